@@ -822,3 +822,80 @@ async def get_evolution_legacy(
         data.append({"date": r["date"], "value": val})
 
     return {"data": data}
+
+
+# ============================================================
+# RATE LIMITS (compteurs acceptes / rejetes par politique)
+# ============================================================
+@router.get("/rate-limits")
+async def get_rate_limits(user: dict = Depends(_require_admin)):
+    """Politiques du rate limiter partage + compteurs depuis le demarrage."""
+    from app.services import rate_limit
+    return rate_limit.stats()
+
+
+# ============================================================
+# CACHES (cache HTTP public + blob store images)
+# ============================================================
+@router.get("/caches")
+async def get_caches(user: dict = Depends(_require_admin)):
+    """Compteurs du cache HTTP (ETag/304) et occupation du blob store."""
+    from app.services import http_cache
+    from app.services.blob_store import blob_store
+    return {"http_cache": http_cache.stats(), "blob_store": blob_store.stats()}
+
+
+# ============================================================
+# CLIENTS EN DOUBLE (meme telephone normalise)
+# ============================================================
+@router.post("/clients/fusion-doublons")
+async def fusion_doublons_clients(
+    dry_run: bool = Query(False, description="Compter sans fusionner"),
+    user: dict = Depends(_require_admin),
+):
+    """Fusionne les clients de meme numero normalise (tickets, fidelite... rattaches)."""
+    from app.services import clients_upsert
+    with get_cursor() as cur:
+        return clients_upsert.merge_duplicates(cur, dry_run=dry_run)
+
+
+# ============================================================
+# PERFORMANCE (temps par route, requetes SQL par requete HTTP)
+# ============================================================
+@router.get("/perf")
+async def get_perf(
+    tri: str = Query("p95", pattern="^(p95|requetes)$"),
+    limit: int = Query(20, ge=1, le=200),
+    user: dict = Depends(_require_admin),
+):
+    """Routes les plus lentes (p95) ou les plus bavardes en SQL, depuis le demarrage."""
+    from app.services import request_metrics
+    return {"sample_rate": request_metrics.sample_rate(), "routes": request_metrics.top(tri, limit)}
+
+
+# ============================================================
+# REQUETES SQL (profileur par empreinte)
+# ============================================================
+@router.get("/requetes-sql")
+async def get_requetes_sql(
+    tri: str = Query("total", pattern="^(total|moyenne|max|appels)$"),
+    limit: int = Query(20, ge=1, le=200),
+    user: dict = Depends(_require_admin),
+):
+    """Formes de requetes SQL les plus couteuses, avec histogrammes et plan EXPLAIN."""
+    from app.services import query_profiler
+    return {
+        "actif": query_profiler.ENABLED,
+        "seuil_plan_ms": query_profiler.SLOW_MS,
+        "requetes": query_profiler.top(tri, limit),
+    }
+
+
+# ============================================================
+# DEMARRAGE (chronologie des taches d'init du dernier boot)
+# ============================================================
+@router.get("/demarrage")
+async def get_demarrage(user: dict = Depends(_require_admin)):
+    """Taches de demarrage : etat, debut / duree (ms), erreurs eventuelles."""
+    from app.services.startup import boot
+    return boot.status()
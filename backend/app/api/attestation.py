@@ -14,8 +14,6 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional, List
-from fpdf import FPDF
-import httpx
 
 from app.database import get_cursor
 from app.api.auth import get_current_user
@@ -83,6 +81,8 @@ def _get_param(key: str) -> str:
 
 def _generate_attestation_pdf(data: AttestationRequest) -> bytes:
     """Genere un PDF A4 professionnel de l'attestation - tient sur 1 page."""
+    from fpdf import FPDF
+
     now = datetime.now()
     date_fr = f"{now.day} {MOIS_FR[now.month - 1]} {now.year}"
     LM = 18
@@ -225,6 +225,7 @@ def _generate_attestation_pdf(data: AttestationRequest) -> bytes:
 
 def _send_resend_pdf(to: str, subject: str, message: str, pdf_bytes: bytes, filename: str) -> tuple:
     """Envoie un email avec PDF en pièce jointe via Resend."""
+    import httpx
     api_key = _get_param("RESEND_API_KEY")
     if not api_key:
         return False, "Cle API Resend non configuree"
@@ -9,7 +9,6 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
 from pydantic import BaseModel
 
 from app.database import get_cursor
@@ -25,6 +24,8 @@ JWT_EXPIRE_DAYS = 30
 
 def create_token(target: str, utilisateur: str) -> str:
     """Crée un JWT token."""
+    from jose import jwt
+
     expire = datetime.utcnow() + timedelta(days=JWT_EXPIRE_DAYS)
     payload = {
         "sub": utilisateur,
@@ -36,6 +37,8 @@ def create_token(target: str, utilisateur: str) -> str:
 
 def decode_token(token: str) -> dict:
     """Décode et valide un JWT token."""
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         return payload
@@ -5,6 +5,7 @@ Endpoints publics (pas d'authentification requise).
 
 from fastapi import APIRouter, HTTPException, Query
 from app.database import get_cursor
+from app.services import tarifs_catalog
 
 router = APIRouter(prefix="/api/autocomplete", tags=["autocomplete"])
 
@@ -52,32 +53,26 @@ async def search(
         ]
 
     elif categorie == "modele":
-        results = []
-        with get_cursor() as cur:
-            cur.execute(
-                """SELECT DISTINCT modele, marque FROM tarifs
-                   WHERE LOWER(modele) LIKE LOWER(%s)
-                   ORDER BY modele
-                   LIMIT %s""",
-                (pattern, limit),
-            )
-            rows = cur.fetchall()
+        # Modeles tarifs depuis le catalogue en memoire (pas de requete SQL)
+        tarif_modeles = tarifs_catalog.matching_modeles(q)
         results = [
-            {"value": row["modele"], "marque": row["marque"], "source": "tarifs"}
-            for row in rows
+            {"value": modele, "marque": marque, "source": "tarifs"}
+            for modele, marque in tarif_modeles[:limit]
         ]
 
         if len(results) < limit:
             remaining = limit - len(results)
+            # Seuls les modeles tarifs qui matchent q peuvent entrer en collision
+            exclude = list({modele for modele, _ in tarif_modeles})
             with get_cursor() as cur:
                 cur.execute(
                     """SELECT terme, compteur FROM autocompletion
                        WHERE categorie='modele_custom'
                          AND LOWER(terme) LIKE LOWER(%s)
-                         AND terme NOT IN (SELECT DISTINCT modele FROM tarifs)
+                         AND NOT (terme = ANY(%s))
                        ORDER BY compteur DESC, derniere_utilisation DESC
                        LIMIT %s""",
-                    (pattern, remaining),
+                    (pattern, exclude, remaining),
                 )
                 custom_rows = cur.fetchall()
             for row in custom_rows:
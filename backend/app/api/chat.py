@@ -7,17 +7,21 @@ Chat interne intelligent Klikphone SAV.
 import os
 import json
 import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 
-import httpx
-
 from app.database import get_cursor
+from app.services.fast_json import FastJSONResponse
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
+logger = logging.getLogger(__name__)
 
 # ─── TABLE LAZY CREATION ────────────────────────────────
 
@@ -188,6 +192,113 @@ TOOLS = [
 
 # ─── TOOL EXECUTION ─────────────────────────────────────
 
+# Les tool_use d'un meme tour du modele sont independants : on les execute
+# en parallele dans un pool dedie (chaque appel prend sa propre connexion du
+# pool psycopg2, maxconn=10 -> on reste bien en dessous).
+_TOOL_WORKERS = 4
+_tool_executor = ThreadPoolExecutor(max_workers=_TOOL_WORKERS, thread_name_prefix="chat_tool")
+
+# Memo des resultats par (outil, input normalise). TTL court : les donnees
+# bougent (statuts, nouveaux clients) mais une meme conversation repete
+# souvent mot pour mot le meme search_client / get_stats.
+_TOOL_CACHE_TTL = 30.0  # seconds
+_TOOL_CACHE_MAX = 256
+_tool_cache: dict = {}
+_tool_cache_lock = threading.Lock()
+
+# Latence par outil (compteurs cumules depuis le demarrage du process)
+_tool_stats: dict = {}
+_tool_stats_lock = threading.Lock()
+
+
+def _normalize_tool_input(value):
+    """Normalise un input d'outil pour la cle de cache (casse, espaces, ordre).
+
+    Toutes les recherches texte des outils sont en ILIKE / UPPER, donc la
+    casse et les espaces en bordure ne changent pas le resultat.
+    """
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {k: _normalize_tool_input(v) for k, v in value.items() if v not in (None, "")}
+    if isinstance(value, list):
+        return [_normalize_tool_input(v) for v in value]
+    return value
+
+
+def _tool_cache_key(tool_name: str, tool_input: dict) -> tuple:
+    normalized = _normalize_tool_input(tool_input or {})
+    return (tool_name, json.dumps(normalized, sort_keys=True, default=str, ensure_ascii=False))
+
+
+def _record_tool_latency(tool_name: str, elapsed_ms: float, cached: bool):
+    with _tool_stats_lock:
+        st = _tool_stats.setdefault(tool_name, {
+            "calls": 0, "cache_hits": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0,
+        })
+        st["calls"] += 1
+        if cached:
+            st["cache_hits"] += 1
+            return
+        st["total_ms"] += elapsed_ms
+        st["last_ms"] = elapsed_ms
+        if elapsed_ms > st["max_ms"]:
+            st["max_ms"] = elapsed_ms
+
+
+def _invalidate_tool_cache():
+    with _tool_cache_lock:
+        _tool_cache.clear()
+
+
+def _execute_tool_cached(tool_name: str, tool_input: dict) -> str:
+    """_execute_tool avec memo TTL et mesure de latence.
+
+    Les resultats en erreur ne sont pas mis en cache (DB indisponible, etc.).
+    """
+    key = _tool_cache_key(tool_name, tool_input)
+    now = time.time()
+    with _tool_cache_lock:
+        entry = _tool_cache.get(key)
+        if entry and now - entry[1] < _TOOL_CACHE_TTL:
+            _record_tool_latency(tool_name, 0.0, cached=True)
+            return entry[0]
+
+    t0 = time.perf_counter()
+    result = _execute_tool(tool_name, tool_input)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    _record_tool_latency(tool_name, elapsed_ms, cached=False)
+    logger.debug("chat tool %s : %.1f ms", tool_name, elapsed_ms)
+
+    if not result.startswith('{"error"'):
+        with _tool_cache_lock:
+            if len(_tool_cache) >= _TOOL_CACHE_MAX:
+                # Purge des entrees expirees, sinon de la plus ancienne
+                expired = [k for k, (_, ts) in _tool_cache.items() if now - ts >= _TOOL_CACHE_TTL]
+                for k in expired:
+                    del _tool_cache[k]
+                if len(_tool_cache) >= _TOOL_CACHE_MAX:
+                    del _tool_cache[min(_tool_cache, key=lambda k: _tool_cache[k][1])]
+            _tool_cache[key] = (result, time.time())
+    return result
+
+
+async def _execute_tools_parallel(blocks: list) -> list:
+    """Execute tous les tool_use d'un tour du modele en parallele.
+
+    Retourne les tool_result dans le meme ordre que les blocs.
+    """
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*[
+        loop.run_in_executor(_tool_executor, _execute_tool_cached, b["name"], b["input"])
+        for b in blocks
+    ])
+    return [
+        {"type": "tool_result", "tool_use_id": b["id"], "content": r}
+        for b, r in zip(blocks, results)
+    ]
+
+
 def _execute_tool(tool_name: str, tool_input: dict) -> str:
     """Execute un outil de recherche en BDD et retourne le resultat JSON."""
     try:
@@ -328,6 +439,7 @@ def _get_system_prompt_for_role(role: str) -> str:
 @router.post("/ai")
 async def chat_ai(msg: AIChatRequest):
     """Chat avec l'assistant IA Klikphone (Claude + tools BDD)."""
+    import httpx
 
     api_key = _get_param("ANTHROPIC_API_KEY") or os.environ.get("ANTHROPIC_API_KEY")
     if not api_key:
@@ -381,15 +493,9 @@ async def chat_ai(msg: AIChatRequest):
                 assistant_content = result["content"]
                 _conversations[conv_id].append({"role": "assistant", "content": assistant_content})
 
-                tool_results = []
-                for block in assistant_content:
-                    if block["type"] == "tool_use":
-                        tool_result = _execute_tool(block["name"], block["input"])
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block["id"],
-                            "content": tool_result
-                        })
+                tool_results = await _execute_tools_parallel(
+                    [b for b in assistant_content if b["type"] == "tool_use"]
+                )
 
                 _conversations[conv_id].append({"role": "user", "content": tool_results})
                 messages = _conversations[conv_id][-10:]
@@ -433,6 +539,22 @@ async def chat_ai(msg: AIChatRequest):
         raise HTTPException(500, f"Erreur: {str(e)}")
 
 
+@router.get("/ai/tool-stats")
+async def get_tool_stats():
+    """Latence des outils IA (appels, hits cache, moyenne/max en ms)."""
+    with _tool_stats_lock:
+        stats = {name: dict(st) for name, st in _tool_stats.items()}
+    for st in stats.values():
+        executed = st["calls"] - st["cache_hits"]
+        st["avg_ms"] = round(st["total_ms"] / executed, 2) if executed else 0.0
+        st["total_ms"] = round(st["total_ms"], 2)
+        st["max_ms"] = round(st["max_ms"], 2)
+        st["last_ms"] = round(st["last_ms"], 2)
+    with _tool_cache_lock:
+        cache_size = len(_tool_cache)
+    return {"tools": stats, "cache_size": cache_size, "cache_ttl": _TOOL_CACHE_TTL}
+
+
 @router.delete("/ai/conversation/{conv_id}")
 async def clear_conversation(conv_id: str):
     """Efface une conversation IA."""
@@ -512,8 +634,7 @@ async def get_team_messages(
     for m in messages:
         rb = m.get("read_by") or ""
         m["read_by"] = [x for x in rb.split(",") if x] if isinstance(rb, str) else (rb or [])
-        m["created_at"] = m["created_at"].isoformat() if m.get("created_at") else None
-    return messages
+    return FastJSONResponse(messages)
 
 
 @router.get("/team/contacts")
@@ -586,9 +707,7 @@ async def get_conversation(user: str, contact: str = Query(alias="with")):
         """, (user, contact, contact, user))
         messages = cur.fetchall() or []
 
-    for m in messages:
-        m["created_at"] = m["created_at"].isoformat() if m.get("created_at") else None
-    return messages
+    return FastJSONResponse(messages)
 
 
 @router.put("/team/read")
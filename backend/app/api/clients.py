@@ -6,11 +6,13 @@ import csv
 import io
 from typing import Optional
 
+from psycopg2 import errors
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from app.database import get_cursor
 from app.models import ClientCreate, ClientUpdate, ClientOut
 from app.api.auth import get_current_user
+from app.services import clients_upsert
 
 router = APIRouter(prefix="/api/clients", tags=["clients"])
 
@@ -153,7 +155,7 @@ async def get_client(client_id: int, user: dict = Depends(get_current_user)):
 async def get_client_by_tel(telephone: str):
     """Recherche un client par téléphone (public — formulaire client)."""
     with get_cursor() as cur:
-        cur.execute("SELECT * FROM clients WHERE telephone = %s", (telephone,))
+        cur.execute("SELECT * FROM clients WHERE telephone_norm = tel_norm(%s)", (telephone,))
         row = cur.fetchone()
     return row  # None si pas trouvé (pas d'erreur 404)
 
@@ -161,41 +163,16 @@ async def get_client_by_tel(telephone: str):
 @router.post("", response_model=ClientOut)
 async def create_or_get_client(data: ClientCreate):
     """Crée un client ou retourne l'existant si le téléphone existe déjà.
-    
-    Compatible avec get_or_create_client.
+
+    Téléphone comparé après normalisation (06…, +33 6…) ; les infos non vides
+    mettent à jour le client existant. Une seule requête (upsert).
     """
     with get_cursor() as cur:
-        # Vérifier si le client existe
-        cur.execute("SELECT * FROM clients WHERE telephone = %s", (data.telephone,))
-        existing = cur.fetchone()
-
-        if existing:
-            # Mettre à jour les infos si elles ont changé
-            cur.execute("""
-                UPDATE clients SET 
-                    nom = COALESCE(NULLIF(%s, ''), nom),
-                    prenom = COALESCE(NULLIF(%s, ''), prenom),
-                    email = COALESCE(NULLIF(%s, ''), email),
-                    societe = COALESCE(NULLIF(%s, ''), societe),
-                    carte_camby = %s
-                WHERE id = %s
-                RETURNING *
-            """, (
-                data.nom, data.prenom, data.email,
-                data.societe, data.carte_camby, existing["id"],
-            ))
-            return cur.fetchone()
-
-        # Créer le client
-        cur.execute("""
-            INSERT INTO clients (nom, prenom, telephone, email, societe, carte_camby)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING *
-        """, (
-            data.nom, data.prenom, data.telephone,
-            data.email, data.societe, data.carte_camby,
-        ))
-        return cur.fetchone()
+        return clients_upsert.upsert(
+            cur, data.telephone,
+            nom=data.nom, prenom=data.prenom, email=data.email,
+            societe=data.societe, carte_camby=data.carte_camby,
+        )
 
 
 @router.patch("/{client_id}", response_model=dict)
@@ -212,8 +189,11 @@ async def update_client(
     set_clause = ", ".join(f"{k} = %s" for k in updates.keys())
     values = list(updates.values()) + [client_id]
 
-    with get_cursor() as cur:
-        cur.execute(f"UPDATE clients SET {set_clause} WHERE id = %s", values)
+    try:
+        with get_cursor() as cur:
+            cur.execute(f"UPDATE clients SET {set_clause} WHERE id = %s", values)
+    except errors.UniqueViolation:
+        raise HTTPException(409, "Un autre client a déjà ce numéro de téléphone")
 
     return {"ok": True}
 
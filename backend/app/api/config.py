@@ -13,6 +13,7 @@ from pydantic import BaseModel
 from app.database import get_cursor
 from app.models import ParamUpdate, ParamOut
 from app.api.auth import get_current_user
+from app.services import clients_upsert, fidelite as fidelite_service, numerotation
 
 router = APIRouter(prefix="/api/config", tags=["config"])
 
@@ -49,6 +50,8 @@ async def set_param(data: ParamUpdate, user: dict = Depends(get_current_user)):
             INSERT INTO params (cle, valeur) VALUES (%s, %s)
             ON CONFLICT (cle) DO UPDATE SET valeur = EXCLUDED.valeur
         """, (data.cle, data.valeur))
+        if fidelite_service.is_setting(data.cle):
+            fidelite_service.invalidate(cur)
     return {"ok": True}
 
 
@@ -64,6 +67,8 @@ async def set_params_batch(
                 INSERT INTO params (cle, valeur) VALUES (%s, %s)
                 ON CONFLICT (cle) DO UPDATE SET valeur = EXCLUDED.valeur
             """, (p.cle, p.valeur))
+        if any(fidelite_service.is_setting(p.cle) for p in params):
+            fidelite_service.invalidate(cur)
     return {"ok": True}
 
 
@@ -153,6 +158,11 @@ async def import_backup(backup: dict, user: dict = Depends(get_current_user)):
     counts = {}
 
     with get_cursor() as cur:
+        # Un ancien backup peut contenir des doublons de téléphone : index
+        # unique levé le temps de l'import, doublons fusionnés à la fin
+        if "clients" in tables:
+            cur.execute(f"DROP INDEX IF EXISTS {clients_upsert.UNIQUE_INDEX}")
+
         # Supprimer dans l'ordre inverse (FK)
         for table in reversed(import_order):
             if table not in ALLOWED_BACKUP_TABLES:
@@ -191,6 +201,13 @@ async def import_backup(backup: dict, user: dict = Depends(get_current_user)):
             except Exception:
                 pass
 
+        if "params" in tables:
+            fidelite_service.invalidate(cur)
+        if "devis" in tables:
+            numerotation.resync(cur)
+        if "clients" in tables:
+            clients_upsert.migrate(cur)
+
     return {"ok": True, "imported": counts}
 
 
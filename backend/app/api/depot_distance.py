@@ -5,7 +5,7 @@ API Dépôt à Distance — pré-enregistrement public + validation/refus par ac
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 
 from app.database import get_cursor
@@ -13,6 +13,7 @@ from app.api.auth import get_current_user
 from app.services.notifications import (
     envoyer_discord_embed, DISCORD_COLORS, envoyer_email, _get_param,
 )
+from app.services import clients_upsert, http_cache, numerotation
 
 router = APIRouter(prefix="/api/depot-distance", tags=["depot-distance"])
 
@@ -55,47 +56,22 @@ async def creer_depot_distance(data: DepotDistanceRequest, bg: BackgroundTasks):
         raise HTTPException(400, "Le dépôt à distance n'est pas disponible actuellement.")
 
     with get_cursor() as cur:
-        # Créer ou récupérer le client
-        cur.execute(
-            "SELECT id FROM clients WHERE telephone = %s",
-            (data.telephone,),
-        )
-        existing = cur.fetchone()
-        if existing:
-            client_id = existing["id"]
-            cur.execute("""
-                UPDATE clients SET
-                    nom = COALESCE(NULLIF(%s, ''), nom),
-                    prenom = COALESCE(NULLIF(%s, ''), prenom),
-                    email = COALESCE(NULLIF(%s, ''), email),
-                    carte_camby = %s
-                WHERE id = %s
-            """, (data.nom, data.prenom, data.email, data.carte_camby, client_id))
-        else:
-            cur.execute("""
-                INSERT INTO clients (nom, prenom, telephone, email, carte_camby)
-                VALUES (%s, %s, %s, %s, %s) RETURNING id
-            """, (data.nom, data.prenom, data.telephone, data.email, data.carte_camby))
-            client_id = cur.fetchone()["id"]
+        # Créer ou récupérer le client (téléphone normalisé, une requête)
+        client_id = clients_upsert.upsert(
+            cur, data.telephone,
+            nom=data.nom, prenom=data.prenom, email=data.email,
+            carte_camby=data.carte_camby,
+        )["id"]
 
         # Créer le ticket en statut "Pré-enregistré"
-        cur.execute("""
-            INSERT INTO tickets
-            (client_id, categorie, marque, modele, modele_autre,
-             panne, panne_detail, notes_client,
-             statut, source)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'Pré-enregistré', 'distance')
-            RETURNING id
-        """, (
-            client_id, data.categorie, data.marque, data.modele,
-            data.modele_autre, data.panne, data.panne_detail,
-            data.notes_client,
-        ))
-        row = cur.fetchone()
-        tid = row["id"]
-
-        code = f"KP-{tid:06d}"
-        cur.execute("UPDATE tickets SET ticket_code = %s WHERE id = %s", (code, tid))
+        row = numerotation.insert_ticket(cur, {
+            "client_id": client_id, "categorie": data.categorie,
+            "marque": data.marque, "modele": data.modele, "modele_autre": data.modele_autre,
+            "panne": data.panne, "panne_detail": data.panne_detail,
+            "notes_client": data.notes_client,
+            "statut": "Pré-enregistré", "source": "distance",
+        })
+        tid, code = row["id"], row["ticket_code"]
 
     # Notifications en arrière-plan (ne bloque pas la réponse)
     appareil = data.modele_autre if data.modele_autre else f"{data.marque} {data.modele}"
@@ -171,6 +147,7 @@ async def valider_depot(ticket_id: int, user: dict = Depends(get_current_user)):
             row["ticket_code"],
         )
 
+    http_cache.invalidate("ticket")
     return {"ok": True, "nouveau_statut": "En attente de diagnostic"}
 
 
@@ -230,6 +207,7 @@ async def refuser_depot(
             motif,
         )
 
+    http_cache.invalidate("ticket")
     return {"ok": True, "nouveau_statut": "Clôturé"}
 
 
@@ -256,25 +234,31 @@ async def get_pending_depots(user: dict = Depends(get_current_user)):
 # ─── PUBLIC: Suivi enrichi ───────────────────────────────────
 
 @router.get("/suivi/{ticket_code}")
-async def suivi_public(ticket_code: str):
+async def suivi_public(ticket_code: str, request: Request):
     """Retourne les infos publiques d'un ticket pour le suivi client."""
-    with get_cursor() as cur:
-        cur.execute("""
-            SELECT t.ticket_code, t.statut, t.marque, t.modele, t.modele_autre,
-                   t.panne, t.panne_detail, t.date_depot, t.date_maj,
-                   t.date_recuperation, t.commande_piece, t.commentaire_client,
-                   t.devis_estime, t.tarif_final, t.acompte,
-                   t.reduction_montant, t.reduction_pourcentage,
-                   t.reparation_supp, t.prix_supp, t.source,
-                   c.prenom AS client_prenom
-            FROM tickets t
-            JOIN clients c ON t.client_id = c.id
-            WHERE t.ticket_code = %s
-        """, (ticket_code,))
-        row = cur.fetchone()
-    if not row:
-        raise HTTPException(404, "Ticket non trouvé")
-    return dict(row)
+    def build():
+        with get_cursor() as cur:
+            cur.execute("""
+                SELECT t.ticket_code, t.statut, t.marque, t.modele, t.modele_autre,
+                       t.panne, t.panne_detail, t.date_depot, t.date_maj,
+                       t.date_recuperation, t.commande_piece, t.commentaire_client,
+                       t.devis_estime, t.tarif_final, t.acompte,
+                       t.reduction_montant, t.reduction_pourcentage,
+                       t.reparation_supp, t.prix_supp, t.source,
+                       c.prenom AS client_prenom
+                FROM tickets t
+                JOIN clients c ON t.client_id = c.id
+                WHERE t.ticket_code = %s
+            """, (ticket_code,))
+            row = cur.fetchone()
+        if not row:
+            raise HTTPException(404, "Ticket non trouvé")
+        return dict(row)
+
+    return http_cache.cached_json(
+        request, "ticket", ticket_code, build,
+        ttl=10.0, cache_control=http_cache.PRIVATE_REVALIDATE, variant="suivi",
+    )
 
 
 # ─── HELPERS EMAIL ────────────────────────────────────────────
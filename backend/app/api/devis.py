@@ -13,6 +13,8 @@ from pydantic import BaseModel
 from app.database import get_cursor
 from app.api.auth import get_current_user
 from app.api.notifications_center import push_notification
+from app.services import clients_upsert, numerotation, tarifs_catalog
+from app.services.fast_json import FastJSONResponse
 
 router = APIRouter(prefix="/api/devis", tags=["devis"])
 
@@ -20,6 +22,7 @@ router = APIRouter(prefix="/api/devis", tags=["devis"])
 # ─── Models ────────────────────────────────────────────────
 
 class DevisLigneIn(BaseModel):
+    id: Optional[int] = None
     description: str
     quantite: int = 1
     prix_unitaire: float = 0
@@ -68,22 +71,86 @@ def _calc_totals(lignes, tva_pct, remise):
     return round(total_ht, 2), round(total_ttc, 2)
 
 
-def _gen_numero(cur):
-    """Génère un numéro de devis unique: DEV-YYYYMM-XXXX."""
-    now = datetime.now()
-    prefix = f"DEV-{now.strftime('%Y%m')}-"
-    cur.execute(
-        "SELECT numero FROM devis WHERE numero LIKE %s ORDER BY id DESC LIMIT 1",
-        (f"{prefix}%",),
+def _prepare_lignes(lignes) -> list:
+    """Lignes du payload -> dicts avec total calculé et ordre = position."""
+    out = []
+    for i, l in enumerate(lignes):
+        ld = l.model_dump()
+        ld["total"] = round(ld["quantite"] * ld["prix_unitaire"], 2)
+        ld["ordre"] = i
+        out.append(ld)
+    return out
+
+
+_LIGNE_FIELDS = ("description", "quantite", "prix_unitaire", "total", "ordre")
+
+_INSERT_LIGNES_SQL = """
+    INSERT INTO devis_lignes (devis_id, description, quantite, prix_unitaire, total, ordre)
+    SELECT %s, * FROM unnest(%s::text[], %s::int[], %s::numeric[], %s::numeric[], %s::int[])
+"""
+
+_UPDATE_LIGNES_SQL = """
+    UPDATE devis_lignes l SET
+        description = v.description, quantite = v.quantite,
+        prix_unitaire = v.prix_unitaire, total = v.total, ordre = v.ordre
+    FROM unnest(%s::int[], %s::text[], %s::int[], %s::numeric[], %s::numeric[], %s::int[])
+        AS v(id, description, quantite, prix_unitaire, total, ordre)
+    WHERE l.id = v.id AND l.devis_id = %s
+"""
+
+
+def _columns(rows: list, fields) -> list:
+    return [[r[f] for r in rows] for f in fields]
+
+
+def _same_ligne(old: dict, new: dict) -> bool:
+    return (
+        old["description"] == new["description"]
+        and int(old["quantite"] or 0) == new["quantite"]
+        and round(float(old["prix_unitaire"] or 0), 2) == round(new["prix_unitaire"], 2)
+        and int(old["ordre"] or 0) == new["ordre"]
     )
-    row = cur.fetchone()
-    if row:
-        try:
-            last_num = int(row["numero"].split("-")[-1])
-        except (ValueError, IndexError):
-            last_num = 0
-        return f"{prefix}{last_num + 1:04d}"
-    return f"{prefix}0001"
+
+
+def _diff_lignes(existing: list, lignes: list):
+    """(inserts, updates, delete_ids) pour passer de `existing` à `lignes`.
+
+    Appariement par id si le client les renvoie, sinon par position (ordre) :
+    un autosave qui modifie une ligne ne touche qu'une ligne.
+    """
+    existing = sorted(existing, key=lambda l: (l.get("ordre") or 0, l["id"]))
+    by_id = {l["id"]: l for l in existing}
+    inserts, updates, matched = [], [], set()
+    use_ids = any(l.get("id") for l in lignes)
+    for i, ld in enumerate(lignes):
+        if use_ids:
+            old = by_id.get(ld.get("id"))
+        else:
+            old = existing[i] if i < len(existing) else None
+        if old is None or old["id"] in matched:
+            inserts.append(ld)
+            continue
+        matched.add(old["id"])
+        if not _same_ligne(old, ld):
+            updates.append({**ld, "id": old["id"]})
+    delete_ids = [l["id"] for l in existing if l["id"] not in matched]
+    return inserts, updates, delete_ids
+
+
+def _insert_lignes(cur, devis_id: int, lignes: list):
+    if lignes:
+        cur.execute(_INSERT_LIGNES_SQL, [devis_id, *_columns(lignes, _LIGNE_FIELDS)])
+
+
+def _save_lignes(cur, devis_id: int, existing: list, lignes: list) -> int:
+    """Applique le diff en au plus 3 instructions ensemblistes ; retourne leur nombre."""
+    inserts, updates, delete_ids = _diff_lignes(existing, lignes)
+    if delete_ids:
+        cur.execute("DELETE FROM devis_lignes WHERE devis_id = %s AND id = ANY(%s)", (devis_id, delete_ids))
+    if updates:
+        cur.execute(_UPDATE_LIGNES_SQL, [*_columns(updates, ("id",) + _LIGNE_FIELDS), devis_id])
+    _insert_lignes(cur, devis_id, inserts)
+    return bool(delete_ids) + bool(updates) + bool(inserts)
 
 
 # ══════════════════════════════════════════════════════════════
@@ -127,23 +194,14 @@ async def list_devis(
         """, params)
         rows = cur.fetchall()
 
-    result = []
-    for r in rows:
-        d = dict(r)
-        for key in ("date_creation", "date_maj", "date_acceptation", "date_refus"):
-            if d.get(key) and hasattr(d[key], "isoformat"):
-                d[key] = d[key].isoformat()
-        result.append(d)
-    return result
+    return FastJSONResponse(rows)
 
 
 # ─── CREATE ────────────────────────────────────────────────
 
 @router.post("")
 async def create_devis(data: DevisCreate, user: dict = Depends(get_current_user)):
-    lignes_dicts = [l.model_dump() for l in data.lignes]
-    for ld in lignes_dicts:
-        ld["total"] = round(ld["quantite"] * ld["prix_unitaire"], 2)
+    lignes_dicts = _prepare_lignes(data.lignes)
     total_ht, total_ttc = _calc_totals(lignes_dicts, data.tva, data.remise)
 
     # Auto-fill client info from client_id
@@ -165,24 +223,15 @@ async def create_devis(data: DevisCreate, user: dict = Depends(get_current_user)
             pass
 
     with get_cursor() as cur:
-        numero = _gen_numero(cur)
-        cur.execute("""
-            INSERT INTO devis (numero, client_id, client_nom, client_prenom, client_tel, client_email,
-                appareil, description, tva, remise, total_ht, total_ttc, notes, validite_jours)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            numero, data.client_id, client_nom, client_prenom, client_tel, client_email,
-            data.appareil, data.description, data.tva, data.remise, total_ht, total_ttc,
-            data.notes, data.validite_jours,
-        ))
-        devis_id = cur.fetchone()["id"]
-
-        for i, ld in enumerate(lignes_dicts):
-            cur.execute("""
-                INSERT INTO devis_lignes (devis_id, description, quantite, prix_unitaire, total, ordre)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (devis_id, ld["description"], ld["quantite"], ld["prix_unitaire"], ld["total"], i))
+        row = numerotation.insert_devis(cur, {
+            "client_id": data.client_id, "client_nom": client_nom, "client_prenom": client_prenom,
+            "client_tel": client_tel, "client_email": client_email,
+            "appareil": data.appareil, "description": data.description, "tva": data.tva,
+            "remise": data.remise, "total_ht": total_ht, "total_ttc": total_ttc,
+            "notes": data.notes, "validite_jours": data.validite_jours,
+        })
+        devis_id, numero = row["id"], row["numero"]
+        _insert_lignes(cur, devis_id, lignes_dicts)
 
     return {"id": devis_id, "numero": numero}
 
@@ -215,34 +264,10 @@ async def devis_flash_search(
     limit: int = Query(20, le=50),
     user: Optional[dict] = None,
 ):
-    """Recherche dans tarifs, résultats groupés par modèle."""
-    with get_cursor() as cur:
-        cur.execute("""
-            SELECT marque, modele, type_piece, qualite, prix_client, en_stock
-            FROM tarifs
-            WHERE (modele ILIKE %s OR marque ILIKE %s)
-            ORDER BY marque, modele, type_piece, qualite
-        """, (f"%{q}%", f"%{q}%"))
-        rows = cur.fetchall()
-
-    models = {}
-    for r in rows:
-        key = f"{r['marque']}||{r['modele']}"
-        if key not in models:
-            models[key] = {
-                "marque": r["marque"],
-                "modele": r["modele"],
-                "reparations": [],
-            }
-        models[key]["reparations"].append({
-            "composant": r["type_piece"],
-            "qualite": r["qualite"] or None,
-            "prix_vente": float(r["prix_client"] or 0),
-            "en_stock": bool(r.get("en_stock", True)),
-        })
+    """Recherche dans tarifs, résultats groupés par modèle.
 
-    result = list(models.values())[:limit]
-    return result
+    Servi depuis le catalogue en memoire (app.services.tarifs_catalog)."""
+    return tarifs_catalog.search_models(q, limit)
 
 
 # ─── TELEPHONES VENTE — CRUD ──────────────────────────────
@@ -282,13 +307,7 @@ async def list_telephones_vente(
         """, params)
         rows = cur.fetchall()
 
-    result = []
-    for r in rows:
-        d = dict(r)
-        if d.get("date_ajout") and hasattr(d["date_ajout"], "isoformat"):
-            d["date_ajout"] = d["date_ajout"].isoformat()
-        result.append(d)
-    return result
+    return FastJSONResponse(rows)
 
 
 @router.get("/telephones-vente/stats")
@@ -379,13 +398,10 @@ async def get_devis(devis_id: int, user: dict = Depends(get_current_user)):
             client_info = cur.fetchone()
 
     d = dict(devis)
-    for key in ("date_creation", "date_maj", "date_acceptation", "date_refus"):
-        if d.get(key) and hasattr(d[key], "isoformat"):
-            d[key] = d[key].isoformat()
-    d["lignes"] = [dict(l) for l in lignes]
+    d["lignes"] = lignes
     if client_info:
-        d["client"] = dict(client_info)
-    return d
+        d["client"] = client_info
+    return FastJSONResponse(d)
 
 
 # ─── UPDATE ────────────────────────────────────────────────
@@ -399,11 +415,22 @@ async def update_devis(devis_id: int, data: DevisUpdate, user: dict = Depends(ge
     existing_data = None
 
     with get_cursor() as cur:
-        cur.execute("SELECT * FROM devis WHERE id = %s", (devis_id,))
+        # Devis + lignes actuelles en une lecture (lignes seulement si diff à faire)
+        cur.execute("""
+            SELECT d.*, CASE WHEN %s THEN COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', l.id, 'description', l.description, 'quantite', l.quantite,
+                    'prix_unitaire', l.prix_unitaire, 'ordre', l.ordre))
+                FROM devis_lignes l WHERE l.devis_id = d.id
+            ), '[]'::json) END AS _lignes
+            FROM devis d WHERE d.id = %s
+            FOR UPDATE OF d
+        """, (data.lignes is not None, devis_id))
         existing = cur.fetchone()
         if not existing:
             raise HTTPException(404, "Devis non trouvé")
         existing_data = dict(existing)
+        lignes_actuelles = existing_data.pop("_lignes", None) or []
 
         # Handle status changes
         if "statut" in updates:
@@ -422,16 +449,8 @@ async def update_devis(devis_id: int, data: DevisUpdate, user: dict = Depends(ge
 
         # Update lignes if provided
         if data.lignes is not None:
-            cur.execute("DELETE FROM devis_lignes WHERE devis_id = %s", (devis_id,))
-            lignes_dicts = []
-            for i, l in enumerate(data.lignes):
-                ld = l.model_dump()
-                ld["total"] = round(ld["quantite"] * ld["prix_unitaire"], 2)
-                lignes_dicts.append(ld)
-                cur.execute("""
-                    INSERT INTO devis_lignes (devis_id, description, quantite, prix_unitaire, total, ordre)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (devis_id, ld["description"], ld["quantite"], ld["prix_unitaire"], ld["total"], i))
+            lignes_dicts = _prepare_lignes(data.lignes)
+            _save_lignes(cur, devis_id, lignes_actuelles, lignes_dicts)
 
             tva = updates.get("tva", existing["tva"])
             remise = updates.get("remise", existing["remise"])
@@ -517,32 +536,24 @@ async def convert_to_ticket(devis_id: int, user: dict = Depends(get_current_user
         # Create client if needed
         client_id = devis.get("client_id")
         if not client_id and devis.get("client_tel"):
-            cur.execute("SELECT id FROM clients WHERE telephone = %s", (devis["client_tel"],))
-            row = cur.fetchone()
-            if row:
-                client_id = row["id"]
-            else:
-                cur.execute("""
-                    INSERT INTO clients (nom, prenom, telephone, email)
-                    VALUES (%s, %s, %s, %s) RETURNING id
-                """, (devis.get("client_nom", ""), devis.get("client_prenom", ""),
-                      devis.get("client_tel", ""), devis.get("client_email")))
-                client_id = cur.fetchone()["id"]
+            client_id = clients_upsert.upsert(
+                cur, devis["client_tel"], update=False,
+                nom=devis.get("client_nom") or "", prenom=devis.get("client_prenom") or "",
+                email=devis.get("client_email"),
+            )["id"]
 
         if not client_id:
             raise HTTPException(400, "Impossible de créer le ticket sans client")
 
         # Create ticket
         panne = devis.get("description") or "Réparation (devis)"
-        cur.execute("""
-            INSERT INTO tickets (client_id, panne, devis_estime, statut, notes_internes)
-            VALUES (%s, %s, %s, 'En attente de diagnostic', %s)
-            RETURNING id
-        """, (client_id, panne, devis.get("total_ttc", 0),
-              f"Créé depuis devis {devis.get('numero', '')}"))
-        ticket_id = cur.fetchone()["id"]
-        code = f"KP-{ticket_id:06d}"
-        cur.execute("UPDATE tickets SET ticket_code = %s WHERE id = %s", (code, ticket_id))
+        row = numerotation.insert_ticket(cur, {
+            "client_id": client_id, "panne": panne,
+            "devis_estime": devis.get("total_ttc", 0),
+            "statut": "En attente de diagnostic",
+            "notes_internes": f"Créé depuis devis {devis.get('numero', '')}",
+        })
+        ticket_id, code = row["id"], row["ticket_code"]
 
         # Mark devis as converted
         cur.execute(
@@ -564,27 +575,19 @@ async def duplicate_devis(devis_id: int, user: dict = Depends(get_current_user))
         if not original:
             raise HTTPException(404, "Devis non trouvé")
 
-        numero = _gen_numero(cur)
-        cur.execute("""
-            INSERT INTO devis (numero, client_id, client_nom, client_prenom, client_tel, client_email,
-                appareil, description, tva, remise, total_ht, total_ttc, notes, validite_jours, statut)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'Brouillon')
-            RETURNING id
-        """, (
-            numero, original["client_id"], original["client_nom"], original["client_prenom"],
-            original["client_tel"], original["client_email"], original["appareil"],
-            original["description"], original["tva"], original["remise"],
-            original["total_ht"], original["total_ttc"], original["notes"],
-            original["validite_jours"],
-        ))
-        new_id = cur.fetchone()["id"]
+        copie = {k: original[k] for k in (
+            "client_id", "client_nom", "client_prenom", "client_tel", "client_email",
+            "appareil", "description", "tva", "remise", "total_ht", "total_ttc",
+            "notes", "validite_jours",
+        )}
+        row = numerotation.insert_devis(cur, {**copie, "statut": "Brouillon"})
+        new_id, numero = row["id"], row["numero"]
 
-        cur.execute("SELECT * FROM devis_lignes WHERE devis_id = %s ORDER BY ordre", (devis_id,))
-        for l in cur.fetchall():
-            cur.execute("""
-                INSERT INTO devis_lignes (devis_id, description, quantite, prix_unitaire, total, ordre)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (new_id, l["description"], l["quantite"], l["prix_unitaire"], l["total"], l["ordre"]))
+        cur.execute("""
+            INSERT INTO devis_lignes (devis_id, description, quantite, prix_unitaire, total, ordre)
+            SELECT %s, description, quantite, prix_unitaire, total, ordre
+            FROM devis_lignes WHERE devis_id = %s ORDER BY ordre, id
+        """, (new_id, devis_id))
 
     return {"id": new_id, "numero": numero}
 
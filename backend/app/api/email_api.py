@@ -12,7 +12,6 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
 
-import httpx
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
@@ -31,6 +30,7 @@ def _get_param(key: str) -> str:
 
 def _send_resend(to: str, subject: str, body: str) -> tuple:
     """Envoie un email via l'API HTTP Resend."""
+    import httpx
     api_key = _get_param("RESEND_API_KEY")
     if not api_key:
         return False, "Clé API Resend non configurée"
@@ -112,6 +112,7 @@ def _send_email(to: str, subject: str, body: str) -> tuple:
 
 def _send_resend_html(to: str, subject: str, html: str) -> tuple:
     """Envoie un email HTML via Resend."""
+    import httpx
     api_key = _get_param("RESEND_API_KEY")
     if not api_key:
         return False, "Clé API Resend non configurée"
@@ -171,6 +172,7 @@ async def envoyer_email(data: EmailRequest, user: dict = Depends(get_current_use
 
 def _send_resend_pdf(to: str, subject: str, body_html: str, pdf_bytes: bytes, filename: str) -> tuple:
     """Envoie un email avec un PDF en pièce jointe via Resend."""
+    import httpx
     api_key = _get_param("RESEND_API_KEY")
     if not api_key:
         return False, "Clé API Resend non configurée"
@@ -14,17 +14,14 @@ from pydantic import BaseModel
 
 from app.database import get_cursor
 from app.api.auth import get_current_user
+from app.services import fidelite as fidelite_service
+from app.services.fidelite import _gain_label
 
 router = APIRouter(prefix="/api/fidelite", tags=["fidelite"])
 
 
 # Tables are created by lifespan migration in main.py at startup.
-
-
-def _get_param(cur, key: str, default: str = "") -> str:
-    cur.execute("SELECT valeur FROM params WHERE cle = %s", (key,))
-    row = cur.fetchone()
-    return row["valeur"] if row else default
+# Réglages du programme : snapshot en mémoire (app.services.fidelite).
 
 
 # ─── MODELS ─────────────────────────────────────────────
@@ -45,55 +42,22 @@ class UtiliserRequest(BaseModel):
 @router.post("/crediter")
 async def crediter_points(data: CrediterRequest, user: dict = Depends(get_current_user)):
     """Crédite les points quand un ticket est payé."""
+    s = fidelite_service.settings()
+    vide = {"points_gagnes": 0, "total_points": 0, "palier_film": False, "palier_reduction": False}
+    if not s.active or int(data.montant * s.points_par_euro) <= 0:
+        return vide
 
     with get_cursor() as cur:
-        pts_par_euro = int(_get_param(cur, "fidelite_points_par_euro", "10"))
-        fidelite_active = _get_param(cur, "fidelite_active", "1")
-        if fidelite_active == "0":
-            return {"points_gagnes": 0, "total_points": 0, "palier_film": False, "palier_reduction": False}
-
-        points_gagnes = int(data.montant * pts_par_euro)
-        if points_gagnes <= 0:
-            return {"points_gagnes": 0, "total_points": 0, "palier_film": False, "palier_reduction": False}
-
-        # Vérifier que ce ticket n'a pas déjà crédité des points
-        cur.execute(
-            "SELECT id FROM fidelite_historique WHERE ticket_id = %s AND type = 'gain'",
-            (data.ticket_id,),
-        )
-        if cur.fetchone():
-            # Déjà crédité, retourner l'état actuel
-            cur.execute("SELECT points_fidelite FROM clients WHERE id = %s", (data.client_id,))
-            row = cur.fetchone()
-            pts = row["points_fidelite"] if row else 0
-            return {"points_gagnes": 0, "total_points": pts, "palier_film": pts >= 1000, "palier_reduction": pts >= 5000}
-
-        cur.execute("""
-            UPDATE clients
-            SET points_fidelite = COALESCE(points_fidelite, 0) + %s,
-                total_depense = COALESCE(total_depense, 0) + %s
-            WHERE id = %s
-            RETURNING points_fidelite
-        """, (points_gagnes, data.montant, data.client_id))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, "Client non trouvé")
-        nouveau_total = row["points_fidelite"]
-
-        cur.execute("""
-            INSERT INTO fidelite_historique (client_id, ticket_id, type, points, description)
-            VALUES (%s, %s, 'gain', %s, %s)
-        """, (data.client_id, data.ticket_id, points_gagnes,
-              f"Réparation {data.montant:.2f}€ — +{points_gagnes} pts"))
-
-        palier_film = int(_get_param(cur, "fidelite_palier_film", "1000"))
-        palier_reduction = int(_get_param(cur, "fidelite_palier_reduction", "5000"))
+        res = fidelite_service.credit(cur, data.client_id, data.ticket_id, data.montant, s)
+    if res is None:
+        raise HTTPException(404, "Client non trouvé")
 
+    total = res["total_points"]
     return {
-        "points_gagnes": points_gagnes,
-        "total_points": nouveau_total,
-        "palier_film": nouveau_total >= palier_film,
-        "palier_reduction": nouveau_total >= palier_reduction,
+        "points_gagnes": res["points_gagnes"],
+        "total_points": total,
+        "palier_film": total >= s.palier_film,
+        "palier_reduction": total >= s.palier_reduction,
     }
 
 
@@ -102,39 +66,15 @@ async def crediter_points(data: CrediterRequest, user: dict = Depends(get_curren
 @router.post("/utiliser")
 async def utiliser_points(data: UtiliserRequest, user: dict = Depends(get_current_user)):
     """Utilise des points pour une récompense."""
-
     with get_cursor() as cur:
-        palier_film = int(_get_param(cur, "fidelite_palier_film", "1000"))
-        palier_reduction = int(_get_param(cur, "fidelite_palier_reduction", "5000"))
-
-        cur.execute("SELECT points_fidelite FROM clients WHERE id = %s", (data.client_id,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, "Client non trouvé")
-        points_actuels = row["points_fidelite"] or 0
-
-        if data.type == "film" and points_actuels >= palier_film:
-            points_deduits = palier_film
-            description = f"Film verre trempé offert — -{palier_film} pts"
-            hist_type = "utilisation_film"
-        elif data.type == "reduction" and points_actuels >= palier_reduction:
-            points_deduits = palier_reduction
-            montant_red = _get_param(cur, "fidelite_montant_reduction", "10")
-            description = f"Réduction {montant_red}€ utilisée — -{palier_reduction} pts"
-            hist_type = "utilisation_reduction"
-        else:
-            raise HTTPException(400, "Points insuffisants")
-
-        cur.execute(
-            "UPDATE clients SET points_fidelite = points_fidelite - %s WHERE id = %s",
-            (points_deduits, data.client_id),
-        )
-        cur.execute("""
-            INSERT INTO fidelite_historique (client_id, type, points, description)
-            VALUES (%s, %s, %s, %s)
-        """, (data.client_id, hist_type, -points_deduits, description))
+        try:
+            restants = fidelite_service.debit(cur, data.client_id, data.type)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+    if restants is None:
+        raise HTTPException(404, "Client non trouvé")
 
-    return {"status": "ok", "points_restants": points_actuels - points_deduits}
+    return {"status": "ok", "points_restants": restants}
 
 
 # ─── CONSOMMER BON GRATTAGE (cote staff au paiement) ────
@@ -175,65 +115,10 @@ async def consommer_bon_grattage(data: ConsommerBonRequest, user: dict = Depends
 @router.get("/{client_id}")
 async def get_fidelite(client_id: int, user: dict = Depends(get_current_user)):
     """Récupère les infos fidélité d'un client."""
-
-    with get_cursor() as cur:
-        fidelite_active = _get_param(cur, "fidelite_active", "1")
-        palier_film = int(_get_param(cur, "fidelite_palier_film", "1000"))
-        palier_reduction = int(_get_param(cur, "fidelite_palier_reduction", "5000"))
-        montant_reduction = _get_param(cur, "fidelite_montant_reduction", "10")
-        pts_par_euro = int(_get_param(cur, "fidelite_points_par_euro", "10"))
-
-        cur.execute(
-            "SELECT points_fidelite, total_depense, bon_grattage FROM clients WHERE id = %s",
-            (client_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, "Client non trouvé")
-
-        points = row["points_fidelite"] or 0
-        total = float(row["total_depense"] or 0)
-        bon_grattage = row.get("bon_grattage") if isinstance(row, dict) else None
-
-        cur.execute("""
-            SELECT type, points, description, date_creation
-            FROM fidelite_historique
-            WHERE client_id = %s
-            ORDER BY date_creation DESC LIMIT 10
-        """, (client_id,))
-        historique = []
-        for r in cur.fetchall():
-            historique.append({
-                **r,
-                "date_creation": r["date_creation"].isoformat() if r.get("date_creation") else None,
-            })
-
-    # Prochaine récompense
-    if points < palier_film:
-        prochaine = {"type": "Film verre trempé", "points_restants": palier_film - points, "palier": palier_film}
-    elif points < palier_reduction:
-        prochaine = {"type": f"Réduction {montant_reduction}€", "points_restants": palier_reduction - points, "palier": palier_reduction}
-    else:
-        prochaine = {"type": f"Réduction {montant_reduction}€ disponible !", "points_restants": 0, "palier": palier_reduction}
-
-    return {
-        "active": fidelite_active != "0",
-        "points": points,
-        "total_depense": total,
-        "pts_par_euro": pts_par_euro,
-        "palier_film": palier_film,
-        "palier_reduction": palier_reduction,
-        "montant_reduction": montant_reduction,
-        "prochaine_recompense": prochaine,
-        "recompenses_disponibles": {
-            "film": points >= palier_film,
-            "reduction": points >= palier_reduction,
-        },
-        # Bon de grattage disponible (valable prochaine reparation)
-        "bon_grattage": bon_grattage,
-        "bon_grattage_label": _gain_label(bon_grattage) if bon_grattage else None,
-        "historique": historique,
-    }
+    fiche = fidelite_service.summary(client_id=client_id)
+    if fiche is None:
+        raise HTTPException(404, "Client non trouvé")
+    return fiche
 
 
 # ─── GET FIDELITE BY TICKET CODE (public) ──────────────
@@ -242,14 +127,10 @@ async def get_fidelite(client_id: int, user: dict = Depends(get_current_user)):
 async def get_fidelite_by_ticket(ticket_code: str):
     """Récupère les infos fidélité à partir d'un code ticket (pour suivi public)."""
 
-    with get_cursor() as cur:
-        cur.execute("SELECT client_id FROM tickets WHERE ticket_code = %s", (ticket_code,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, "Ticket non trouvé")
-        client_id = row["client_id"]
-
-    return await get_fidelite(client_id)
+    fiche = fidelite_service.summary(ticket_code=ticket_code)
+    if fiche is None:
+        raise HTTPException(404, "Ticket non trouvé")
+    return fiche
 
 
 # ═════════════════════════════════════════════════════════
@@ -260,11 +141,11 @@ async def get_fidelite_by_ticket(ticket_code: str):
 async def get_grattage(ticket_code: str):
     """Vérifie l'état du grattage pour un ticket."""
 
-    with get_cursor() as cur:
-        grattage_actif = _get_param(cur, "grattage_actif", "1")
-        if grattage_actif == "0":
-            return {"actif": False}
+    s = fidelite_service.settings()
+    if not s.grattage_actif:
+        return {"actif": False}
 
+    with get_cursor() as cur:
         cur.execute(
             "SELECT id, client_id, grattage_fait, grattage_gain FROM tickets WHERE ticket_code = %s",
             (ticket_code,),
@@ -273,8 +154,7 @@ async def get_grattage(ticket_code: str):
         if not row:
             raise HTTPException(404, "Ticket non trouvé")
 
-        frequence = int(_get_param(cur, "grattage_frequence", "10"))
-
+    frequence = s.grattage_frequence
     if row["grattage_fait"]:
         return {
             "actif": True,
@@ -291,11 +171,11 @@ async def get_grattage(ticket_code: str):
 async def gratter(ticket_code: str):
     """Effectue le grattage d'un ticket."""
 
-    with get_cursor() as cur:
-        grattage_actif = _get_param(cur, "grattage_actif", "1")
-        if grattage_actif == "0":
-            raise HTTPException(400, "Jeu de grattage désactivé")
+    s = fidelite_service.settings()
+    if not s.grattage_actif:
+        raise HTTPException(400, "Jeu de grattage désactivé")
 
+    with get_cursor() as cur:
         cur.execute(
             "SELECT id, client_id, grattage_fait FROM tickets WHERE ticket_code = %s",
             (ticket_code,),
@@ -308,7 +188,7 @@ async def gratter(ticket_code: str):
 
         ticket_id = row["id"]
         client_id = row["client_id"]
-        frequence = int(_get_param(cur, "grattage_frequence", "10"))
+        frequence = s.grattage_frequence
 
         # Compter les tickets grattés perdants depuis le dernier gagnant
         cur.execute("""
@@ -349,10 +229,3 @@ async def gratter(ticket_code: str):
         "gain_label": _gain_label(gain) if gain else None,
     }
 
-
-def _gain_label(gain: str) -> str:
-    if gain == "film":
-        return "Film verre trempé OFFERT"
-    elif gain == "reduction":
-        return "10€ de réduction"
-    return ""
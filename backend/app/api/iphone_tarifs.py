@@ -6,19 +6,16 @@ API Tarifs iPhones reconditionnés.
 """
 
 import hashlib
-import io
 import logging
 import re
 import secrets
-import zipfile
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional
 
-import httpx
 from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, UploadFile, File
 from fastapi.responses import FileResponse, StreamingResponse
-from fpdf import FPDF
 from psycopg2.extras import execute_values
 from pydantic import BaseModel
 
@@ -28,6 +25,8 @@ from app.api.auth import get_current_user  # noqa: F401 (si besoin plus tard)
 from app.api.smartphones_tarifs import _fetch_image_for_pdf
 # Reutilise le rate limiter public (protection anti-spam)
 from app.api.tickets import _rate_limit_public_lookup
+from app.services import http_cache, poster_render, rate_limit
+from app.services.fast_json import FastJSONResponse
 # Pour l'envoi d'email sur le formulaire demande de tarif
 from app.api.email_api import _send_email
 
@@ -165,6 +164,7 @@ def generate_iphone_image(payload: GenerateIphoneImageRequest):
 
     Si `query` est fourni, il remplace la construction auto — utile pour
     l'admin qui cherche un angle specifique (ex: "iPhone 15 mockup PNG")."""
+    import httpx
     import json
     from urllib.parse import quote
 
@@ -598,14 +598,7 @@ async def list_demandes_commandes(
     with get_cursor() as cur:
         cur.execute(sql, params)
         rows = cur.fetchall()
-    out = []
-    for r in rows:
-        d = dict(r)
-        for k in ("date_creation", "date_maj"):
-            if d.get(k) and hasattr(d[k], "isoformat"):
-                d[k] = d[k].isoformat()
-        out.append(d)
-    return out
+    return FastJSONResponse(rows)
 
 
 class UpdateDemandeCommandeRequest(BaseModel):
@@ -669,28 +662,8 @@ async def count_nouvelles(user: dict = Depends(get_current_user)):
 
 # Rate limiter dedie a la verif admin password (anti brute-force).
 # Plus strict que le rate-limit public : 5 tentatives / 5 min / IP.
-_ADMIN_VERIFY_BUCKETS: "_AdminBuckets" = None  # init lazy ci-dessous
-
-
 def _rate_limit_admin_verify(request: Request):
-    from collections import defaultdict, deque
-    from time import time as _now_t
-    global _ADMIN_VERIFY_BUCKETS
-    if _ADMIN_VERIFY_BUCKETS is None:
-        _ADMIN_VERIFY_BUCKETS = defaultdict(deque)
-    ip = request.client.host if request.client else "unknown"
-    xff = request.headers.get("x-forwarded-for", "")
-    if xff:
-        ip = xff.split(",")[0].strip()
-    now = _now_t()
-    bucket = _ADMIN_VERIFY_BUCKETS[ip]
-    while bucket and (now - bucket[0]) > 300:  # fenetre 5 min
-        bucket.popleft()
-    if len(bucket) >= 5:
-        raise HTTPException(
-            429, "Trop de tentatives. Reessayez dans quelques minutes."
-        )
-    bucket.append(now)
+    rate_limit.enforce(request, "admin_verify")
 
 
 def _audit_log(cur, *, user, action, target_type, target_id, details, request):
@@ -912,19 +885,22 @@ class IphoneTarifUpdate(BaseModel):
 # CRUD
 # ---------------------------------------------------------------------------
 @router.get("")
-def list_tarifs():
-    with get_cursor() as cur:
-        cur.execute("""
-            SELECT id, slug, modele, ordre,
-                   stockage_1, prix_1, stock_1,
-                   stockage_2, prix_2, stock_2,
-                   stockage_3, prix_3, stock_3,
-                   grade, das_tete, das_corps, das_membre,
-                   image_filename, image_url, page_group, actif, condition, updated_at
-            FROM iphone_tarifs
-            ORDER BY ordre ASC
-        """)
-        return [dict(r) for r in cur.fetchall()]
+def list_tarifs(request: Request):
+    def build():
+        with get_cursor() as cur:
+            cur.execute("""
+                SELECT id, slug, modele, ordre,
+                       stockage_1, prix_1, stock_1,
+                       stockage_2, prix_2, stock_2,
+                       stockage_3, prix_3, stock_3,
+                       grade, das_tete, das_corps, das_membre,
+                       image_filename, image_url, page_group, actif, condition, updated_at
+                FROM iphone_tarifs
+                ORDER BY ordre ASC
+            """)
+            return [dict(r) for r in cur.fetchall()]
+
+    return http_cache.cached_json(request, "catalogue", "iphone_tarifs", build)
 
 
 @router.patch("/{tarif_id}")
@@ -962,113 +938,120 @@ GREY_BORDER = (200, 200, 200)
 DAS_BG = (235, 240, 250)
 
 
-class _TarifPDF(FPDF):
-    def __init__(self, *a, **kw):
-        super().__init__(*a, **kw)
-        self.add_font("UI", "", _find_font())
-        self.add_font("UI", "B", _find_font(bold=True))
-        self.add_font("UI", "I", _find_font(italic=True))
-
-    def header(self):
-        if LOGO_PATH.exists():
-            self.image(str(LOGO_PATH), x=(210 - 22) / 2, y=8, w=22, h=22)
-        self.set_font("UI", "B", 20)
-        self.set_text_color(*DARK)
-        self.set_y(31)
-        self.cell(0, 7, "KlikPhone", align="C", new_x="LMARGIN", new_y="NEXT")
-        self.set_font("UI", "I", 9)
-        self.set_text_color(120, 120, 120)
-        self.cell(0, 4, "Spécialiste Apple", align="C", new_x="LMARGIN", new_y="NEXT")
-        self.ln(3)
-        self.set_font("UI", "", 11)
-        self.set_text_color(*DARK)
-        self.cell(
-            0, 6,
-            "Tous nos iPhones sont 100% pièces d'origine et Garantie 1 an",
-            align="C", new_x="LMARGIN", new_y="NEXT",
-        )
+@lru_cache(maxsize=1)
+def _tarif_pdf_class():
+    """Classe PDF des affiches (fpdf importé au premier rendu)."""
+    from fpdf import FPDF
 
-    def add_model_block(self, model: dict, y_start: int):
-        # Titre modèle
-        self.set_font("UI", "B", 18)
-        self.set_text_color(*DARK)
-        self.set_xy(105, y_start)
-        self.cell(95, 9, model["modele"].upper(), align="C", new_x="LMARGIN", new_y="NEXT")
-
-        # Image gauche
-        img = ASSETS_DIR / (model.get("image_filename") or "")
-        if img.exists():
-            self.image(str(img), x=12, y=y_start + 8, w=85, h=60)
-        else:
-            self.set_fill_color(230, 230, 230)
-            self.rect(12, y_start + 8, 85, 60, style="F")
-
-        # Encadré prix droite
-        bx, by, bw, bh = 105, y_start + 11, 95, 50
-        self.set_fill_color(*GREY_BOX)
-        self.set_draw_color(*GREY_BORDER)
-        self.rect(bx, by, bw, bh, style="FD")
-
-        line_h = 8
-        y = by + 5
-
-        def _price_string(model) -> str:
-            parts = []
-            for i in (1, 2, 3):
-                s = model.get(f"stockage_{i}")
-                p = model.get(f"prix_{i}")
-                if s and p:
-                    parts.append(f"{p} €")
-            return " / ".join(parts) if parts else "—"
-
-        def _storage_string(model) -> str:
-            parts = []
-            for i in (1, 2, 3):
-                s = model.get(f"stockage_{i}")
-                if s:
-                    parts.append(s)
-            return " / ".join(parts) if parts else "—"
-
-        def row(label, value, value_color=ORANGE, big=False):
-            nonlocal y
-            self.set_font("UI", "B", 12)
+    class _TarifPDF(FPDF):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.add_font("UI", "", _find_font())
+            self.add_font("UI", "B", _find_font(bold=True))
+            self.add_font("UI", "I", _find_font(italic=True))
+
+        def header(self):
+            if LOGO_PATH.exists():
+                self.image(str(LOGO_PATH), x=(210 - 22) / 2, y=8, w=22, h=22)
+            self.set_font("UI", "B", 20)
             self.set_text_color(*DARK)
-            self.set_xy(bx + 5, y)
-            self.cell(32, line_h, label)
-            self.set_text_color(*value_color)
-            self.set_font("UI", "B", 14 if big else 12)
-            self.set_xy(bx + 36, y)
-            self.cell(0, line_h, value)
-            y += line_h + 4
-
-        row("Stockage :", _storage_string(model), DARK)
-        row("Prix :", _price_string(model), ORANGE, big=True)
-        row("Grade :", model.get("grade") or "100% Satisfait", DARK)
-
-        # Bandeau DAS
-        das_y = y_start + 70
-        self.set_fill_color(*DAS_BG)
-        self.set_draw_color(210, 220, 235)
-        self.rect(12, das_y, 186, 14, style="FD")
-        self.set_font("UI", "B", 10)
-        self.set_text_color(60, 80, 130)
-        self.set_xy(15, das_y + 2)
-        self.cell(0, 4.5, "DAS (Débit d'Absorption Spécifique) — W/kg")
-        self.set_font("UI", "", 9)
-        self.set_text_color(*DARK)
-        self.set_xy(15, das_y + 7.5)
-        self.cell(
-            0, 4.5,
-            f"Tête : {model.get('das_tete') or '—'}   •   "
-            f"Corps : {model.get('das_corps') or '—'}   •   "
-            f"Membre : {model.get('das_membre') or '—'}       "
-            "(source Apple — moyenné 10g)",
-        )
+            self.set_y(31)
+            self.cell(0, 7, "KlikPhone", align="C", new_x="LMARGIN", new_y="NEXT")
+            self.set_font("UI", "I", 9)
+            self.set_text_color(120, 120, 120)
+            self.cell(0, 4, "Spécialiste Apple", align="C", new_x="LMARGIN", new_y="NEXT")
+            self.ln(3)
+            self.set_font("UI", "", 11)
+            self.set_text_color(*DARK)
+            self.cell(
+                0, 6,
+                "Tous nos iPhones sont 100% pièces d'origine et Garantie 1 an",
+                align="C", new_x="LMARGIN", new_y="NEXT",
+            )
+
+        def add_model_block(self, model: dict, y_start: int):
+            # Titre modèle
+            self.set_font("UI", "B", 18)
+            self.set_text_color(*DARK)
+            self.set_xy(105, y_start)
+            self.cell(95, 9, model["modele"].upper(), align="C", new_x="LMARGIN", new_y="NEXT")
+
+            # Image gauche
+            img = ASSETS_DIR / (model.get("image_filename") or "")
+            if img.exists():
+                self.image(str(img), x=12, y=y_start + 8, w=85, h=60)
+            else:
+                self.set_fill_color(230, 230, 230)
+                self.rect(12, y_start + 8, 85, 60, style="F")
+
+            # Encadré prix droite
+            bx, by, bw, bh = 105, y_start + 11, 95, 50
+            self.set_fill_color(*GREY_BOX)
+            self.set_draw_color(*GREY_BORDER)
+            self.rect(bx, by, bw, bh, style="FD")
+
+            line_h = 8
+            y = by + 5
+
+            def _price_string(model) -> str:
+                parts = []
+                for i in (1, 2, 3):
+                    s = model.get(f"stockage_{i}")
+                    p = model.get(f"prix_{i}")
+                    if s and p:
+                        parts.append(f"{p} €")
+                return " / ".join(parts) if parts else "—"
+
+            def _storage_string(model) -> str:
+                parts = []
+                for i in (1, 2, 3):
+                    s = model.get(f"stockage_{i}")
+                    if s:
+                        parts.append(s)
+                return " / ".join(parts) if parts else "—"
+
+            def row(label, value, value_color=ORANGE, big=False):
+                nonlocal y
+                self.set_font("UI", "B", 12)
+                self.set_text_color(*DARK)
+                self.set_xy(bx + 5, y)
+                self.cell(32, line_h, label)
+                self.set_text_color(*value_color)
+                self.set_font("UI", "B", 14 if big else 12)
+                self.set_xy(bx + 36, y)
+                self.cell(0, line_h, value)
+                y += line_h + 4
+
+            row("Stockage :", _storage_string(model), DARK)
+            row("Prix :", _price_string(model), ORANGE, big=True)
+            row("Grade :", model.get("grade") or "100% Satisfait", DARK)
+
+            # Bandeau DAS
+            das_y = y_start + 70
+            self.set_fill_color(*DAS_BG)
+            self.set_draw_color(210, 220, 235)
+            self.rect(12, das_y, 186, 14, style="FD")
+            self.set_font("UI", "B", 10)
+            self.set_text_color(60, 80, 130)
+            self.set_xy(15, das_y + 2)
+            self.cell(0, 4.5, "DAS (Débit d'Absorption Spécifique) — W/kg")
+            self.set_font("UI", "", 9)
+            self.set_text_color(*DARK)
+            self.set_xy(15, das_y + 7.5)
+            self.cell(
+                0, 4.5,
+                f"Tête : {model.get('das_tete') or '—'}   •   "
+                f"Corps : {model.get('das_corps') or '—'}   •   "
+                f"Membre : {model.get('das_membre') or '—'}       "
+                "(source Apple — moyenné 10g)",
+            )
+
+    return _TarifPDF
 
 
 def _render_pdf(models: list) -> bytes:
     """Génère un PDF avec 2 modèles par page max."""
-    pdf = _TarifPDF(orientation="P", unit="mm", format="A4")
+    pdf = _tarif_pdf_class()(orientation="P", unit="mm", format="A4")
     pdf.set_auto_page_break(False)
 
     # 2 modèles par page
@@ -1092,6 +1075,15 @@ def _render_pdf(models: list) -> bytes:
     return bytes(pdf.output())
 
 
+def _image_stamps(models: list) -> tuple:
+    """mtime des photos locales : remplacer un fichier invalide le PDF en cache."""
+    stamps = []
+    for m in models:
+        img = ASSETS_DIR / (m.get("image_filename") or "")
+        stamps.append(img.stat().st_mtime_ns if m.get("image_filename") and img.is_file() else 0)
+    return tuple(stamps)
+
+
 def _get_models(slugs: Optional[List[str]] = None, group: Optional[str] = None) -> list:
     with get_cursor() as cur:
         if slugs:
@@ -1121,7 +1113,7 @@ def generate_pdf(
     if not models:
         raise HTTPException(404, "Aucun modèle trouvé")
 
-    pdf_bytes = _render_pdf(models)
+    pdf_bytes = poster_render.render_cached("iphone_tarifs", models, _render_pdf, _image_stamps(models))
     filename = "klikphone_tarifs_iphones.pdf"
     if slug_list and len(slug_list) <= 3:
         filename = f"klikphone_tarifs_{'_'.join(slug_list)}.pdf"
@@ -1137,26 +1129,27 @@ def generate_pdf(
 
 @router.get("/pdf/all-zip")
 def generate_all_pdfs_zip():
-    """Génère un ZIP contenant un PDF par page_group (un pack d'affiches)."""
+    """Génère un ZIP contenant un PDF par page_group (un pack d'affiches).
+
+    Une requête pour tous les groupes ; chaque PDF est mis en cache par hash
+    de ses lignes (seuls les groupes modifiés sont re-rendus, en parallèle
+    dans un pool de process) et le ZIP est streamé entrée par entrée."""
     with get_cursor() as cur:
         cur.execute(
-            "SELECT DISTINCT page_group FROM iphone_tarifs WHERE actif = TRUE AND page_group IS NOT NULL ORDER BY page_group"
+            "SELECT * FROM iphone_tarifs WHERE actif = TRUE AND page_group IS NOT NULL ORDER BY page_group, ordre ASC"
         )
-        groups = [r["page_group"] if isinstance(r, dict) else r[0] for r in cur.fetchall()]
-
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for g in groups:
-            models = _get_models(group=g)
-            if not models:
-                continue
-            pdf_bytes = _render_pdf(models)
-            safe = re.sub(r"[^a-zA-Z0-9_-]", "", g)
-            zf.writestr(f"klikphone_tarifs_{safe}.pdf", pdf_bytes)
-
-    buf.seek(0)
+        rows = [dict(r) for r in cur.fetchall()]
+
+    groups: dict = {}
+    for r in rows:
+        groups.setdefault(r["page_group"], []).append(r)
+
+    jobs = [
+        (f"klikphone_tarifs_{re.sub(r'[^a-zA-Z0-9_-]', '', g)}.pdf", models, _image_stamps(models))
+        for g, models in groups.items()
+    ]
     return StreamingResponse(
-        buf,
+        poster_render.stream_zip(poster_render.render_many(jobs, _render_pdf, "iphone_tarifs")),
         media_type="application/zip",
         headers={"Content-Disposition": 'attachment; filename="klikphone_tarifs_iphones.zip"'},
     )
@@ -9,12 +9,13 @@ import time
 from pathlib import Path
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from psycopg2.extras import execute_values
 
 from app.database import get_cursor
+from app.services import http_cache
 
 
 router = APIRouter(prefix="/api/iphones", tags=["iphones-stock"])
@@ -37,6 +38,7 @@ def _invalidate_tarifs_cache():
     with _tarifs_cache_lock:
         _tarifs_cache["ts"] = 0.0
         _tarifs_cache["data"] = None
+    http_cache.invalidate("catalogue")
 
 
 def _ensure_table():
@@ -390,7 +392,7 @@ def _normalize_conditions_and_prices():
 
 
 def _deferred_init():
-    """Backfill + catalogue en background (non-bloquant pour le startup Railway)."""
+    """Backfill + catalogue : tache de demarrage separee (apres init_iphones_stock)."""
     try:
         _backfill_image_urls()
     except Exception as e:
@@ -406,11 +408,10 @@ def _deferred_init():
 
 
 def init_iphones_stock():
-    """Appelé au startup. Table + seed inline (rapide), reste en thread."""
+    """Appelé au startup. Table + seed (rapide) ; _deferred_init est une tâche
+    de démarrage à part, qui ne bloque pas la disponibilité du router."""
     _ensure_table()
     _seed_default()
-    # Backfill + catalogue lancés en background pour ne pas bloquer le boot Railway
-    threading.Thread(target=_deferred_init, daemon=True, name="iphones_deferred_init").start()
 
 
 # ---------------------------------------------------------------------------
@@ -625,22 +626,28 @@ def _tarifs_to_phones() -> list:
 
 @router.get("")
 def list_iphones(
+    request: Request,
     condition: Optional[str] = Query(None),
     model: Optional[str] = Query(None),
     active_only: bool = Query(True),
 ):
     """Liste les telephones en vente. Source : iphone_tarifs + smartphones_tarifs.
-    Filtres : condition, model."""
-    phones = _tarifs_to_phones()
-    if condition:
-        phones = [p for p in phones if p["condition"] == condition]
-    if model:
-        ml = model.lower()
-        phones = [p for p in phones if ml in (p["model"] or "").lower()]
-    # Tri : iPhone 16/17 en haut (plus cher → plus recent),
-    # puis Samsung/Xiaomi, ordonnes par prix decroissant
-    phones.sort(key=lambda p: (-(p["price"] or 0), p["model"]))
-    return phones
+    Filtres : condition, model. Reponse cachee + ETag (cf. http_cache)."""
+    def build():
+        phones = _tarifs_to_phones()
+        if condition:
+            phones = [p for p in phones if p["condition"] == condition]
+        if model:
+            ml = model.lower()
+            phones = [p for p in phones if ml in (p["model"] or "").lower()]
+        # Tri : iPhone 16/17 en haut (plus cher → plus recent),
+        # puis Samsung/Xiaomi, ordonnes par prix decroissant
+        phones.sort(key=lambda p: (-(p["price"] or 0), p["model"]))
+        return phones
+
+    return http_cache.cached_json(
+        request, "catalogue", f"iphones|{condition}|{model}|{active_only}", build,
+    )
 
 
 @router.post("")
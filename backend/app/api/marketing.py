@@ -7,16 +7,18 @@ Marketing module — Klikphone SAV.
 - Analytics (overview, posts performance)
 """
 
+import hashlib
 import os
 import json
 from datetime import datetime, date
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 
 from app.database import get_cursor
 from app.api.auth import get_current_user
+from app.services.blob_store import blob_store, extension_for
 
 
 def _require_admin_marketing(user: dict = Depends(get_current_user)):
@@ -61,6 +63,7 @@ def _ensure_tables():
                     created_at TIMESTAMP DEFAULT NOW()
                 )
             """)
+        _ensure_avis_dedup_index()
         with get_cursor() as cur:
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS posts_marketing (
@@ -124,6 +127,22 @@ def _ensure_tables():
         print(f"Warning marketing tables: {e}")
 
 
+def _ensure_avis_dedup_index():
+    """Index (auteur, note, md5(texte)) pour la dedup des anciens avis demo.
+
+    UNIQUE si possible ; s'il reste des doublons historiques la creation
+    echoue et on retombe sur un index simple (le NOT EXISTS de sync_avis
+    s'appuie sur l'un comme sur l'autre)."""
+    expr = "avis_google (auteur, note, md5(COALESCE(texte, '')))"
+    try:
+        with get_cursor() as cur:
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_avis_google_dedup ON {expr}")
+    except Exception as e:
+        print(f"Warning avis dedup unique index (doublons existants ?): {e}")
+        with get_cursor() as cur:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_avis_google_dedup ON {expr}")
+
+
 def _seed_templates():
     """Insère les templates par défaut si la table est vide."""
     with get_cursor() as cur:
@@ -385,6 +404,23 @@ async def search_place(query: str = Query(..., description="Nom de la boutique +
     return {"candidates": data["candidates"]}
 
 
+_SYNC_AVIS_SQL = """
+    INSERT INTO avis_google
+        (google_review_id, auteur, note, texte, date_avis,
+         repondu, reponse_texte, reponse_date, reponse_par)
+    SELECT v.google_review_id, v.auteur, v.note, v.texte, v.date_avis,
+           FALSE, NULL, NULL, NULL
+    FROM (VALUES {values}) AS v(google_review_id, auteur, note, texte, date_avis)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM avis_google a
+        WHERE a.auteur = v.auteur AND a.note = v.note
+          AND md5(COALESCE(a.texte, '')) = md5(COALESCE(v.texte, ''))
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING id
+"""
+
+
 @router.post("/avis/sync")
 async def sync_avis(user: dict = Depends(_require_admin_marketing)):
     """Synchronise les avis depuis Google Places API. Nécessite GOOGLE_PLACES_API_KEY + GOOGLE_PLACE_ID."""
@@ -456,43 +492,32 @@ async def sync_avis(user: dict = Depends(_require_admin_marketing)):
     if not reviews:
         return {"synced": 0, "total_google": result.get("user_ratings_total", 0), "message": "Aucun avis retourné par Google"}
 
-    synced = 0
-    with get_cursor() as cur:
-        for review in reviews:
-            author = review.get("author_name", "Anonyme")
-            rating = review.get("rating", 5)
-            text = review.get("text", "")
-            timestamp = review.get("time", 0)
-            # Créer un ID unique à partir de l'auteur + timestamp
-            review_id = f"google_{author.replace(' ', '_').lower()}_{timestamp}"
-
-            # Convertir le timestamp unix en datetime
-            from datetime import datetime as dt
-            date_avis = dt.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S") if timestamp else None
-
-            # Vérifier si cet avis existe déjà (par google_review_id ou par auteur+date)
-            cur.execute(
-                "SELECT id FROM avis_google WHERE google_review_id = %s",
-                (review_id,),
-            )
-            if cur.fetchone():
-                continue
-
-            # Vérifier aussi par auteur + note (pour éviter les doublons des anciens avis démo)
-            cur.execute(
-                "SELECT id FROM avis_google WHERE auteur = %s AND note = %s AND texte = %s",
-                (author, rating, text),
-            )
-            if cur.fetchone():
-                continue
+    # Cles de dedup calculees cote Python (doublons dans la reponse Google
+    # elle-meme), puis un seul INSERT multi-lignes : l'avis deja connu est
+    # ecarte par la contrainte unique google_review_id, un ancien avis demo
+    # identique (auteur + note + texte) par l'index idx_avis_google_dedup.
+    rows = []
+    seen = set()
+    for review in reviews:
+        author = review.get("author_name", "Anonyme")
+        rating = review.get("rating", 5)
+        text = review.get("text", "")
+        timestamp = review.get("time", 0)
+        # Créer un ID unique à partir de l'auteur + timestamp
+        review_id = f"google_{author.replace(' ', '_').lower()}_{timestamp}"
+        content_key = (author, rating, hashlib.md5((text or "").encode("utf-8")).hexdigest())
+        if review_id in seen or content_key in seen:
+            continue
+        seen.update((review_id, content_key))
+        date_avis = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S") if timestamp else None
+        rows.append((review_id, author, rating, text, date_avis))
 
-            cur.execute("""
-                INSERT INTO avis_google
-                    (google_review_id, auteur, note, texte, date_avis,
-                     repondu, reponse_texte, reponse_date, reponse_par)
-                VALUES (%s, %s, %s, %s, %s, FALSE, NULL, NULL, NULL)
-            """, (review_id, author, rating, text, date_avis))
-            synced += 1
+    with get_cursor() as cur:
+        cur.execute(
+            _SYNC_AVIS_SQL.format(values=", ".join(["(%s, %s, %s::int, %s, %s::timestamp)"] * len(rows))),
+            [v for row in rows for v in row],
+        )
+        synced = len(cur.fetchall())
 
     return {
         "synced": synced,
@@ -995,46 +1020,26 @@ class ImageGenerer(BaseModel):
     prompt: str  # Description de l'image souhaitée
 
 
-# Stockage en mémoire des images générées (id → bytes JPEG/PNG)
-_generated_images: dict = {}
-
-
 def _store_image(img_bytes: bytes) -> str:
-    """Stocke une image en mémoire et retourne l'URL publique."""
-    import uuid
-    image_id = str(uuid.uuid4())[:12]
-    _generated_images[image_id] = img_bytes
-    # Garder max 50 images en mémoire
-    if len(_generated_images) > 50:
-        oldest = list(_generated_images.keys())[0]
-        del _generated_images[oldest]
+    """Stocke une image dans le blob store et retourne l'URL publique.
+
+    L'URL contient le hash du contenu : elle reste valide apres un redemarrage
+    ou sur un autre worker (le scheduler social peut la publier plus tard)."""
+    image_id = blob_store.put(img_bytes)
     base_url = os.getenv("RAILWAY_PUBLIC_DOMAIN", "")
     if base_url and not base_url.startswith("http"):
         base_url = f"https://{base_url}"
     if not base_url:
         base_url = "https://klikphone-sav-v2-production.up.railway.app"
-    # Extension selon le format
-    ext = "webp" if img_bytes[:4] == b"RIFF" else "png" if img_bytes[:8] == b"\x89PNG\r\n\x1a\n" else "jpg"
-    return f"{base_url}/api/marketing/images/{image_id}.{ext}"
+    return f"{base_url}/api/marketing/images/{image_id}.{extension_for(img_bytes)}"
 
 
 @router.get("/images/{image_id}")
-async def serve_generated_image(image_id: str):
-    """Sert une image générée stockée en mémoire."""
-    from fastapi.responses import Response
+async def serve_generated_image(image_id: str, request: Request):
+    """Sert une image générée (blob store, cache immutable, Range)."""
     # Accepte image_id avec ou sans extension
     clean_id = image_id.rsplit(".", 1)[0] if "." in image_id else image_id
-    img_data = _generated_images.get(clean_id)
-    if not img_data:
-        raise HTTPException(404, "Image non trouvée ou expirée")
-    # Détecter le format
-    if img_data[:4] == b"RIFF":
-        media = "image/webp"
-    elif img_data[:8] == b"\x89PNG\r\n\x1a\n":
-        media = "image/png"
-    else:
-        media = "image/jpeg"
-    return Response(content=img_data, media_type=media)
+    return blob_store.serve(request, clean_id)
 
 
 async def _generate_with_together(prompt: str) -> bytes:
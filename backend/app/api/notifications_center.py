@@ -16,6 +16,7 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 
 from app.database import get_cursor
+from app.services.fast_json import FastJSONResponse
 
 router = APIRouter(prefix="/api/notifications-center", tags=["notifications-center"])
 
@@ -213,10 +214,8 @@ async def list_notifications(
         read_by = (d.get("read_by") or "").split(",")
         d["is_read"] = user in read_by
         d.pop("read_by", None)
-        if d.get("created_at") and hasattr(d["created_at"], "isoformat"):
-            d["created_at"] = d["created_at"].isoformat()
         result.append(d)
-    return result
+    return FastJSONResponse(result)
 
 
 @router.get("/unread-count")
@@ -4,8 +4,10 @@ API Commandes de pièces.
 
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request
 from app.database import get_cursor
+from app.services import http_cache
+from app.services.fast_json import FastJSONResponse
 from app.models import CommandePieceCreate, CommandePieceUpdate, CommandePieceOut
 
 router = APIRouter(prefix="/api/parts", tags=["parts"])
@@ -66,12 +68,8 @@ async def list_parts(
             if not d.get("ticket_code") and d.get("linked_ticket_code"):
                 d["ticket_code"] = d["linked_ticket_code"]
             d.pop("linked_ticket_code", None)
-            # Serialize datetimes
-            for key in ("date_creation", "date_commande", "date_reception"):
-                if d.get(key) and hasattr(d[key], "isoformat"):
-                    d[key] = d[key].isoformat()
             results.append(d)
-        return results
+    return FastJSONResponse(results)
 
 
 @router.post("", response_model=dict)
@@ -104,6 +102,7 @@ async def create_part(data: CommandePieceCreate):
                 (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ticket_id),
             )
 
+    http_cache.invalidate("ticket")
     return {"id": row["id"]}
 
 
@@ -139,6 +138,7 @@ async def create_part_auto(data: dict):
             (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ticket_id),
         )
 
+    http_cache.invalidate("ticket")
     return {"id": row["id"]}
 
 
@@ -191,6 +191,7 @@ async def update_part(
                     (history_entry, row["ticket_id"]),
                 )
 
+    http_cache.invalidate("ticket")
     return {"ok": True}
 
 
@@ -199,28 +200,27 @@ async def delete_part(commande_id: int):
     """Supprime une commande de pièce."""
     with get_cursor() as cur:
         cur.execute("DELETE FROM commandes_pieces WHERE id = %s", (commande_id,))
+    http_cache.invalidate("ticket")
     return {"ok": True}
 
 
 # ─── PUBLIC ENDPOINT (for suivi page) ──────────────────────────
 @router.get("/public/{ticket_code}")
-async def get_commandes_public(ticket_code: str):
+async def get_commandes_public(ticket_code: str, request: Request):
     """Retourne les commandes liées à un ticket (public, infos limitées)."""
-    with get_cursor() as cur:
-        cur.execute("""
-            SELECT c.id, c.description as piece, c.statut,
-                   c.date_commande, c.date_reception
-            FROM commandes_pieces c
-            JOIN tickets t ON t.id = c.ticket_id
-            WHERE t.ticket_code = %s
-            ORDER BY c.date_creation DESC
-        """, (ticket_code,))
-        rows = cur.fetchall()
-        results = []
-        for r in rows:
-            d = dict(r)
-            for key in ("date_commande", "date_reception"):
-                if d.get(key) and hasattr(d[key], "isoformat"):
-                    d[key] = d[key].isoformat()
-            results.append(d)
-        return results
+    def build():
+        with get_cursor() as cur:
+            cur.execute("""
+                SELECT c.id, c.description as piece, c.statut,
+                       c.date_commande, c.date_reception
+                FROM commandes_pieces c
+                JOIN tickets t ON t.id = c.ticket_id
+                WHERE t.ticket_code = %s
+                ORDER BY c.date_creation DESC
+            """, (ticket_code,))
+            return [dict(r) for r in cur.fetchall()]
+
+    return http_cache.cached_json(
+        request, "ticket", ticket_code, build,
+        ttl=10.0, cache_control=http_cache.PRIVATE_REVALIDATE, variant="commandes",
+    )
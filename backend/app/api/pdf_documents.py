@@ -3,8 +3,6 @@ PDF Documents A4 — Devis et Recu professionnels au format A4.
 Génération HTML → PDF via xhtml2pdf, envoi par email via Resend.
 """
 
-import base64
-import os
 from io import BytesIO
 from datetime import datetime
 
@@ -13,23 +11,13 @@ from fastapi.responses import Response
 
 from app.api.print_tickets import (
     _get_ticket_full, _parse_repair_lines, _calc_reduction,
-    _get_config, _fp, _fd, _qr_url,
+    _get_config, _fp, _fd, _qr_url, _logo_img,
 )
 
 router = APIRouter(prefix="/api/tickets", tags=["pdf"])
 
-# ─── Logo en base64 (embarqué pour fiabilité dans le PDF) ───────
-_LOGO_B64 = ""
-_logo_path = os.path.join(os.path.dirname(__file__), "logo_k.png")
-if os.path.exists(_logo_path):
-    with open(_logo_path, "rb") as f:
-        _LOGO_B64 = base64.b64encode(f.read()).decode()
-
-
-def _logo_img(height: int = 60) -> str:
-    if _LOGO_B64:
-        return f'<img src="data:image/png;base64,{_LOGO_B64}" style="height:{height}px" />'
-    return ""
+# Logo embarqué en base64 (fiabilité dans le PDF) : _logo_img de print_tickets,
+# data URI mis en cache et invalidé par mtime du fichier.
 
 
 # ─── CSS A4 commun ──────────────────────────────────────────────
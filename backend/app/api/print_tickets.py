@@ -7,37 +7,59 @@ Tickets client, staff, combiné, devis, reçu.
 import base64
 import json
 import os
+import threading
+import time
 import urllib.parse
-from datetime import datetime
+from contextvars import ContextVar
+from datetime import date, datetime
+from functools import lru_cache
 from io import BytesIO
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import HTMLResponse, Response
-
-try:
-    import qrcode
-    HAS_QRCODE = True
-except ImportError:
-    HAS_QRCODE = False
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 
 from app.database import get_cursor
+from app.api.auth import get_current_user
 
 router = APIRouter(prefix="/api/tickets", tags=["print"])
 
+# Params pre-charges pour une impression par lot (cf. print_batch) :
+# _get_config / _get_frontend_url lisent ce snapshot au lieu de la DB.
+_params_snapshot: ContextVar[Optional[dict]] = ContextVar("print_params", default=None)
+
 # URL frontend pour les QR codes de suivi
 _FRONTEND_URL_DEFAULT = "https://klikphone-sav-v2-production.up.railway.app"
 _FRONTEND_URL_ENV = os.getenv("FRONTEND_URL", "")
 
 
+# URL_SUIVI relue au plus toutes les 60s (un lookup params par impression sinon)
+_FRONTEND_URL_TTL = 60.0
+_frontend_url_cache = {"ts": 0.0, "url": None}
+
+
 def _get_frontend_url() -> str:
     """Résout l'URL frontend : params DB > env FRONTEND_URL > défaut hardcodé."""
-    try:
-        with get_cursor() as cur:
-            cur.execute("SELECT valeur FROM params WHERE cle = 'URL_SUIVI'")
-            row = cur.fetchone()
-            if row and row["valeur"] and row["valeur"].startswith("http"):
-                return row["valeur"].rstrip("/")
-    except Exception:
-        pass
+    snapshot = _params_snapshot.get()
+    if snapshot is not None:
+        url = snapshot.get("URL_SUIVI") or ""
+        if url.startswith("http"):
+            return url.rstrip("/")
+    elif time.time() - _frontend_url_cache["ts"] < _FRONTEND_URL_TTL:
+        if _frontend_url_cache["url"]:
+            return _frontend_url_cache["url"]
+    else:
+        url = None
+        try:
+            with get_cursor() as cur:
+                cur.execute("SELECT valeur FROM params WHERE cle = 'URL_SUIVI'")
+                row = cur.fetchone()
+                if row and row["valeur"] and row["valeur"].startswith("http"):
+                    url = row["valeur"].rstrip("/")
+        except Exception:
+            pass
+        _frontend_url_cache.update(ts=time.time(), url=url)
+        if url:
+            return url
     if _FRONTEND_URL_ENV:
         return _FRONTEND_URL_ENV.rstrip("/")
     return _FRONTEND_URL_DEFAULT
@@ -60,6 +82,9 @@ def _get_ticket_full(ticket_id: int) -> dict:
 
 
 def _get_config(key: str, default: str = "") -> str:
+    snapshot = _params_snapshot.get()
+    if snapshot is not None:
+        return snapshot.get(key, default)
     try:
         with get_cursor() as cur:
             cur.execute("SELECT valeur FROM params WHERE cle = %s", (key,))
@@ -125,18 +150,35 @@ def _suivi_url(code: str) -> str:
     return f"{_get_frontend_url()}/suivi?ticket={urllib.parse.quote(code)}"
 
 
+@lru_cache(maxsize=1)
+def _qrcode():
+    """Module qrcode (+ Pillow), importé au premier QR ; None si absent."""
+    try:
+        import qrcode
+        return qrcode
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=512)
+def _qr_png_data_uri(target: str) -> str:
+    """Encode QR + PNG + base64 (~5 ms) — memoise : l'URL d'un ticket ne change pas."""
+    qrcode = _qrcode()
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=6, border=2)
+    qr.add_data(target)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    b64 = base64.b64encode(buf.getvalue()).decode()
+    return f"data:image/png;base64,{b64}"
+
+
 def _qr_data_uri(code: str) -> str:
     """Génère un QR code en base64 data URI (local, pas de dépendance externe)."""
     target = _suivi_url(code)
-    if HAS_QRCODE:
-        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=6, border=2)
-        qr.add_data(target)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        b64 = base64.b64encode(buf.getvalue()).decode()
-        return f"data:image/png;base64,{b64}"
+    if _qrcode() is not None:
+        return _qr_png_data_uri(target)
     # Fallback: API externe avec encodage correct
     return f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data={urllib.parse.quote(target, safe='')}"
 
@@ -325,7 +367,9 @@ def _retour_sav_banner(t: dict) -> str:
     if not t.get("est_retour_sav"):
         return ""
     orig_code = ""
-    if t.get("ticket_original_id"):
+    if "ticket_original_code" in t:
+        orig_code = t["ticket_original_code"] or ""
+    elif t.get("ticket_original_id"):
         try:
             with get_cursor() as cur:
                 cur.execute("SELECT ticket_code FROM tickets WHERE id = %s", (t["ticket_original_id"],))
@@ -503,7 +547,10 @@ def _ticket_staff_html(t: dict) -> str:
 
     # --- Notes from notes_tickets table ---
     ticket_id = t.get("id")
-    notes_list = _get_ticket_notes(ticket_id)[:3] if ticket_id else []
+    if "_notes" in t:
+        notes_list = t["_notes"][:3]
+    else:
+        notes_list = _get_ticket_notes(ticket_id)[:3] if ticket_id else []
     notes_html = ""
     if notes_list:
         notes_inner = ""
@@ -864,6 +911,136 @@ async def print_combined(ticket_id: int):
     return HTMLResponse(page1)
 
 
+# ─── IMPRESSION PAR LOT ─────────────────────────────────────────
+# Réimpression des étiquettes de toute une file (ouverture boutique) :
+# 3 requêtes quel que soit le nombre de tickets (params, tickets+clients,
+# notes), puis un seul document HTML streamé avec un saut de page par ticket.
+
+_BATCH_MAX = 200
+_BATCH_PARAM_KEYS = (
+    "URL_SUIVI", "adresse", "tel_boutique", "horaires", "tva", "SIRET",
+    "fidelite_active", "fidelite_palier_film", "fidelite_palier_reduction",
+    "fidelite_montant_reduction",
+)
+_PAGE_BREAK = '<div style="page-break-after:always"></div>'
+
+
+def _load_batch(ids: Optional[list], statut: Optional[str], technicien: Optional[str],
+                jour: Optional[date]) -> tuple:
+    """Charge params, tickets (+ client + code ticket d'origine) et notes du lot."""
+    where, params = [], []
+    if ids:
+        where.append("t.id = ANY(%s)")
+        params.append(ids)
+    if statut:
+        where.append("t.statut = %s")
+        params.append(statut)
+    if technicien:
+        where.append("t.technicien_assigne = %s")
+        params.append(technicien)
+    if jour:
+        where.append("t.date_depot::date = %s")
+        params.append(jour)
+    with get_cursor() as cur:
+        cur.execute(
+            "SELECT cle, valeur FROM params WHERE cle = ANY(%s)",
+            (list(_BATCH_PARAM_KEYS),),
+        )
+        config = {r["cle"]: r["valeur"] for r in cur.fetchall()}
+        cur.execute(f"""
+            SELECT t.*, c.nom as client_nom, c.prenom as client_prenom,
+                   c.telephone as client_tel, c.email as client_email,
+                   c.societe as client_societe,
+                   o.ticket_code as ticket_original_code
+            FROM tickets t
+            JOIN clients c ON t.client_id = c.id
+            LEFT JOIN tickets o ON o.id = t.ticket_original_id
+            WHERE {" AND ".join(where)}
+            ORDER BY t.date_depot ASC, t.id ASC
+            LIMIT %s
+        """, params + [_BATCH_MAX])
+        tickets = [dict(r) for r in cur.fetchall()]
+        notes = {}
+        if tickets:
+            cur.execute("""
+                SELECT ticket_id, contenu, auteur, important, date_creation
+                FROM notes_tickets
+                WHERE ticket_id = ANY(%s)
+                ORDER BY ticket_id, date_creation DESC
+            """, ([t["id"] for t in tickets],))
+            for n in cur.fetchall():
+                notes.setdefault(n["ticket_id"], []).append(dict(n))
+    for t in tickets:
+        t["_notes"] = notes.get(t["id"], [])
+    if ids:
+        # Respecte l'ordre demandé
+        rank = {tid: i for i, tid in enumerate(ids)}
+        tickets.sort(key=lambda t: rank.get(t["id"], len(rank)))
+    return config, tickets
+
+
+def _body_of(html: str) -> str:
+    """Contenu entre <body> et </body> d'un document rendu."""
+    if "<body>" in html:
+        html = html.split("<body>", 1)[1]
+    return html.replace("</body></html>", "")
+
+
+@router.get("/print/batch", response_class=HTMLResponse)
+async def print_batch(
+    ids: Optional[str] = Query(None, description="IDs séparés par des virgules"),
+    statut: Optional[str] = None,
+    technicien: Optional[str] = None,
+    date_depot: Optional[date] = Query(None, alias="date"),
+    mode: str = Query("staff", pattern="^(client|staff|combined)$"),
+    user: dict = Depends(get_current_user),
+):
+    """Imprime plusieurs tickets (liste d'IDs ou filtre) en un seul document."""
+    id_list = None
+    if ids:
+        try:
+            id_list = [int(x) for x in ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(400, "ids invalides")
+    if not id_list and not (statut or technicien or date_depot):
+        raise HTTPException(400, "Fournir ids ou au moins un filtre (statut, technicien, date)")
+
+    config, tickets = _load_batch(id_list, statut, technicien, date_depot)
+    if not tickets:
+        raise HTTPException(404, "Aucun ticket à imprimer")
+
+    renderers = {
+        "client": (_ticket_client_html,),
+        "staff": (_ticket_staff_html,),
+        "combined": (_ticket_client_html, _ticket_staff_html),
+    }[mode]
+
+    def _render(render, t) -> str:
+        # set/reset dans le meme pas d'iteration : le generateur est consomme
+        # dans un threadpool, chaque next() peut avoir son propre contexte
+        token = _params_snapshot.set(config)
+        try:
+            return _body_of(render(t))
+        finally:
+            _params_snapshot.reset(token)
+
+    def _pages():
+        yield _THERMAL.format(title=f"Impression lot — {len(tickets)} ticket(s)")
+        first = True
+        for t in tickets:
+            for render in renderers:
+                if not first:
+                    yield _PAGE_BREAK
+                first = False
+                yield _render(render, t)
+        yield "</body></html>"
+
+    return StreamingResponse(
+        _pages(), media_type="text/html; charset=utf-8",
+        headers={"X-Ticket-Count": str(len(tickets))},
+    )
+
+
 @router.get("/{ticket_id}/print/devis", response_class=HTMLResponse)
 async def print_devis(ticket_id: int):
     t = _get_ticket_full(ticket_id)
@@ -884,20 +1061,56 @@ async def print_recu(ticket_id: int):
 # PDF A4 — Devis et Reçu professionnels
 # ═══════════════════════════════════════════════════════════════
 
-# ─── Logo en base64 ─────────────────────────────────────────────
-_LOGO_B64 = ""
+# ─── Logo en data URI ───────────────────────────────────────────
+# Cache par chemin, invalide par mtime : remplacer le fichier suffit.
 _logo_path = os.path.join(os.path.dirname(__file__), "logo_k.png")
-if os.path.exists(_logo_path):
-    with open(_logo_path, "rb") as f:
-        _LOGO_B64 = base64.b64encode(f.read()).decode()
+_asset_uris: dict = {}
+_asset_lock = threading.Lock()
+
+
+def _asset_data_uri(path: str) -> str:
+    """data URI base64 d'un PNG local, "" si absent."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return ""
+    cached = _asset_uris.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        uri = "data:image/png;base64," + base64.b64encode(f.read()).decode()
+    with _asset_lock:
+        _asset_uris[path] = (mtime, uri)
+    return uri
 
 
 def _logo_img(height: int = 60) -> str:
-    if _LOGO_B64:
-        return f'<img src="data:image/png;base64,{_LOGO_B64}" style="height:{height}px" />'
+    uri = _asset_data_uri(_logo_path)
+    if uri:
+        return f'<img src="{uri}" style="height:{height}px" />'
     return ""
 
 
+def prewarm_render_caches(limit: int = 200) -> dict:
+    """Pré-calcule le logo et les QR des tickets en cours (appelé au démarrage)."""
+    t0 = time.perf_counter()
+    assets = 1 if _asset_data_uri(_logo_path) else 0
+    qrs = 0
+    if _qrcode() is not None:
+        with get_cursor() as cur:
+            cur.execute("""
+                SELECT ticket_code FROM tickets
+                WHERE statut NOT IN ('Clôturé', 'Rendu au client') AND ticket_code IS NOT NULL
+                ORDER BY date_depot DESC
+                LIMIT %s
+            """, (limit,))
+            codes = [r["ticket_code"] for r in cur.fetchall()]
+        for code in codes:
+            _qr_data_uri(code)
+            qrs += 1
+    return {"assets": assets, "qr": qrs, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
 
 # ═══════════════════════════════════════════════════════════════
 # A4 DOCUMENT — HTML/CSS professionnel (Devis & Reçu)
@@ -6,31 +6,27 @@ Permet a l'admin de gerer sa propre liste de smartphones reconditionnes/neufs
 avec prix, storage, condition et image auto-generée (par IA) ou uploadée.
 """
 
-import hashlib
 import io
 import logging
 from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional
 
-import httpx
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-from fpdf import FPDF
-from PIL import Image
 from psycopg2.extras import execute_values
 from pydantic import BaseModel
 
 from app.database import get_cursor
+from app.services import http_cache, poster_render
+from app.services.blob_store import blob_store, derived_key
 
 # Assets pour PDF (logo + fonts)
 _ASSETS_DIR = Path(__file__).parent.parent / "assets" / "iphone_tarifs"
 _FONTS_DIR = Path(__file__).parent.parent / "assets" / "fonts"
 _LOGO_PATH = _ASSETS_DIR / "logo.png"
 
-# Cache disque pour les images distantes (convertit WebP/JPEG/PNG → PNG)
-_PDF_IMG_CACHE = Path(__file__).parent.parent / "video" / "cache" / "pdf_images"
-_PDF_IMG_CACHE.mkdir(parents=True, exist_ok=True)
 
 
 def _fetch_image_for_pdf(url: str) -> Optional[Path]:
@@ -38,13 +34,16 @@ def _fetch_image_for_pdf(url: str) -> Optional[Path]:
 
     fpdf2 ne supporte que JPEG/PNG/GIF. Les images DuckDuckGo sont souvent
     en WebP ou d'autres formats exotiques → Pillow convertit systematiquement
-    en PNG RGB. Cache disque SHA256 pour ne pas re-fetch a chaque PDF."""
+    en PNG RGB. Cache dans le blob store (cle derivee de l'URL) pour ne pas
+    re-fetch a chaque PDF."""
+    import httpx
+    from PIL import Image
     if not url or not url.startswith("http"):
         return None
-    h = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
-    cache = _PDF_IMG_CACHE / f"{h}.png"
-    if cache.exists() and cache.stat().st_size > 200:
-        return cache
+    key = derived_key("pdf_image", url)
+    cached = blob_store.local_path(key)
+    if cached is not None:
+        return cached
     try:
         headers = {
             "User-Agent": (
@@ -71,8 +70,10 @@ def _fetch_image_for_pdf(url: str) -> Optional[Path]:
         # Redimensionne si trop gros (pas besoin > 600px pour PDF)
         if img.width > 600 or img.height > 600:
             img.thumbnail((600, 600), Image.LANCZOS)
-        img.save(cache, "PNG", optimize=True)
-        return cache
+        buf = io.BytesIO()
+        img.save(buf, "PNG", optimize=True)
+        blob_store.put(buf.getvalue(), key=key)
+        return blob_store.local_path(key)
     except Exception as e:
         logger.info("PDF image fetch failed for %s : %s", url[:80], e)
         return None
@@ -206,15 +207,18 @@ class SmartphoneUpdate(BaseModel):
 # CRUD endpoints
 # ---------------------------------------------------------------------------
 @router.get("")
-def list_smartphones(active_only: bool = True):
-    """Liste tous les smartphones triés par ordre."""
-    sql = "SELECT * FROM smartphones_tarifs"
-    if active_only:
-        sql += " WHERE actif = TRUE"
-    sql += " ORDER BY marque ASC, ordre ASC, modele ASC"
-    with get_cursor() as cur:
-        cur.execute(sql)
-        return [dict(r) for r in cur.fetchall()]
+def list_smartphones(request: Request, active_only: bool = True):
+    """Liste tous les smartphones triés par ordre (réponse cachée + ETag)."""
+    def build():
+        sql = "SELECT * FROM smartphones_tarifs"
+        if active_only:
+            sql += " WHERE actif = TRUE"
+        sql += " ORDER BY marque ASC, ordre ASC, modele ASC"
+        with get_cursor() as cur:
+            cur.execute(sql)
+            return [dict(r) for r in cur.fetchall()]
+
+    return http_cache.cached_json(request, "catalogue", f"smartphones|{active_only}", build)
 
 
 @router.post("")
@@ -317,6 +321,7 @@ def generate_image(payload: GenerateImageRequest):
     Au lieu de generer une image AI qui hallucine, on trouve une vraie photo
     marketing du produit. L'admin peut choisir parmi les alternatives
     renvoyees si la premiere ne convient pas."""
+    import httpx
     import re
     import json
     from urllib.parse import quote
@@ -432,195 +437,215 @@ def _find_font_file(bold: bool = False, italic: bool = False) -> str:
     return str(p)
 
 
-class _SmartphonePDF(FPDF):
-    def __init__(self, *a, **kw):
-        super().__init__(*a, **kw)
-        self.add_font("UI", "", _find_font_file())
-        self.add_font("UI", "B", _find_font_file(bold=True))
-        self.add_font("UI", "I", _find_font_file(italic=True))
-
-    def header(self):
-        # Bandeau orange en haut
-        self.set_fill_color(*ORANGE)
-        self.rect(0, 0, 210, 8, style="F")
-
-        # Logo centré
-        if _LOGO_PATH.exists():
-            self.image(str(_LOGO_PATH), x=(210 - 22) / 2, y=14, w=22, h=22)
-
-        # Wordmark
-        self.set_font("UI", "B", 22)
-        self.set_text_color(*DARK)
-        self.set_y(38)
-        self.cell(0, 7, "KLIKPHONE", align="C", new_x="LMARGIN", new_y="NEXT")
-
-        # Baseline
-        self.set_font("UI", "I", 9)
-        self.set_text_color(120, 120, 120)
-        self.cell(0, 4, "Spécialiste Apple & Smartphones · Chambéry", align="C",
-                  new_x="LMARGIN", new_y="NEXT")
-
-        # Séparateur
-        self.ln(2)
-        self.set_draw_color(*ORANGE)
-        self.set_line_width(0.8)
-        self.line(40, self.get_y(), 170, self.get_y())
-        self.ln(4)
-
-        # Sous-titre
-        self.set_font("UI", "B", 15)
-        self.set_text_color(*DARK)
-        self.cell(0, 7, "NOS SMARTPHONES — TARIFS", align="C",
-                  new_x="LMARGIN", new_y="NEXT")
-        self.ln(3)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("UI", "", 8)
-        self.set_text_color(140, 140, 140)
-        self.cell(0, 4, "klikphone.com  ·  06 95 71 51 96  ·  79 Place Saint-Léger, Chambéry",
-                  align="C", new_x="LMARGIN", new_y="NEXT")
-        self.set_text_color(180, 180, 180)
-        self.cell(0, 4, f"Page {self.page_no()}",
-                  align="C", new_x="LMARGIN", new_y="NEXT")
-
-    def _condition_pill(self, x: float, y: float, condition: str):
-        """Petite pill colorée pour la condition."""
-        is_neuf = (condition or "").lower() == "neuf"
-        color = EMERALD if is_neuf else BLUE
-        label = "NEUF" if is_neuf else "RECOND. PREMIUM"
-
-        self.set_font("UI", "B", 7)
-        tw = self.get_string_width(label) + 4
-        self.set_fill_color(*color)
-        self.set_draw_color(*color)
-        self.set_text_color(255, 255, 255)
-        self.rect(x, y, tw + 1, 4.5, style="F")
-        self.set_xy(x + 0.5, y + 0.3)
-        self.cell(tw, 4, label, align="C")
-        return tw + 1
-
-    def add_smartphone_row(self, phone: dict, y_top: float, row_idx: int,
-                           card_h: float):
-        """Une ligne smartphone sur `card_h` mm : photo | marque+modele+condition | prix.
-
-        Design compact et adaptatif :
-        - Pas de stock affiche (non pertinent sur affiche boutique)
-        - Stockage + prix : une ligne par variante effectivement remplie
-          (pas de "256 Go — vide")
-        - Taille photo / fonts proportionnelles a card_h pour lisibilite"""
-        margin = 10
-        x = margin
-
-        # Fond alterne subtil
-        if row_idx % 2 == 1:
-            self.set_fill_color(*GRAY_BG)
-            self.rect(x, y_top, 210 - 2 * margin, card_h, style="F")
-
-        # Border bottom fin
-        self.set_draw_color(*GRAY_BORDER)
-        self.set_line_width(0.2)
-        self.line(x, y_top + card_h, 210 - margin, y_top + card_h)
-
-        # ─ Photo (gauche) — carree et centree verticalement ─
-        img_size = min(card_h - 4, 28)
-        img_x = x + 2
-        img_y = y_top + (card_h - img_size) / 2
-        img_url = phone.get("image_url") or ""
-        img_drawn = False
-        if img_url:
-            local = _fetch_image_for_pdf(img_url)
-            if local:
-                try:
-                    self.image(str(local), x=img_x, y=img_y, w=img_size, h=img_size)
-                    img_drawn = True
-                except Exception as e:
-                    logger.info("fpdf image failed %s : %s", local, e)
-        if not img_drawn:
-            # Placeholder : icone smartphone dans un fond gris clair
-            self.set_fill_color(235, 237, 242)
-            self.set_draw_color(210, 215, 222)
-            self.rect(img_x, img_y, img_size, img_size, style="FD")
-            # Petite silhouette de telephone au centre
-            ph_w = img_size * 0.45
-            ph_h = img_size * 0.7
-            ph_x = img_x + (img_size - ph_w) / 2
-            ph_y = img_y + (img_size - ph_h) / 2
-            self.set_fill_color(200, 205, 215)
-            self.rect(ph_x, ph_y, ph_w, ph_h, style="F")
-
-        # ─ Marque + Modele + condition (milieu) ─
-        text_x = x + img_size + 6
-        # Taille fonts proportionnelle a card_h
-        compact = card_h < 22
-        brand_size = 7 if compact else 8
-        model_size = 12 if compact else 14
-
-        # Marque (petit, orange, majuscules)
-        self.set_font("UI", "B", brand_size)
-        self.set_text_color(*ORANGE)
-        marque_y = y_top + (2.5 if compact else 3)
-        self.set_xy(text_x, marque_y)
-        self.cell(60, 4, (phone.get("marque") or "").upper())
-
-        # Modele (gros, noir)
-        self.set_font("UI", "B", model_size)
-        self.set_text_color(*DARK)
-        model_y = y_top + (6.5 if compact else 8)
-        self.set_xy(text_x, model_y)
-        modele = (phone.get("modele") or "")[:30]
-        self.cell(75, 6, modele)
-
-        # Condition pill (sous le modele)
-        pill_y = y_top + (card_h - 6) if compact else y_top + 17
-        self._condition_pill(text_x, pill_y, phone.get("condition") or "")
-
-        # ─ Prix (droite) : une ligne par stockage non vide ─
-        # Calcule les variantes qui ont vraiment un prix
-        variants = []
-        for i in (1, 2, 3):
-            p = phone.get(f"prix_{i}")
-            s = phone.get(f"stockage_{i}")
-            if p:
-                variants.append((s, p))
-
-        if not variants:
-            return
-
-        # Zone prix : droite de la page
-        price_x = 135
-        price_w = 65
-        # Taille fonts adaptative
-        main_size = 17 if not compact else 14
-        sub_size = 10 if not compact else 9
-        stor_size = 8 if not compact else 7
-
-        # Premier prix : plus gros, orange
-        first_stor, first_price = variants[0]
-        self.set_font("UI", "B", main_size)
-        self.set_text_color(*ORANGE)
-        first_y = y_top + (2 if compact else 4)
-        self.set_xy(price_x, first_y)
-        self.cell(price_w, main_size * 0.5,
-                  f"{first_price}€", align="R")
-        if first_stor:
-            self.set_font("UI", "", stor_size)
-            self.set_text_color(130, 130, 130)
-            self.set_xy(price_x, first_y + main_size * 0.5 + 0.5)
-            self.cell(price_w, 4, first_stor, align="R")
-
-        # Variantes suivantes (si existent) : plus petites, gris
-        if len(variants) > 1:
-            sub_y = first_y + main_size * 0.5 + (4 if compact else 5)
-            for stor, price in variants[1:]:
-                label = f"{price}€"
-                if stor:
-                    label = f"{stor} · {price}€"
-                self.set_font("UI", "B", sub_size)
-                self.set_text_color(110, 110, 110)
-                self.set_xy(price_x, sub_y)
-                self.cell(price_w, 4, label, align="R")
-                sub_y += sub_size * 0.42
+@lru_cache(maxsize=1)
+def _smartphone_pdf_class():
+    """Classe PDF des affiches (fpdf importé au premier rendu)."""
+    from fpdf import FPDF
+
+    class _SmartphonePDF(FPDF):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.add_font("UI", "", _find_font_file())
+            self.add_font("UI", "B", _find_font_file(bold=True))
+            self.add_font("UI", "I", _find_font_file(italic=True))
+            self.images: dict = {}  # url -> PNG local pre-telecharge (cf. _prefetch_images)
+
+        def header(self):
+            # Bandeau orange en haut
+            self.set_fill_color(*ORANGE)
+            self.rect(0, 0, 210, 8, style="F")
+
+            # Logo centré
+            if _LOGO_PATH.exists():
+                self.image(str(_LOGO_PATH), x=(210 - 22) / 2, y=14, w=22, h=22)
+
+            # Wordmark
+            self.set_font("UI", "B", 22)
+            self.set_text_color(*DARK)
+            self.set_y(38)
+            self.cell(0, 7, "KLIKPHONE", align="C", new_x="LMARGIN", new_y="NEXT")
+
+            # Baseline
+            self.set_font("UI", "I", 9)
+            self.set_text_color(120, 120, 120)
+            self.cell(0, 4, "Spécialiste Apple & Smartphones · Chambéry", align="C",
+                      new_x="LMARGIN", new_y="NEXT")
+
+            # Séparateur
+            self.ln(2)
+            self.set_draw_color(*ORANGE)
+            self.set_line_width(0.8)
+            self.line(40, self.get_y(), 170, self.get_y())
+            self.ln(4)
+
+            # Sous-titre
+            self.set_font("UI", "B", 15)
+            self.set_text_color(*DARK)
+            self.cell(0, 7, "NOS SMARTPHONES — TARIFS", align="C",
+                      new_x="LMARGIN", new_y="NEXT")
+            self.ln(3)
+
+        def footer(self):
+            self.set_y(-15)
+            self.set_font("UI", "", 8)
+            self.set_text_color(140, 140, 140)
+            self.cell(0, 4, "klikphone.com  ·  06 95 71 51 96  ·  79 Place Saint-Léger, Chambéry",
+                      align="C", new_x="LMARGIN", new_y="NEXT")
+            self.set_text_color(180, 180, 180)
+            self.cell(0, 4, f"Page {self.page_no()}",
+                      align="C", new_x="LMARGIN", new_y="NEXT")
+
+        def _condition_pill(self, x: float, y: float, condition: str):
+            """Petite pill colorée pour la condition."""
+            is_neuf = (condition or "").lower() == "neuf"
+            color = EMERALD if is_neuf else BLUE
+            label = "NEUF" if is_neuf else "RECOND. PREMIUM"
+
+            self.set_font("UI", "B", 7)
+            tw = self.get_string_width(label) + 4
+            self.set_fill_color(*color)
+            self.set_draw_color(*color)
+            self.set_text_color(255, 255, 255)
+            self.rect(x, y, tw + 1, 4.5, style="F")
+            self.set_xy(x + 0.5, y + 0.3)
+            self.cell(tw, 4, label, align="C")
+            return tw + 1
+
+        def add_smartphone_row(self, phone: dict, y_top: float, row_idx: int,
+                               card_h: float):
+            """Une ligne smartphone sur `card_h` mm : photo | marque+modele+condition | prix.
+
+            Design compact et adaptatif :
+            - Pas de stock affiche (non pertinent sur affiche boutique)
+            - Stockage + prix : une ligne par variante effectivement remplie
+              (pas de "256 Go — vide")
+            - Taille photo / fonts proportionnelles a card_h pour lisibilite"""
+            margin = 10
+            x = margin
+
+            # Fond alterne subtil
+            if row_idx % 2 == 1:
+                self.set_fill_color(*GRAY_BG)
+                self.rect(x, y_top, 210 - 2 * margin, card_h, style="F")
+
+            # Border bottom fin
+            self.set_draw_color(*GRAY_BORDER)
+            self.set_line_width(0.2)
+            self.line(x, y_top + card_h, 210 - margin, y_top + card_h)
+
+            # ─ Photo (gauche) — carree et centree verticalement ─
+            img_size = min(card_h - 4, 28)
+            img_x = x + 2
+            img_y = y_top + (card_h - img_size) / 2
+            img_url = phone.get("image_url") or ""
+            img_drawn = False
+            if img_url:
+                if img_url in self.images:
+                    local = self.images[img_url]
+                else:
+                    local = _fetch_image_for_pdf(img_url)
+                if local:
+                    try:
+                        self.image(str(local), x=img_x, y=img_y, w=img_size, h=img_size)
+                        img_drawn = True
+                    except Exception as e:
+                        logger.info("fpdf image failed %s : %s", local, e)
+            if not img_drawn:
+                # Placeholder : icone smartphone dans un fond gris clair
+                self.set_fill_color(235, 237, 242)
+                self.set_draw_color(210, 215, 222)
+                self.rect(img_x, img_y, img_size, img_size, style="FD")
+                # Petite silhouette de telephone au centre
+                ph_w = img_size * 0.45
+                ph_h = img_size * 0.7
+                ph_x = img_x + (img_size - ph_w) / 2
+                ph_y = img_y + (img_size - ph_h) / 2
+                self.set_fill_color(200, 205, 215)
+                self.rect(ph_x, ph_y, ph_w, ph_h, style="F")
+
+            # ─ Marque + Modele + condition (milieu) ─
+            text_x = x + img_size + 6
+            # Taille fonts proportionnelle a card_h
+            compact = card_h < 22
+            brand_size = 7 if compact else 8
+            model_size = 12 if compact else 14
+
+            # Marque (petit, orange, majuscules)
+            self.set_font("UI", "B", brand_size)
+            self.set_text_color(*ORANGE)
+            marque_y = y_top + (2.5 if compact else 3)
+            self.set_xy(text_x, marque_y)
+            self.cell(60, 4, (phone.get("marque") or "").upper())
+
+            # Modele (gros, noir)
+            self.set_font("UI", "B", model_size)
+            self.set_text_color(*DARK)
+            model_y = y_top + (6.5 if compact else 8)
+            self.set_xy(text_x, model_y)
+            modele = (phone.get("modele") or "")[:30]
+            self.cell(75, 6, modele)
+
+            # Condition pill (sous le modele)
+            pill_y = y_top + (card_h - 6) if compact else y_top + 17
+            self._condition_pill(text_x, pill_y, phone.get("condition") or "")
+
+            # ─ Prix (droite) : une ligne par stockage non vide ─
+            # Calcule les variantes qui ont vraiment un prix
+            variants = []
+            for i in (1, 2, 3):
+                p = phone.get(f"prix_{i}")
+                s = phone.get(f"stockage_{i}")
+                if p:
+                    variants.append((s, p))
+
+            if not variants:
+                return
+
+            # Zone prix : droite de la page
+            price_x = 135
+            price_w = 65
+            # Taille fonts adaptative
+            main_size = 17 if not compact else 14
+            sub_size = 10 if not compact else 9
+            stor_size = 8 if not compact else 7
+
+            # Premier prix : plus gros, orange
+            first_stor, first_price = variants[0]
+            self.set_font("UI", "B", main_size)
+            self.set_text_color(*ORANGE)
+            first_y = y_top + (2 if compact else 4)
+            self.set_xy(price_x, first_y)
+            self.cell(price_w, main_size * 0.5,
+                      f"{first_price}€", align="R")
+            if first_stor:
+                self.set_font("UI", "", stor_size)
+                self.set_text_color(130, 130, 130)
+                self.set_xy(price_x, first_y + main_size * 0.5 + 0.5)
+                self.cell(price_w, 4, first_stor, align="R")
+
+            # Variantes suivantes (si existent) : plus petites, gris
+            if len(variants) > 1:
+                sub_y = first_y + main_size * 0.5 + (4 if compact else 5)
+                for stor, price in variants[1:]:
+                    label = f"{price}€"
+                    if stor:
+                        label = f"{stor} · {price}€"
+                    self.set_font("UI", "B", sub_size)
+                    self.set_text_color(110, 110, 110)
+                    self.set_xy(price_x, sub_y)
+                    self.cell(price_w, 4, label, align="R")
+                    sub_y += sub_size * 0.42
+
+    return _SmartphonePDF
+
+
+def _prefetch_images(urls: list) -> dict:
+    """url -> chemin PNG local (ou None), telecharges en parallele."""
+    todo = list(dict.fromkeys(u for u in urls if u))
+    if not todo:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(8, len(todo))) as ex:
+        return dict(zip(todo, ex.map(_fetch_image_for_pdf, todo)))
 
 
 def _render_smartphones_pdf(phones: list) -> bytes:
@@ -628,7 +653,7 @@ def _render_smartphones_pdf(phones: list) -> bytes:
 
     La hauteur de chaque ligne est calculee pour que tout tienne sur 1 page,
     entre 16mm (ultra-compact, ~13 phones max) et 34mm (aere, 6-7 phones)."""
-    pdf = _SmartphonePDF(orientation="P", unit="mm", format="A4")
+    pdf = _smartphone_pdf_class()(orientation="P", unit="mm", format="A4")
     # Pas de page break auto — on force tout sur une seule page
     pdf.set_auto_page_break(auto=False)
     pdf.add_page()
@@ -645,6 +670,9 @@ def _render_smartphones_pdf(phones: list) -> bytes:
     # mais on tient quand meme sur 1 page
     max_rows = int(usable_h / 16)
     phones_to_render = phones[:max_rows]
+    # Toutes les photos en parallele avant la mise en page (sinon un fetch
+    # httpx sequentiel par ligne)
+    pdf.images = _prefetch_images([p.get("image_url") for p in phones_to_render])
 
     current_y = y_start
     for idx, phone in enumerate(phones_to_render):
@@ -696,7 +724,13 @@ def generate_pdf(
     if not phones:
         raise HTTPException(404, "Aucun smartphone à afficher")
 
-    pdf_bytes = _render_smartphones_pdf(phones)
+    # Les photos indisponibles (placeholder) font partie de la cle : le PDF
+    # sera re-rendu quand elles redeviennent telechargeables
+    images = _prefetch_images([p.get("image_url") for p in phones])
+    available = tuple(sorted(u for u, path in images.items() if path))
+    pdf_bytes = poster_render.render_cached(
+        "smartphones_tarifs", phones, _render_smartphones_pdf, available,
+    )
     filename = "smartphones_tarifs.pdf" if not marque else f"smartphones_{marque.lower()}.pdf"
     return StreamingResponse(
         io.BytesIO(pdf_bytes),
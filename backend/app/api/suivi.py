@@ -151,52 +151,58 @@ async def laisser_avis(ticket_code: str, body: AvisBody):
 
 
 # ─── DASHBOARD INTERACTIONS ──────────────────────────────
+# Categories d'interaction client -> cle de la reponse dashboard
+_INTERACTION_TYPES = {
+    "validation_devis": "accord_client",
+    "message_client": "messages",
+    "avis_client": "avis",
+}
+
+# Une seule requete, servie par des index partiels (cf. main.py) :
+# - idx_notes_unread_interactions : notes non lues des 3 types client
+#   (le predicat `is_read IS NOT TRUE` doit rester identique a celui de l'index)
+# - idx_tickets_actifs : tickets pas encore rendus / clotures, qui pilotent la
+#   categorie accord_client_valide ; pour chacun, idx_notes_devis_valide
+#   sonde l'existence d'une validation positive (contenu LIKE '✅%').
+#   Le predicat sur statut doit rester identique a celui de l'index.
+# Le cout ne depend donc que du nombre d'interactions en attente et de
+# tickets ouverts, pas de la taille de notes_tickets ni de l'historique.
+_INTERACTIONS_SQL = """
+    SELECT DISTINCT type_note AS cat, ticket_id
+    FROM notes_tickets
+    WHERE is_read IS NOT TRUE
+      AND type_note IN ('validation_devis', 'message_client', 'avis_client')
+    UNION ALL
+    SELECT 'accord_client_valide' AS cat, t.id AS ticket_id
+    FROM tickets t
+    WHERE t.statut NOT IN ('Rendu au client', 'Clôturé')
+      AND EXISTS (
+          SELECT 1 FROM notes_tickets n
+          WHERE n.ticket_id = t.id
+            AND n.type_note = 'validation_devis'
+            AND n.contenu LIKE '✅%'
+      )
+"""
+
+
 @router.get("/dashboard/interactions")
 async def get_interactions():
     """4 catégories d'interactions non lues : accord_client (tout), accord_client_valide
-    (validations positives uniquement, pour point vert dashboard), messages, avis."""
-    with get_cursor() as cur:
-        # Accord client (validation_devis non lues — toutes : validation + refus)
-        cur.execute("""
-            SELECT DISTINCT ticket_id FROM notes_tickets
-            WHERE type_note = 'validation_devis' AND (is_read = FALSE OR is_read IS NULL)
-        """)
-        accord_ids = [r["ticket_id"] for r in cur.fetchall()]
-
-        # Accord client VALIDÉ : tous les tickets ayant une note 'validation_devis'
-        # commençant par ✅, ET dont le ticket est encore actif (pas rendu/clôturé).
-        # → Le point vert dashboard reste donc visible toute la phase de réparation,
-        # même après que le staff a ouvert le ticket (ce qui marque is_read=TRUE).
-        cur.execute("""
-            SELECT DISTINCT n.ticket_id
-            FROM notes_tickets n
-            JOIN tickets t ON t.id = n.ticket_id
-            WHERE n.type_note = 'validation_devis'
-              AND n.contenu LIKE %s
-              AND t.statut NOT IN ('Rendu au client', 'Clôturé')
-        """, ("✅%",))
-        accord_valide_ids = [r["ticket_id"] for r in cur.fetchall()]
-
-        # Messages clients non lus
-        cur.execute("""
-            SELECT DISTINCT ticket_id FROM notes_tickets
-            WHERE type_note = 'message_client' AND (is_read = FALSE OR is_read IS NULL)
-        """)
-        message_ids = [r["ticket_id"] for r in cur.fetchall()]
+    (validations positives uniquement, pour point vert dashboard), messages, avis.
 
-        # Avis clients non lus
-        cur.execute("""
-            SELECT DISTINCT ticket_id FROM notes_tickets
-            WHERE type_note = 'avis_client' AND (is_read = FALSE OR is_read IS NULL)
-        """)
-        avis_ids = [r["ticket_id"] for r in cur.fetchall()]
+    accord_client_valide : tous les tickets ayant une note 'validation_devis'
+    commençant par ✅, ET dont le ticket est encore actif (pas rendu/clôturé).
+    → Le point vert dashboard reste donc visible toute la phase de réparation,
+    même après que le staff a ouvert le ticket (ce qui marque is_read=TRUE)."""
+    ids = {"accord_client": [], "accord_client_valide": [], "messages": [], "avis": []}
+    with get_cursor() as cur:
+        cur.execute(_INTERACTIONS_SQL)
+        for r in cur.fetchall():
+            ids[_INTERACTION_TYPES.get(r["cat"], r["cat"])].append(r["ticket_id"])
 
-    total = len(accord_ids) + len(message_ids) + len(avis_ids)
+    total = len(ids["accord_client"]) + len(ids["messages"]) + len(ids["avis"])
     return {
-        "accord_client": {"count": len(accord_ids), "ticket_ids": accord_ids},
-        "accord_client_valide": {"count": len(accord_valide_ids), "ticket_ids": accord_valide_ids},
-        "messages": {"count": len(message_ids), "ticket_ids": message_ids},
-        "avis": {"count": len(avis_ids), "ticket_ids": avis_ids},
+        **{k: {"count": len(v), "ticket_ids": v} for k, v in ids.items()},
         "total_actions": total,
     }
 
@@ -15,6 +15,7 @@ from pydantic import BaseModel
 
 from app.database import get_cursor
 from app.api.auth import get_current_user
+from app.services import tarifs_catalog
 
 router = APIRouter(prefix="/api/tarifs", tags=["tarifs"])
 
@@ -372,6 +373,7 @@ async def import_tarifs(
                 ),
             )
             inserted += 1
+        tarifs_catalog.invalidate(cur)
 
     _cache.clear()
     return {"inserted": inserted}
@@ -405,6 +407,8 @@ async def recalculate_tarifs(user: dict = Depends(get_current_user)):
                     (new_prix, row["id"]),
                 )
                 updated += 1
+        if updated:
+            tarifs_catalog.invalidate(cur)
 
     return {"recalculated": updated, "total": len(rows)}
 
@@ -418,6 +422,8 @@ async def toggle_stock(tarif_id: int, user: dict = Depends(get_current_user)):
             (tarif_id,),
         )
         row = cur.fetchone()
+        if row:
+            tarifs_catalog.invalidate(cur)
     if not row:
         raise HTTPException(404, "Tarif non trouve")
     return {"id": row["id"], "en_stock": row["en_stock"]}
@@ -430,6 +436,7 @@ async def clear_tarifs(user: dict = Depends(get_current_user)):
         raise HTTPException(403, "Admin requis")
     with get_cursor() as cur:
         cur.execute("TRUNCATE TABLE tarifs RESTART IDENTITY")
+        tarifs_catalog.invalidate(cur)
     _cache.clear()
     return {"status": "ok"}
 
@@ -753,6 +760,8 @@ async def check_stock_mobilax(user: dict = Depends(get_current_user)):
 
             await asyncio.sleep(0.3)
 
+    if results["tarifs_updated"]:
+        tarifs_catalog.invalidate()
     return results
 
 
@@ -4,7 +4,6 @@ Scraping LCD-Phone.com pour les prix fournisseur + marge automatique.
 """
 
 import os
-import time
 import threading
 import logging
 from datetime import datetime
@@ -15,6 +14,8 @@ from pydantic import BaseModel
 
 from app.database import get_cursor
 from app.api.auth import get_current_user
+from app.services import telephones_catalog
+from app.services.fast_json import FastJSONResponse
 
 router = APIRouter(prefix="/api/telephones", tags=["telephones"])
 logger = logging.getLogger(__name__)
@@ -23,29 +24,6 @@ _table_checked = False
 _sync_status = {"running": False, "last_result": None, "started_at": None}
 
 
-# ─── Simple TTL cache ────────────────────────────────
-class _Cache:
-    def __init__(self, ttl=300):
-        self._data = {}
-        self._ttl = ttl
-
-    def get(self, key):
-        entry = self._data.get(key)
-        if entry and time.time() - entry[1] < self._ttl:
-            return entry[0]
-        self._data.pop(key, None)
-        return None
-
-    def set(self, key, value):
-        self._data[key] = (value, time.time())
-
-    def clear(self):
-        self._data.clear()
-
-
-_cache = _Cache(ttl=300)  # 5 min
-
-
 def _ensure_table():
     global _table_checked
     if _table_checked:
@@ -86,18 +64,12 @@ def _ensure_table():
         _table_checked = True
     except Exception as e:
         print(f"Warning telephones table: {e}")
-
-
-def _row_to_dict(row):
-    if row is None:
-        return None
-    d = dict(row)
-    for k, v in d.items():
-        if isinstance(v, datetime):
-            d[k] = v.isoformat()
-        elif hasattr(v, '__float__'):
-            d[k] = float(v)
-    return d
+        return
+    try:
+        with get_cursor() as cur:
+            telephones_catalog.ensure_indexes(cur)
+    except Exception as e:
+        print(f"Warning telephones trigram indexes: {e}")
 
 
 def _run_sync_background():
@@ -126,7 +98,6 @@ def _run_sync_background():
             pass
     finally:
         _sync_status["running"] = False
-        _cache.clear()  # Invalidate stats/marques cache after sync
 
 
 @router.post("/sync")
@@ -176,12 +147,6 @@ async def probe_lcdphone_endpoint(user: dict = Depends(get_current_user)):
     return probe_lcdphone()
 
 
-_CATALOGUE_COLS = (
-    "id, marque, modele, stockage, couleur, grade, type_produit, "
-    "prix_vente, en_stock, stock_fournisseur, image_url, garantie_mois"
-)
-
-
 @router.get("/catalogue")
 async def liste_telephones(
     marque: Optional[str] = None,
@@ -194,62 +159,23 @@ async def liste_telephones(
     limit: int = Query(24, ge=1, le=100),
     user: dict = Depends(get_current_user),
 ):
-    """Liste des téléphones avec filtres et pagination."""
+    """Liste des téléphones avec filtres, pagination et facettes (une requête)."""
     _ensure_table()
-    with get_cursor() as cur:
-        where = "actif = TRUE AND modele IS NOT NULL AND modele != '' AND prix_vente IS NOT NULL AND prix_vente > 0 AND marque IS NOT NULL AND marque != ''"
-        params = []
-        if marque:
-            where += " AND marque = %s"
-            params.append(marque)
-        if type_produit:
-            where += " AND type_produit = %s"
-            params.append(type_produit)
-        if grade:
-            where += " AND grade = %s"
-            params.append(grade)
-        if en_stock is not None:
-            where += " AND en_stock = %s"
-            params.append(en_stock)
-        if search:
-            where += " AND (modele ILIKE %s OR marque ILIKE %s)"
-            params.extend([f"%{search}%", f"%{search}%"])
-
-        # Count total
-        cur.execute(f"SELECT COUNT(*) as cnt FROM telephones_catalogue WHERE {where}", params)
-        total = cur.fetchone()["cnt"]
-
-        order_map = {
-            "marque": "marque, modele, stockage",
-            "prix_asc": "prix_vente ASC NULLS LAST",
-            "prix_desc": "prix_vente DESC NULLS LAST",
-            "nouveautes": "derniere_sync DESC",
-        }
-        order = order_map.get(tri, "marque, modele")
-        offset = (page - 1) * limit
-
-        cur.execute(
-            f"SELECT {_CATALOGUE_COLS} FROM telephones_catalogue WHERE {where} ORDER BY {order} LIMIT %s OFFSET %s",
-            params + [limit, offset],
-        )
-        items = [_row_to_dict(r) for r in cur.fetchall()]
-
-        return {
-            "items": items,
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "total_pages": max(1, (total + limit - 1) // limit),
-        }
+    result = telephones_catalog.search(
+        marque=marque, type_produit=type_produit, grade=grade, en_stock=en_stock,
+        search=search, tri=tri, page=page, limit=limit,
+    )
+    return FastJSONResponse(result)
 
 
 @router.get("/stats")
 async def stats_catalogue(user: dict = Depends(get_current_user)):
-    """Statistiques du catalogue (cached 5 min)."""
-    cached = _cache.get("stats")
-    if cached:
-        return cached
+    """Statistiques du catalogue (cache invalidé à chaque sync)."""
     _ensure_table()
+    return telephones_catalog.cached("stats", _load_stats)
+
+
+def _load_stats():
     with get_cursor() as cur:
         cur.execute("""
             SELECT
@@ -274,17 +200,17 @@ async def stats_catalogue(user: dict = Depends(get_current_user)):
             "prix_max": float(row["prix_max"]) if row["prix_max"] else 0,
             "derniere_sync": row["derniere_sync"].isoformat() if row["derniere_sync"] else None,
         }
-        _cache.set("stats", result)
         return result
 
 
 @router.get("/marques")
 async def liste_marques(user: dict = Depends(get_current_user)):
-    """Liste des marques disponibles (cached 5 min)."""
-    cached = _cache.get("marques")
-    if cached:
-        return cached
+    """Liste des marques disponibles (cache invalidé à chaque sync)."""
     _ensure_table()
+    return telephones_catalog.cached("marques", _load_marques)
+
+
+def _load_marques():
     with get_cursor() as cur:
         cur.execute("""
             SELECT marque, COUNT(*) as nb_modeles,
@@ -292,6 +218,4 @@ async def liste_marques(user: dict = Depends(get_current_user)):
             FROM telephones_catalogue WHERE actif = TRUE
             GROUP BY marque ORDER BY nb_modeles DESC
         """)
-        result = [{"marque": r["marque"], "nb_modeles": r["nb_modeles"], "nb_en_stock": r["nb_en_stock"]} for r in cur.fetchall()]
-        _cache.set("marques", result)
-        return result
+        return [{"marque": r["marque"], "nb_modeles": r["nb_modeles"], "nb_en_stock": r["nb_en_stock"]} for r in cur.fetchall()]
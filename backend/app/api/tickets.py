@@ -3,9 +3,7 @@ API CRUD Tickets — compatible schéma PostgreSQL existant.
 CRUD et gestion des statuts.
 """
 
-from collections import defaultdict, deque
 from datetime import datetime
-from time import time
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
@@ -15,47 +13,25 @@ from app.api.autocomplete import learn_terms
 from app.api.auth import get_current_user
 from app.models import (
     TicketCreate, TicketUpdate, TicketOut, TicketFull,
-    StatusChange, KPIResponse,
+    StatusChange, KPIResponse, BulkStatusChange, BulkAssign, BulkPaye,
 )
 from app.services.notifications import (
     notif_nouveau_ticket, notif_changement_statut, notif_reparation_terminee,
+    notif_operation_groupee,
 )
 from app.api.notifications_center import push_notification
+from app.services import fidelite as fidelite_service, http_cache, numerotation, rate_limit
+from app.services.fast_json import FastJSONResponse, rows_as
 
 router = APIRouter(prefix="/api/tickets", tags=["tickets"])
 
 
-# ─── Rate limiter in-memory (protection enumeration tickets publics) ─
-# Simple token bucket par IP. Pas persistant (reset au redeploy), mais
-# suffit largement contre les attaquants automatises qui font > 30 req/min.
-_RATE_BUCKETS: dict[str, deque] = defaultdict(deque)
-_RATE_LIMIT = 30        # max 30 requetes
-_RATE_WINDOW = 60       # par 60 secondes
-
-
+# ─── Rate limiter (protection enumeration tickets publics) ─
+# Politique "public" du limiter partage (app.services.rate_limit) :
+# 30 req/min/IP, partagee entre workers si RATE_LIMIT_BACKEND=postgres.
 def _rate_limit_public_lookup(request: Request):
     """Raise 429 si l'IP depasse 30 req/min sur les endpoints publics."""
-    ip = request.client.host if request.client else "unknown"
-    # IP derriere Railway proxy -> header X-Forwarded-For
-    xff = request.headers.get("x-forwarded-for", "")
-    if xff:
-        ip = xff.split(",")[0].strip()
-    now = time()
-    bucket = _RATE_BUCKETS[ip]
-    # Purge les hits plus vieux que la fenetre
-    while bucket and (now - bucket[0]) > _RATE_WINDOW:
-        bucket.popleft()
-    if len(bucket) >= _RATE_LIMIT:
-        raise HTTPException(
-            429,
-            "Trop de requetes — attendez 1 minute avant de reessayer.",
-        )
-    bucket.append(now)
-    # GC sommaire pour eviter fuite memoire (max 5000 IPs tracked)
-    if len(_RATE_BUCKETS) > 5000:
-        for k in list(_RATE_BUCKETS.keys())[:2500]:
-            if not _RATE_BUCKETS[k]:
-                del _RATE_BUCKETS[k]
+    rate_limit.enforce(request, "public")
 
 
 def _ajouter_historique(cur, ticket_id, type_event, contenu):
@@ -142,7 +118,7 @@ async def get_dashboard(
     pre = kpi_data.pop("pre_enregistres", 0)
     kpi = {**KPIResponse(**kpi_data).model_dump(), "pre_enregistres": pre}
 
-    return {"kpi": kpi, "tickets": tickets}
+    return FastJSONResponse({"kpi": kpi, "tickets": tickets})
 
 
 # ─── KPI DASHBOARD ───────────────────────────────────────────────
@@ -217,15 +193,7 @@ async def get_repair_queue(
         """, params)
         rows = cur.fetchall()
 
-    # Serialize datetimes
-    result = []
-    for r in rows:
-        d = dict(r)
-        for key in ("date_recuperation", "date_depot", "reparation_debut"):
-            if d.get(key) and hasattr(d[key], "isoformat"):
-                d[key] = d[key].isoformat()
-        result.append(d)
-    return result
+    return FastJSONResponse(rows)
 
 
 # ─── LISTE / RECHERCHE ─────────────────────────────────────────
@@ -267,14 +235,18 @@ async def list_tickets(
 
     where = "WHERE " + " AND ".join(conditions) if conditions else ""
 
+    # Types alignes sur TicketFull (entiers) : la reponse n'est pas revalidee.
+    # telephone_pret_rendu (BOOLEAN) est relu apres t.* : la derniere colonne
+    # du meme nom l'emporte dans la ligne RealDict.
     query = f"""
         SELECT t.*,
+               t.telephone_pret_rendu::int as telephone_pret_rendu,
                c.nom as client_nom, c.prenom as client_prenom,
                c.telephone as client_tel, c.email as client_email,
-               c.societe as client_societe, c.carte_camby as client_carte_camby,
-               EXISTS(SELECT 1 FROM notes_tickets WHERE ticket_id = t.id AND type_note = 'whatsapp') as msg_whatsapp,
-               EXISTS(SELECT 1 FROM notes_tickets WHERE ticket_id = t.id AND type_note = 'sms') as msg_sms,
-               EXISTS(SELECT 1 FROM notes_tickets WHERE ticket_id = t.id AND type_note = 'email') as msg_email
+               c.societe as client_societe, c.carte_camby::int as client_carte_camby,
+               EXISTS(SELECT 1 FROM notes_tickets WHERE ticket_id = t.id AND type_note = 'whatsapp')::int as msg_whatsapp,
+               EXISTS(SELECT 1 FROM notes_tickets WHERE ticket_id = t.id AND type_note = 'sms')::int as msg_sms,
+               EXISTS(SELECT 1 FROM notes_tickets WHERE ticket_id = t.id AND type_note = 'email')::int as msg_email
         FROM tickets t
         JOIN clients c ON t.client_id = c.id
         {where}
@@ -285,7 +257,8 @@ async def list_tickets(
 
     with get_cursor() as cur:
         cur.execute(query, params)
-        return cur.fetchall()
+        rows = cur.fetchall()
+    return FastJSONResponse(rows_as(TicketFull, rows))
 
 
 # ─── TICKET UNIQUE ─────────────────────────────────────────────
@@ -362,20 +335,29 @@ async def get_tickets_by_phone(telephone: str, request: Request):
 async def get_ticket_by_code(ticket_code: str, request: Request):
     """Récupère un ticket par code (public — pour suivi client)."""
     _rate_limit_public_lookup(request)
-    with get_cursor() as cur:
-        cur.execute("""
-            SELECT t.*,
-                   c.nom as client_nom, c.prenom as client_prenom,
-                   c.telephone as client_tel, c.email as client_email,
-                   c.societe as client_societe, c.carte_camby as client_carte_camby
-            FROM tickets t
-            JOIN clients c ON t.client_id = c.id
-            WHERE t.ticket_code = %s
-        """, (ticket_code,))
-        row = cur.fetchone()
-    if not row:
-        raise HTTPException(404, "Ticket non trouvé")
-    return dict(row)
+
+    def build():
+        with get_cursor() as cur:
+            cur.execute("""
+                SELECT t.*,
+                       c.nom as client_nom, c.prenom as client_prenom,
+                       c.telephone as client_tel, c.email as client_email,
+                       c.societe as client_societe, c.carte_camby as client_carte_camby
+                FROM tickets t
+                JOIN clients c ON t.client_id = c.id
+                WHERE t.ticket_code = %s
+            """, (ticket_code,))
+            row = cur.fetchone()
+        if not row:
+            raise HTTPException(404, "Ticket non trouvé")
+        return dict(row)
+
+    # Page de suivi rafraichie en boucle : revalidation par ETag, TTL court
+    # pour les ecritures faites hors de ce module
+    return http_cache.cached_json(
+        request, "ticket", ticket_code, build,
+        ttl=10.0, cache_control=http_cache.PRIVATE_REVALIDATE, variant="full",
+    )
 
 
 # ─── CRÉATION ───────────────────────────────────────────────────
@@ -398,25 +380,17 @@ async def create_ticket(data: TicketCreate):
     statut_initial = "Pré-enregistré" if data.source == "distance" else "En attente de diagnostic"
 
     with get_cursor() as cur:
-        cur.execute("""
-            INSERT INTO tickets
-            (client_id, categorie, marque, modele, modele_autre, imei,
-             panne, panne_detail, pin, pattern, notes_client,
-             commande_piece, statut, est_retour_sav, ticket_original_id, source)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            RETURNING id
-        """, (
-            data.client_id, data.categorie, data.marque, data.modele,
-            data.modele_autre, data.imei, data.panne, data.panne_detail,
-            data.pin, data.pattern, data.notes_client, data.commande_piece,
-            statut_initial, data.est_retour_sav or False, data.ticket_original_id,
-            data.source or "boutique",
-        ))
-        row = cur.fetchone()
-        tid = row["id"]
-
-        code = f"KP-{tid:06d}"
-        cur.execute("UPDATE tickets SET ticket_code = %s WHERE id = %s", (code, tid))
+        row = numerotation.insert_ticket(cur, {
+            "client_id": data.client_id, "categorie": data.categorie,
+            "marque": data.marque, "modele": data.modele, "modele_autre": data.modele_autre,
+            "imei": data.imei, "panne": data.panne, "panne_detail": data.panne_detail,
+            "pin": data.pin, "pattern": data.pattern, "notes_client": data.notes_client,
+            "commande_piece": data.commande_piece, "statut": statut_initial,
+            "est_retour_sav": data.est_retour_sav or False,
+            "ticket_original_id": data.ticket_original_id,
+            "source": data.source or "boutique",
+        })
+        tid, code = row["id"], row["ticket_code"]
 
     # Apprentissage autocomplétion (silencieux)
     learn_terms({"panne": data.panne, "panne_detail": data.panne_detail, "modele_autre": data.modele_autre})
@@ -459,6 +433,8 @@ async def update_ticket(
             values,
         )
 
+    http_cache.invalidate("ticket")
+
     # Apprentissage autocomplétion (silencieux)
     learn_terms(updates)
 
@@ -509,51 +485,20 @@ async def toggle_paye(
 
         # Auto-crédit fidélité quand marqué payé
         if new_paye == 1:
+            cur.execute("SAVEPOINT fidelite")
             try:
-                fidelite_active = "1"
-                cur.execute("SELECT valeur FROM params WHERE cle = 'fidelite_active'")
-                r = cur.fetchone()
-                if r:
-                    fidelite_active = r["valeur"]
-
-                if fidelite_active != "0":
-                    client_id = row["client_id"]
-                    montant = float(row.get("tarif_final") or row.get("devis_estime") or 0) + float(row.get("prix_supp") or 0)
-                    if montant > 0:
-                        cur.execute("SELECT valeur FROM params WHERE cle = 'fidelite_points_par_euro'")
-                        r2 = cur.fetchone()
-                        pts_par_euro = int(r2["valeur"]) if r2 else 10
-                        points_gagnes = int(montant * pts_par_euro)
-
-                        # Vérifier pas déjà crédité
-                        cur.execute(
-                            "SELECT id FROM fidelite_historique WHERE ticket_id = %s AND type = 'gain'",
-                            (ticket_id,),
-                        )
-                        if not cur.fetchone() and points_gagnes > 0:
-                            cur.execute("""
-                                UPDATE clients
-                                SET points_fidelite = COALESCE(points_fidelite, 0) + %s,
-                                    total_depense = COALESCE(total_depense, 0) + %s
-                                WHERE id = %s
-                                RETURNING points_fidelite
-                            """, (points_gagnes, montant, client_id))
-                            pts_row = cur.fetchone()
-                            total_pts = pts_row["points_fidelite"] if pts_row else 0
-
-                            cur.execute("""
-                                INSERT INTO fidelite_historique (client_id, ticket_id, type, points, description)
-                                VALUES (%s, %s, 'gain', %s, %s)
-                            """, (client_id, ticket_id, points_gagnes,
-                                  f"Réparation {montant:.2f}€ — +{points_gagnes} pts"))
-
-                            fidelite_result = {
-                                "points_gagnes": points_gagnes,
-                                "total_points": total_pts,
-                            }
+                fid = fidelite_service.settings()
+                montant = float(row.get("tarif_final") or row.get("devis_estime") or 0) + float(row.get("prix_supp") or 0)
+                if fid.active and int(montant * fid.points_par_euro) > 0:
+                    res = fidelite_service.credit(cur, row["client_id"], ticket_id, montant, fid)
+                    if res and res["points_gagnes"]:
+                        fidelite_result = res
+                cur.execute("RELEASE SAVEPOINT fidelite")
             except Exception:
-                pass  # Ne pas bloquer le paiement si la fidélité échoue
+                # Ne pas bloquer (ni annuler) le paiement si la fidélité échoue
+                cur.execute("ROLLBACK TO SAVEPOINT fidelite")
 
+    http_cache.invalidate("ticket")
     result = {"ok": True, "paye": new_paye}
     if fidelite_result:
         result["fidelite"] = fidelite_result
@@ -561,6 +506,73 @@ async def toggle_paye(
 
 
 # ─── CHANGEMENT DE STATUT ───────────────────────────────────────
+REPARATION = "En cours de réparation"
+
+# Transition complete en une seule instruction (un aller-retour) :
+# verrou + ancien statut, mise a jour du ticket (timer calcule en SQL),
+# synchro des pieces, historique structure et note de validation devis.
+# Le journal texte tickets.historique est complete cote serveur (plus de
+# relecture / reecriture depuis Python) ; le journal de reference est la
+# table historique, en ajout seul.
+_STATUS_SQL = """
+    WITH old AS (
+        SELECT id, statut, ticket_code, technicien_assigne, panne
+        FROM tickets WHERE {where}
+        ORDER BY id
+        FOR UPDATE
+    ), upd AS (
+        UPDATE tickets t SET
+            statut = %(statut)s,
+            date_maj = %(now)s,
+            date_cloture = CASE WHEN %(statut)s = 'Clôturé' THEN %(now)s ELSE t.date_cloture END,
+            historique = CASE
+                WHEN btrim(COALESCE(t.historique, '')) = '' THEN ''
+                ELSE rtrim(t.historique) || E'\\n'
+            END || '[' || %(ts)s || '] Statut: ' || COALESCE(old.statut, '') || ' → ' || %(statut)s,
+            reparation_debut = CASE WHEN %(entree)s AND old.statut IS DISTINCT FROM %(rep)s
+                THEN %(now)s ELSE t.reparation_debut END,
+            reparation_fin = CASE
+                WHEN %(entree)s AND old.statut IS DISTINCT FROM %(rep)s THEN NULL
+                WHEN NOT %(entree)s AND old.statut = %(rep)s AND t.reparation_debut IS NOT NULL THEN %(now)s
+                ELSE t.reparation_fin END,
+            reparation_duree = CASE
+                WHEN NOT %(entree)s AND old.statut = %(rep)s AND t.reparation_debut IS NOT NULL
+                THEN COALESCE(t.reparation_duree, 0)
+                     + FLOOR(EXTRACT(EPOCH FROM (%(now)s - t.reparation_debut)))::int
+                ELSE t.reparation_duree END
+        FROM old
+        WHERE t.id = old.id
+    ), pieces AS (
+        {pieces}
+    ), hist AS (
+        INSERT INTO historique (ticket_id, type, contenu)
+        SELECT id, 'statut', 'Statut: ' || COALESCE(statut, '') || ' → ' || %(statut)s FROM old
+    ), note AS (
+        INSERT INTO notes_tickets (ticket_id, auteur, contenu, type_note, is_read)
+        SELECT id, 'Staff', '✅ Devis accepté par le client (validation au comptoir)',
+               'validation_devis', FALSE
+        FROM old
+        WHERE old.statut = 'En attente d''accord client' AND %(statut)s = %(rep)s
+    )
+    SELECT id, statut AS ancien_statut, ticket_code, technicien_assigne, panne FROM old
+"""
+
+# Auto-sync commandes_pieces selon le statut ticket
+_PIECES_RECUES = """UPDATE commandes_pieces SET statut = 'Reçu', date_reception = %(now)s
+        WHERE ticket_id IN (SELECT id FROM old) AND statut IN ('En attente', 'Commandée')"""
+_PIECES_SYNC = {
+    "Réparation terminée": _PIECES_RECUES,
+    "Rendu au client": _PIECES_RECUES,
+    "Clôturé": _PIECES_RECUES,
+    REPARATION: """UPDATE commandes_pieces SET statut = 'En réparation'
+        WHERE ticket_id IN (SELECT id FROM old) AND statut = 'Reçu'""",
+    "En attente de pièce": """UPDATE commandes_pieces SET statut = 'Commandée', date_commande = %(now)s
+        WHERE ticket_id IN (SELECT id FROM old) AND statut = 'En attente'""",
+}
+# Pas de synchro : CTE neutre
+_PIECES_NONE = "SELECT 1"
+
+
 @router.patch("/{ticket_id}/statut", response_model=dict)
 async def change_status(
     ticket_id: int,
@@ -571,85 +583,30 @@ async def change_status(
     if data.statut not in STATUTS:
         raise HTTPException(400, f"Statut invalide. Valides: {STATUTS}")
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ts = datetime.now().strftime("%d/%m %H:%M")
+    now = datetime.now().replace(microsecond=0)
+    sql = _STATUS_SQL.format(
+        where="id = %(id)s", pieces=_PIECES_SYNC.get(data.statut, _PIECES_NONE),
+    )
 
     with get_cursor() as cur:
-        # Récupérer ancien statut, historique, technicien et panne
-        cur.execute(
-            "SELECT statut, historique, ticket_code, technicien_assigne, panne FROM tickets WHERE id = %s",
-            (ticket_id,),
-        )
+        cur.execute(sql, {
+            "id": ticket_id,
+            "statut": data.statut,
+            "now": now,
+            "ts": now.strftime("%d/%m %H:%M"),
+            "rep": REPARATION,
+            "entree": data.statut == REPARATION,
+        })
         row = cur.fetchone()
         if not row:
             raise HTTPException(404, "Ticket non trouvé")
 
-        ancien_statut = row.get("statut", "")
-        historique = row.get("historique") or ""
-        ticket_code = row.get("ticket_code", f"#{ticket_id}")
-        technicien = row.get("technicien_assigne")
-        panne = row.get("panne") or ""
-
-        # Ajouter à l'historique
-        log_entry = f"[{ts}] Statut: {ancien_statut} → {data.statut}"
-        new_hist = f"{historique.rstrip()}\n{log_entry}" if historique.strip() else log_entry
-
-        # Mise à jour
-        if data.statut == "Clôturé":
-            cur.execute(
-                "UPDATE tickets SET statut=%s, date_maj=%s, date_cloture=%s, historique=%s WHERE id=%s",
-                (data.statut, now, now, new_hist, ticket_id),
-            )
-        else:
-            cur.execute(
-                "UPDATE tickets SET statut=%s, date_maj=%s, historique=%s WHERE id=%s",
-                (data.statut, now, new_hist, ticket_id),
-            )
+    ancien_statut = row.get("ancien_statut", "")
+    ticket_code = row.get("ticket_code", f"#{ticket_id}")
+    technicien = row.get("technicien_assigne")
+    panne = row.get("panne") or ""
 
-        # Timer auto — start/stop
-        entering_repair = data.statut == "En cours de réparation" and ancien_statut != "En cours de réparation"
-        leaving_repair = ancien_statut == "En cours de réparation" and data.statut != "En cours de réparation"
-
-        if entering_repair:
-            cur.execute(
-                "UPDATE tickets SET reparation_debut = %s, reparation_fin = NULL WHERE id = %s",
-                (now, ticket_id),
-            )
-        elif leaving_repair:
-            cur.execute(
-                "SELECT reparation_debut, reparation_duree FROM tickets WHERE id = %s",
-                (ticket_id,),
-            )
-            tr = cur.fetchone()
-            if tr and tr.get("reparation_debut"):
-                debut = tr["reparation_debut"]
-                if isinstance(debut, str):
-                    debut = datetime.strptime(debut, "%Y-%m-%d %H:%M:%S")
-                elapsed = int((datetime.now() - debut).total_seconds())
-                prev = tr.get("reparation_duree") or 0
-                cur.execute(
-                    "UPDATE tickets SET reparation_fin = %s, reparation_duree = %s WHERE id = %s",
-                    (now, prev + elapsed, ticket_id),
-                )
-
-        # ── Auto-sync commandes_pieces selon le statut ticket ──
-        if data.statut in ("Réparation terminée", "Rendu au client", "Clôturé"):
-            cur.execute(
-                "UPDATE commandes_pieces SET statut = 'Reçu', date_reception = %s WHERE ticket_id = %s AND statut IN ('En attente', 'Commandée')",
-                (now, ticket_id),
-            )
-        elif data.statut == "En cours de réparation":
-            cur.execute(
-                "UPDATE commandes_pieces SET statut = 'En réparation' WHERE ticket_id = %s AND statut = 'Reçu'",
-                (ticket_id,),
-            )
-        elif data.statut == "En attente de pièce":
-            cur.execute(
-                "UPDATE commandes_pieces SET statut = 'Commandée', date_commande = %s WHERE ticket_id = %s AND statut = 'En attente'",
-                (now, ticket_id),
-            )
-
-        _ajouter_historique(cur, ticket_id, 'statut', f"Statut: {ancien_statut} → {data.statut}")
+    http_cache.invalidate("ticket", ticket_code)
 
     # Notifications Discord
     if data.statut == "Réparation terminée":
@@ -658,28 +615,15 @@ async def change_status(
         notif_changement_statut(ticket_code, ancien_statut, data.statut)
 
     # ─── Validation devis au comptoir : transition spécifique ─────────
-    # On détecte que le staff vient de valider le devis pour le client en passant
-    # de "En attente d'accord client" → "En cours de réparation". Dans ce cas on :
-    #   1. Crée une note de type 'validation_devis' (pour bannière verte ticket + point vert dashboard)
-    #   2. Déclenche la notification in-app (toast + cloche + chat tech)
+    # Le staff vient de valider le devis pour le client en passant de
+    # "En attente d'accord client" → "En cours de réparation". La note
+    # 'validation_devis' (bannière verte ticket + point vert dashboard) est
+    # créée par la requête ci-dessus ; reste la notification in-app
+    # (toast + cloche + chat tech).
     if (
         ancien_statut == "En attente d'accord client"
-        and data.statut == "En cours de réparation"
+        and data.statut == REPARATION
     ):
-        # 1. Note 'validation_devis' (alimente accord_client_valide → point vert + bannière)
-        try:
-            with get_cursor() as cur2:
-                cur2.execute(
-                    """
-                    INSERT INTO notes_tickets (ticket_id, auteur, contenu, type_note, is_read)
-                    VALUES (%s, %s, %s, 'validation_devis', FALSE)
-                    """,
-                    (ticket_id, "Staff", "✅ Devis accepté par le client (validation au comptoir)"),
-                )
-        except Exception as e:
-            print(f"[tickets] note validation_devis insert failed: {e}")
-
-        # 2. Notification in-app (toast + cloche + chat tech)
         try:
             panne_excerpt = (panne[:50] + "…") if len(panne) > 50 else panne
             panne_str = f" Panne : {panne_excerpt}." if panne_excerpt else ""
@@ -701,6 +645,210 @@ async def change_status(
     return {"ok": True, "ancien_statut": ancien_statut, "nouveau_statut": data.statut}
 
 
+# ─── OPÉRATIONS GROUPÉES (dashboard accueil) ────────────────────
+# Une transaction, une instruction ensembliste par opération, une seule
+# notification récapitulative au lieu d'une par ticket.
+_BULK_MAX = 200
+
+
+def _bulk_ids(ids: list) -> list:
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        raise HTTPException(400, "Aucun ticket sélectionné")
+    if len(ids) > _BULK_MAX:
+        raise HTTPException(400, f"{_BULK_MAX} tickets maximum par opération")
+    return ids
+
+
+@router.post("/bulk/statut", response_model=dict)
+async def bulk_change_status(
+    data: BulkStatusChange,
+    user: dict = Depends(get_current_user),
+):
+    """Applique le même changement de statut à plusieurs tickets."""
+    if data.statut not in STATUTS:
+        raise HTTPException(400, f"Statut invalide. Valides: {STATUTS}")
+    ids = _bulk_ids(data.ids)
+
+    now = datetime.now().replace(microsecond=0)
+    sql = _STATUS_SQL.format(
+        where="id = ANY(%(ids)s)", pieces=_PIECES_SYNC.get(data.statut, _PIECES_NONE),
+    )
+    with get_cursor() as cur:
+        cur.execute(sql, {
+            "ids": ids,
+            "statut": data.statut,
+            "now": now,
+            "ts": now.strftime("%d/%m %H:%M"),
+            "rep": REPARATION,
+            "entree": data.statut == REPARATION,
+        })
+        rows = cur.fetchall() or []
+
+    http_cache.invalidate("ticket")
+
+    changes = [r for r in rows if r.get("ancien_statut") != data.statut]
+    if data.statut == "Réparation terminée":
+        notif_operation_groupee(
+            "Réparations terminées",
+            [f"**{r['ticket_code']}** est prêt pour récupération" for r in rows],
+            notif_type="reparation_terminee", color="green",
+        )
+    else:
+        notif_operation_groupee(
+            f"Changement de statut → {data.statut}",
+            [f"**{r['ticket_code']}** : {r['ancien_statut']} → {data.statut}"
+             for r in changes if r.get("ancien_statut")],
+            notif_type="changement_statut",
+        )
+
+    # Devis validés au comptoir : une notification in-app récapitulative
+    valides = [r for r in rows if r.get("ancien_statut") == "En attente d'accord client"]
+    if data.statut == REPARATION and valides:
+        techs = {r.get("technicien_assigne") for r in valides}
+        codes = ", ".join(r["ticket_code"] for r in valides)
+        try:
+            push_notification(
+                type="devis_accepte_comptoir",
+                title=f"✅ {len(valides)} devis acceptés" if len(valides) > 1 else f"✅ Devis accepté — {codes}",
+                message=f"Le client a validé la réparation : {codes}. Tu peux démarrer.",
+                important=True,
+                icon="✅",
+                target_user=techs.pop() if len(techs) == 1 else None,
+                related_ticket_id=valides[0]["id"] if len(valides) == 1 else None,
+                action_url=f"/accueil/ticket/{valides[0]['id']}" if len(valides) == 1 else None,
+            )
+        except Exception as e:
+            print(f"[tickets] notification trigger failed: {e}")
+
+    return {
+        "ok": True,
+        "nouveau_statut": data.statut,
+        "modifies": len(rows),
+        "introuvables": sorted(set(ids) - {r["id"] for r in rows}),
+    }
+
+
+_BULK_ASSIGN_SQL = """
+    WITH old AS (
+        SELECT id, ticket_code, technicien_assigne FROM tickets
+        WHERE id = ANY(%(ids)s)
+        ORDER BY id
+        FOR UPDATE
+    ), upd AS (
+        UPDATE tickets t SET technicien_assigne = %(tech)s, date_maj = %(now)s
+        FROM old WHERE t.id = old.id
+    ), hist AS (
+        INSERT INTO historique (ticket_id, type, contenu)
+        SELECT id, 'assignation',
+               'Technicien: ' || COALESCE(NULLIF(technicien_assigne, ''), 'Non assigné')
+               || ' → ' || COALESCE(NULLIF(%(tech)s, ''), 'Non assigné')
+        FROM old
+        WHERE technicien_assigne IS DISTINCT FROM %(tech)s
+    )
+    SELECT id, ticket_code, technicien_assigne AS ancien_technicien FROM old
+"""
+
+
+@router.post("/bulk/assignation", response_model=dict)
+async def bulk_assign(
+    data: BulkAssign,
+    user: dict = Depends(get_current_user),
+):
+    """Réassigne plusieurs tickets à un technicien (None = désassigner)."""
+    ids = _bulk_ids(data.ids)
+    tech = (data.technicien or "").strip() or None
+    with get_cursor() as cur:
+        cur.execute(_BULK_ASSIGN_SQL, {"ids": ids, "tech": tech, "now": datetime.now().replace(microsecond=0)})
+        rows = cur.fetchall() or []
+
+    http_cache.invalidate("ticket")
+
+    moved = [r for r in rows if r.get("ancien_technicien") != tech]
+    if tech and moved:
+        codes = ", ".join(r["ticket_code"] for r in moved)
+        try:
+            push_notification(
+                type="tickets_assignes",
+                title=f"🔧 {len(moved)} ticket(s) assigné(s)",
+                message=f"Tickets assignés à {tech} : {codes}",
+                target_user=tech,
+                icon="🔧",
+                also_chat=False,
+            )
+        except Exception as e:
+            print(f"[tickets] notification trigger failed: {e}")
+
+    return {
+        "ok": True,
+        "technicien": tech,
+        "modifies": len(moved),
+        "introuvables": sorted(set(ids) - {r["id"] for r in rows}),
+    }
+
+
+# Tickets déjà payés ignorés ; même journal que toggle_paye
+_BULK_PAYE_SQL = """
+    WITH old AS (
+        SELECT id FROM tickets
+        WHERE id = ANY(%(ids)s) AND COALESCE(paye, 0) = 0
+        ORDER BY id
+        FOR UPDATE
+    ), upd AS (
+        UPDATE tickets t SET
+            paye = 1, date_maj = %(now)s, statut_paiement = 'Payé', reste_a_payer = 0,
+            historique = CASE
+                WHEN btrim(COALESCE(t.historique, '')) = '' THEN ''
+                ELSE rtrim(t.historique) || E'\\n'
+            END || '[' || %(ts)s || '] Marqué payé'
+        FROM old WHERE t.id = old.id
+        RETURNING t.id, t.ticket_code, t.client_id,
+                  COALESCE(NULLIF(t.tarif_final, 0), NULLIF(t.devis_estime, 0), 0) + COALESCE(t.prix_supp, 0) AS montant
+    ), hist AS (
+        INSERT INTO historique (ticket_id, type, contenu)
+        SELECT id, 'statut', 'Marqué payé' FROM upd
+    )
+    SELECT id, ticket_code, client_id, montant FROM upd
+"""
+
+
+@router.post("/bulk/paye", response_model=dict)
+async def bulk_paye(
+    data: BulkPaye,
+    user: dict = Depends(get_current_user),
+):
+    """Marque plusieurs tickets payés et crédite la fidélité en une transaction."""
+    ids = _bulk_ids(data.ids)
+    now = datetime.now().replace(microsecond=0)
+    with get_cursor() as cur:
+        cur.execute(_BULK_PAYE_SQL, {"ids": ids, "now": now, "ts": now.strftime("%d/%m %H:%M")})
+        rows = cur.fetchall() or []
+        points = {}
+        fidelite_ok = True
+        if rows:
+            # SAVEPOINT : un échec fidélité ne doit pas annuler les paiements
+            cur.execute("SAVEPOINT fidelite_groupee")
+            try:
+                points = fidelite_service.credit_many(
+                    cur, [(r["client_id"], r["id"], float(r["montant"] or 0)) for r in rows],
+                )
+                cur.execute("RELEASE SAVEPOINT fidelite_groupee")
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT fidelite_groupee")
+                points, fidelite_ok = {}, False
+                print(f"[tickets] fidélité groupée: {e}")
+
+    http_cache.invalidate("ticket")
+
+    return {
+        "ok": True,
+        "payes": [r["ticket_code"] for r in rows],
+        "deja_payes_ou_introuvables": sorted(set(ids) - {r["id"] for r in rows}),
+        "points_credites": sum(points.values()),
+        "fidelite_ok": fidelite_ok,
+    }
+
+
 # ─── HISTORIQUE (structured table) ───────────────────────────────
 @router.get("/{ticket_id}/historique")
 async def get_historique(ticket_id: int, user: dict = Depends(get_current_user)):
@@ -713,8 +861,7 @@ async def get_historique(ticket_id: int, user: dict = Depends(get_current_user))
                 WHERE ticket_id = %s
                 ORDER BY date_creation DESC
             """, (ticket_id,))
-            rows = cur.fetchall()
-            return [{**r, "date_creation": r["date_creation"].isoformat() if r.get("date_creation") else None} for r in rows]
+            return FastJSONResponse(cur.fetchall())
         except Exception:
             return []
 
@@ -785,8 +932,7 @@ async def get_notes(ticket_id: int, user: dict = Depends(get_current_user)):
                 WHERE ticket_id = %s
                 ORDER BY date_creation DESC
             """, (ticket_id,))
-            rows = cur.fetchall()
-            return [{**r, "date_creation": r["date_creation"].isoformat() if r.get("date_creation") else None} for r in rows]
+            return FastJSONResponse(cur.fetchall())
         except Exception:
             return []
 
@@ -846,7 +992,7 @@ async def mark_ticket_read(ticket_id: int, user: dict = Depends(get_current_user
     with get_cursor() as cur:
         cur.execute("""
             UPDATE notes_tickets SET is_read = TRUE
-            WHERE ticket_id = %s AND (is_read = FALSE OR is_read IS NULL)
+            WHERE ticket_id = %s AND is_read IS NOT TRUE
             AND type_note IN ('message_client', 'validation_devis', 'avis_client')
         """, (ticket_id,))
     return {"ok": True}
@@ -883,6 +1029,7 @@ async def delete_ticket(ticket_id: int):
         cur.execute("DELETE FROM fidelite_historique WHERE ticket_id = %s", (ticket_id,))
         cur.execute("DELETE FROM historique WHERE ticket_id = %s", (ticket_id,))
         cur.execute("DELETE FROM tickets WHERE id = %s", (ticket_id,))
+    http_cache.invalidate("ticket")
     return {"ok": True}
 
 
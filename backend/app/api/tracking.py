@@ -3,24 +3,29 @@
 Endpoints :
 - POST /api/tracking/event  (public, rate-limite) : enregistre un event
 - GET  /api/tracking/stats   (admin) : retourne compteurs par type / source
+- POST /api/tracking/compact (admin) : replie les jours complets en rollups
 
 Pas d'analytics complexe, juste compter les clics sur les CTA publics
 ('Voir nos tarifs téléphones') pour que l'admin sache si le lien est utilisé.
+
+Les events ne sont pas inseres un par un : ils passent par le buffer
+d'ingestion (app.services.tracking_buffer) qui ecrit par lots.
 """
 
 import hashlib
-from datetime import datetime, timedelta
+import logging
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
-from app.database import get_cursor
 from app.api.auth import get_current_user
-from app.api.tickets import _rate_limit_public_lookup
+from app.services import rate_limit, tracking_rollup
+from app.services.tracking_buffer import tracking_buffer
 
 
 router = APIRouter(prefix="/api/tracking", tags=["tracking"])
+logger = logging.getLogger(__name__)
 
 
 class TrackEventRequest(BaseModel):
@@ -36,7 +41,7 @@ def _hash_ip(ip: str) -> str:
 @router.post("/event")
 async def track_event(data: TrackEventRequest, request: Request):
     """Enregistre un event public (clic, view). Rate-limite 30/min/IP."""
-    _rate_limit_public_lookup(request)
+    rate_limit.enforce(request, "tracking")
 
     event_type = (data.event_type or "").strip()[:60]
     if not event_type:
@@ -45,23 +50,19 @@ async def track_event(data: TrackEventRequest, request: Request):
     target = (data.target or "").strip()[:120] or None
 
     # IP anonymisee (hash, pas stockee en clair)
-    ip = "unknown"
-    if request.client:
-        ip = request.client.host
-    xff = request.headers.get("x-forwarded-for", "")
-    if xff:
-        ip = xff.split(",")[0].strip()
-    ip_hash = _hash_ip(ip)
-
-    with get_cursor() as cur:
-        cur.execute(
-            """INSERT INTO tracking_events (event_type, source, target, ip_hash)
-               VALUES (%s, %s, %s, %s)""",
-            (event_type, source, target, ip_hash),
-        )
+    ip_hash = _hash_ip(rate_limit.client_ip(request))
+
+    if not tracking_buffer.add(event_type, source, target, ip_hash):
+        raise HTTPException(503, "Tracking momentanément saturé", headers={"Retry-After": "5"})
     return {"ok": True}
 
 
+@router.get("/buffer")
+async def tracking_buffer_stats(user: dict = Depends(get_current_user)):
+    """Compteurs du buffer d'ingestion (en attente, ecrits, rejetes)."""
+    return tracking_buffer.stats()
+
+
 @router.get("/stats")
 async def tracking_stats(
     event_type: Optional[str] = None,
@@ -69,65 +70,33 @@ async def tracking_stats(
     user: dict = Depends(get_current_user),
 ):
     """Stats agregees des events. Par defaut retourne les 30 derniers jours
-    pour 'tarifs_click' (clics sur le lien vers la vitrine tarifs)."""
-    since = datetime.now() - timedelta(days=max(1, min(365, days)))
-    evt = (event_type or "tarifs_click").strip()[:60]
-
-    with get_cursor() as cur:
-        # Total + uniques
-        cur.execute(
-            """SELECT COUNT(*) AS total,
-                      COUNT(DISTINCT ip_hash) AS uniques
-               FROM tracking_events
-               WHERE event_type = %s AND created_at >= %s""",
-            (evt, since),
-        )
-        row = cur.fetchone()
-        total = row["total"] if row else 0
-        uniques = row["uniques"] if row else 0
-
-        # Par source
-        cur.execute(
-            """SELECT COALESCE(source, 'autre') AS source, COUNT(*) AS n
-               FROM tracking_events
-               WHERE event_type = %s AND created_at >= %s
-               GROUP BY source
-               ORDER BY n DESC""",
-            (evt, since),
-        )
-        by_source = [dict(r) for r in cur.fetchall()]
-
-        # Par jour (timeline)
-        cur.execute(
-            """SELECT DATE(created_at) AS day, COUNT(*) AS n
-               FROM tracking_events
-               WHERE event_type = %s AND created_at >= %s
-               GROUP BY DATE(created_at)
-               ORDER BY day ASC""",
-            (evt, since),
-        )
-        timeline = []
-        for r in cur.fetchall():
-            d = r["day"]
-            timeline.append({
-                "day": d.isoformat() if hasattr(d, "isoformat") else str(d),
-                "n": r["n"],
-            })
-
-        # Aujourd'hui
-        cur.execute(
-            """SELECT COUNT(*) AS n FROM tracking_events
-               WHERE event_type = %s AND DATE(created_at) = CURRENT_DATE""",
-            (evt,),
-        )
-        today = cur.fetchone()["n"]
+    pour 'tarifs_click' (clics sur le lien vers la vitrine tarifs).
 
+    Lit les rollups journaliers (tracking_daily) + les events bruts du jour ;
+    les jours complets manquants sont replies au passage."""
+    days = max(1, min(365, days))
+    evt = (event_type or "tarifs_click").strip()[:60]
+    # Ecrit les events encore en memoire pour que les compteurs soient a jour
+    tracking_buffer.flush()
+    try:
+        tracking_rollup.ensure_compacted()
+    except Exception as e:
+        logger.warning("tracking rollup: %s", e)
+
+    stats = tracking_rollup.rollup_stats(evt, days)
     return {
         "event_type": evt,
         "period_days": days,
-        "total": total,
-        "today": today,
-        "unique_visitors": uniques,
-        "by_source": by_source,
-        "timeline": timeline,
+        **stats,
     }
+
+
+@router.post("/compact")
+async def tracking_compact(
+    prune_days: Optional[int] = None,
+    user: dict = Depends(get_current_user),
+):
+    """Replie les jours complets dans tracking_daily ; purge optionnelle des
+    events bruts deja replies plus vieux que prune_days jours."""
+    tracking_buffer.flush()
+    return tracking_rollup.compact(prune_days=prune_days)
@@ -4,15 +4,79 @@ Utilise psycopg2 avec un pool de connexions pour des performances optimales.
 Compatible avec la base existante Klikphone SAV.
 """
 
+import logging
 import os
+import socket
+import time
 import psycopg2
+import psycopg2.extensions
 import psycopg2.pool
 import psycopg2.extras
 from contextlib import contextmanager
 
+logger = logging.getLogger(__name__)
+
 # Pool de connexions global
 _pool = None
 
+# application_name des connexions de cette instance (tous les workers du même
+# hôte) : permet au démarrage de ne terminer que les sessions des autres
+# instances (cf. main._kill_idle_sessions). 63 caractères max côté Postgres.
+APPLICATION_NAME = f"klikphone-sav@{socket.gethostname()}"[:63]
+
+# Observateurs (instrumentation) : fn(query, vars, secondes, cursor) après
+# chaque execute, fn(secondes) après chaque sortie de connexion du pool.
+_query_observers = []
+_checkout_observers = []
+_observed_cursors = {}
+
+
+def add_query_observer(fn):
+    if fn not in _query_observers:
+        _query_observers.append(fn)
+
+
+def add_checkout_observer(fn):
+    if fn not in _checkout_observers:
+        _checkout_observers.append(fn)
+
+
+def _notify(observers, *args):
+    for fn in observers:
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.warning("observateur %s : %s", getattr(fn, "__name__", fn), e)
+
+
+def _observed(factory):
+    """Sous-classe de `factory` dont execute() prévient les observateurs."""
+    cls = _observed_cursors.get(factory)
+    if cls is None:
+        base_execute = factory.execute
+
+        def execute(self, query, vars=None):
+            if not _query_observers:
+                return base_execute(self, query, vars)
+            t0 = time.perf_counter()
+            try:
+                return base_execute(self, query, vars)
+            finally:
+                _notify(_query_observers, query, vars, time.perf_counter() - t0, self)
+
+        cls = type(f"Observed{factory.__name__}", (factory,), {"execute": execute})
+        _observed_cursors[factory] = cls
+    return cls
+
+
+class ObservedConnection(psycopg2.extensions.connection):
+    """Connexion du pool : tous ses curseurs (dict ou non) sont observés."""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs["cursor_factory"] = _observed(factory)
+        return super().cursor(*args, **kwargs)
+
 
 def get_pool():
     """Initialise et retourne le pool de connexions PostgreSQL."""
@@ -39,6 +103,8 @@ def get_pool():
             keepalives_idle=30,
             keepalives_interval=10,
             keepalives_count=5,
+            connection_factory=ObservedConnection,
+            application_name=APPLICATION_NAME,
         )
     return _pool
 
@@ -53,7 +119,10 @@ def get_db():
                 cur.execute("SELECT ...")
     """
     pool = get_pool()
+    t0 = time.perf_counter()
     conn = pool.getconn()
+    if _checkout_observers:
+        _notify(_checkout_observers, time.perf_counter() - t0)
     try:
         # Validate connection is still alive (Supabase idle timeout)
         try:
@@ -20,7 +20,10 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.database import close_pool
+from app.database import APPLICATION_NAME, close_pool, get_cursor
+from app.services import query_profiler, request_metrics, startup
+from app.services.startup import boot
+from app.services.fast_json import FastJSONResponse
 from app.api import auth, tickets, clients, config, team, parts, catalog, notifications, print_tickets, caisse_api, attestation, admin, chat, fidelite, email_api, tarifs, marketing, telephones, autocomplete, devis, reporting, depot_distance, suivi, iphone_tarifs, iphones_stock, smartphones_tarifs, tracking, notifications_center
 
 logger = logging.getLogger("klikphone.startup")
@@ -90,358 +93,391 @@ def _seed_catalog_models():
             )
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Lifecycle: init DB tables + fermer proprement le pool DB a l'arret."""
-    from app.database import get_cursor
-    # Non-blocking migrations: kill idle sessions, short lock_timeout, skip on failure
-    try:
-        with get_cursor() as cur:
-            cur.execute("""
-                SELECT pg_terminate_backend(pid)
-                FROM pg_stat_activity
-                WHERE state = 'idle in transaction'
-                AND pid != pg_backend_pid()
-            """)
-    except Exception:
-        print(f"Warning kill idle sessions:\n{traceback.format_exc()}")
+# --- DEMARRAGE ---
+# Chaque etape d'init est une tache declaree (dependances, timeout, portes) ;
+# app.services.startup les execute en parallele apres le lancement du
+# serveur. Porte "schema" : tables / colonnes du coeur SAV ; une porte par
+# module qui cree ses propres tables (tarifs, marketing...).
+
+# CREATE TABLE statements (don't need exclusive locks)
+_CREATE_TABLES = [
+    # Audit log : actions admin sensibles (suppression, etc.)
+    # Permet de tracer qui a fait quoi (ne pas truster aveuglement le staff).
+    """CREATE TABLE IF NOT EXISTS admin_audit_log (
+        id SERIAL PRIMARY KEY,
+        user_login TEXT DEFAULT '',
+        user_target TEXT DEFAULT '',
+        action TEXT NOT NULL,
+        target_type TEXT DEFAULT '',
+        target_id INTEGER DEFAULT NULL,
+        details TEXT DEFAULT '',
+        ip_hash TEXT DEFAULT '',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE INDEX IF NOT EXISTS idx_audit_action_date ON admin_audit_log(action, created_at DESC)""",
+    # Demandes de commande passees depuis la vitrine publique
+    # /site-tarifs-iphone (bouton 'Passer commande').
+    # Statut : nouvelle / en_cours / confirmee / annulee
+    """CREATE TABLE IF NOT EXISTS demandes_commandes (
+        id SERIAL PRIMARY KEY,
+        nom TEXT NOT NULL,
+        telephone TEXT NOT NULL,
+        email TEXT DEFAULT '',
+        marque TEXT DEFAULT '',
+        modele TEXT NOT NULL,
+        stockage TEXT DEFAULT '',
+        prix INTEGER DEFAULT 0,
+        message TEXT DEFAULT '',
+        statut TEXT DEFAULT 'nouvelle',
+        date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        date_maj TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        admin_notes TEXT DEFAULT ''
+    )""",
+    """CREATE INDEX IF NOT EXISTS idx_demandes_commandes_statut ON demandes_commandes(statut, date_creation DESC)""",
+    # Tracking events : clics sur liens publics (compteurs admin reporting)
+    """CREATE TABLE IF NOT EXISTS tracking_events (
+        id SERIAL PRIMARY KEY,
+        event_type TEXT NOT NULL,
+        source TEXT DEFAULT '',
+        target TEXT DEFAULT '',
+        ip_hash TEXT DEFAULT '',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE INDEX IF NOT EXISTS idx_tracking_type_date ON tracking_events(event_type, created_at)""",
+    # Rollups journaliers des tracking_events (compteur + sketch HLL des
+    # ip_hash) : les stats lisent ces lignes au lieu des events bruts.
+    """CREATE TABLE IF NOT EXISTS tracking_daily (
+        day DATE NOT NULL,
+        event_type TEXT NOT NULL,
+        source TEXT NOT NULL DEFAULT 'autre',
+        n INTEGER NOT NULL DEFAULT 0,
+        sketch BYTEA,
+        PRIMARY KEY (day, event_type, source)
+    )""",
+    """CREATE INDEX IF NOT EXISTS idx_tracking_daily_type_day ON tracking_daily(event_type, day)""",
+    """CREATE TABLE IF NOT EXISTS historique (
+        id SERIAL PRIMARY KEY,
+        ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
+        type TEXT DEFAULT 'statut',
+        contenu TEXT,
+        date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS chat_messages (
+        id SERIAL PRIMARY KEY,
+        sender TEXT NOT NULL,
+        recipient TEXT DEFAULT 'all',
+        message TEXT NOT NULL,
+        is_private BOOLEAN DEFAULT FALSE,
+        read_by TEXT DEFAULT '',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS fidelite_historique (
+        id SERIAL PRIMARY KEY,
+        client_id INTEGER REFERENCES clients(id),
+        ticket_id INTEGER REFERENCES tickets(id),
+        type TEXT NOT NULL,
+        points INTEGER NOT NULL,
+        description TEXT,
+        date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS notes_tickets (
+        id SERIAL PRIMARY KEY,
+        ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
+        auteur TEXT NOT NULL,
+        contenu TEXT NOT NULL,
+        important BOOLEAN DEFAULT FALSE,
+        date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS autocompletion (
+        id SERIAL PRIMARY KEY,
+        categorie VARCHAR(50) NOT NULL,
+        terme VARCHAR(255) NOT NULL,
+        compteur INTEGER DEFAULT 1,
+        derniere_utilisation TIMESTAMP DEFAULT NOW(),
+        UNIQUE(categorie, terme)
+    )""",
+    """CREATE TABLE IF NOT EXISTS devis (
+        id SERIAL PRIMARY KEY,
+        numero TEXT UNIQUE,
+        client_id INTEGER REFERENCES clients(id),
+        client_nom TEXT,
+        client_prenom TEXT,
+        client_tel TEXT,
+        client_email TEXT,
+        appareil TEXT,
+        description TEXT,
+        statut TEXT DEFAULT 'Brouillon',
+        total_ht DECIMAL(10,2) DEFAULT 0,
+        tva DECIMAL(5,2) DEFAULT 20,
+        total_ttc DECIMAL(10,2) DEFAULT 0,
+        remise DECIMAL(10,2) DEFAULT 0,
+        notes TEXT,
+        validite_jours INTEGER DEFAULT 30,
+        date_creation TIMESTAMP DEFAULT NOW(),
+        date_maj TIMESTAMP DEFAULT NOW(),
+        date_acceptation TIMESTAMP,
+        date_refus TIMESTAMP,
+        ticket_id INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS devis_lignes (
+        id SERIAL PRIMARY KEY,
+        devis_id INTEGER REFERENCES devis(id) ON DELETE CASCADE,
+        description TEXT NOT NULL,
+        quantite INTEGER DEFAULT 1,
+        prix_unitaire DECIMAL(10,2) DEFAULT 0,
+        total DECIMAL(10,2) DEFAULT 0,
+        ordre INTEGER DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS telephones_vente (
+        id SERIAL PRIMARY KEY,
+        marque TEXT NOT NULL,
+        modele TEXT NOT NULL,
+        capacite TEXT,
+        couleur TEXT,
+        etat TEXT DEFAULT 'Occasion',
+        prix_achat DECIMAL(10,2) DEFAULT 0,
+        prix_vente DECIMAL(10,2) DEFAULT 0,
+        imei TEXT,
+        en_stock BOOLEAN DEFAULT TRUE,
+        notes TEXT,
+        date_ajout TIMESTAMP DEFAULT NOW()
+    )""",
+]
+
+# ALTER TABLE statements (need exclusive lock — use very short timeout)
+_ALTER_COLUMNS = [
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS attention TEXT",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS points_fidelite INTEGER DEFAULT 0",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS total_depense DECIMAL(10,2) DEFAULT 0",
+    # Bon de grattage disponible : 'film', 'reduction' ou NULL. Valable pour
+    # la PROCHAINE reparation (consome au paiement par l'admin).
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS bon_grattage TEXT DEFAULT NULL",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS grattage_fait BOOLEAN DEFAULT FALSE",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS grattage_gain TEXT",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reduction_montant DECIMAL(10,2) DEFAULT 0",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reduction_pourcentage DECIMAL(5,2) DEFAULT 0",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS telephone_pret TEXT",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS telephone_pret_imei TEXT",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS telephone_pret_rendu BOOLEAN DEFAULT FALSE",
+    "ALTER TABLE commandes_pieces ADD COLUMN IF NOT EXISTS ticket_code TEXT DEFAULT ''",
+    "ALTER TABLE notes_tickets ADD COLUMN IF NOT EXISTS type_note TEXT DEFAULT 'note'",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reparation_debut TIMESTAMP",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reparation_fin TIMESTAMP",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reparation_duree INTEGER DEFAULT 0",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS cree_par TEXT DEFAULT ''",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS cree_par TEXT DEFAULT ''",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS est_retour_sav BOOLEAN DEFAULT FALSE",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS ticket_original_id INTEGER",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS source VARCHAR(50) DEFAULT 'boutique'",
+    "ALTER TABLE notes_tickets ADD COLUMN IF NOT EXISTS is_read BOOLEAN DEFAULT FALSE",
+    "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS type_document TEXT DEFAULT 'devis'",
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS carte_camby BOOLEAN DEFAULT FALSE",
+]
+
+# Performance indexes (CREATE INDEX IF NOT EXISTS is safe to run every startup)
+_CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_tickets_client_id ON tickets(client_id)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_statut ON tickets(statut)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_date_depot ON tickets(date_depot DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_clients_telephone ON clients(telephone)",
+    "CREATE INDEX IF NOT EXISTS idx_notes_tickets_ticket_id ON notes_tickets(ticket_id)",
+    "CREATE INDEX IF NOT EXISTS idx_commandes_pieces_ticket_id ON commandes_pieces(ticket_id)",
+    "CREATE INDEX IF NOT EXISTS idx_historique_ticket_id ON historique(ticket_id)",
+    "CREATE INDEX IF NOT EXISTS idx_fidelite_hist_client ON fidelite_historique(client_id)",
+    "CREATE INDEX IF NOT EXISTS idx_fidelite_hist_ticket ON fidelite_historique(ticket_id)",
+    "CREATE INDEX IF NOT EXISTS idx_fidelite_hist_client_date ON fidelite_historique(client_id, date_creation DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_created ON chat_messages(created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_technicien ON tickets(technicien_assigne)",
+    "CREATE INDEX IF NOT EXISTS idx_autocompletion_categorie ON autocompletion(categorie)",
+    "CREATE INDEX IF NOT EXISTS idx_autocompletion_compteur ON autocompletion(categorie, compteur DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_devis_client_id ON devis(client_id)",
+    "CREATE INDEX IF NOT EXISTS idx_devis_statut ON devis(statut)",
+    "CREATE INDEX IF NOT EXISTS idx_devis_date ON devis(date_creation DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_devis_lignes_devis_id ON devis_lignes(devis_id)",
+    "CREATE INDEX IF NOT EXISTS idx_telephones_vente_marque ON telephones_vente(marque)",
+    "CREATE INDEX IF NOT EXISTS idx_telephones_vente_stock ON telephones_vente(en_stock)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_cree_par ON tickets(cree_par)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_date_cloture ON tickets(date_cloture DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_retour_sav ON tickets(est_retour_sav) WHERE est_retour_sav = true",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_original_id ON tickets(ticket_original_id) WHERE ticket_original_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_source ON tickets(source)",
+    # Performance indexes — ticket_code lookups, commandes, clients
+    "CREATE INDEX IF NOT EXISTS idx_tickets_ticket_code ON tickets(ticket_code)",
+    "CREATE INDEX IF NOT EXISTS idx_clients_email ON clients(email)",
+    "CREATE INDEX IF NOT EXISTS idx_commandes_pieces_ticket_code ON commandes_pieces(ticket_code)",
+    "CREATE INDEX IF NOT EXISTS idx_commandes_pieces_statut ON commandes_pieces(statut)",
+    "CREATE INDEX IF NOT EXISTS idx_notes_tickets_type ON notes_tickets(ticket_id, type_note)",
+    # Inbox dashboard (suivi.get_interactions) : index partiels qui ne
+    # contiennent que les interactions client en attente, pas les logs.
+    "CREATE INDEX IF NOT EXISTS idx_notes_unread_interactions ON notes_tickets(type_note, ticket_id) "
+    "WHERE is_read IS NOT TRUE AND type_note IN ('validation_devis', 'message_client', 'avis_client')",
+    "CREATE INDEX IF NOT EXISTS idx_notes_devis_valide ON notes_tickets(ticket_id) "
+    "WHERE type_note = 'validation_devis' AND contenu LIKE '✅%'",
+    # Tickets ouverts uniquement : reste petit quand l'historique grossit
+    "CREATE INDEX IF NOT EXISTS idx_tickets_actifs ON tickets(id) "
+    "WHERE statut NOT IN ('Rendu au client', 'Clôturé')",
+]
+
+
+@boot.task("kill_idle", timeout=10)
+def _kill_idle_sessions():
+    """Libère les verrous des sessions 'idle in transaction' avant les migrations.
+
+    Le serveur accepte déjà des requêtes (auth, team ne sont pas gatés) : les
+    connexions de cette instance, reconnues à leur application_name, sont
+    épargnées pour ne pas tuer une transaction de requête en cours.
+    """
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT pg_terminate_backend(pid)
+            FROM pg_stat_activity
+            WHERE state = 'idle in transaction'
+            AND pid != pg_backend_pid()
+            AND application_name IS DISTINCT FROM %s
+        """, (APPLICATION_NAME,))
+
+
+@boot.task("unaccent", deps=("kill_idle",), timeout=15, gates=("schema",))
+def _enable_unaccent():
+    """Extension unaccent (recherche insensible aux accents)."""
+    with get_cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
 
-    # Enable unaccent extension for accent-insensitive search
-    try:
-        with get_cursor() as cur:
-            cur.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
-    except Exception as e:
-        print(f"Warning unaccent extension: {e}\n{traceback.format_exc()}")
-
-    # CREATE TABLE statements (don't need exclusive locks)
-    for sql in [
-        # Audit log : actions admin sensibles (suppression, etc.)
-        # Permet de tracer qui a fait quoi (ne pas truster aveuglement le staff).
-        """CREATE TABLE IF NOT EXISTS admin_audit_log (
-            id SERIAL PRIMARY KEY,
-            user_login TEXT DEFAULT '',
-            user_target TEXT DEFAULT '',
-            action TEXT NOT NULL,
-            target_type TEXT DEFAULT '',
-            target_id INTEGER DEFAULT NULL,
-            details TEXT DEFAULT '',
-            ip_hash TEXT DEFAULT '',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""",
-        """CREATE INDEX IF NOT EXISTS idx_audit_action_date ON admin_audit_log(action, created_at DESC)""",
-        # Demandes de commande passees depuis la vitrine publique
-        # /site-tarifs-iphone (bouton 'Passer commande').
-        # Statut : nouvelle / en_cours / confirmee / annulee
-        """CREATE TABLE IF NOT EXISTS demandes_commandes (
-            id SERIAL PRIMARY KEY,
-            nom TEXT NOT NULL,
-            telephone TEXT NOT NULL,
-            email TEXT DEFAULT '',
-            marque TEXT DEFAULT '',
-            modele TEXT NOT NULL,
-            stockage TEXT DEFAULT '',
-            prix INTEGER DEFAULT 0,
-            message TEXT DEFAULT '',
-            statut TEXT DEFAULT 'nouvelle',
-            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            date_maj TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            admin_notes TEXT DEFAULT ''
-        )""",
-        """CREATE INDEX IF NOT EXISTS idx_demandes_commandes_statut ON demandes_commandes(statut, date_creation DESC)""",
-        # Tracking events : clics sur liens publics (compteurs admin reporting)
-        """CREATE TABLE IF NOT EXISTS tracking_events (
-            id SERIAL PRIMARY KEY,
-            event_type TEXT NOT NULL,
-            source TEXT DEFAULT '',
-            target TEXT DEFAULT '',
-            ip_hash TEXT DEFAULT '',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""",
-        """CREATE INDEX IF NOT EXISTS idx_tracking_type_date ON tracking_events(event_type, created_at)""",
-        """CREATE TABLE IF NOT EXISTS historique (
-            id SERIAL PRIMARY KEY,
-            ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
-            type TEXT DEFAULT 'statut',
-            contenu TEXT,
-            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""",
-        """CREATE TABLE IF NOT EXISTS chat_messages (
-            id SERIAL PRIMARY KEY,
-            sender TEXT NOT NULL,
-            recipient TEXT DEFAULT 'all',
-            message TEXT NOT NULL,
-            is_private BOOLEAN DEFAULT FALSE,
-            read_by TEXT DEFAULT '',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""",
-        """CREATE TABLE IF NOT EXISTS fidelite_historique (
-            id SERIAL PRIMARY KEY,
-            client_id INTEGER REFERENCES clients(id),
-            ticket_id INTEGER REFERENCES tickets(id),
-            type TEXT NOT NULL,
-            points INTEGER NOT NULL,
-            description TEXT,
-            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""",
-        """CREATE TABLE IF NOT EXISTS notes_tickets (
-            id SERIAL PRIMARY KEY,
-            ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
-            auteur TEXT NOT NULL,
-            contenu TEXT NOT NULL,
-            important BOOLEAN DEFAULT FALSE,
-            date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )""",
-        """CREATE TABLE IF NOT EXISTS autocompletion (
-            id SERIAL PRIMARY KEY,
-            categorie VARCHAR(50) NOT NULL,
-            terme VARCHAR(255) NOT NULL,
-            compteur INTEGER DEFAULT 1,
-            derniere_utilisation TIMESTAMP DEFAULT NOW(),
-            UNIQUE(categorie, terme)
-        )""",
-        """CREATE TABLE IF NOT EXISTS devis (
-            id SERIAL PRIMARY KEY,
-            numero TEXT UNIQUE,
-            client_id INTEGER REFERENCES clients(id),
-            client_nom TEXT,
-            client_prenom TEXT,
-            client_tel TEXT,
-            client_email TEXT,
-            appareil TEXT,
-            description TEXT,
-            statut TEXT DEFAULT 'Brouillon',
-            total_ht DECIMAL(10,2) DEFAULT 0,
-            tva DECIMAL(5,2) DEFAULT 20,
-            total_ttc DECIMAL(10,2) DEFAULT 0,
-            remise DECIMAL(10,2) DEFAULT 0,
-            notes TEXT,
-            validite_jours INTEGER DEFAULT 30,
-            date_creation TIMESTAMP DEFAULT NOW(),
-            date_maj TIMESTAMP DEFAULT NOW(),
-            date_acceptation TIMESTAMP,
-            date_refus TIMESTAMP,
-            ticket_id INTEGER
-        )""",
-        """CREATE TABLE IF NOT EXISTS devis_lignes (
-            id SERIAL PRIMARY KEY,
-            devis_id INTEGER REFERENCES devis(id) ON DELETE CASCADE,
-            description TEXT NOT NULL,
-            quantite INTEGER DEFAULT 1,
-            prix_unitaire DECIMAL(10,2) DEFAULT 0,
-            total DECIMAL(10,2) DEFAULT 0,
-            ordre INTEGER DEFAULT 0
-        )""",
-        """CREATE TABLE IF NOT EXISTS telephones_vente (
-            id SERIAL PRIMARY KEY,
-            marque TEXT NOT NULL,
-            modele TEXT NOT NULL,
-            capacite TEXT,
-            couleur TEXT,
-            etat TEXT DEFAULT 'Occasion',
-            prix_achat DECIMAL(10,2) DEFAULT 0,
-            prix_vente DECIMAL(10,2) DEFAULT 0,
-            imei TEXT,
-            en_stock BOOLEAN DEFAULT TRUE,
-            notes TEXT,
-            date_ajout TIMESTAMP DEFAULT NOW()
-        )""",
-    ]:
-        try:
-            with get_cursor() as cur:
-                cur.execute(sql)
-        except Exception as e:
-            print(f"Warning CREATE TABLE: {e}\n{traceback.format_exc()}")
-
-    # Tarifs table
-    try:
-        tarifs._ensure_table()
-    except Exception as e:
-        print(f"Warning tarifs table: {e}\n{traceback.format_exc()}")
 
-    # iPhone tarifs (affiches boutique) : table + seed
-    try:
-        iphone_tarifs.init_iphone_tarifs()
-    except Exception as e:
-        print(f"Warning iphone_tarifs init: {e}\n{traceback.format_exc()}")
+@boot.task("tables", deps=("kill_idle",), timeout=60, gates=("schema",))
+def _create_tables():
+    startup.run_statements("CREATE TABLE", _CREATE_TABLES)
 
-    # iPhones stock (ventes + générateur vidéo Story) : table + seed
-    try:
-        iphones_stock.init_iphones_stock()
-    except Exception as e:
-        print(f"Warning iphones_stock init: {e}\n{traceback.format_exc()}")
 
-    # Smartphones non-Apple (Samsung, Xiaomi, Google, etc.)
-    try:
-        smartphones_tarifs.init_smartphones_tarifs()
-    except Exception as e:
-        print(f"Warning smartphones_tarifs init: {e}\n{traceback.format_exc()}")
+@boot.task("colonnes", deps=("tables",), timeout=120, gates=("schema",))
+def _add_columns():
+    startup.run_statements("ALTER TABLE", _ALTER_COLUMNS, lock_timeout="3s")
 
-    # Attestations table
-    try:
-        attestation._ensure_attestation_table()
-    except Exception as e:
-        print(f"Warning attestations table: {e}\n{traceback.format_exc()}")
 
-    # Marketing tables
-    try:
-        marketing._ensure_tables()
-    except Exception as e:
-        print(f"Warning marketing tables: {e}\n{traceback.format_exc()}")
+@boot.task("index", deps=("colonnes",), timeout=300)
+def _create_indexes():
+    startup.run_statements("CREATE INDEX", _CREATE_INDEXES)
 
-    # Telephones table
-    try:
-        telephones._ensure_table()
-    except Exception as e:
-        print(f"Warning telephones table: {e}\n{traceback.format_exc()}")
-
-    # ALTER TABLE statements (need exclusive lock — use very short timeout)
-    for sql in [
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS attention TEXT",
-        "ALTER TABLE clients ADD COLUMN IF NOT EXISTS points_fidelite INTEGER DEFAULT 0",
-        "ALTER TABLE clients ADD COLUMN IF NOT EXISTS total_depense DECIMAL(10,2) DEFAULT 0",
-        # Bon de grattage disponible : 'film', 'reduction' ou NULL. Valable pour
-        # la PROCHAINE reparation (consome au paiement par l'admin).
-        "ALTER TABLE clients ADD COLUMN IF NOT EXISTS bon_grattage TEXT DEFAULT NULL",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS grattage_fait BOOLEAN DEFAULT FALSE",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS grattage_gain TEXT",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reduction_montant DECIMAL(10,2) DEFAULT 0",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reduction_pourcentage DECIMAL(5,2) DEFAULT 0",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS telephone_pret TEXT",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS telephone_pret_imei TEXT",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS telephone_pret_rendu BOOLEAN DEFAULT FALSE",
-        "ALTER TABLE commandes_pieces ADD COLUMN IF NOT EXISTS ticket_code TEXT DEFAULT ''",
-        "ALTER TABLE notes_tickets ADD COLUMN IF NOT EXISTS type_note TEXT DEFAULT 'note'",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reparation_debut TIMESTAMP",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reparation_fin TIMESTAMP",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS reparation_duree INTEGER DEFAULT 0",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS cree_par TEXT DEFAULT ''",
-        "ALTER TABLE clients ADD COLUMN IF NOT EXISTS cree_par TEXT DEFAULT ''",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS est_retour_sav BOOLEAN DEFAULT FALSE",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS ticket_original_id INTEGER",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS source VARCHAR(50) DEFAULT 'boutique'",
-        "ALTER TABLE notes_tickets ADD COLUMN IF NOT EXISTS is_read BOOLEAN DEFAULT FALSE",
-        "ALTER TABLE tickets ADD COLUMN IF NOT EXISTS type_document TEXT DEFAULT 'devis'",
-        "ALTER TABLE clients ADD COLUMN IF NOT EXISTS carte_camby BOOLEAN DEFAULT FALSE",
-    ]:
-        try:
-            with get_cursor() as cur:
-                cur.execute("SET lock_timeout = '3s'")
-                cur.execute(sql)
-        except Exception as e:
-            print(f"Warning ALTER TABLE: {e}\n{traceback.format_exc()}")
-    # Performance indexes (CREATE INDEX IF NOT EXISTS is safe to run every startup)
-    for sql in [
-        "CREATE INDEX IF NOT EXISTS idx_tickets_client_id ON tickets(client_id)",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_statut ON tickets(statut)",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_date_depot ON tickets(date_depot DESC)",
-        "CREATE INDEX IF NOT EXISTS idx_clients_telephone ON clients(telephone)",
-        "CREATE INDEX IF NOT EXISTS idx_notes_tickets_ticket_id ON notes_tickets(ticket_id)",
-        "CREATE INDEX IF NOT EXISTS idx_commandes_pieces_ticket_id ON commandes_pieces(ticket_id)",
-        "CREATE INDEX IF NOT EXISTS idx_historique_ticket_id ON historique(ticket_id)",
-        "CREATE INDEX IF NOT EXISTS idx_fidelite_hist_client ON fidelite_historique(client_id)",
-        "CREATE INDEX IF NOT EXISTS idx_fidelite_hist_ticket ON fidelite_historique(ticket_id)",
-        "CREATE INDEX IF NOT EXISTS idx_chat_created ON chat_messages(created_at DESC)",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_technicien ON tickets(technicien_assigne)",
-        "CREATE INDEX IF NOT EXISTS idx_autocompletion_categorie ON autocompletion(categorie)",
-        "CREATE INDEX IF NOT EXISTS idx_autocompletion_compteur ON autocompletion(categorie, compteur DESC)",
-        "CREATE INDEX IF NOT EXISTS idx_devis_client_id ON devis(client_id)",
-        "CREATE INDEX IF NOT EXISTS idx_devis_statut ON devis(statut)",
-        "CREATE INDEX IF NOT EXISTS idx_devis_date ON devis(date_creation DESC)",
-        "CREATE INDEX IF NOT EXISTS idx_devis_lignes_devis_id ON devis_lignes(devis_id)",
-        "CREATE INDEX IF NOT EXISTS idx_telephones_vente_marque ON telephones_vente(marque)",
-        "CREATE INDEX IF NOT EXISTS idx_telephones_vente_stock ON telephones_vente(en_stock)",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_cree_par ON tickets(cree_par)",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_date_cloture ON tickets(date_cloture DESC)",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_retour_sav ON tickets(est_retour_sav) WHERE est_retour_sav = true",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_original_id ON tickets(ticket_original_id) WHERE ticket_original_id IS NOT NULL",
-        "CREATE INDEX IF NOT EXISTS idx_tickets_source ON tickets(source)",
-        # Performance indexes — ticket_code lookups, commandes, clients
-        "CREATE INDEX IF NOT EXISTS idx_tickets_ticket_code ON tickets(ticket_code)",
-        "CREATE INDEX IF NOT EXISTS idx_clients_email ON clients(email)",
-        "CREATE INDEX IF NOT EXISTS idx_commandes_pieces_ticket_code ON commandes_pieces(ticket_code)",
-        "CREATE INDEX IF NOT EXISTS idx_commandes_pieces_statut ON commandes_pieces(statut)",
-        "CREATE INDEX IF NOT EXISTS idx_notes_tickets_type ON notes_tickets(ticket_id, type_note)",
-    ]:
-        try:
-            with get_cursor() as cur:
-                cur.execute(sql)
-        except Exception as e:
-            print(f"Warning CREATE INDEX: {e}\n{traceback.format_exc()}")
-
-    # Seed autocompletion — pannes courantes
-    try:
-        with get_cursor() as cur:
-            cur.execute("""
-                INSERT INTO autocompletion (categorie, terme, compteur) VALUES
-                    ('panne', 'Écran cassé', 100),
-                    ('panne', 'Batterie HS', 80),
-                    ('panne', 'Ne charge plus', 60),
-                    ('panne', 'Connecteur de charge', 45),
-                    ('panne', 'Écran qui clignote', 40),
-                    ('panne', 'Vitre arrière cassée', 35),
-                    ('panne', 'Bouton power HS', 30),
-                    ('panne', 'Caméra arrière HS', 25),
-                    ('panne', 'Désoxydation', 25),
-                    ('panne', 'Tactile ne répond plus', 22),
-                    ('panne', 'Caméra avant HS', 20),
-                    ('panne', 'Haut-parleur HS', 20),
-                    ('panne', 'Face ID HS', 20),
-                    ('panne', 'LCD tâche noire', 18),
-                    ('panne', 'Micro HS', 15),
-                    ('panne', 'Touch ID HS', 15),
-                    ('panne', 'Écouteur interne HS', 12),
-                    ('panne', 'Batterie qui gonfle', 10),
-                    ('panne', 'Wifi / Bluetooth HS', 10),
-                    ('panne', 'Nappe volume HS', 8)
-                ON CONFLICT (categorie, terme) DO NOTHING
-            """)
-            cur.execute("""
-                INSERT INTO params (cle, valeur) VALUES ('AFFICHER_AUTOCOMPLETION', 'true')
-                ON CONFLICT (cle) DO NOTHING
-            """)
-            cur.execute("""
-                INSERT INTO params (cle, valeur) VALUES
-                    ('MODULE_DEVIS_VISIBLE', 'false'),
-                    ('MODULE_DEVIS_FLASH_VISIBLE', 'false'),
-                    ('DEPOT_DISTANCE_ACTIF', 'true'),
-                    ('NOTIFICATIONS_EMAIL_ACTIF', 'true'),
-                    ('NOTIFICATIONS_STATUTS', 'Réparation terminée,En attente de pièce,En cours de réparation')
-                ON CONFLICT (cle) DO NOTHING
-            """)
-    except Exception as e:
-        print(f"Warning autocompletion seed: {e}\n{traceback.format_exc()}")
 
-    # Default admin password — lu depuis env var DEFAULT_ADMIN_PASSWORD.
-    # Si absent, on ne seed PAS de mot de passe en clair (security).
-    # Le password existant en DB est preserve (ON CONFLICT DO NOTHING).
-    try:
-        default_admin_pwd = os.environ.get("DEFAULT_ADMIN_PASSWORD")
-        with get_cursor() as cur:
-            if default_admin_pwd:
-                cur.execute(
-                    """INSERT INTO params (cle, valeur) VALUES ('ADMIN_PASSWORD', %s)
-                       ON CONFLICT (cle) DO NOTHING""",
-                    (default_admin_pwd,),
-                )
-            cur.execute("""
-                INSERT INTO params (cle, valeur) VALUES ('GOOGLE_REVIEW_LINK', 'https://g.page/r/Cf6adrBONrj3EAE/review')
-                ON CONFLICT (cle) DO NOTHING
-            """)
-            cur.execute("""
-                INSERT INTO params (cle, valeur) VALUES ('URL_SUIVI', 'https://klikphone-sav-v2-production.up.railway.app')
-                ON CONFLICT (cle) DO UPDATE SET valeur = 'https://klikphone-sav-v2-production.up.railway.app'
-                WHERE params.valeur != 'https://klikphone-sav-v2-production.up.railway.app'
-            """)
-    except Exception as e:
-        print(f"Warning ADMIN_PASSWORD default: {e}\n{traceback.format_exc()}")
+@boot.task("numerotation", deps=("tables",), timeout=30, gates=("schema",))
+def _sync_numerotation():
+    """Compteurs de numérotation (devis) recalés sur les numéros existants."""
+    from app.services import numerotation
+    with get_cursor() as cur:
+        cur.execute(numerotation.TABLE_SQL)
+        numerotation.resync(cur)
 
-    # Seed Samsung & Xiaomi models
-    try:
-        _seed_catalog_models()
-    except Exception as e:
-        print(f"Warning catalog seed: {e}\n{traceback.format_exc()}")
+
+@boot.task("clients_telephone", deps=("colonnes",), timeout=120, gates=("schema",))
+def _migrate_clients_telephone():
+    """Téléphone normalisé + index unique (fusion des doublons à la 1re fois)."""
+    from app.services import clients_upsert
+    with get_cursor() as cur:
+        cur.execute("SET LOCAL lock_timeout = '3s'")
+        clients_upsert.migrate(cur)
+
+
+@boot.task("seeds", deps=("tables",), timeout=30, gates=("schema",))
+def _seed_autocompletion_and_params():
+    """Seed autocompletion (pannes courantes) + params par défaut."""
+    with get_cursor() as cur:
+        cur.execute("""
+            INSERT INTO autocompletion (categorie, terme, compteur) VALUES
+                ('panne', 'Écran cassé', 100),
+                ('panne', 'Batterie HS', 80),
+                ('panne', 'Ne charge plus', 60),
+                ('panne', 'Connecteur de charge', 45),
+                ('panne', 'Écran qui clignote', 40),
+                ('panne', 'Vitre arrière cassée', 35),
+                ('panne', 'Bouton power HS', 30),
+                ('panne', 'Caméra arrière HS', 25),
+                ('panne', 'Désoxydation', 25),
+                ('panne', 'Tactile ne répond plus', 22),
+                ('panne', 'Caméra avant HS', 20),
+                ('panne', 'Haut-parleur HS', 20),
+                ('panne', 'Face ID HS', 20),
+                ('panne', 'LCD tâche noire', 18),
+                ('panne', 'Micro HS', 15),
+                ('panne', 'Touch ID HS', 15),
+                ('panne', 'Écouteur interne HS', 12),
+                ('panne', 'Batterie qui gonfle', 10),
+                ('panne', 'Wifi / Bluetooth HS', 10),
+                ('panne', 'Nappe volume HS', 8)
+            ON CONFLICT (categorie, terme) DO NOTHING
+        """)
+        cur.execute("""
+            INSERT INTO params (cle, valeur) VALUES ('AFFICHER_AUTOCOMPLETION', 'true')
+            ON CONFLICT (cle) DO NOTHING
+        """)
+        cur.execute("""
+            INSERT INTO params (cle, valeur) VALUES
+                ('MODULE_DEVIS_VISIBLE', 'false'),
+                ('MODULE_DEVIS_FLASH_VISIBLE', 'false'),
+                ('DEPOT_DISTANCE_ACTIF', 'true'),
+                ('NOTIFICATIONS_EMAIL_ACTIF', 'true'),
+                ('NOTIFICATIONS_STATUTS', 'Réparation terminée,En attente de pièce,En cours de réparation')
+            ON CONFLICT (cle) DO NOTHING
+        """)
+
+
+@boot.task("params_admin", deps=("kill_idle",), timeout=30, gates=("schema",))
+def _seed_admin_params():
+    """Default admin password — lu depuis env var DEFAULT_ADMIN_PASSWORD.
+    Si absent, on ne seed PAS de mot de passe en clair (security).
+    Le password existant en DB est preserve (ON CONFLICT DO NOTHING)."""
+    default_admin_pwd = os.environ.get("DEFAULT_ADMIN_PASSWORD")
+    with get_cursor() as cur:
+        if default_admin_pwd:
+            cur.execute(
+                """INSERT INTO params (cle, valeur) VALUES ('ADMIN_PASSWORD', %s)
+                   ON CONFLICT (cle) DO NOTHING""",
+                (default_admin_pwd,),
+            )
+        cur.execute("""
+            INSERT INTO params (cle, valeur) VALUES ('GOOGLE_REVIEW_LINK', 'https://g.page/r/Cf6adrBONrj3EAE/review')
+            ON CONFLICT (cle) DO NOTHING
+        """)
+        cur.execute("""
+            INSERT INTO params (cle, valeur) VALUES ('URL_SUIVI', 'https://klikphone-sav-v2-production.up.railway.app')
+            ON CONFLICT (cle) DO UPDATE SET valeur = 'https://klikphone-sav-v2-production.up.railway.app'
+            WHERE params.valeur != 'https://klikphone-sav-v2-production.up.railway.app'
+        """)
+
+
+# Modules avec leurs propres tables : une porte chacun
+boot.add("tarifs", tarifs._ensure_table, deps=("kill_idle",), gates=("tarifs",))
+boot.add("iphone_tarifs", iphone_tarifs.init_iphone_tarifs, deps=("kill_idle",), gates=("iphone_tarifs",))
+boot.add("iphones_stock", iphones_stock.init_iphones_stock, deps=("kill_idle",), gates=("iphones_stock",))
+# Backfill + catalogue iPhones : long, ne ferme aucune porte
+boot.add("iphones_catalogue", iphones_stock._deferred_init, deps=("iphones_stock",), timeout=300)
+boot.add("smartphones_tarifs", smartphones_tarifs.init_smartphones_tarifs, deps=("kill_idle",), gates=("smartphones_tarifs",))
+boot.add("attestation", attestation._ensure_attestation_table, deps=("kill_idle",), gates=("attestation",))
+boot.add("marketing", marketing._ensure_tables, deps=("kill_idle",), gates=("marketing",))
+boot.add("telephones", telephones._ensure_table, deps=("kill_idle",), gates=("telephones",))
+# Seed Samsung & Xiaomi models
+boot.add("catalogue_modeles", _seed_catalog_models, deps=("kill_idle",), gates=("catalog",))
+
+
+@boot.task("prechauffe_impression", deps=("index",), timeout=60)
+def _prewarm_print():
+    """Pré-chauffe QR / logo des impressions (en dernier : CPU seulement)."""
+    print(f"Print caches prewarmed: {print_tickets.prewarm_render_caches()}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifecycle: lance le boot en fond (sert /health tout de suite) + ferme
+    proprement le pool DB a l'arret."""
+    boot.start()
 
     yield
+
+    # Vide le buffer d'ingestion tracking avant de fermer le pool
+    try:
+        from app.services.tracking_buffer import tracking_buffer
+        tracking_buffer.stop()
+    except Exception as e:
+        print(f"Warning tracking buffer flush: {e}\n{traceback.format_exc()}")
     close_pool()
 
 
@@ -454,6 +490,7 @@ app = FastAPI(
     version="2.1.0",
     description="API de gestion de tickets SAV pour Klikphone",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url=None if _DISABLE_DOCS else "/docs",
     redoc_url=None if _DISABLE_DOCS else "/redoc",
     openapi_url=None if _DISABLE_DOCS else "/openapi.json",
@@ -504,6 +541,22 @@ async def security_and_cache_headers(request: Request, call_next):
     return response
 
 
+# --- INSTRUMENTATION (Server-Timing, /api/admin/perf, /api/admin/requetes-sql) ---
+request_metrics.install()
+query_profiler.install()
+
+
+@app.middleware("http")
+async def perf_instrumentation(request: Request, call_next):
+    token = request_metrics.begin()
+    response = None
+    try:
+        response = await call_next(request)
+        return response
+    finally:
+        request_metrics.end(token, request, response)
+
+
 # --- ERROR HANDLER ---
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -517,34 +570,37 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 # --- ROUTERS ---
+# Les routers qui lisent des tables / colonnes creees au demarrage repondent
+# 503 (+ Retry-After) tant que leur porte n'est pas ouverte.
+_SCHEMA = [startup.requires("schema")]
 app.include_router(auth.router)
-app.include_router(tickets.router)
-app.include_router(clients.router)
-app.include_router(config.router)
+app.include_router(tickets.router, dependencies=_SCHEMA)
+app.include_router(clients.router, dependencies=_SCHEMA)
+app.include_router(config.router, dependencies=_SCHEMA)
 app.include_router(team.router)
-app.include_router(parts.router)
-app.include_router(catalog.router)
-app.include_router(notifications.router)
-app.include_router(print_tickets.router)
-app.include_router(caisse_api.router)
-app.include_router(attestation.router)
-app.include_router(admin.router)
-app.include_router(chat.router)
-app.include_router(fidelite.router)
-app.include_router(email_api.router)
-app.include_router(tarifs.router)
-app.include_router(marketing.router)
-app.include_router(telephones.router)
-app.include_router(autocomplete.router)
-app.include_router(devis.router)
-app.include_router(reporting.router)
-app.include_router(depot_distance.router)
-app.include_router(suivi.router)
-app.include_router(iphone_tarifs.router)
-app.include_router(iphones_stock.router)
-app.include_router(smartphones_tarifs.router)
-app.include_router(tracking.router)
-app.include_router(notifications_center.router)
+app.include_router(parts.router, dependencies=_SCHEMA)
+app.include_router(catalog.router, dependencies=[startup.requires("catalog")])
+app.include_router(notifications.router, dependencies=_SCHEMA)
+app.include_router(print_tickets.router, dependencies=_SCHEMA)
+app.include_router(caisse_api.router, dependencies=_SCHEMA)
+app.include_router(attestation.router, dependencies=[startup.requires("attestation")])
+app.include_router(admin.router, dependencies=_SCHEMA)
+app.include_router(chat.router, dependencies=_SCHEMA)
+app.include_router(fidelite.router, dependencies=_SCHEMA)
+app.include_router(email_api.router, dependencies=_SCHEMA)
+app.include_router(tarifs.router, dependencies=[startup.requires("tarifs")])
+app.include_router(marketing.router, dependencies=[startup.requires("marketing")])
+app.include_router(telephones.router, dependencies=[startup.requires("telephones")])
+app.include_router(autocomplete.router, dependencies=_SCHEMA)
+app.include_router(devis.router, dependencies=_SCHEMA)
+app.include_router(reporting.router, dependencies=_SCHEMA)
+app.include_router(depot_distance.router, dependencies=_SCHEMA)
+app.include_router(suivi.router, dependencies=_SCHEMA)
+app.include_router(iphone_tarifs.router, dependencies=[startup.requires("iphone_tarifs")])
+app.include_router(iphones_stock.router, dependencies=[startup.requires("iphones_stock")])
+app.include_router(smartphones_tarifs.router, dependencies=[startup.requires("smartphones_tarifs")])
+app.include_router(tracking.router, dependencies=_SCHEMA)
+app.include_router(notifications_center.router, dependencies=_SCHEMA)
 
 
 # --- HEALTH CHECK ---
@@ -555,8 +611,15 @@ async def health():
 
 @app.get("/health/db")
 async def health_db():
+    # Pas pret tant que les migrations tournent (portes encore fermees)
+    en_attente = boot.pending()
+    if en_attente:
+        return JSONResponse(
+            {"status": "starting", "db": "migrating", "en_attente": en_attente},
+            status_code=503,
+            headers={"Retry-After": str(startup.RETRY_AFTER_S)},
+        )
     try:
-        from app.database import get_cursor
         with get_cursor() as cur:
             cur.execute("SELECT 1")
         return {"status": "ok", "db": "connected"}
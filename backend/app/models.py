@@ -126,6 +126,20 @@ class StatusChange(BaseModel):
     statut: str
 
 
+class BulkStatusChange(BaseModel):
+    ids: list[int]
+    statut: str
+
+
+class BulkAssign(BaseModel):
+    ids: list[int]
+    technicien: Optional[str] = None
+
+
+class BulkPaye(BaseModel):
+    ids: list[int]
+
+
 class TicketOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
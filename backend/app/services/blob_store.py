@@ -0,0 +1,378 @@
+"""
+Blob store persistant pour les images generees (marketing, vitrine, video).
+
+Les blobs sont adresses par hash : put(data) retourne le sha256 du contenu,
+donc une meme image n'est stockee qu'une fois et son URL ne change jamais
+(-> Cache-Control immutable cote client / CDN). Pour les caches derives
+(image distante telechargee, photo detouree) la cle est derived_key(...) :
+le hash des entrees qui determinent le resultat.
+
+Deux niveaux :
+- disque local (BLOB_STORE_DIR), borne a BLOB_STORE_MAX_MB : au-dela, les
+  blobs les moins recemment lus sont evinces (atime = dernier acces, pose
+  explicitement ; mtime = date d'ecriture, seule base de max_age) ;
+- S3 compatible optionnel (BLOB_S3_BUCKET + BLOB_S3_ENDPOINT, boto3) : chaque
+  put y est aussi ecrit, un blob evince ou absent du disque (autre worker,
+  redeploiement) est relu depuis S3 puis remis en cache local.
+
+serve() sert un blob en streaming avec ETag, 304 et requetes Range (206).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = Path(__file__).parent.parent / "video" / "cache" / "blobs"
+IMMUTABLE = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 64 * 1024
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def derived_key(*parts) -> str:
+    """Cle stable pour un resultat derive de `parts` (ex: "pdf_image", url)."""
+    return hashlib.sha256("\x00".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def is_key(key: str) -> bool:
+    return bool(key) and bool(_KEY_RE.match(key))
+
+
+def media_type_for(head: bytes) -> str:
+    """Type MIME deduit des premiers octets (images uniquement)."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if head[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    return "application/octet-stream"
+
+
+def extension_for(data: bytes) -> str:
+    return {
+        "image/webp": "webp", "image/png": "png", "image/gif": "gif",
+        "video/mp4": "mp4",
+    }.get(media_type_for(data[:16]), "jpg")
+
+
+# ─── Backend disque ─────────────────────────────────────
+
+class FilesystemBackend:
+    """Blobs dans <root>/<2 premiers hex>/<cle>, ecriture atomique, LRU borne."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total = None  # calcule paresseusement (scan du dossier)
+        self.evicted = 0
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def touch(self, key: str):
+        """Marque l'acces (LRU) sans toucher a la date d'ecriture."""
+        p = self.path(key)
+        try:
+            os.utime(p, (time.time(), p.stat().st_mtime))
+        except OSError:
+            pass
+
+    def age(self, key: str) -> Optional[float]:
+        """Secondes depuis l'ecriture du blob (les lectures ne la changent pas)."""
+        try:
+            return time.time() - self.path(key).stat().st_mtime
+        except OSError:
+            return None
+
+    def put(self, key: str, data: bytes, written_at: float = None):
+        """`written_at` : date d'ecriture d'origine (blob relu depuis S3)."""
+        dest = self.path(key)
+        if dest.is_file():
+            self.touch(key)
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            if written_at is not None:
+                os.utime(tmp, (time.time(), written_at))
+            os.replace(tmp, dest)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            if self._total is not None:
+                self._total += len(data)
+        self._evict_if_needed()
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            data = self.path(key).read_bytes()
+        except OSError:
+            return None
+        self.touch(key)
+        return data
+
+    def delete(self, key: str):
+        p = self.path(key)
+        try:
+            size = p.stat().st_size
+            p.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._total is not None:
+                self._total -= size
+
+    def _files(self):
+        for p in self.root.glob("??/*"):
+            if p.is_file() and not p.name.startswith(".tmp-"):
+                yield p
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            if self._total is None:
+                self._total = sum(p.stat().st_size for p in self._files())
+            return self._total
+
+    def _evict_if_needed(self):
+        if self.total_bytes() <= self.max_bytes:
+            return
+        with self._lock:
+            files = []
+            for p in self._files():
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                files.append((st.st_atime, st.st_size, p))
+            files.sort()
+            total = sum(f[1] for f in files)
+            # On redescend a 90 % pour ne pas evincer a chaque put
+            target = int(self.max_bytes * 0.9)
+            for _, size, p in files:
+                if total <= target:
+                    break
+                try:
+                    p.unlink()
+                except OSError:
+                    continue
+                total -= size
+                self.evicted += 1
+            self._total = total
+
+
+# ─── Backend S3 (optionnel) ─────────────────────────────
+
+class S3Backend:
+    """Stockage durable sur un bucket S3 compatible (AWS, R2, MinIO...).
+
+    `client` suit l'API boto3 (put_object / get_object / head_object) ; il
+    peut etre injecte (tests, stand-in local). L'eviction cote bucket releve
+    d'une regle lifecycle, pas de ce module.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "blobs/", client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client
+
+    @classmethod
+    def from_env(cls) -> Optional["S3Backend"]:
+        bucket = os.getenv("BLOB_S3_BUCKET", "")
+        if not bucket:
+            return None
+        try:
+            import boto3
+        except ImportError:
+            logger.warning("BLOB_S3_BUCKET defini mais boto3 absent : stockage disque seul")
+            return None
+        client = boto3.client(
+            "s3",
+            endpoint_url=os.getenv("BLOB_S3_ENDPOINT") or None,
+            region_name=os.getenv("BLOB_S3_REGION") or None,
+            aws_access_key_id=os.getenv("BLOB_S3_ACCESS_KEY") or None,
+            aws_secret_access_key=os.getenv("BLOB_S3_SECRET_KEY") or None,
+        )
+        return cls(bucket, os.getenv("BLOB_S3_PREFIX", "blobs/"), client)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(
+            Bucket=self.bucket, Key=self._key(key), Body=data,
+            ContentType=media_type_for(data[:16]), CacheControl=IMMUTABLE,
+        )
+
+    def fetch(self, key: str):
+        """(contenu, date d'ecriture en epoch ou None), ou None si absent."""
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if "NoSuchKey" not in type(e).__name__ and "NoSuchKey" not in str(e):
+                logger.warning("blob S3 get %s : %s", key[:12], e)
+            return None
+        modified = obj.get("LastModified")
+        return obj["Body"].read(), modified.timestamp() if modified is not None else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        found = self.fetch(key)
+        return found[0] if found else None
+
+
+# ─── Facade ─────────────────────────────────────────────
+
+class BlobStore:
+    def __init__(self, local: FilesystemBackend, remote: Optional[S3Backend] = None):
+        self.local = local
+        self.remote = remote
+        self._stats = {"puts": 0, "hits": 0, "remote_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def put(self, data: bytes, key: str = None) -> str:
+        """Stocke `data` et retourne sa cle (hash du contenu si `key` absent)."""
+        key = key or content_key(data)
+        self.local.put(key, data)
+        if self.remote is not None:
+            try:
+                self.remote.put(key, data)
+            except Exception as e:
+                logger.warning("blob S3 put %s : %s", key[:12], e)
+        self._count("puts")
+        return key
+
+    def _ensure_local(self, key: str) -> bool:
+        if self.local.exists(key):
+            self._count("hits")
+            return True
+        if self.remote is not None:
+            found = self.remote.fetch(key)
+            if found is not None:
+                # Garde la date d'ecriture S3 : max_age ne repart pas de zero
+                self.local.put(key, found[0], written_at=found[1])
+                self._count("remote_hits")
+                return True
+        self._count("misses")
+        return False
+
+    def get(self, key: str, max_age: float = None) -> Optional[bytes]:
+        """Contenu du blob, ou None. `max_age` (secondes) pour les caches
+        derives d'une source qui peut changer (URL distante)."""
+        if not is_key(key) or not self._ensure_local(key):
+            return None
+        if max_age is not None:
+            age = self.local.age(key)
+            if age is None or age > max_age:
+                return None
+        return self.local.get(key)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Chemin disque du blob (pour fpdf / Pillow), relu depuis S3 si besoin."""
+        if not is_key(key) or not self._ensure_local(key):
+            return None
+        self.local.touch(key)
+        return self.local.path(key)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {
+            **counters,
+            "bytes": self.local.total_bytes(),
+            "max_bytes": self.local.max_bytes,
+            "evicted": self.local.evicted,
+            "remote": self.remote.bucket if self.remote else None,
+        }
+
+    def serve(self, request: Request, key: str, cache_control: str = IMMUTABLE) -> Response:
+        """Reponse HTTP streamee avec ETag, 304 et support Range."""
+        path = self.local_path(key)
+        if path is None:
+            raise HTTPException(404, "Image non trouvée ou expirée")
+        size = path.stat().st_size
+        with open(path, "rb") as f:
+            media = media_type_for(f.read(16))
+        etag = f'"{key}"'
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+
+        inm = request.headers.get("if-none-match", "")
+        if inm and (inm.strip() == "*" or etag in [c.strip() for c in inm.split(",")]):
+            return Response(status_code=304, headers=headers)
+
+        start, end = 0, size - 1
+        status = 200
+        rng = request.headers.get("range")
+        if rng and size:
+            m = _RANGE_RE.match(rng.strip())
+            if m and (m.group(1) or m.group(2)):
+                if m.group(1):
+                    start = int(m.group(1))
+                    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+                else:
+                    # bytes=-N : les N derniers octets
+                    start = max(0, size - int(m.group(2)))
+                if start > end or start >= size:
+                    return Response(
+                        status_code=416,
+                        headers={**headers, "Content-Range": f"bytes */{size}"},
+                    )
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1 if size else 0)
+
+        def _iter():
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+
+        return StreamingResponse(_iter(), status_code=status, media_type=media, headers=headers)
+
+
+def _from_env() -> BlobStore:
+    root = Path(os.getenv("BLOB_STORE_DIR", "") or DEFAULT_DIR)
+    max_mb = int(os.getenv("BLOB_STORE_MAX_MB", "512") or 512)
+    return BlobStore(FilesystemBackend(root, max_mb * 1024 * 1024), S3Backend.from_env())
+
+
+blob_store = _from_env()
@@ -3,7 +3,6 @@ Service d'intégration avec caisse.enregistreuse.fr
 Integration avec caisse.enregistreuse.fr.
 """
 
-import httpx
 from app.database import get_cursor
 
 
@@ -16,6 +15,7 @@ def _get_param(key: str) -> str:
 
 def envoyer_vers_caisse(ticket: dict, payment_override: int = None):
     """Envoie un ticket de réparation vers caisse.enregistreuse.fr"""
+    import httpx
     try:
         apikey = _get_param("CAISSE_APIKEY")
         shopid = _get_param("CAISSE_SHOPID")
@@ -0,0 +1,240 @@
+"""
+Clients identifies par numero de telephone normalise.
+
+Les saisies "06 12 34 56 78", "0612345678" et "+33 6 12 34 56 78" creaient
+trois clients. clients.telephone_norm (rempli par la fonction SQL tel_norm()
+et un trigger, quel que soit le chemin d'ecriture) porte un index unique :
+toute creation passe par upsert(), un seul
+INSERT ... ON CONFLICT (telephone_norm) DO UPDATE ... RETURNING *, sans
+SELECT prealable ni course entre deux formulaires soumis en meme temps.
+
+Tant que l'index unique n'existe pas (migration hors delai ou en echec au
+demarrage), ON CONFLICT (telephone_norm) serait refuse par Postgres :
+upsert() repasse alors par l'ancien SELECT puis INSERT / UPDATE sur le
+telephone saisi, jusqu'a ce que l'index apparaisse.
+
+merge_duplicates() fusionne les doublons deja en base (job ponctuel, lance
+automatiquement avant la creation de l'index unique, ou depuis l'admin) :
+le plus ancien client est conserve, les autres y sont rattaches (tickets,
+fidelite, devis... toute table ayant une colonne client_id) puis supprimes.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNIQUE_INDEX = "idx_clients_telephone_norm"
+
+# Seule definition de la normalisation (testee sur Postgres)
+TEL_NORM_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION tel_norm(raw TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT NULLIF(CASE
+        WHEN intl AND i ~ '^33[1-9][0-9]{8}$' THEN '0' || substr(i, 3)
+        WHEN intl AND i <> '' THEN '+' || i
+        WHEN d ~ '^33[1-9][0-9]{8}$' THEN '0' || substr(d, 3)
+        ELSE d
+    END, '')
+    FROM (
+        SELECT d, intl, CASE WHEN intl THEN regexp_replace(d, '^00', '') ELSE d END AS i
+        FROM (
+            SELECT regexp_replace(COALESCE(raw, ''), '[^0-9]', '', 'g') AS d,
+                   COALESCE(raw, '') ~ '^\s*(\+|00)' AS intl
+        ) s0
+    ) s
+$$
+"""
+
+MIGRATION_SQL = [
+    "ALTER TABLE clients ADD COLUMN IF NOT EXISTS telephone_norm TEXT",
+    TEL_NORM_FUNCTION,
+    """CREATE OR REPLACE FUNCTION clients_tel_norm_trg() RETURNS trigger
+       LANGUAGE plpgsql AS $$
+       BEGIN
+           NEW.telephone_norm := tel_norm(NEW.telephone);
+           RETURN NEW;
+       END $$""",
+    "DROP TRIGGER IF EXISTS trg_clients_tel_norm ON clients",
+    """CREATE TRIGGER trg_clients_tel_norm
+       BEFORE INSERT OR UPDATE OF telephone ON clients
+       FOR EACH ROW EXECUTE FUNCTION clients_tel_norm_trg()""",
+    """UPDATE clients SET telephone_norm = tel_norm(telephone)
+       WHERE telephone_norm IS DISTINCT FROM tel_norm(telephone)""",
+]
+
+# Index unique vu present par upsert() : plus besoin de le verifier (il n'est
+# supprime que dans la transaction de config.import_backup, qui le recree)
+_index_ready = False
+
+
+def _index_exists(cur) -> bool:
+    cur.execute("SELECT to_regclass(%s) AS idx", (UNIQUE_INDEX,))
+    row = cur.fetchone()
+    return bool(row and row["idx"])
+
+
+def unique_index_ready(cur) -> bool:
+    global _index_ready
+    if not _index_ready:
+        _index_ready = _index_exists(cur)
+    return _index_ready
+
+
+def migrate(cur):
+    """Colonne, fonction, trigger et index unique (fusion des doublons au besoin).
+
+    Rien a faire une fois l'index cree : pas de DROP / CREATE TRIGGER (verrou
+    exclusif sur clients) ni d'UPDATE de toute la table a chaque demarrage.
+    """
+    if _index_exists(cur):
+        return None
+    for sql in MIGRATION_SQL:
+        cur.execute(sql)
+    stats = merge_duplicates(cur)
+    if stats["doublons"]:
+        logger.warning("clients : %d doublons fusionnes dans %d clients",
+                       stats["doublons"], stats["groupes"])
+    cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {UNIQUE_INDEX} ON clients(telephone_norm)")
+    return stats
+
+
+# ─── Upsert ─────────────────────────────────────────────
+
+_TEXT_FIELDS = ("nom", "prenom", "email", "societe")
+
+
+def _select_then_insert(cur, telephone: str, update: bool, values: dict) -> dict:
+    """Mode degrade (index unique absent) : comportement d'avant l'upsert."""
+    cur.execute("SELECT * FROM clients WHERE telephone = %s ORDER BY id LIMIT 1", (telephone,))
+    existing = cur.fetchone()
+    if existing is None:
+        cols = ["telephone"] + list(values)
+        cur.execute(f"""
+            INSERT INTO clients ({", ".join(cols)})
+            VALUES ({", ".join(f"%({c})s" for c in cols)})
+            RETURNING *
+        """, {"telephone": telephone, **values})
+        return cur.fetchone()
+    if not update or not values:
+        return existing
+    sets = [
+        f"{c} = COALESCE(NULLIF(%({c})s, ''), {c})" if c in _TEXT_FIELDS else f"{c} = %({c})s"
+        for c in values
+    ]
+    cur.execute(
+        f"UPDATE clients SET {', '.join(sets)} WHERE id = %(_id)s RETURNING *",
+        {**values, "_id": existing["id"]},
+    )
+    return cur.fetchone()
+
+
+def upsert(cur, telephone: str, update: bool = True, **fields) -> dict:
+    """Cree le client ou retourne l'existant (meme numero normalise), en une instruction.
+
+    `fields` : nom, prenom, email, societe, carte_camby... (None = non fourni).
+    Si `update`, les champs texte non vides et carte_camby remplacent ceux du
+    client existant ; sinon l'existant est retourne tel quel.
+    """
+    values = {k: v for k, v in fields.items() if v is not None}
+    if not unique_index_ready(cur):
+        logger.warning("clients : index %s absent, upsert en mode SELECT + INSERT", UNIQUE_INDEX)
+        return _select_then_insert(cur, telephone, update, values)
+    cols = ["telephone", "telephone_norm"] + list(values)
+    exprs = ["%(telephone)s", "tel_norm(%(telephone)s)"] + [f"%({c})s" for c in values]
+    sets = []
+    if update:
+        for c in values:
+            if c in _TEXT_FIELDS:
+                sets.append(f"{c} = COALESCE(NULLIF(EXCLUDED.{c}, ''), clients.{c})")
+            else:
+                sets.append(f"{c} = EXCLUDED.{c}")
+    if not sets:
+        # DO NOTHING ne retournerait pas la ligne existante
+        sets = ["telephone_norm = EXCLUDED.telephone_norm"]
+    cur.execute(f"""
+        INSERT INTO clients ({", ".join(cols)})
+        VALUES ({", ".join(exprs)})
+        ON CONFLICT (telephone_norm) DO UPDATE SET {", ".join(sets)}
+        RETURNING *
+    """, {"telephone": telephone, **values})
+    return cur.fetchone()
+
+
+# ─── Fusion des doublons ────────────────────────────────
+
+_MERGE_MAP_SQL = """
+    CREATE TEMP TABLE _clients_fusion ON COMMIT DROP AS
+    SELECT id AS doublon, survivant FROM (
+        SELECT id, MIN(id) OVER (PARTITION BY telephone_norm) AS survivant
+        FROM clients WHERE telephone_norm IS NOT NULL
+    ) s
+    WHERE id <> survivant
+"""
+
+# Champs vides du survivant completes par le doublon le plus recent ; points
+# et depenses cumules ; bon de grattage et carte Camby conserves.
+_MERGE_CLIENTS_SQL = """
+    UPDATE clients s SET
+        nom = COALESCE(NULLIF(s.nom, ''), agg.nom),
+        prenom = COALESCE(NULLIF(s.prenom, ''), agg.prenom),
+        email = COALESCE(NULLIF(s.email, ''), agg.email),
+        societe = COALESCE(NULLIF(s.societe, ''), agg.societe),
+        points_fidelite = COALESCE(s.points_fidelite, 0) + agg.points,
+        total_depense = COALESCE(s.total_depense, 0) + agg.depense,
+        bon_grattage = COALESCE(s.bon_grattage, agg.bon_grattage),
+        carte_camby = CASE WHEN COALESCE(s.carte_camby::int, 0) >= agg.camby_rang
+                           THEN s.carte_camby ELSE agg.carte_camby END
+    FROM (
+        SELECT f.survivant,
+               (array_agg(NULLIF(c.nom, '') ORDER BY c.id DESC) FILTER (WHERE NULLIF(c.nom, '') IS NOT NULL))[1] AS nom,
+               (array_agg(NULLIF(c.prenom, '') ORDER BY c.id DESC) FILTER (WHERE NULLIF(c.prenom, '') IS NOT NULL))[1] AS prenom,
+               (array_agg(NULLIF(c.email, '') ORDER BY c.id DESC) FILTER (WHERE NULLIF(c.email, '') IS NOT NULL))[1] AS email,
+               (array_agg(NULLIF(c.societe, '') ORDER BY c.id DESC) FILTER (WHERE NULLIF(c.societe, '') IS NOT NULL))[1] AS societe,
+               SUM(COALESCE(c.points_fidelite, 0)) AS points,
+               SUM(COALESCE(c.total_depense, 0)) AS depense,
+               (array_agg(c.bon_grattage ORDER BY c.id) FILTER (WHERE c.bon_grattage IS NOT NULL))[1] AS bon_grattage,
+               MAX(COALESCE(c.carte_camby::int, 0)) AS camby_rang,
+               (array_agg(c.carte_camby ORDER BY COALESCE(c.carte_camby::int, 0) DESC))[1] AS carte_camby
+        FROM _clients_fusion f JOIN clients c ON c.id = f.doublon
+        GROUP BY f.survivant
+    ) agg
+    WHERE s.id = agg.survivant
+"""
+
+_REFERENCING_TABLES_SQL = """
+    SELECT table_name FROM information_schema.columns
+    WHERE column_name = 'client_id' AND table_schema = current_schema()
+      AND table_name <> 'clients'
+    ORDER BY table_name
+"""
+
+
+def merge_duplicates(cur, dry_run: bool = False) -> dict:
+    """Fusionne les clients de meme telephone_norm (dans la transaction de `cur`).
+
+    Retourne {"groupes", "doublons", "tables"} ; `dry_run` ne fait que compter.
+    """
+    cur.execute("""
+        SELECT COUNT(*) AS groupes, COALESCE(SUM(n - 1), 0) AS doublons FROM (
+            SELECT COUNT(*) AS n FROM clients
+            WHERE telephone_norm IS NOT NULL
+            GROUP BY telephone_norm HAVING COUNT(*) > 1
+        ) g
+    """)
+    row = cur.fetchone()
+    stats = {"groupes": int(row["groupes"]), "doublons": int(row["doublons"]), "tables": {}}
+    if dry_run or not stats["doublons"]:
+        return stats
+
+    cur.execute(_MERGE_MAP_SQL)
+    cur.execute(_MERGE_CLIENTS_SQL)
+    cur.execute(_REFERENCING_TABLES_SQL)
+    for table in [r["table_name"] for r in cur.fetchall()]:
+        cur.execute(f"""
+            UPDATE "{table}" t SET client_id = f.survivant
+            FROM _clients_fusion f WHERE t.client_id = f.doublon
+        """)
+        stats["tables"][table] = cur.rowcount
+    cur.execute("DELETE FROM clients WHERE id IN (SELECT doublon FROM _clients_fusion)")
+    cur.execute("DROP TABLE _clients_fusion")
+    return stats
@@ -0,0 +1,81 @@
+"""
+Serialisation JSON rapide pour les grosses reponses (listes de lignes SQL).
+
+Par defaut FastAPI passe chaque valeur retournee dans jsonable_encoder (et
+dans le modele Pydantic si response_model est declare) puis json.dumps :
+pour 500 tickets de ~60 colonnes, c'est l'essentiel du CPU de la requete.
+Ici les RealDictRow partent directement dans orjson, qui gere nativement
+datetime / date / time / UUID ; Decimal et timedelta passent par _default
+avec le meme rendu que jsonable_encoder (12.50 -> 12.5, 12 -> 12).
+
+Sans orjson, repli sur json.dumps avec le meme _default : meme sortie,
+seulement moins rapide.
+
+Usage dans un endpoint : garder response_model (schema OpenAPI) et
+retourner FastJSONResponse(rows_as(Model, rows)) ; retourner une Response
+court-circuite la validation et l'encodage de FastAPI. Mesures :
+benchmarks/bench_json_response.py.
+"""
+
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _default(o):
+    if isinstance(o, Decimal):
+        return int(o) if o.as_tuple().exponent >= 0 else float(o)
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, timedelta):
+        return o.total_seconds()
+    if isinstance(o, (set, frozenset, tuple)):
+        return list(o)
+    raise TypeError(f"Type non serialisable en JSON : {type(o).__name__}")
+
+
+if HAS_ORJSON:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse dont le rendu passe par dumps() (lignes SQL brutes acceptees)."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+_projections = {}
+
+
+def rows_as(model, rows) -> list:
+    """Projette des lignes sur les champs d'un modele Pydantic, sans validation.
+
+    Meme forme que response_model=list[model] : colonnes hors modele ignorees,
+    champs absents remplaces par leur valeur par defaut. Les types ne sont pas
+    convertis : aligner la requete SQL sur le modele (ex. EXISTS(...)::int).
+    """
+    fields = _projections.get(model)
+    if fields is None:
+        fields = _projections[model] = tuple(
+            (name, None if f.is_required() else f.get_default(call_default_factory=True))
+            for name, f in model.model_fields.items()
+        )
+    return [{name: r.get(name, default) for name, default in fields} for r in rows]
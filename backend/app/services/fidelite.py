@@ -0,0 +1,363 @@
+"""
+Programme fidelite : reglages en memoire + requetes client en un aller-retour.
+
+Les reglages (fidelite_* et grattage_* dans params) etaient relus cle par cle
+a chaque ouverture de fiche client, a chaque credit / debit et sur les pages
+publiques de suivi. On garde un snapshot par process, invalide comme le
+catalogue tarifs : invalidate() ecrit un nouveau jeton dans params
+(FIDELITE_SETTINGS_VERSION), les autres workers le relisent au plus toutes les
+VERSION_CHECK_S secondes.
+
+summary() retourne points, total, bon de grattage et les 10 derniers
+mouvements en une seule requete. credit() / debit() modifient le solde et
+ecrivent l'historique en une seule instruction (CTE) qui retourne le nouveau
+solde : pas de lecture-puis-ecriture, donc pas de double credit ni de solde
+negatif quand deux postes valident en meme temps.
+"""
+
+import logging
+import threading
+import time
+
+from app.database import get_cursor
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "FIDELITE_SETTINGS_VERSION"
+VERSION_CHECK_S = 5.0
+
+# cle params -> (attribut, defaut)
+_KEYS = {
+    "fidelite_active": ("active", "1"),
+    "fidelite_points_par_euro": ("points_par_euro", "10"),
+    "fidelite_palier_film": ("palier_film", "1000"),
+    "fidelite_palier_reduction": ("palier_reduction", "5000"),
+    "fidelite_montant_reduction": ("montant_reduction", "10"),
+    "grattage_actif": ("grattage_actif", "1"),
+    "grattage_frequence": ("grattage_frequence", "10"),
+}
+
+
+def is_setting(cle: str) -> bool:
+    return cle in _KEYS
+
+
+def _int(value: str, default: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return int(default)
+
+
+class Settings:
+    __slots__ = (
+        "version", "active", "points_par_euro", "palier_film", "palier_reduction",
+        "montant_reduction", "grattage_actif", "grattage_frequence",
+    )
+
+    def __init__(self, values: dict, version: str = ""):
+        raw = {attr: values.get(cle, default) for cle, (attr, default) in _KEYS.items()}
+        self.version = version
+        self.active = raw["active"] != "0"
+        self.points_par_euro = _int(raw["points_par_euro"], "10")
+        self.palier_film = _int(raw["palier_film"], "1000")
+        self.palier_reduction = _int(raw["palier_reduction"], "5000")
+        self.montant_reduction = raw["montant_reduction"]
+        self.grattage_actif = raw["grattage_actif"] != "0"
+        self.grattage_frequence = _int(raw["grattage_frequence"], "10")
+
+
+_settings = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _read_db_version(cur) -> str:
+    cur.execute("SELECT valeur FROM params WHERE cle = %s", (VERSION_KEY,))
+    row = cur.fetchone()
+    return (row["valeur"] if row else "") or ""
+
+
+def _load() -> Settings:
+    with get_cursor() as cur:
+        cur.execute(
+            "SELECT cle, valeur FROM params WHERE cle = ANY(%s)",
+            (list(_KEYS) + [VERSION_KEY],),
+        )
+        values = {r["cle"]: r["valeur"] for r in cur.fetchall() or []}
+    return Settings(values, values.pop(VERSION_KEY, "") or "")
+
+
+def settings() -> Settings:
+    """Reglages courants, recharges si invalides localement ou par un autre worker."""
+    global _settings, _checked_at
+    now = time.time()
+    snap = _settings
+    if snap is not None and now - _checked_at < VERSION_CHECK_S:
+        return snap
+    with _lock:
+        snap = _settings
+        if snap is not None and now - _checked_at < VERSION_CHECK_S:
+            return snap
+        if snap is not None:
+            with get_cursor() as cur:
+                if _read_db_version(cur) == snap.version:
+                    _checked_at = now
+                    return snap
+        snap = _load()
+        _settings = snap
+        _checked_at = time.time()
+        return snap
+
+
+def invalidate(cur=None):
+    """A appeler apres une ecriture sur un reglage fidelite / grattage.
+
+    Si `cur` est fourni, le jeton est ecrit dans la meme transaction.
+    """
+    global _settings
+    token = str(time.time_ns())
+    sql = """INSERT INTO params (cle, valeur) VALUES (%s, %s)
+             ON CONFLICT (cle) DO UPDATE SET valeur = EXCLUDED.valeur"""
+    try:
+        if cur is not None:
+            cur.execute(sql, (VERSION_KEY, token))
+        else:
+            with get_cursor() as c:
+                c.execute(sql, (VERSION_KEY, token))
+    except Exception as e:
+        logger.warning("fidelite settings version bump: %s", e)
+    with _lock:
+        _settings = None
+
+
+# ─── Fiche client ───────────────────────────────────────
+
+_SUMMARY_SQL = """
+    SELECT c.id AS client_id,
+           c.points_fidelite, c.total_depense, c.bon_grattage,
+           COALESCE((
+               SELECT json_agg(h ORDER BY h.date_creation DESC)
+               FROM (
+                   SELECT type, points, description, date_creation
+                   FROM fidelite_historique
+                   WHERE client_id = c.id
+                   ORDER BY date_creation DESC LIMIT 10
+               ) h
+           ), '[]'::json) AS historique
+    {source}
+"""
+
+_SUMMARY_BY_CLIENT = _SUMMARY_SQL.format(source="FROM clients c WHERE c.id = %s")
+_SUMMARY_BY_TICKET = _SUMMARY_SQL.format(
+    source="FROM tickets t JOIN clients c ON c.id = t.client_id WHERE t.ticket_code = %s",
+)
+
+
+def _gain_label(gain: str) -> str:
+    if gain == "film":
+        return "Film verre trempé OFFERT"
+    elif gain == "reduction":
+        return "10€ de réduction"
+    return ""
+
+
+def _prochaine(points: int, s: Settings) -> dict:
+    if points < s.palier_film:
+        return {"type": "Film verre trempé", "points_restants": s.palier_film - points, "palier": s.palier_film}
+    if points < s.palier_reduction:
+        return {"type": f"Réduction {s.montant_reduction}€", "points_restants": s.palier_reduction - points, "palier": s.palier_reduction}
+    return {"type": f"Réduction {s.montant_reduction}€ disponible !", "points_restants": 0, "palier": s.palier_reduction}
+
+
+def summary(client_id: int = None, ticket_code: str = None):
+    """Fiche fidelite d'un client (par id ou par code ticket), en une requete.
+
+    Retourne None si le client (ou le ticket) n'existe pas.
+    """
+    s = settings()
+    with get_cursor() as cur:
+        if ticket_code is not None:
+            cur.execute(_SUMMARY_BY_TICKET, (ticket_code,))
+        else:
+            cur.execute(_SUMMARY_BY_CLIENT, (client_id,))
+        row = cur.fetchone()
+    if not row or row["client_id"] is None:
+        return None
+
+    points = row["points_fidelite"] or 0
+    bon_grattage = row.get("bon_grattage")
+    historique = row["historique"] or []
+    return {
+        "active": s.active,
+        "points": points,
+        "total_depense": float(row["total_depense"] or 0),
+        "pts_par_euro": s.points_par_euro,
+        "palier_film": s.palier_film,
+        "palier_reduction": s.palier_reduction,
+        "montant_reduction": s.montant_reduction,
+        "prochaine_recompense": _prochaine(points, s),
+        "recompenses_disponibles": {
+            "film": points >= s.palier_film,
+            "reduction": points >= s.palier_reduction,
+        },
+        # Bon de grattage disponible (valable prochaine reparation)
+        "bon_grattage": bon_grattage,
+        "bon_grattage_label": _gain_label(bon_grattage) if bon_grattage else None,
+        "historique": historique,
+    }
+
+
+# ─── Credit / debit atomiques ───────────────────────────
+
+# Les CTE ne voient pas les modifications des CTE soeurs : le solde final vient
+# de RETURNING, le solde inchange (deja credite) de la relecture de clients.
+_CREDIT_SQL = """
+    WITH upd AS (
+        UPDATE clients
+        SET points_fidelite = COALESCE(points_fidelite, 0) + %(points)s,
+            total_depense = COALESCE(total_depense, 0) + %(montant)s
+        WHERE id = %(client_id)s
+          AND NOT EXISTS (
+              SELECT 1 FROM fidelite_historique
+              WHERE ticket_id = %(ticket_id)s AND type = 'gain'
+          )
+        RETURNING id, points_fidelite
+    ), ins AS (
+        INSERT INTO fidelite_historique (client_id, ticket_id, type, points, description)
+        SELECT id, %(ticket_id)s, 'gain', %(points)s, %(description)s FROM upd
+    )
+    SELECT EXISTS (SELECT 1 FROM upd) AS credite,
+           COALESCE(
+               (SELECT points_fidelite FROM upd),
+               (SELECT points_fidelite FROM clients WHERE id = %(client_id)s)
+           ) AS total_points,
+           EXISTS (SELECT 1 FROM clients WHERE id = %(client_id)s) AS client_existe
+"""
+
+# Le WHERE est reevalue sous verrou de ligne : deux debits concurrents ne
+# peuvent pas passer sous le palier.
+_DEBIT_SQL = """
+    WITH upd AS (
+        UPDATE clients
+        SET points_fidelite = points_fidelite - %(points)s
+        WHERE id = %(client_id)s AND COALESCE(points_fidelite, 0) >= %(points)s
+        RETURNING id, points_fidelite
+    ), ins AS (
+        INSERT INTO fidelite_historique (client_id, type, points, description)
+        SELECT id, %(type)s, -%(points)s, %(description)s FROM upd
+    )
+    SELECT (SELECT points_fidelite FROM upd) AS points_restants,
+           EXISTS (SELECT 1 FROM clients WHERE id = %(client_id)s) AS client_existe
+"""
+
+
+def credit(cur, client_id: int, ticket_id: int, montant: float, s: Settings = None):
+    """Credite les points d'un ticket paye (une seule fois par ticket).
+
+    Retourne None si le client n'existe pas, sinon
+    {"points_gagnes", "total_points"} (points_gagnes = 0 si deja credite).
+    """
+    s = s or settings()
+    points = int(montant * s.points_par_euro)
+    cur.execute(_CREDIT_SQL, {
+        "client_id": client_id,
+        "ticket_id": ticket_id,
+        "points": points,
+        "montant": montant,
+        "description": f"Réparation {montant:.2f}€ — +{points} pts",
+    })
+    row = cur.fetchone()
+    if not row or not row["client_existe"]:
+        return None
+    return {
+        "points_gagnes": points if row["credite"] else 0,
+        "total_points": row["total_points"] or 0,
+    }
+
+
+def debit(cur, client_id: int, kind: str, s: Settings = None):
+    """Utilise une recompense ("film" ou "reduction").
+
+    Retourne le solde restant, None si le client n'existe pas ; leve
+    ValueError si le type est inconnu ou les points insuffisants.
+    """
+    s = s or settings()
+    if kind == "film":
+        points = s.palier_film
+        description = f"Film verre trempé offert — -{points} pts"
+    elif kind == "reduction":
+        points = s.palier_reduction
+        description = f"Réduction {s.montant_reduction}€ utilisée — -{points} pts"
+    else:
+        raise ValueError("Points insuffisants")
+    cur.execute(_DEBIT_SQL, {
+        "client_id": client_id,
+        "points": points,
+        "type": f"utilisation_{kind}",
+        "description": description,
+    })
+    row = cur.fetchone()
+    if not row or not row["client_existe"]:
+        return None
+    if row["points_restants"] is None:
+        raise ValueError("Points insuffisants")
+    return row["points_restants"]
+
+
+# Variante ensembliste (paiement groupe) : un ticket deja credite est ignore,
+# les points d'un meme client sont cumules avant l'UPDATE.
+_CREDIT_MANY_SQL = """
+    WITH src AS (
+        SELECT * FROM unnest(%(clients)s::int[], %(tickets)s::int[], %(points)s::int[],
+                             %(montants)s::numeric[], %(descriptions)s::text[])
+            AS s(client_id, ticket_id, points, montant, description)
+    ), todo AS (
+        SELECT s.* FROM src s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM fidelite_historique h
+            WHERE h.ticket_id = s.ticket_id AND h.type = 'gain'
+        )
+    ), agg AS (
+        SELECT client_id, SUM(points) AS points, SUM(montant) AS montant
+        FROM todo GROUP BY client_id
+    ), upd AS (
+        UPDATE clients c
+        SET points_fidelite = COALESCE(c.points_fidelite, 0) + agg.points,
+            total_depense = COALESCE(c.total_depense, 0) + agg.montant
+        FROM agg
+        WHERE c.id = agg.client_id
+        RETURNING c.id
+    ), ins AS (
+        INSERT INTO fidelite_historique (client_id, ticket_id, type, points, description)
+        SELECT client_id, ticket_id, 'gain', points, description
+        FROM todo WHERE client_id IN (SELECT id FROM upd)
+    )
+    SELECT ticket_id, points FROM todo WHERE client_id IN (SELECT id FROM upd)
+"""
+
+
+def credit_many(cur, items: list, s: Settings = None) -> dict:
+    """Credite plusieurs tickets payes en une instruction.
+
+    items : liste de (client_id, ticket_id, montant). Retourne
+    {ticket_id: points_gagnes} pour les tickets effectivement credites.
+    """
+    s = s or settings()
+    rows = []
+    for client_id, ticket_id, montant in items:
+        points = int(montant * s.points_par_euro)
+        if client_id and points > 0:
+            rows.append((client_id, ticket_id, points, montant,
+                         f"Réparation {montant:.2f}€ — +{points} pts"))
+    if not s.active or not rows:
+        return {}
+    cols = list(zip(*rows))
+    cur.execute(_CREDIT_MANY_SQL, {
+        "clients": list(cols[0]),
+        "tickets": list(cols[1]),
+        "points": list(cols[2]),
+        "montants": list(cols[3]),
+        "descriptions": list(cols[4]),
+    })
+    return {r["ticket_id"]: r["points"] for r in cur.fetchall() or []}
@@ -0,0 +1,120 @@
+"""
+Cache de reponses HTTP pour les endpoints publics (vitrine + suivi client).
+
+Chaque reponse est serialisee une seule fois en bytes JSON et gardee en
+memoire avec un ETag fort (hash du contenu, donc identique d'un worker a
+l'autre). Un client qui renvoie If-None-Match recoit un 304 sans corps.
+
+Invalidation : les donnees sont rangees par namespace ("catalogue",
+"ticket", ...). invalidate(namespace) incremente la version du namespace
+(ou d'une seule cle) ; les entrees d'une version plus ancienne sont
+reconstruites au prochain appel. Un TTL borne en plus la fraicheur pour les
+ecritures faites par un autre worker ou par un chemin sans hook.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+_MAX_ENTRIES = 2000
+
+# Politiques Cache-Control
+# Catalogue : les editeurs admin relisent ces memes URLs juste apres une
+# ecriture, donc pas de fraicheur cote navigateur ; la revalidation par ETag
+# (304 sans corps) garde l'essentiel du gain.
+PUBLIC_CATALOGUE = "public, no-cache"
+# Donnees client (nom, tel, statut) : jamais en cache partage, revalidation
+# systematique via ETag
+PRIVATE_REVALIDATE = "private, no-cache"
+
+_versions: dict = {}
+_entries: dict = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+def _version(namespace: str, key: str) -> tuple:
+    return (_versions.get(namespace, 0), _versions.get((namespace, key), 0))
+
+
+def invalidate(namespace: str, key: str = None):
+    """Invalide tout un namespace, ou une seule cle si `key` est fourni."""
+    with _lock:
+        vkey = namespace if key is None else (namespace, key)
+        _versions[vkey] = _versions.get(vkey, 0) + 1
+
+
+def _render(data) -> bytes:
+    # Meme rendu que fastapi.responses.JSONResponse
+    return json.dumps(
+        jsonable_encoder(data),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [c.strip() for c in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def cached_json(
+    request: Request,
+    namespace: str,
+    key: str,
+    builder,
+    ttl: float = 30.0,
+    cache_control: str = PUBLIC_CATALOGUE,
+    variant: str = "",
+) -> Response:
+    """Reponse JSON servie depuis le cache (ou construite via builder()).
+
+    `key` est l'unite d'invalidation (ex: code ticket) ; `variant` distingue
+    plusieurs representations d'une meme cle (ex: suivi vs commandes).
+    builder() retourne les donnees (dict/list) ; une HTTPException levee par
+    builder() se propage normalement et rien n'est mis en cache.
+    """
+    now = time.time()
+    ckey = (namespace, key, variant)
+    with _lock:
+        version = _version(namespace, key)
+        entry = _entries.get(ckey)
+        if entry and entry[0] == version and now - entry[3] < ttl:
+            _stats["hits"] += 1
+            body, etag = entry[1], entry[2]
+        else:
+            entry = None
+
+    if entry is None:
+        body = _render(builder())
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        with _lock:
+            _stats["misses"] += 1
+            if len(_entries) >= _MAX_ENTRIES:
+                # Purge simple : on jette les plus anciennes (moitie)
+                for k in sorted(_entries, key=lambda k: _entries[k][3])[: _MAX_ENTRIES // 2]:
+                    del _entries[k]
+            _entries[ckey] = (version, body, etag, now)
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request, etag):
+        with _lock:
+            _stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_entries)}
@@ -12,8 +12,6 @@ from email.mime.application import MIMEApplication
 from email.header import Header
 from email.utils import formataddr
 
-import httpx
-
 from app.database import get_cursor
 
 
@@ -50,6 +48,7 @@ def _is_notif_enabled(notif_type: str) -> bool:
 
 def envoyer_discord_embed(title: str, description: str, color: int = 0x3B82F6, fields: list = None, notif_type: str = ""):
     """Envoie une notification Discord avec un embed riche."""
+    import httpx
     try:
         webhook_url = _get_param("DISCORD_WEBHOOK")
         if not webhook_url:
@@ -78,6 +77,7 @@ def envoyer_discord_embed(title: str, description: str, color: int = 0x3B82F6, f
 
 def test_discord_webhook(webhook_url: str) -> tuple:
     """Teste un webhook Discord en envoyant un embed de test."""
+    import httpx
     try:
         embed = {
             "title": "Test Klikphone SAV",
@@ -150,6 +150,23 @@ def notif_reparation_terminee(ticket_code: str):
     )
 
 
+def notif_operation_groupee(titre: str, lignes: list, notif_type: str, color: str = "orange"):
+    """Un seul embed pour une opération appliquée à plusieurs tickets."""
+    if not lignes:
+        return
+    # Limite Discord : 4096 caractères par description
+    texte = "\n".join(lignes[:40])
+    if len(lignes) > 40:
+        texte += f"\n… et {len(lignes) - 40} autre(s)"
+    envoyer_discord_embed(
+        title=titre,
+        description=texte,
+        color=DISCORD_COLORS[color],
+        fields=[{"name": "Tickets", "value": str(len(lignes)), "inline": True}],
+        notif_type=notif_type,
+    )
+
+
 def notif_connexion(utilisateur: str, interface: str):
     envoyer_discord_embed(
         title="Connexion",
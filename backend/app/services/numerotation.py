@@ -0,0 +1,102 @@
+"""
+Numerotation des documents (devis DEV-YYYYMM-XXXX, tickets KP-XXXXXX).
+
+Le numero est produit dans la meme instruction que l'INSERT :
+- devis : compteur par prefixe (table compteurs) incremente par un
+  INSERT ... ON CONFLICT DO UPDATE ... RETURNING. Le verrou de ligne du
+  compteur serialise les creations concurrentes du meme mois jusqu'au commit :
+  pas de scan de la table devis, pas de doublon, pas de retry ;
+- tickets : le code derive de l'id, tire de la sequence avant l'INSERT
+  (plus d'UPDATE tickets SET ticket_code separe).
+
+resync() recale les compteurs sur les numeros deja presents (demarrage,
+import de backup).
+"""
+
+from datetime import datetime
+
+TABLE_SQL = """CREATE TABLE IF NOT EXISTS compteurs (
+    prefixe TEXT PRIMARY KEY,
+    valeur INTEGER NOT NULL DEFAULT 0
+)"""
+
+# Compteurs existants : au moins le plus grand numero deja attribue
+RESYNC_SQL = r"""
+    INSERT INTO compteurs (prefixe, valeur)
+    SELECT substring(numero FROM '^(DEV-\d{6}-)'), MAX(split_part(numero, '-', 3)::int)
+    FROM devis
+    WHERE numero ~ '^DEV-\d{6}-\d+$'
+    GROUP BY 1
+    ON CONFLICT (prefixe) DO UPDATE SET valeur = GREATEST(compteurs.valeur, EXCLUDED.valeur)
+"""
+
+_COUNTER_CTE = """n AS (
+        INSERT INTO compteurs (prefixe, valeur) VALUES (%(_prefixe)s, 1)
+        ON CONFLICT (prefixe) DO UPDATE SET valeur = compteurs.valeur + 1
+        RETURNING valeur
+    )"""
+
+_TICKET_ID_CTE = """n AS (
+        SELECT nextval(pg_get_serial_sequence('tickets', 'id')) AS valeur
+    )"""
+
+
+def _padded(expr: str, width: int) -> str:
+    # Comme f"{n:0{width}d}" : jamais tronque au-dela de `width` chiffres
+    return f"lpad({expr}::text, GREATEST({width}, length({expr}::text)), '0')"
+
+
+def devis_prefix(now: datetime = None) -> str:
+    return f"DEV-{(now or datetime.now()).strftime('%Y%m')}-"
+
+
+def next_value(cur, prefixe: str) -> int:
+    """Valeur suivante du compteur `prefixe` (une instruction, atomique)."""
+    cur.execute(f"WITH {_COUNTER_CTE} SELECT valeur FROM n", {"_prefixe": prefixe})
+    return cur.fetchone()["valeur"]
+
+
+def _insert(cur, cte: str, table: str, numbered: dict, values: dict, params: dict, returning: str):
+    """INSERT ... VALUES avec des colonnes calculees depuis n.valeur (`numbered`).
+
+    VALUES plutot que SELECT : les parametres prennent le type de leur colonne
+    (NULL, dates en texte...). n est evalue une seule fois meme si reference
+    plusieurs fois.
+    """
+    cols = list(numbered) + list(values)
+    exprs = [f"(SELECT {e} FROM n)" for e in numbered.values()] + [f"%({c})s" for c in values]
+    cur.execute(f"""
+        WITH {cte}
+        INSERT INTO {table} ({", ".join(cols)})
+        VALUES ({", ".join(exprs)})
+        RETURNING {returning}
+    """, {**values, **params})
+    return cur.fetchone()
+
+
+def insert_devis(cur, values: dict, now: datetime = None) -> dict:
+    """INSERT INTO devis avec le numero attribue dans la meme instruction.
+
+    `values` : colonne -> valeur (hors numero). Retourne {"id", "numero"}.
+    """
+    return _insert(
+        cur, _COUNTER_CTE, "devis",
+        {"numero": "%(_prefixe)s || " + _padded("valeur", 4)},
+        values, {"_prefixe": devis_prefix(now)}, "id, numero",
+    )
+
+
+def insert_ticket(cur, values: dict) -> dict:
+    """INSERT INTO tickets avec id et ticket_code KP-XXXXXX en une instruction.
+
+    Retourne {"id", "ticket_code"}.
+    """
+    return _insert(
+        cur, _TICKET_ID_CTE, "tickets",
+        {"id": "valeur", "ticket_code": "'KP-' || " + _padded("valeur", 6)},
+        values, {}, "id, ticket_code",
+    )
+
+
+def resync(cur):
+    cur.execute(RESYNC_SQL)
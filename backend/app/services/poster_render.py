@@ -0,0 +1,162 @@
+"""
+Rendu des affiches de prix (PDF fpdf2) : cache par contenu + pool de process.
+
+Chaque PDF est identifie par le hash de ses lignes (prix, stockages, image,
+updated_at...) et de la version du gabarit : tant que les lignes d'un
+page_group ne changent pas, le PDF est relu depuis le blob store. Apres un
+changement de prix, seul le groupe concerne est re-rendu.
+
+Les rendus manquants partent dans un ProcessPoolExecutor (fpdf2 est du pur
+Python, CPU-bound : les threads se marchent dessus a cause du GIL).
+POSTER_RENDER_PROCESSES=0 force le rendu dans le process courant.
+
+stream_zip() ecrit le ZIP au fil de l'eau : chaque entree est envoyee au
+client des que son PDF est pret.
+"""
+
+import json
+import logging
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator
+
+from app.services.blob_store import blob_store, derived_key
+
+logger = logging.getLogger(__name__)
+
+# A incrementer quand le gabarit d'une affiche change (invalide tous les PDF)
+TEMPLATE_VERSION = 1
+
+_pool = None
+_stats = {"cache_hits": 0, "rendered": 0, "pool_fallbacks": 0}
+
+
+def _processes() -> int:
+    try:
+        return int(os.getenv("POSTER_RENDER_PROCESSES", "") or min(4, os.cpu_count() or 1))
+    except ValueError:
+        return 1
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_processes())
+    return _pool
+
+
+def rows_key(kind: str, rows: list, extra: tuple = ()) -> str:
+    """Cle blob du PDF `kind` pour ces lignes (ordre significatif)."""
+    payload = json.dumps(rows, sort_keys=True, default=str)
+    return derived_key("poster", kind, TEMPLATE_VERSION, payload, *extra)
+
+
+def render_cached(kind: str, rows: list, render: Callable[[list], bytes], extra: tuple = ()) -> bytes:
+    """PDF depuis le cache, ou rendu dans le process courant puis mis en cache."""
+    key = rows_key(kind, rows, extra)
+    pdf = blob_store.get(key)
+    if pdf is not None:
+        _stats["cache_hits"] += 1
+        return pdf
+    pdf = render(rows)
+    blob_store.put(pdf, key=key)
+    _stats["rendered"] += 1
+    return pdf
+
+
+def render_many(jobs: Iterable[tuple], render: Callable[[list], bytes], kind: str) -> Iterator[tuple]:
+    """Rend plusieurs PDF : yield (nom, pdf) au fur et a mesure.
+
+    jobs : iterable de (nom, lignes, extra). Les PDF en cache sortent tout de
+    suite ; les autres sont rendus en parallele dans le pool de process.
+    `render` doit etre une fonction de module (picklable).
+    """
+    misses = []
+    for name, rows, extra in jobs:
+        key = rows_key(kind, rows, extra)
+        pdf = blob_store.get(key)
+        if pdf is not None:
+            _stats["cache_hits"] += 1
+            yield name, pdf
+        else:
+            misses.append((name, rows, key))
+    if not misses:
+        return
+
+    done = set()
+    if _processes() > 0 and len(misses) > 1:
+        try:
+            pool = _get_pool()
+            futures = {pool.submit(render, rows): (name, key) for name, rows, key in misses}
+            for fut in as_completed(futures):
+                name, key = futures[fut]
+                pdf = fut.result()
+                blob_store.put(pdf, key=key)
+                _stats["rendered"] += 1
+                done.add(key)
+                yield name, pdf
+            return
+        except BrokenProcessPool as e:
+            # Process tue (OOM...) : on termine dans le process courant
+            logger.warning("poster render pool HS, rendu sequentiel : %s", e)
+            _reset_pool()
+            _stats["pool_fallbacks"] += 1
+
+    for name, rows, key in misses:
+        if key in done:
+            continue
+        pdf = render(rows)
+        blob_store.put(pdf, key=key)
+        _stats["rendered"] += 1
+        yield name, pdf
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+class _ChunkSink:
+    """Flux non seekable pour zipfile : accumule les octets a envoyer."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks = []
+        return out
+
+
+def stream_zip(entries: Iterable[tuple]) -> Iterator[bytes]:
+    """ZIP streame a partir de (nom, bytes) : une entree envoyee des qu'elle arrive."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def stats() -> dict:
+    return {**_stats, "processes": _processes()}
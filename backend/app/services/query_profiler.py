@@ -0,0 +1,244 @@
+"""
+Profileur de requetes SQL par empreinte (fingerprint).
+
+Beaucoup de requetes sont construites en f-string (listes de tickets,
+catalogue telephones, devis, stats admin) : l'empreinte normalise le texte
+(commentaires, litteraux, nombres, placeholders -> ?, listes IN / ARRAY /
+VALUES reduites a un element, espaces) pour regrouper les executions d'une
+meme forme de requete.
+
+Par empreinte : nombre d'appels, temps total / max, histogrammes bornes
+(seaux fixes) de la latence et des lignes retournees, un exemple de texte,
+et le plan EXPLAIN (sans ANALYZE : rien n'est reexecute) capture quand une
+execution depasse QUERY_PROFILER_SLOW_MS (defaut 200 ms), au plus une fois
+par PLAN_TTL_S. L'EXPLAIN passe par un curseur separe de la meme connexion,
+sous SAVEPOINT, pour ne jamais toucher au resultat ni a la transaction de
+l'appelant.
+
+Actif par defaut, QUERY_PROFILER=0 pour le couper. Le chemin courant (texte
+deja vu) ne coute qu'un lookup de dict et une mise a jour sous verrou :
+voir benchmarks/bench_query_profiler.py.
+"""
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import psycopg2
+import psycopg2.extensions
+
+from app import database
+
+MAX_FINGERPRINTS = 1000
+MAX_TEXTS = 4096
+PLAN_TTL_S = 600
+OVERFLOW = "(autres requetes)"
+
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+ROWS_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Lus une fois : le chemin d'observation ne relit pas l'environnement
+ENABLED = os.getenv("QUERY_PROFILER", "1") != "0"
+SLOW_MS = _env_float("QUERY_PROFILER_SLOW_MS", 200.0)
+
+
+# ─── Empreinte ──────────────────────────────────────────
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"(?:\b[Ee])?'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s")
+_NUMBERS = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+_LIST = r"\?(?:\s*,\s*\?)*"
+_IN_LIST = re.compile(r"\b(IN|ANY)\s*\(\s*" + _LIST + r"\s*\)", re.I)
+_ARRAY = re.compile(r"\bARRAY\s*\[\s*" + _LIST + r"\s*\]", re.I)
+_TUPLES = re.compile(r"(\(\s*" + _LIST + r"\s*\))(?:\s*,\s*\(\s*" + _LIST + r"\s*\))+")
+
+
+def fingerprint(sql: str) -> str:
+    """Forme normalisee d'une requete (litteraux et listes remplaces par ?)."""
+    s = _COMMENTS.sub(" ", sql)
+    s = _STRINGS.sub("?", s)
+    s = _PLACEHOLDERS.sub("?", s)
+    s = _NUMBERS.sub("?", s)
+    s = _SPACES.sub(" ", s).strip()
+    s = _IN_LIST.sub(lambda m: f"{m.group(1)} (?)", s)
+    s = _ARRAY.sub("ARRAY[?]", s)
+    s = _TUPLES.sub(r"\1, ...", s)
+    return s
+
+
+_texts = {}
+
+
+def _fingerprint_cached(sql: str) -> str:
+    fp = _texts.get(sql)
+    if fp is None:
+        if len(_texts) >= MAX_TEXTS:
+            _texts.clear()
+        fp = _texts[sql] = fingerprint(sql)
+    return fp
+
+
+# ─── Statistiques ───────────────────────────────────────
+
+class _Stats:
+    __slots__ = ("count", "total", "max", "latency", "rows", "example", "plan", "plan_at")
+
+    def __init__(self, example: str):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.rows = [0] * (len(ROWS_BUCKETS) + 1)
+        self.example = example[:2000]
+        self.plan = None
+        self.plan_at = 0.0
+
+
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _observe(query, vars, seconds, cur):
+    if not ENABLED or getattr(_local, "busy", False):
+        return
+    if not isinstance(query, str):
+        try:
+            query = query.decode() if isinstance(query, bytes) else query.as_string(cur)
+        except Exception:
+            return
+    fp = _fingerprint_cached(query)
+    ms = seconds * 1000
+    rows = cur.rowcount if cur.rowcount is not None else -1
+    with _lock:
+        st = _stats.get(fp)
+        if st is None:
+            if len(_stats) >= MAX_FINGERPRINTS:
+                fp = OVERFLOW
+                st = _stats.get(fp)
+            if st is None:
+                st = _stats[fp] = _Stats(query)
+        st.count += 1
+        st.total += ms
+        if ms > st.max:
+            st.max = ms
+        st.latency[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        if rows >= 0:
+            st.rows[bisect_left(ROWS_BUCKETS, rows)] += 1
+        want_plan = (ms >= SLOW_MS and fp != OVERFLOW
+                     and time.time() - st.plan_at > PLAN_TTL_S)
+        if want_plan:
+            st.plan_at = time.time()
+    if want_plan:
+        plan = _explain(cur, query, vars)
+        if plan:
+            with _lock:
+                st.plan = plan
+
+
+def _explain(cur, query: str, vars):
+    """Plan estime de `query`, sans effet sur la transaction de l'appelant."""
+    if not query.lstrip()[:6].upper().startswith(_EXPLAINABLE) or ";" in query.rstrip().rstrip(";"):
+        return None
+    conn = getattr(cur, "connection", None)
+    if conn is None or conn.closed:
+        return None
+    if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+        return None
+    _local.busy = True
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as ec:
+            savepoint = not conn.autocommit
+            if savepoint:
+                ec.execute("SAVEPOINT query_profiler")
+            try:
+                ec.execute("EXPLAIN " + query, vars)
+                plan = "\n".join(r[0] for r in ec.fetchall())
+            except psycopg2.Error:
+                plan = None
+            if savepoint:
+                ec.execute("ROLLBACK TO SAVEPOINT query_profiler")
+                ec.execute("RELEASE SAVEPOINT query_profiler")
+            return plan
+    except Exception:
+        return None
+    finally:
+        _local.busy = False
+
+
+_installed = False
+
+
+def install():
+    """Branche le profileur sur app.database (idempotent)."""
+    global _installed
+    if not _installed:
+        database.add_query_observer(_observe)
+        _installed = True
+
+
+# ─── Lecture ────────────────────────────────────────────
+
+def _histogram(bounds, counts, unit=""):
+    labels = [f"<={b}{unit}" for b in bounds] + [f">{bounds[-1]}{unit}"]
+    return {label: n for label, n in zip(labels, counts) if n}
+
+
+def _quantile_bucket(bounds, counts, q: float, unit=""):
+    """Seau contenant le quantile q (estimation a la granularite des seaux)."""
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for i, n in enumerate(counts):
+        seen += n
+        if seen >= q * total:
+            break
+    return f"<={bounds[i]}{unit}" if i < len(bounds) else f">{bounds[-1]}{unit}"
+
+
+_SORTS = {
+    "total": lambda st: st.total,
+    "moyenne": lambda st: st.total / st.count,
+    "max": lambda st: st.max,
+    "appels": lambda st: st.count,
+}
+
+
+def top(tri: str = "total", limit: int = 20) -> list:
+    """Empreintes triees par temps total, moyen, max ou nombre d'appels."""
+    key = _SORTS.get(tri, _SORTS["total"])
+    with _lock:
+        ranked = sorted(((fp, st) for fp, st in _stats.items() if st.count), key=lambda x: key(x[1]), reverse=True)
+        return [{
+            "fingerprint": fp,
+            "appels": st.count,
+            "total_ms": round(st.total, 1),
+            "moyenne_ms": round(st.total / st.count, 2),
+            "max_ms": round(st.max, 1),
+            "p95": _quantile_bucket(LATENCY_BUCKETS_MS, st.latency, 0.95, "ms"),
+            "latence": _histogram(LATENCY_BUCKETS_MS, st.latency, "ms"),
+            "lignes": _histogram(ROWS_BUCKETS, st.rows),
+            "exemple": st.example,
+            "plan": st.plan,
+        } for fp, st in ranked[:limit]]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+    _texts.clear()
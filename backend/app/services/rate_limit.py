@@ -0,0 +1,232 @@
+"""
+Rate limiter partage pour les endpoints publics / sensibles.
+
+Algorithme : sliding window counter. Par cle on garde le compteur de la
+fenetre courante et celui de la precedente ; la charge estimee est
+    prev * (1 - fraction_ecoulee) + curr
+ce qui donne une fenetre glissante en O(1) par verification (au lieu d'une
+deque de timestamps par IP).
+
+Deux backends :
+- memory   : dict LRU borne, par process (defaut, dev / 1 worker)
+- postgres : table UNLOGGED partagee entre workers et replicas, une seule
+             requete par verification. Selection via RATE_LIMIT_BACKEND=postgres.
+             En cas d'erreur DB on retombe sur le backend memoire (fail-open).
+
+Politiques par route dans POLICIES, surchargeables par env var
+RATE_LIMIT_<NOM>="limite/fenetre_secondes" (ex: RATE_LIMIT_PUBLIC="60/60").
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request
+
+from app.database import get_cursor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RatePolicy:
+    limit: int
+    window: int  # secondes
+    message: str = "Trop de requetes — attendez 1 minute avant de reessayer."
+
+
+POLICIES = {
+    # Lookups publics (suivi ticket, vitrine, formulaires) : 30 req/min/IP
+    "public": RatePolicy(30, 60),
+    # Clics vitrine (tracking) : budget separe pour ne pas manger celui du suivi
+    "tracking": RatePolicy(30, 60),
+    # Verification du code admin (anti brute-force) : 5 tentatives / 5 min / IP
+    "admin_verify": RatePolicy(5, 300, "Trop de tentatives. Reessayez dans quelques minutes."),
+}
+
+
+def _policy(name: str) -> RatePolicy:
+    base = POLICIES[name]
+    override = os.getenv(f"RATE_LIMIT_{name.upper()}", "")
+    if override:
+        try:
+            limit, window = override.split("/", 1)
+            return RatePolicy(int(limit), int(window), base.message)
+        except ValueError:
+            logger.warning("RATE_LIMIT_%s invalide : %r", name.upper(), override)
+    return base
+
+
+def client_ip(request: Request) -> str:
+    """IP du client (derriere le proxy Railway -> X-Forwarded-For)."""
+    ip = request.client.host if request.client else "unknown"
+    xff = request.headers.get("x-forwarded-for", "")
+    if xff:
+        ip = xff.split(",")[0].strip()
+    return ip
+
+
+def _estimate(prev: int, curr: int, now: float, window: int) -> float:
+    elapsed = (now % window) / window
+    return prev * (1.0 - elapsed) + curr
+
+
+# ─── Backend memoire ────────────────────────────────────
+
+class MemoryBackend:
+    """Compteurs (fenetre, courant, precedent) par cle, LRU borne."""
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max_keys
+        self._counters: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, policy: RatePolicy, now: float) -> bool:
+        win = int(now // policy.window)
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = [win, 0, 0]
+                self._counters[key] = entry
+                if len(self._counters) > self.max_keys:
+                    # Les cles les moins recemment vues ont des fenetres expirees
+                    self._counters.popitem(last=False)
+            else:
+                self._counters.move_to_end(key)
+            if entry[0] != win:
+                entry[2] = entry[1] if entry[0] == win - 1 else 0
+                entry[1] = 0
+                entry[0] = win
+            if _estimate(entry[2], entry[1], now, policy.window) >= policy.limit:
+                return False
+            entry[1] += 1
+            return True
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+# ─── Backend Postgres ───────────────────────────────────
+
+class PostgresBackend:
+    """Compteurs dans une table UNLOGGED partagee par tous les workers.
+
+    Une requete par verification : l'INSERT ... ON CONFLICT n'incremente la
+    fenetre courante que si l'estimation (courante + precedente ponderee)
+    reste sous la limite ; aucune ligne retournee = requete rejetee.
+    """
+
+    _GC_PROBABILITY = 0.002
+
+    def __init__(self):
+        self._table_checked = False
+
+    def _ensure_table(self, cur):
+        if self._table_checked:
+            return
+        cur.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_counters (
+                key TEXT NOT NULL,
+                win BIGINT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (key, win)
+            )
+        """)
+        self._table_checked = True
+
+    def hit(self, key: str, policy: RatePolicy, now: float) -> bool:
+        # win = debut de la fenetre en secondes epoch (comparable entre politiques)
+        win = int(now // policy.window) * policy.window
+        weight = 1.0 - (now - win) / policy.window
+        with get_cursor() as cur:
+            self._ensure_table(cur)
+            cur.execute("""
+                INSERT INTO rate_limit_counters AS r (key, win, hits)
+                SELECT %(key)s, %(win)s, 1
+                WHERE COALESCE((SELECT hits FROM rate_limit_counters
+                                WHERE key = %(key)s AND win = %(win)s), 0)
+                    + COALESCE((SELECT hits FROM rate_limit_counters
+                                WHERE key = %(key)s AND win = %(prev)s), 0) * %(weight)s
+                    < %(limit)s
+                ON CONFLICT (key, win) DO UPDATE SET hits = r.hits + 1
+                RETURNING hits
+            """, {
+                "key": key, "win": win, "prev": win - policy.window,
+                "weight": weight, "limit": policy.limit,
+            })
+            allowed = cur.fetchone() is not None
+            if random.random() < self._GC_PROBABILITY:
+                # Purge des fenetres expirees (plus vieilles que la plus longue politique)
+                cur.execute(
+                    "DELETE FROM rate_limit_counters WHERE win < %s",
+                    (int(now) - 2 * max(p.window for p in POLICIES.values()),),
+                )
+        return allowed
+
+
+# ─── Facade ─────────────────────────────────────────────
+
+_memory = MemoryBackend()
+_postgres = PostgresBackend()
+_metrics: dict = {}
+_metrics_lock = threading.Lock()
+
+
+def _backend():
+    if os.getenv("RATE_LIMIT_BACKEND", "memory").lower() == "postgres":
+        return _postgres
+    return _memory
+
+
+def _count(name: str, allowed: bool):
+    with _metrics_lock:
+        m = _metrics.setdefault(name, {"allowed": 0, "rejected": 0, "backend_errors": 0})
+        m["allowed" if allowed else "rejected"] += 1
+
+
+def check(name: str, key: str) -> bool:
+    """True si la requete passe pour la politique `name` et la cle `key`."""
+    policy = _policy(name)
+    now = time.time()
+    bucket = f"{name}:{key}"
+    backend = _backend()
+    try:
+        allowed = backend.hit(bucket, policy, now)
+    except Exception as e:
+        if backend is _memory:
+            raise
+        logger.warning("rate limit backend postgres KO, fallback memoire : %s", e)
+        with _metrics_lock:
+            _metrics.setdefault(name, {"allowed": 0, "rejected": 0, "backend_errors": 0})["backend_errors"] += 1
+        allowed = _memory.hit(bucket, policy, now)
+    _count(name, allowed)
+    return allowed
+
+
+def enforce(request: Request, name: str):
+    """Raise 429 (avec Retry-After) si l'IP depasse la politique `name`."""
+    if not check(name, client_ip(request)):
+        policy = _policy(name)
+        raise HTTPException(429, policy.message, headers={"Retry-After": str(policy.window)})
+
+
+def stats() -> dict:
+    """Compteurs acceptes / rejetes par politique."""
+    with _metrics_lock:
+        counters = {k: dict(v) for k, v in _metrics.items()}
+    return {
+        "backend": "postgres" if _backend() is _postgres else "memory",
+        "policies": {
+            name: {
+                "limit": _policy(name).limit,
+                "window": _policy(name).window,
+                **counters.get(name, {"allowed": 0, "rejected": 0, "backend_errors": 0}),
+            }
+            for name in POLICIES
+        },
+    }
@@ -0,0 +1,261 @@
+"""
+Instrumentation par requete HTTP.
+
+Pour chaque requete echantillonnee (PERF_SAMPLE_RATE, 0..1, defaut 1) :
+- temps total du handler (jusqu'au debut de la reponse) ;
+- attente de connexion du pool, nombre de requetes SQL et temps SQL cumule
+  (observateurs de app.database : tout curseur du pool est compte, y compris
+  SET statement_timeout et le ping de validation) ;
+- temps des appels HTTP sortants par service (Discord, Resend, caisse,
+  Anthropic...), via les transports httpx (SDK anthropic compris).
+
+Le resultat part dans un en-tete Server-Timing, une ligne de log JSON
+(logger klikphone.perf) et des agregats par route (reservoir borne des
+dernieres durees) lus par GET /api/admin/perf. Les BackgroundTasks qui
+tournent apres l'envoi de la reponse ne sont pas comptees.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import sys
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from app import database
+
+logger = logging.getLogger("klikphone.perf")
+
+RESERVOIR = 512
+MAX_ROUTES = 500
+
+# Sous-chaine de l'hote -> libelle Server-Timing
+HTTP_LABELS = (
+    ("discord", "discord"),
+    ("resend", "resend"),
+    ("caisse", "caisse"),
+    ("anthropic", "anthropic"),
+)
+
+
+def sample_rate() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.getenv("PERF_SAMPLE_RATE", "1"))))
+    except ValueError:
+        return 1.0
+
+
+class Metrics:
+    __slots__ = ("started", "pool_wait", "queries", "db_time", "http")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.pool_wait = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.http = {}  # libelle -> [nombre, secondes]
+
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+# ─── Collecte ───────────────────────────────────────────
+
+def _on_query(query, vars, seconds, cur):
+    m = _current.get()
+    if m is not None:
+        m.queries += 1
+        m.db_time += seconds
+
+
+def _on_checkout(seconds):
+    m = _current.get()
+    if m is not None:
+        m.pool_wait += seconds
+
+
+def http_label(url) -> str:
+    host = urlsplit(str(url)).hostname or ""
+    for needle, label in HTTP_LABELS:
+        if needle in host:
+            return label
+    return "http"
+
+
+def record_http(url, seconds: float):
+    m = _current.get()
+    if m is not None:
+        entry = m.http.setdefault(http_label(url), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def _patch_httpx():
+    """Instrumente les transports httpx s'ils sont deja importes.
+
+    httpx est importe a la premiere utilisation (pas au demarrage) : begin()
+    rappelle cette fonction tant que le module n'est pas charge.
+    """
+    global _httpx_patched
+    httpx = sys.modules.get("httpx")
+    if httpx is None:
+        return
+    _httpx_patched = True
+    if getattr(httpx.HTTPTransport, "_perf_patched", False):
+        return
+    sync_handle = httpx.HTTPTransport.handle_request
+    async_handle = httpx.AsyncHTTPTransport.handle_async_request
+
+    def handle_request(self, request):
+        t0 = time.perf_counter()
+        try:
+            return sync_handle(self, request)
+        finally:
+            record_http(request.url, time.perf_counter() - t0)
+
+    async def handle_async_request(self, request):
+        t0 = time.perf_counter()
+        try:
+            return await async_handle(self, request)
+        finally:
+            record_http(request.url, time.perf_counter() - t0)
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+    httpx.HTTPTransport._perf_patched = True
+
+
+_installed = False
+_httpx_patched = False
+
+
+def install():
+    """Branche les observateurs DB et httpx (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    database.add_query_observer(_on_query)
+    database.add_checkout_observer(_on_checkout)
+    _patch_httpx()
+    _installed = True
+
+
+# ─── Cycle de requete ───────────────────────────────────
+
+def begin():
+    """Demarre la mesure si la requete est echantillonnee ; retourne un jeton ou None."""
+    if not _httpx_patched:
+        _patch_httpx()
+    rate = sample_rate()
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None
+    m = Metrics()
+    return m, _current.set(m)
+
+
+def server_timing(m: Metrics, total: float) -> str:
+    parts = [
+        f"app;dur={total * 1000:.1f}",
+        f'db;dur={m.db_time * 1000:.1f};desc="{m.queries} req"',
+        f"pool;dur={m.pool_wait * 1000:.1f}",
+    ]
+    for label, (n, secs) in sorted(m.http.items()):
+        parts.append(f'{label};dur={secs * 1000:.1f};desc="{n} appel(s)"')
+    return ", ".join(parts)
+
+
+def route_key(request) -> str:
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or "(hors route)"
+    return f"{request.method} {path}"
+
+
+def end(token, request, response):
+    """Termine la mesure : en-tete Server-Timing, log JSON, agregats."""
+    if token is None:
+        return
+    m, ctx_token = token
+    total = time.perf_counter() - m.started
+    try:
+        _current.reset(ctx_token)
+    except ValueError:
+        pass
+    key = route_key(request)
+    if response is not None:
+        response.headers["Server-Timing"] = server_timing(m, total)
+    _record(key, total, m)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            "route": key,
+            "status": getattr(response, "status_code", 500),
+            "ms": round(total * 1000, 1),
+            "db_ms": round(m.db_time * 1000, 1),
+            "requetes": m.queries,
+            "pool_ms": round(m.pool_wait * 1000, 1),
+            "http_ms": {k: round(v[1] * 1000, 1) for k, v in m.http.items()},
+        }))
+
+
+# ─── Agregats par route ─────────────────────────────────
+
+class _RouteStats:
+    __slots__ = ("count", "durations", "queries", "db_time")
+
+    def __init__(self):
+        self.count = 0
+        self.durations = deque(maxlen=RESERVOIR)
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_routes = {}
+_lock = threading.Lock()
+
+
+def _record(key: str, total: float, m: Metrics):
+    with _lock:
+        st = _routes.get(key)
+        if st is None:
+            if len(_routes) >= MAX_ROUTES:
+                return
+            st = _routes[key] = _RouteStats()
+        st.count += 1
+        st.durations.append(total)
+        st.queries += m.queries
+        st.db_time += m.db_time
+
+
+def _percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(p * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def top(by: str = "p95", limit: int = 20) -> list:
+    """Routes triees par p95 ("p95") ou par requetes SQL moyennes ("requetes")."""
+    rows = []
+    with _lock:
+        items = [(k, st.count, sorted(st.durations), st.queries, st.db_time) for k, st in _routes.items()]
+    for key, count, durations, queries, db_time in items:
+        rows.append({
+            "route": key,
+            "appels": count,
+            "p50_ms": round(_percentile(durations, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(durations, 0.95) * 1000, 1),
+            "max_ms": round((durations[-1] if durations else 0) * 1000, 1),
+            "requetes_moy": round(queries / count, 1) if count else 0,
+            "db_ms_moy": round(db_time / count * 1000, 1) if count else 0,
+        })
+    sort_key = "requetes_moy" if by == "requetes" else "p95_ms"
+    rows.sort(key=lambda r: r[sort_key], reverse=True)
+    return rows[:limit]
+
+
+def reset():
+    with _lock:
+        _routes.clear()
@@ -551,6 +551,9 @@ def sync_telephones_lcdphone() -> dict:
                           p["das"], p["image_url"], p["source_url"]))
                     inserted += 1
 
+            # Nouvelle version du catalogue, committee avec les donnees
+            from app.services import telephones_catalog
+            telephones_catalog.invalidate(cur)
             cur.close()
             # conn.commit() is called automatically by get_db() on success
 
@@ -0,0 +1,274 @@
+"""
+Orchestrateur de demarrage : taches d'init declarees avec dependances.
+
+Le lifespan ne bloque plus le boot : boot.start() lance les taches dans un
+thread de coordination et uvicorn sert /health immediatement. Les taches
+independantes tournent en parallele (WORKERS threads, borne bien en dessous
+du maxconn du pool), chacune bornee par son timeout ; une tache en echec ou
+hors delai est journalisee et ne bloque pas ses dependantes (meme politique
+que l'ancien lifespan : avertissement, puis on continue).
+
+Portes de disponibilite : une tache ouvre une ou plusieurs portes ("schema",
+"tarifs"...). Les routers concernes sont montes avec
+dependencies=[requires("schema")] : 503 + Retry-After tant qu'une tache de
+la porte n'est pas terminee. Hors boot (tests, scripts), tout est pret.
+
+Chaque boot journalise sa chronologie (logger klikphone.startup) ; lue
+aussi par GET /health/db et GET /api/admin/demarrage.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from fastapi import Depends, HTTPException
+
+from app.database import get_db
+
+logger = logging.getLogger("klikphone.startup")
+
+WORKERS = int(os.getenv("STARTUP_WORKERS", "4"))
+DEFAULT_TIMEOUT_S = 60.0
+RETRY_AFTER_S = 2
+
+PENDING, RUNNING, OK, ERROR, TIMEOUT = "attente", "en_cours", "ok", "erreur", "hors_delai"
+_DONE = (OK, ERROR, TIMEOUT)
+
+
+class Task:
+    __slots__ = ("name", "fn", "deps", "timeout", "gates", "state", "started", "ended", "error")
+
+    def __init__(self, name, fn, deps=(), timeout=DEFAULT_TIMEOUT_S, gates=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.gates = tuple(gates)
+        self.state = PENDING
+        self.started = None
+        self.ended = None
+        self.error = None
+
+
+class Boot:
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self.tasks = {}
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._ready = True  # hors boot : tout est disponible
+        self._pending_gates = {}
+
+    # ─── Declaration ────────────────────────────────────
+
+    def add(self, name, fn, deps=(), timeout=DEFAULT_TIMEOUT_S, gates=()):
+        if name in self.tasks:
+            raise ValueError(f"tache de demarrage en double : {name}")
+        self.tasks[name] = Task(name, fn, deps, timeout, gates)
+        return fn
+
+    def task(self, name, deps=(), timeout=DEFAULT_TIMEOUT_S, gates=()):
+        """Decorateur : @boot.task("tables", deps=("kill_idle",), gates=("schema",))."""
+        def register(fn):
+            return self.add(name, fn, deps, timeout, gates)
+        return register
+
+    def _check_graph(self):
+        for t in self.tasks.values():
+            missing = [d for d in t.deps if d not in self.tasks]
+            if missing:
+                raise ValueError(f"{t.name} : dependance inconnue {missing}")
+        seen, stack = set(), set()
+
+        def visit(name):
+            if name in stack:
+                raise ValueError(f"cycle de dependances via {name}")
+            if name not in seen:
+                stack.add(name)
+                for d in self.tasks[name].deps:
+                    visit(d)
+                stack.discard(name)
+                seen.add(name)
+
+        for name in self.tasks:
+            visit(name)
+
+    # ─── Execution ──────────────────────────────────────
+
+    def start(self):
+        """Lance le boot en arriere-plan (retour immediat)."""
+        self._check_graph()
+        with self._lock:
+            for t in self.tasks.values():
+                t.state, t.started, t.ended, t.error = PENDING, None, None, None
+            self._pending_gates = {}
+            for t in self.tasks.values():
+                for g in t.gates:
+                    self._pending_gates.setdefault(g, set()).add(t.name)
+            self._ready = not self.tasks
+            self._done.clear()
+            self.started = time.perf_counter()
+            self.finished = None
+        if not self.tasks:
+            self._done.set()
+            return
+        threading.Thread(target=self._coordinate, daemon=True, name="startup").start()
+
+    def _execute(self, t: Task):
+        t.started = time.perf_counter()
+        t.state = RUNNING
+        t.fn()
+
+    def _finish(self, t: Task, state: str, error=None):
+        with self._lock:
+            if t.state in _DONE:
+                return
+            t.state = state
+            t.ended = time.perf_counter()
+            t.error = error
+            for g in t.gates:
+                waiting = self._pending_gates.get(g)
+                if waiting is not None:
+                    waiting.discard(t.name)
+                    if not waiting:
+                        del self._pending_gates[g]
+        if state == ERROR:
+            logger.warning("demarrage %s : %s", t.name, error)
+            print(f"Warning startup {t.name}: {error}")
+        elif state == TIMEOUT:
+            logger.warning("demarrage %s : hors delai (%.0f s), on continue", t.name, t.timeout)
+            print(f"Warning startup {t.name}: timeout {t.timeout:.0f}s")
+
+    def _coordinate(self):
+        submitted = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="startup")
+        try:
+            while True:
+                for t in self.tasks.values():
+                    if t.name not in submitted and t.state == PENDING and all(
+                        self.tasks[d].state in _DONE for d in t.deps
+                    ):
+                        submitted[t.name] = executor.submit(self._execute, t)
+                running = {f: n for n, f in submitted.items() if self.tasks[n].state not in _DONE}
+                if not running:
+                    if all(t.state in _DONE for t in self.tasks.values()):
+                        break
+                    continue
+                now = time.perf_counter()
+                deadlines = [self.tasks[n].started + self.tasks[n].timeout
+                             for n in running.values() if self.tasks[n].started is not None]
+                wait_s = max(0.0, min(deadlines) - now) if deadlines else 0.05
+                done, _ = wait(running, timeout=min(wait_s, 1.0), return_when=FIRST_COMPLETED)
+                for f in done:
+                    t = self.tasks[running[f]]
+                    exc = f.exception()
+                    self._finish(t, OK if exc is None else ERROR, None if exc is None else repr(exc))
+                now = time.perf_counter()
+                for n in running.values():
+                    t = self.tasks[n]
+                    if t.state == RUNNING and t.started is not None and now - t.started > t.timeout:
+                        # Le thread continue en fond ; ses dependantes sont liberees
+                        self._finish(t, TIMEOUT)
+        finally:
+            executor.shutdown(wait=False)
+            with self._lock:
+                self.finished = time.perf_counter()
+                self._ready = True
+                self._pending_gates = {}
+            self._done.set()
+            self._log_timeline()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Attend la fin du boot (scripts, bancs de charge)."""
+        return self._done.wait(timeout)
+
+    # ─── Lecture ────────────────────────────────────────
+
+    def pending(self, gates=None) -> list:
+        """Portes encore fermees (toutes, ou parmi `gates`)."""
+        if self._ready:
+            return []
+        with self._lock:
+            if gates is None:
+                return sorted(self._pending_gates)
+            return [g for g in gates if g in self._pending_gates]
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def timeline(self) -> list:
+        t0 = self.started
+        rows = []
+        for t in sorted(self.tasks.values(), key=lambda t: (t.started is None, t.started or 0)):
+            rows.append({
+                "tache": t.name,
+                "etat": t.state,
+                "debut_ms": round((t.started - t0) * 1000) if t0 and t.started else None,
+                "duree_ms": round((t.ended - t.started) * 1000) if t.started and t.ended else None,
+                "dependances": list(t.deps),
+                "portes": list(t.gates),
+                "erreur": t.error,
+            })
+        return rows
+
+    def status(self) -> dict:
+        return {
+            "pret": self._ready,
+            "portes_en_attente": self.pending(),
+            "duree_ms": round((self.finished - self.started) * 1000) if self.started and self.finished else None,
+            "taches": self.timeline(),
+        }
+
+    def _log_timeline(self):
+        total = (self.finished - self.started) * 1000
+        lines = [f"Demarrage termine en {total:.0f} ms ({self.workers} workers)"]
+        for row in self.timeline():
+            lines.append(
+                f"  {row['debut_ms'] if row['debut_ms'] is not None else '-':>6} ms "
+                f"+{row['duree_ms'] if row['duree_ms'] is not None else '-':>6} ms  "
+                f"{row['etat']:<10} {row['tache']}"
+            )
+        print("\n".join(lines))
+        logger.info("\n".join(lines))
+
+
+boot = Boot()
+
+
+def requires(*gates):
+    """Dependance FastAPI : 503 tant qu'une des portes n'est pas ouverte."""
+    def check():
+        if boot.ready:
+            return
+        waiting = boot.pending(gates)
+        if waiting:
+            raise HTTPException(
+                503,
+                f"Démarrage en cours ({', '.join(waiting)}), réessayer dans quelques secondes",
+                headers={"Retry-After": str(RETRY_AFTER_S)},
+            )
+    check.gates = gates
+    return Depends(check)
+
+
+def run_statements(label: str, statements, lock_timeout: str = None):
+    """Execute une liste de DDL sur une seule connexion, une transaction par
+    requete (un echec n'annule pas les suivantes)."""
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET statement_timeout = '30s'")
+            conn.commit()
+            for sql in statements:
+                try:
+                    if lock_timeout:
+                        cur.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+                    cur.execute(sql)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Warning {label}: {e}")
@@ -0,0 +1,179 @@
+"""
+Catalogue tarifs en memoire pour la recherche Devis Flash et l'autocomplete.
+
+La table tarifs est petite et ne change qu'a l'import / recalcul / toggle
+stock / vidage, mais elle etait interrogee a chaque frappe au comptoir
+(ILIKE '%q%' sans LIMIT). On garde un snapshot par process :
+- modeles pre-groupes avec leurs reparations (ordre marque, modele, piece, qualite)
+- index trigrammes sur marque / modele -> recherche sous-chaine sans scan complet
+
+Invalidation versionnee : chaque ecriture appelle invalidate(), qui jette le
+snapshot local et ecrit un nouveau jeton dans params (TARIFS_CATALOG_VERSION).
+Les autres workers relisent ce jeton au plus toutes les VERSION_CHECK_S
+secondes (lookup par cle primaire) et reconstruisent si besoin.
+"""
+
+import logging
+import threading
+import time
+
+from app.database import get_cursor
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "TARIFS_CATALOG_VERSION"
+VERSION_CHECK_S = 5.0
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _Snapshot:
+    __slots__ = ("version", "models", "grams", "built_ms")
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.models = []
+        self.grams = {}
+        t0 = time.perf_counter()
+        index = {}
+        for r in rows:
+            key = (r["marque"], r["modele"])
+            model = index.get(key)
+            if model is None:
+                model = {
+                    "marque": r["marque"],
+                    "modele": r["modele"],
+                    "reparations": [],
+                    "_marque": (r["marque"] or "").lower(),
+                    "_modele": (r["modele"] or "").lower(),
+                }
+                index[key] = model
+                self.models.append(model)
+            model["reparations"].append({
+                "composant": r["type_piece"],
+                "qualite": r["qualite"] or None,
+                "prix_vente": float(r["prix_client"] or 0),
+                "en_stock": bool(r.get("en_stock", True)),
+            })
+        for i, m in enumerate(self.models):
+            for g in _trigrams(m["_marque"]) | _trigrams(m["_modele"]):
+                self.grams.setdefault(g, set()).add(i)
+        self.built_ms = (time.perf_counter() - t0) * 1000
+
+    def _candidates(self, q: str):
+        """Indices des modeles pouvant contenir q (marque ou modele)."""
+        if len(q) < 3:
+            return range(len(self.models))
+        postings = []
+        for g in _trigrams(q):
+            p = self.grams.get(g)
+            if not p:
+                return ()
+            postings.append(p)
+        postings.sort(key=len)
+        ids = set(postings[0])
+        for p in postings[1:]:
+            ids &= p
+        return sorted(ids)
+
+    def search(self, q: str, modele_only: bool = False):
+        q = q.lower()
+        out = []
+        for i in self._candidates(q):
+            m = self.models[i]
+            if q in m["_modele"] or (not modele_only and q in m["_marque"]):
+                out.append(m)
+        return out
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _read_db_version(cur) -> str:
+    cur.execute("SELECT valeur FROM params WHERE cle = %s", (VERSION_KEY,))
+    row = cur.fetchone()
+    return (row["valeur"] if row else "") or ""
+
+
+def _load():
+    with get_cursor() as cur:
+        version = _read_db_version(cur)
+        cur.execute("""
+            SELECT marque, modele, type_piece, qualite, prix_client, en_stock
+            FROM tarifs
+            ORDER BY marque, modele, type_piece, qualite
+        """)
+        rows = cur.fetchall() or []
+    snap = _Snapshot(rows, version)
+    logger.info("tarifs_catalog : %d modeles indexes en %.1f ms", len(snap.models), snap.built_ms)
+    return snap
+
+
+def get_snapshot() -> _Snapshot:
+    """Snapshot courant, reconstruit si invalide localement ou par un autre worker."""
+    global _snapshot, _checked_at
+    now = time.time()
+    snap = _snapshot
+    if snap is not None and now - _checked_at < VERSION_CHECK_S:
+        return snap
+    with _lock:
+        snap = _snapshot
+        if snap is not None and now - _checked_at < VERSION_CHECK_S:
+            return snap
+        if snap is not None:
+            with get_cursor() as cur:
+                if _read_db_version(cur) == snap.version:
+                    _checked_at = now
+                    return snap
+        snap = _load()
+        _snapshot = snap
+        _checked_at = time.time()
+        return snap
+
+
+def invalidate(cur=None):
+    """A appeler apres toute ecriture sur tarifs (import, recalcul, stock, vidage).
+
+    Si `cur` est fourni, le nouveau jeton de version est ecrit dans la meme
+    transaction que la modification.
+    """
+    global _snapshot
+    token = str(time.time_ns())
+    sql = """INSERT INTO params (cle, valeur) VALUES (%s, %s)
+             ON CONFLICT (cle) DO UPDATE SET valeur = EXCLUDED.valeur"""
+    try:
+        if cur is not None:
+            cur.execute(sql, (VERSION_KEY, token))
+        else:
+            with get_cursor() as c:
+                c.execute(sql, (VERSION_KEY, token))
+    except Exception as e:
+        logger.warning("tarifs_catalog version bump: %s", e)
+    with _lock:
+        _snapshot = None
+
+
+def _public(model: dict) -> dict:
+    return {"marque": model["marque"], "modele": model["modele"], "reparations": model["reparations"]}
+
+
+def search_models(q: str, limit: int) -> list:
+    """Modeles dont la marque ou le modele contient q, avec leurs reparations."""
+    return [_public(m) for m in get_snapshot().search(q)[:limit]]
+
+
+def matching_modeles(q: str) -> list:
+    """(modele, marque) distincts dont le modele contient q, tries par modele."""
+    seen = set()
+    out = []
+    for m in get_snapshot().search(q, modele_only=True):
+        key = (m["modele"], m["marque"])
+        if key not in seen:
+            seen.add(key)
+            out.append(key)
+    out.sort(key=lambda k: k[0])
+    return out
@@ -0,0 +1,230 @@
+"""
+Recherche a facettes dans le catalogue telephones (LCD-Phone).
+
+Une seule requete par recherche : page, total et compteurs de facettes
+(marque, grade, type_produit, en_stock) calcules sur le meme ensemble de
+lignes (CTE materialisee). Chaque facette compte avec les autres filtres
+appliques mais pas le sien, pour afficher les alternatives.
+
+Le catalogue ne change qu'a la synchronisation : total et facettes sont
+mis en cache par (version du catalogue, filtres). La sync ecrit un nouveau
+jeton dans params (TELEPHONES_CATALOG_VERSION) dans sa transaction ; les
+workers relisent ce jeton au plus toutes les VERSION_CHECK_S secondes.
+Une page suivante avec les memes filtres ne relit donc que ses lignes.
+"""
+
+import logging
+import threading
+import time
+
+from app.database import get_cursor
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "TELEPHONES_CATALOG_VERSION"
+VERSION_CHECK_S = 5.0
+MAX_ENTRIES = 512
+
+INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_telephones_modele_trgm ON telephones_catalogue USING gin (modele gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_telephones_marque_trgm ON telephones_catalogue USING gin (marque gin_trgm_ops)",
+    # Lignes affichables uniquement, dans l'ordre de tri par defaut
+    """CREATE INDEX IF NOT EXISTS idx_telephones_vitrine
+       ON telephones_catalogue (marque, modele, stockage)
+       WHERE actif = TRUE AND prix_vente > 0""",
+]
+
+COLUMNS = (
+    "id, marque, modele, stockage, couleur, grade, type_produit, "
+    "prix_vente, en_stock, stock_fournisseur, image_url, garantie_mois"
+)
+
+BASE_WHERE = (
+    "actif = TRUE AND modele IS NOT NULL AND modele != '' AND prix_vente IS NOT NULL "
+    "AND prix_vente > 0 AND marque IS NOT NULL AND marque != ''"
+)
+
+# id en dernier : ordre total, sinon les ex aequo changent de place entre la
+# page 1 (CTE + row_number) et les suivantes (LIMIT / OFFSET seul) et des
+# lignes sont doublees ou sautees.
+ORDERS = {
+    "marque": "marque, modele, stockage, id",
+    "prix_asc": "prix_vente ASC NULLS LAST, id",
+    "prix_desc": "prix_vente DESC NULLS LAST, id",
+    "nouveautes": "derniere_sync DESC, id",
+}
+DEFAULT_ORDER = "marque, modele, id"
+
+FACETS = ("marque", "grade", "type_produit", "en_stock")
+
+
+def ensure_indexes(cur):
+    for sql in INDEX_SQL:
+        cur.execute(sql)
+
+
+# ─── Version du catalogue ───────────────────────────────
+
+_version = None
+_checked_at = 0.0
+_entries = {}
+_lock = threading.Lock()
+
+
+def _read_db_version(cur) -> str:
+    cur.execute("SELECT valeur FROM params WHERE cle = %s", (VERSION_KEY,))
+    row = cur.fetchone()
+    return (row["valeur"] if row else "") or ""
+
+
+def version() -> str:
+    """Jeton de version courant ; vide le cache local s'il a change."""
+    global _version, _checked_at
+    now = time.time()
+    if _version is not None and now - _checked_at < VERSION_CHECK_S:
+        return _version
+    with get_cursor() as cur:
+        v = _read_db_version(cur)
+    with _lock:
+        if v != _version:
+            _entries.clear()
+            _version = v
+        _checked_at = now
+    return v
+
+
+def invalidate(cur=None):
+    """A appeler par la synchronisation (avec son curseur : meme transaction)."""
+    global _version
+    token = str(time.time_ns())
+    sql = """INSERT INTO params (cle, valeur) VALUES (%s, %s)
+             ON CONFLICT (cle) DO UPDATE SET valeur = EXCLUDED.valeur"""
+    try:
+        if cur is not None:
+            cur.execute(sql, (VERSION_KEY, token))
+        else:
+            with get_cursor() as c:
+                c.execute(sql, (VERSION_KEY, token))
+    except Exception as e:
+        logger.warning("telephones_catalog version bump: %s", e)
+    with _lock:
+        _entries.clear()
+        _version = None
+
+
+def _get(key):
+    with _lock:
+        return _entries.get((_version, key))
+
+
+def _set(key, value):
+    with _lock:
+        if len(_entries) >= MAX_ENTRIES:
+            _entries.clear()
+        _entries[(_version, key)] = value
+
+
+def cached(key, loader):
+    """Valeur de `key` pour la version courante du catalogue (loader() sinon)."""
+    version()
+    value = _get(key)
+    if value is None:
+        value = loader()
+        _set(key, value)
+    return value
+
+
+# ─── Recherche ──────────────────────────────────────────
+
+def _conditions(marque, type_produit, grade, en_stock, search):
+    """WHERE commun (recherche incluse) + un predicat par facette filtree."""
+    where = BASE_WHERE
+    params = {}
+    if search:
+        where += " AND (modele ILIKE %(search)s OR marque ILIKE %(search)s)"
+        params["search"] = f"%{search}%"
+    preds = {}
+    for facet, value in (("marque", marque), ("type_produit", type_produit),
+                         ("grade", grade), ("en_stock", en_stock)):
+        if value is not None and value != "":
+            preds[facet] = f"{facet} = %({facet})s"
+            params[facet] = value
+    return where, preds, params
+
+
+def _facets_sql(preds: dict) -> str:
+    branches = []
+    for facet in FACETS:
+        others = [p for f, p in preds.items() if f != facet] or ["TRUE"]
+        branches.append(
+            f"SELECT '{facet}' AS facette, to_jsonb({facet}) AS valeur, COUNT(*) AS nb "
+            f"FROM base WHERE {' AND '.join(others)} GROUP BY {facet}"
+        )
+    return "\n            UNION ALL ".join(branches)
+
+
+def _facets(rows) -> dict:
+    out = {f: [] for f in FACETS}
+    for r in rows or []:
+        out[r["facette"]].append({"valeur": r["valeur"], "nb": r["nb"]})
+    for values in out.values():
+        values.sort(key=lambda v: (-v["nb"], str(v["valeur"])))
+    return out
+
+
+def search(marque=None, type_produit=None, grade=None, en_stock=None, search=None,
+           tri="marque", page=1, limit=24) -> dict:
+    """Page de resultats + total + facettes, en une requete.
+
+    Si total et facettes sont deja en cache pour ces filtres, seule la page
+    est lue. Les lignes retournees gardent les types SQL (Decimal...).
+    """
+    where, preds, params = _conditions(marque, type_produit, grade, en_stock, search)
+    hits = " AND ".join(preds.values()) or "TRUE"
+    order = ORDERS.get(tri, DEFAULT_ORDER)
+    key = ("counts",) + tuple(sorted(params.items()))
+    params.update(limit=limit, offset=(page - 1) * limit)
+
+    version()
+    counts = _get(key)
+    with get_cursor() as cur:
+        if counts is not None:
+            cur.execute(
+                f"SELECT {COLUMNS} FROM telephones_catalogue "
+                f"WHERE {where} AND {hits} ORDER BY {order} LIMIT %(limit)s OFFSET %(offset)s",
+                params,
+            )
+            items = cur.fetchall()
+        else:
+            cur.execute(f"""
+                WITH base AS MATERIALIZED (
+                    SELECT {COLUMNS}, derniere_sync FROM telephones_catalogue WHERE {where}
+                ),
+                page AS (
+                    SELECT {COLUMNS}, row_number() OVER (ORDER BY {order}) AS rang
+                    FROM base WHERE {hits}
+                    ORDER BY {order} LIMIT %(limit)s OFFSET %(offset)s
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM base WHERE {hits}) AS total,
+                    (SELECT COALESCE(jsonb_agg(to_jsonb(page) - 'rang' ORDER BY rang), '[]'::jsonb)
+                     FROM page) AS items,
+                    (SELECT jsonb_agg(f) FROM (
+                        {_facets_sql(preds)}
+                    ) f) AS facettes
+            """, params)
+            row = cur.fetchone()
+            items = row["items"]
+            counts = {"total": row["total"], "facettes": _facets(row["facettes"])}
+            _set(key, counts)
+
+    total = counts["total"]
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": max(1, (total + limit - 1) // limit),
+        "facettes": counts["facettes"],
+    }
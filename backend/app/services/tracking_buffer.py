@@ -0,0 +1,174 @@
+"""
+Buffer d'ingestion des events de tracking publics.
+
+Les clics vitrine (POST /api/tracking/event) ne font plus un INSERT + commit
+chacun : ils sont accumules en memoire puis ecrits par lots (INSERT multi-lignes)
+toutes les FLUSH_EVENTS lignes ou toutes les FLUSH_MS millisecondes, par un
+thread daemon. Le buffer est vide proprement a l'arret (lifespan).
+
+Back-pressure : si le buffer atteint MAX_PENDING (DB lente ou indisponible),
+l'appelant flush lui-meme en synchrone ; si ca ne libere pas de place, l'event
+est rejete et compte dans `dropped`.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from app.database import get_cursor
+
+logger = logging.getLogger(__name__)
+
+FLUSH_EVENTS = 200      # flush des qu'on a N events en attente
+FLUSH_MS = 2000         # ... ou au plus tard toutes les T ms
+MAX_PENDING = 5000      # au-dela : back-pressure puis rejet
+
+_INSERT_PREFIX = (
+    "INSERT INTO tracking_events (event_type, source, target, ip_hash, created_at) VALUES "
+)
+_ROW_PLACEHOLDER = "(%s, %s, %s, %s, %s)"
+
+
+class TrackingBuffer:
+    def __init__(self, flush_events=FLUSH_EVENTS, flush_ms=FLUSH_MS, max_pending=MAX_PENDING):
+        self.flush_events = flush_events
+        self.flush_ms = flush_ms
+        self.max_pending = max_pending
+        self._pending: list = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._counters = {
+            "accepted": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "batches": 0,
+            "flush_errors": 0,
+            "backpressure_flushes": 0,
+        }
+        self._last_flush_ms = 0.0
+        self._last_flush_at = None
+
+    # ─── Ingestion ──────────────────────────────────────
+
+    def add(self, event_type: str, source, target, ip_hash: str) -> bool:
+        """Ajoute un event au buffer. Retourne False si rejete (buffer plein)."""
+        row = (event_type, source, target, ip_hash, datetime.now())
+        with self._lock:
+            if len(self._pending) < self.max_pending:
+                self._pending.append(row)
+                self._counters["accepted"] += 1
+                size = len(self._pending)
+                row = None
+        if row is not None:
+            # Buffer plein : l'appelant paie le flush (back-pressure)
+            with self._lock:
+                self._counters["backpressure_flushes"] += 1
+            self.flush()
+            with self._lock:
+                if len(self._pending) >= self.max_pending:
+                    self._counters["dropped"] += 1
+                    return False
+                self._pending.append(row)
+                self._counters["accepted"] += 1
+                size = len(self._pending)
+
+        self._ensure_thread()
+        if size >= self.flush_events:
+            self._wakeup.set()
+        return True
+
+    # ─── Flush ──────────────────────────────────────────
+
+    def flush(self) -> int:
+        """Ecrit tous les events en attente en un INSERT multi-lignes par lot.
+
+        En cas d'erreur DB, les lignes sont remises en tete du buffer (dans la
+        limite de max_pending, le surplus est compte dans `dropped`).
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            t0 = time.perf_counter()
+            written = 0
+            try:
+                for i in range(0, len(batch), self.flush_events):
+                    chunk = batch[i:i + self.flush_events]
+                    params = [v for row in chunk for v in row]
+                    with get_cursor() as cur:
+                        cur.execute(
+                            _INSERT_PREFIX + ", ".join([_ROW_PLACEHOLDER] * len(chunk)),
+                            params,
+                        )
+                    written += len(chunk)
+            except Exception as e:
+                logger.warning("tracking flush failed (%d events en attente): %s", len(batch) - written, e)
+                with self._lock:
+                    self._counters["flush_errors"] += 1
+                    remaining = batch[written:] + self._pending
+                    overflow = len(remaining) - self.max_pending
+                    if overflow > 0:
+                        self._counters["dropped"] += overflow
+                        remaining = remaining[overflow:]
+                    self._pending = remaining
+            with self._lock:
+                self._counters["flushed"] += written
+                if written:
+                    self._counters["batches"] += (written + self.flush_events - 1) // self.flush_events
+                self._last_flush_ms = (time.perf_counter() - t0) * 1000
+                self._last_flush_at = datetime.now()
+            return written
+
+    # ─── Thread de fond ─────────────────────────────────
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, daemon=True, name="tracking_buffer_flusher"
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_ms / 1000)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("tracking flusher")
+
+    def stop(self):
+        """Arrete le thread de fond et vide le buffer (appele au shutdown)."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        return self.flush()
+
+    # ─── Compteurs ──────────────────────────────────────
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "buffered": len(self._pending),
+                "max_pending": self.max_pending,
+                "flush_events": self.flush_events,
+                "flush_ms": self.flush_ms,
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "last_flush_at": self._last_flush_at.isoformat() if self._last_flush_at else None,
+            }
+
+
+tracking_buffer = TrackingBuffer()
@@ -0,0 +1,236 @@
+"""
+Rollups journaliers des events de tracking.
+
+La table tracking_daily agrege tracking_events par (jour, event_type, source) :
+un compteur + un sketch HyperLogLog des ip_hash pour les visiteurs uniques.
+Les sketches sont fusionnables (max registre par registre), donc les uniques
+sur 30 ou 365 jours se calculent sans COUNT(DISTINCT) sur les events bruts.
+
+compact() replie les jours complets (avant aujourd'hui) non encore agreges et
+peut purger les events bruts deja replies. Le jour courant reste lu en brut.
+"""
+
+import hashlib
+import logging
+import math
+from datetime import date, datetime, timedelta
+
+from app.database import get_cursor
+
+logger = logging.getLogger(__name__)
+
+# Cle params : dernier jour replie dans tracking_daily (ISO, inclus)
+WATERMARK_KEY = "TRACKING_ROLLUP_UNTIL"
+# Verrou advisory : un seul worker compacte a la fois
+_ADVISORY_LOCK_ID = 73_000_028
+
+HLL_P = 10                 # 1024 registres -> ~3.3 % d'erreur, 1 Ko par ligne
+HLL_M = 1 << HLL_P
+
+
+class HyperLogLog:
+    """Sketch HyperLogLog minimal (p=10) serialisable en bytes."""
+
+    __slots__ = ("registers",)
+
+    def __init__(self, registers: bytes = None):
+        if registers:
+            self.registers = bytearray(registers)
+        else:
+            self.registers = bytearray(HLL_M)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        digest = hashlib.blake2b((value or "").encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def add(self, value: str):
+        h = self._hash(value)
+        idx = h >> (64 - HLL_P)
+        rest = h & ((1 << (64 - HLL_P)) - 1)
+        rank = (64 - HLL_P) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        regs = self.registers
+        for i, r in enumerate(other.registers):
+            if r > regs[i]:
+                regs[i] = r
+        return self
+
+    def count(self) -> int:
+        m = HLL_M
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Petite cardinalite : linear counting, exact a quelques % pres
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+
+def _get_watermark(cur):
+    cur.execute("SELECT valeur FROM params WHERE cle = %s", (WATERMARK_KEY,))
+    row = cur.fetchone()
+    if not row or not row.get("valeur"):
+        return None
+    try:
+        return date.fromisoformat(row["valeur"])
+    except ValueError:
+        return None
+
+
+def get_watermark():
+    with get_cursor() as cur:
+        return _get_watermark(cur)
+
+
+def compact(prune_days: int = None) -> dict:
+    """Replie les jours complets de tracking_events dans tracking_daily.
+
+    Chaque jour est recalcule en entier depuis les events bruts (idempotent).
+    Si prune_days est fourni, supprime les events bruts deja replies et plus
+    vieux que prune_days jours.
+    """
+    yesterday = date.today() - timedelta(days=1)
+    with get_cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s) AS ok", (_ADVISORY_LOCK_ID,))
+        lock = cur.fetchone()
+        if not lock or not lock.get("ok"):
+            return {"status": "busy"}
+
+        watermark = _get_watermark(cur)
+        start = watermark + timedelta(days=1) if watermark else None
+        folded_rows = 0
+        if start is None or start <= yesterday:
+            where = "created_at < %s"
+            params = [yesterday + timedelta(days=1)]
+            if start is not None:
+                where += " AND created_at >= %s"
+                params.append(start)
+            cur.execute(
+                f"""SELECT DATE(created_at) AS day, event_type,
+                           COALESCE(source, 'autre') AS source,
+                           COUNT(*) AS n,
+                           array_agg(DISTINCT ip_hash) AS hashes
+                    FROM tracking_events
+                    WHERE {where}
+                    GROUP BY 1, 2, 3""",
+                params,
+            )
+            rows = cur.fetchall() or []
+            values = []
+            for r in rows:
+                sketch = HyperLogLog()
+                for h in r["hashes"] or []:
+                    sketch.add(h)
+                values.extend([r["day"], r["event_type"], r["source"], r["n"], sketch.to_bytes()])
+            if rows:
+                cur.execute(
+                    "INSERT INTO tracking_daily (day, event_type, source, n, sketch) VALUES "
+                    + ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+                    + " ON CONFLICT (day, event_type, source) DO UPDATE"
+                      " SET n = EXCLUDED.n, sketch = EXCLUDED.sketch",
+                    values,
+                )
+            folded_rows = len(rows)
+            cur.execute(
+                """INSERT INTO params (cle, valeur) VALUES (%s, %s)
+                   ON CONFLICT (cle) DO UPDATE SET valeur = EXCLUDED.valeur""",
+                (WATERMARK_KEY, yesterday.isoformat()),
+            )
+            watermark = yesterday
+
+        pruned = 0
+        if prune_days is not None and watermark is not None:
+            cutoff = min(date.today() - timedelta(days=max(1, prune_days)), watermark + timedelta(days=1))
+            cur.execute("DELETE FROM tracking_events WHERE created_at < %s", (cutoff,))
+            pruned = cur.rowcount or 0
+
+    if folded_rows or pruned:
+        logger.info("tracking rollup : %d lignes repliees, %d events purges", folded_rows, pruned)
+    return {
+        "status": "ok",
+        "watermark": watermark.isoformat() if watermark else None,
+        "rollup_rows": folded_rows,
+        "pruned": pruned,
+    }
+
+
+def ensure_compacted():
+    """Compacte si le dernier jour complet n'est pas encore replie."""
+    yesterday = date.today() - timedelta(days=1)
+    watermark = get_watermark()
+    if watermark is None or watermark < yesterday:
+        compact()
+
+
+def rollup_stats(event_type: str, days: int) -> dict:
+    """Stats d'un event_type sur `days` jours : rollups + queue brute du jour.
+
+    Deux requetes : les lignes tracking_daily de la periode (quelques
+    centaines au plus), et les events bruts posterieurs au watermark
+    (normalement : aujourd'hui seulement).
+    """
+    today = date.today()
+    since = datetime.now() - timedelta(days=days)
+    since_day = since.date()
+
+    with get_cursor() as cur:
+        watermark = _get_watermark(cur)
+        cur.execute(
+            """SELECT day, source, n, sketch FROM tracking_daily
+               WHERE event_type = %s AND day >= %s""",
+            (event_type, since_day),
+        )
+        rolled = cur.fetchall() or []
+
+        raw_since = since
+        if watermark is not None:
+            raw_since = max(since, datetime.combine(watermark + timedelta(days=1), datetime.min.time()))
+        cur.execute(
+            """SELECT DATE(created_at) AS day, COALESCE(source, 'autre') AS source,
+                      COUNT(*) AS n, array_agg(DISTINCT ip_hash) AS hashes
+               FROM tracking_events
+               WHERE event_type = %s AND created_at >= %s
+               GROUP BY 1, 2""",
+            (event_type, raw_since),
+        )
+        raw = cur.fetchall() or []
+
+    uniques = HyperLogLog()
+    by_source: dict = {}
+    by_day: dict = {}
+    total = 0
+    for r in rolled:
+        if watermark is not None and r["day"] > watermark:
+            continue  # deja couvert par la lecture brute
+        total += r["n"]
+        by_source[r["source"]] = by_source.get(r["source"], 0) + r["n"]
+        by_day[r["day"]] = by_day.get(r["day"], 0) + r["n"]
+        if r["sketch"]:
+            uniques.merge(HyperLogLog(bytes(r["sketch"])))
+    for r in raw:
+        total += r["n"]
+        by_source[r["source"]] = by_source.get(r["source"], 0) + r["n"]
+        by_day[r["day"]] = by_day.get(r["day"], 0) + r["n"]
+        for h in r["hashes"] or []:
+            uniques.add(h)
+
+    return {
+        "total": total,
+        "today": by_day.get(today, 0),
+        "unique_visitors": uniques.count() if total else 0,
+        "by_source": [
+            {"source": s, "n": n}
+            for s, n in sorted(by_source.items(), key=lambda kv: kv[1], reverse=True)
+        ],
+        "timeline": [
+            {"day": d.isoformat() if hasattr(d, "isoformat") else str(d), "n": by_day[d]}
+            for d in sorted(by_day)
+        ],
+    }
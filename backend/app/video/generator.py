@@ -14,11 +14,10 @@ Photos iPhone :
 - Priorité 3 : PNG local dans backend/app/video/assets/iphones/<model_key>.png
 - Fallback  : silhouette iPhone en SVG (pas de JPEG foireux)
 
-Le dossier backend/app/video/cache/ sert de cache disque TTL 7j pour les URLs
+Le blob store (app.services.blob_store) sert de cache TTL 7j pour les URLs
 téléchargées — évite de rebougeoir le CDN Apple à chaque génération.
 """
 
-import hashlib
 import logging
 import os
 import subprocess
@@ -31,6 +30,8 @@ from typing import Optional
 import httpx
 from PIL import Image
 
+from app.services.blob_store import blob_store, content_key, derived_key
+
 from .story_template import (
     render_intro_frame, render_phone_frame, render_outro_frame,
     W, H,
@@ -48,11 +49,8 @@ VIDEO_DIR = Path(__file__).parent
 GENERATED_DIR = VIDEO_DIR / "generated"
 GENERATED_DIR.mkdir(parents=True, exist_ok=True)
 
-CACHE_DIR = VIDEO_DIR / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-# Sous-dossier pour les photos déjà processed (remove_bg + trim + feather)
-PROCESSED_CACHE_DIR = CACHE_DIR / "processed"
-PROCESSED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# Téléchargements et photos processed (remove_bg + trim + feather) vont dans
+# le blob store partagé (app.services.blob_store)
 CACHE_TTL_SECONDS = 7 * 24 * 3600  # 7 jours
 
 LOCAL_IPHONES_DIR = VIDEO_DIR / "assets" / "iphones"
@@ -95,18 +93,12 @@ def _local_image_for(phone: dict) -> Optional[Path]:
     return None
 
 
-def _cache_path_for(url: str) -> Path:
-    h = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
-    return CACHE_DIR / f"{h}.png"
-
-
 def _download_cached(url: str) -> Optional[bytes]:
-    """Télécharge une URL avec cache disque TTL 7j. None si échec."""
-    cache = _cache_path_for(url)
-    if cache.exists():
-        age = time.time() - cache.stat().st_mtime
-        if age < CACHE_TTL_SECONDS:
-            return cache.read_bytes()
+    """Télécharge une URL avec cache blob store TTL 7j. None si échec."""
+    key = derived_key("video_download", url)
+    cached = blob_store.get(key, max_age=CACHE_TTL_SECONDS)
+    if cached is not None:
+        return cached
     try:
         # User-Agent nécessaire pour certains CDN (pngimg, cloudflare)
         headers = {
@@ -120,7 +112,8 @@ def _download_cached(url: str) -> Optional[bytes]:
         if len(data) < 5000:
             logger.warning("Image trop petite (%d bytes) pour %s — skip", len(data), url)
             return None
-        cache.write_bytes(data)
+        blob_store.local.delete(key)  # perime : remplace (la cle ne depend que de l'URL)
+        blob_store.put(data, key=key)
         return data
     except Exception as e:
         logger.warning("Download failed for %s : %s", url, e)
@@ -241,29 +234,32 @@ def _placeholder_silhouette() -> Image.Image:
     return img
 
 
-def _processed_cache_key(source_bytes: bytes) -> Path:
-    """Clé sha256 des bytes source (url-data ou file content) pour le cache processed."""
-    h = hashlib.sha256(source_bytes).hexdigest()[:24]
-    return PROCESSED_CACHE_DIR / f"{h}.png"
+def _processed_cache_key(source_bytes: bytes) -> str:
+    """Clé blob dérivée des bytes source (url-data ou file content) pour le cache processed."""
+    return derived_key("video_processed", content_key(source_bytes))
 
 
 def _load_and_process(source_bytes: bytes, label: str) -> Optional[Image.Image]:
     """Lit l'image source depuis bytes, la processe (remove_bg + trim) et cache le résultat.
     Le feather gaussien + flood fills coûtent ~150-300ms — on les saute si déjà en cache."""
     from io import BytesIO
-    cache_path = _processed_cache_key(source_bytes)
-    if cache_path.exists():
+    cache_key = _processed_cache_key(source_bytes)
+    cache_path = blob_store.local_path(cache_key)
+    if cache_path is not None:
         try:
             return Image.open(cache_path).convert("RGBA")
         except Exception as e:
             logger.warning("Cache processed corrompu %s (%s) — reprocess", cache_path, e)
+            blob_store.local.delete(cache_key)
     try:
         img = Image.open(BytesIO(source_bytes)).convert("RGBA")
         processed = _trim_alpha(_remove_white_bg(img))
         try:
-            processed.save(cache_path, "PNG", optimize=False, compress_level=1)
+            buf = BytesIO()
+            processed.save(buf, "PNG", optimize=False, compress_level=1)
+            blob_store.put(buf.getvalue(), key=cache_key)
         except Exception as e:
-            logger.debug("Save processed cache failed (%s) : %s", cache_path, e)
+            logger.debug("Save processed cache failed (%s) : %s", cache_key[:12], e)
         return processed
     except Exception as e:
         logger.warning("Pillow failed to process %s : %s", label, e)
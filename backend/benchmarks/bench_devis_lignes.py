@@ -0,0 +1,111 @@
+"""
+Benchmark : autosave d'un devis de 30 lignes (devis.update_devis).
+
+Compare l'ancienne persistance (DELETE de toutes les lignes puis un INSERT par
+ligne) au diff ensembliste (_save_lignes : au plus DELETE + UPDATE + INSERT),
+pour un autosave typique ou une seule ligne change, et pour un ajout de ligne.
+Chaque mesure inclut le commit (une transaction par autosave).
+
+Usage (base jetable, schema temporaire supprime a la fin) :
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_devis_lignes
+    DATABASE_URL=... python -m benchmarks.bench_devis_lignes --lignes 30 --runs 200
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import psycopg2
+import psycopg2.extras
+
+SCHEMA = "bench_devis_lignes"
+
+SETUP_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path = {SCHEMA};
+CREATE TABLE devis (id SERIAL PRIMARY KEY, total_ht DECIMAL(10,2), total_ttc DECIMAL(10,2));
+CREATE TABLE devis_lignes (
+    id SERIAL PRIMARY KEY,
+    devis_id INTEGER REFERENCES devis(id) ON DELETE CASCADE,
+    description TEXT NOT NULL,
+    quantite INTEGER DEFAULT 1,
+    prix_unitaire DECIMAL(10,2) DEFAULT 0,
+    total DECIMAL(10,2) DEFAULT 0,
+    ordre INTEGER DEFAULT 0
+);
+CREATE INDEX ON devis_lignes(devis_id);
+"""
+
+
+def _payload(n: int, run: int, extra: bool):
+    from app.api.devis import DevisLigneIn, _prepare_lignes
+    lignes = [DevisLigneIn(description=f"Piece {i}", prix_unitaire=10 + i) for i in range(n)]
+    # Autosave : le prix d'une ligne change a chaque frappe
+    lignes[run % n] = DevisLigneIn(description=f"Piece {run % n}", prix_unitaire=run)
+    if extra:
+        lignes.append(DevisLigneIn(description=f"Ajout {run}", prix_unitaire=1))
+    return _prepare_lignes(lignes)
+
+
+def _old(cur, devis_id: int, lignes: list):
+    cur.execute("DELETE FROM devis_lignes WHERE devis_id = %s", (devis_id,))
+    for ld in lignes:
+        cur.execute("""
+            INSERT INTO devis_lignes (devis_id, description, quantite, prix_unitaire, total, ordre)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (devis_id, ld["description"], ld["quantite"], ld["prix_unitaire"], ld["total"], ld["ordre"]))
+
+
+def _new(cur, devis_id: int, lignes: list):
+    from app.api.devis import _save_lignes
+    cur.execute(
+        "SELECT id, description, quantite, prix_unitaire, ordre FROM devis_lignes WHERE devis_id = %s",
+        (devis_id,),
+    )
+    _save_lignes(cur, devis_id, cur.fetchall(), lignes)
+
+
+def _time(conn, devis_id: int, fn, n: int, runs: int, extra: bool) -> float:
+    samples = []
+    for run in range(runs):
+        lignes = _payload(n, run, extra)
+        t0 = time.perf_counter()
+        with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            fn(cur, devis_id, lignes)
+        samples.append((time.perf_counter() - t0) * 1000)
+        # Retour a l'etat initial hors mesure
+        with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            _old(cur, devis_id, _payload(n, 0, False))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--lignes", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ["DATABASE_URL"], options=f"-c search_path={SCHEMA},public")
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(SETUP_SQL)
+            cur.execute("INSERT INTO devis (total_ht, total_ttc) VALUES (0, 0) RETURNING id")
+            devis_id = cur.fetchone()[0]
+        with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            _old(cur, devis_id, _payload(args.lignes, 0, False))
+
+        print(f"{'scenario':<22}  {'delete+insert (ms)':>18}  {'diff (ms)':>10}")
+        for label, extra in (("1 ligne modifiee", False), ("1 ligne ajoutee", True)):
+            old_ms = _time(conn, devis_id, _old, args.lignes, args.runs, extra)
+            new_ms = _time(conn, devis_id, _new, args.lignes, args.runs, extra)
+            print(f"{label:<22}  {old_ms:>18.2f}  {new_ms:>10.2f}")
+    finally:
+        with conn, conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark : inbox des interactions client (suivi.get_interactions).
+
+Compare l'ancienne version (4 SELECT DISTINCT sur notes_tickets) a la requete
+unique servie par les index partiels, pour 10k / 100k / 1M notes.
+Le volume d'interactions en attente reste constant (~60 tickets), comme le
+nombre de tickets ouverts (--actifs, 200 par defaut) : seule la masse de
+notes "historiques" (logs WhatsApp/SMS/email, notes privees) et de tickets
+rendus / clotures grossit.
+
+Usage (base jetable, schema temporaire supprime a la fin) :
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_interactions
+    DATABASE_URL=... python -m benchmarks.bench_interactions --sizes 10000 1000000 --runs 50
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import psycopg2
+
+SCHEMA = "bench_interactions"
+
+SETUP_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path = {SCHEMA};
+CREATE TABLE tickets (id SERIAL PRIMARY KEY, statut TEXT);
+CREATE TABLE notes_tickets (
+    id SERIAL PRIMARY KEY,
+    ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
+    auteur TEXT NOT NULL DEFAULT 'bench',
+    contenu TEXT NOT NULL,
+    important BOOLEAN DEFAULT FALSE,
+    date_creation TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    type_note TEXT DEFAULT 'note',
+    is_read BOOLEAN DEFAULT FALSE
+);
+CREATE INDEX idx_notes_tickets_ticket_id ON notes_tickets(ticket_id);
+CREATE INDEX idx_notes_tickets_type ON notes_tickets(ticket_id, type_note);
+CREATE INDEX idx_notes_unread_interactions ON notes_tickets(type_note, ticket_id)
+    WHERE is_read IS NOT TRUE AND type_note IN ('validation_devis', 'message_client', 'avis_client');
+CREATE INDEX idx_notes_devis_valide ON notes_tickets(ticket_id)
+    WHERE type_note = 'validation_devis' AND contenu LIKE '✅%';
+CREATE INDEX idx_tickets_actifs ON tickets(id)
+    WHERE statut NOT IN ('Rendu au client', 'Clôturé');
+"""
+
+OLD_QUERIES = [
+    """SELECT DISTINCT ticket_id FROM notes_tickets
+       WHERE type_note = 'validation_devis' AND (is_read = FALSE OR is_read IS NULL)""",
+    """SELECT DISTINCT n.ticket_id FROM notes_tickets n JOIN tickets t ON t.id = n.ticket_id
+       WHERE n.type_note = 'validation_devis' AND n.contenu LIKE '✅%'
+         AND t.statut NOT IN ('Rendu au client', 'Clôturé')""",
+    """SELECT DISTINCT ticket_id FROM notes_tickets
+       WHERE type_note = 'message_client' AND (is_read = FALSE OR is_read IS NULL)""",
+    """SELECT DISTINCT ticket_id FROM notes_tickets
+       WHERE type_note = 'avis_client' AND (is_read = FALSE OR is_read IS NULL)""",
+]
+
+
+def _seed(cur, n_notes: int, actifs: int):
+    """Remplit jusqu'a n_notes notes (appels successifs = croissance)."""
+    n_tickets = max(1000, n_notes // 20)
+    cur.execute("SELECT COUNT(*) FROM tickets")
+    have_tickets = cur.fetchone()[0]
+    if have_tickets < n_tickets:
+        cur.execute(
+            """INSERT INTO tickets (statut)
+               SELECT (ARRAY['Rendu au client', 'Clôturé'])[1 + (g %% 2)]
+               FROM generate_series(%s, %s) g""",
+            (have_tickets + 1, n_tickets),
+        )
+    # Seuls les `actifs` tickets les plus recents sont encore en atelier
+    cur.execute(
+        """UPDATE tickets SET statut = CASE
+               WHEN id > %(n)s - %(actifs)s
+                   THEN (ARRAY['En cours de réparation', 'Réparation terminée'])[1 + (id %% 2)]
+               ELSE (ARRAY['Rendu au client', 'Clôturé'])[1 + (id %% 2)]
+           END""",
+        {"n": n_tickets, "actifs": actifs},
+    )
+    cur.execute("SELECT COUNT(*) FROM notes_tickets")
+    have = cur.fetchone()[0]
+    if have < n_notes:
+        # Historique : tout est lu (logs + anciennes interactions traitees)
+        cur.execute(
+            """INSERT INTO notes_tickets (ticket_id, contenu, type_note, is_read)
+               SELECT 1 + (g %% %s),
+                      CASE WHEN g %% 3 = 0 THEN '✅ Devis accepté par le client' ELSE 'log' END,
+                      (ARRAY['whatsapp', 'sms', 'email', 'note', 'message_client',
+                             'validation_devis', 'avis_client'])[1 + (g %% 7)],
+                      TRUE
+               FROM generate_series(%s, %s) g""",
+            (n_tickets, have + 1, n_notes),
+        )
+    # Interactions en attente : volume constant
+    cur.execute("UPDATE notes_tickets SET is_read = TRUE WHERE is_read IS NOT TRUE")
+    cur.execute(
+        """UPDATE notes_tickets SET is_read = FALSE
+           WHERE id IN (SELECT id FROM notes_tickets
+                        WHERE type_note IN ('validation_devis', 'message_client', 'avis_client')
+                        ORDER BY id DESC LIMIT 60)"""
+    )
+    cur.execute("ANALYZE tickets; ANALYZE notes_tickets;")
+
+
+def _time(cur, queries, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        for q in queries:
+            cur.execute(q)
+            cur.fetchall()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    from app.api.suivi import _INTERACTIONS_SQL
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--actifs", type=int, default=200, help="tickets encore en atelier")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute(SETUP_SQL)
+        print(f"{'notes':>10}  {'4 requetes (ms)':>16}  {'1 requete (ms)':>15}")
+        for size in sorted(args.sizes):
+            _seed(cur, size, args.actifs)
+            old_ms = _time(cur, OLD_QUERIES, args.runs)
+            new_ms = _time(cur, [_INTERACTIONS_SQL], args.runs)
+            print(f"{size:>10}  {old_ms:>16.2f}  {new_ms:>15.2f}")
+    finally:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark : CPU par reponse pour une liste de 500 tickets (GET /api/tickets).
+
+Lignes synthetiques de la forme renvoyee par la requete de list_tickets
+(t.* + colonnes client, datetime / Decimal / bool), serialisees par :
+  - response_model : validation list[TicketFull] + dump JSON Pydantic +
+    json.dumps (chemin FastAPI quand l'endpoint retourne les lignes) ;
+  - jsonable_encoder : endpoints sans modele (dashboard, chat, devis...) ;
+  - fast_json : rows_as(TicketFull) + dumps (orjson si installe) ;
+  - fast_json brut : dumps des lignes telles quelles (dashboard).
+Mesure en temps CPU (process_time), mediane par reponse.
+
+Usage :
+    python -m benchmarks.bench_json_response
+    python -m benchmarks.bench_json_response --tickets 500 --runs 200
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from psycopg2.extras import RealDictRow
+from pydantic import TypeAdapter
+
+from app.models import TicketFull
+from app.services import fast_json
+
+
+def _rows(n: int) -> list:
+    base = datetime(2025, 3, 1, 9, 30)
+    rows = []
+    for i in range(n):
+        r = RealDictRow()
+        r.update({name: None for name in TicketFull.model_fields})
+        r.update(
+            id=i, ticket_code=f"KP-{i:06d}", client_id=i // 3, categorie="Smartphone",
+            marque="Apple", modele="iPhone 13", panne="Ecran cassé", panne_detail="Vitre + LCD",
+            notes_internes="Client pressé, rappeler avant 18h", statut="En cours de réparation",
+            technicien_assigne="Yassine", devis_estime=Decimal("129.90"), acompte=Decimal("20.00"),
+            tarif_final=Decimal("129.90"), reste_a_payer=Decimal("109.90"), paye=0,
+            commande_piece=0, client_contacte=1, client_accord=1, msg_whatsapp=1, msg_sms=0, msg_email=0,
+            date_depot=base - timedelta(hours=i), date_maj=base, reparation_debut=base,
+            historique="[01/03 09:30] Création\n[01/03 11:00] Statut -> En cours", est_retour_sav=False,
+            client_nom="Martin", client_prenom="Lucas", client_tel="0612345678",
+            client_email="lucas@example.fr", client_societe="", client_carte_camby=0,
+            ticket_original_id=None,
+        )
+        rows.append(r)
+    return rows
+
+
+_LIST = TypeAdapter(list[TicketFull])
+
+
+def _response_model(rows):
+    value = _LIST.validate_python(rows)
+    content = _LIST.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _jsonable(rows):
+    return json.dumps(jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _fast(rows):
+    return fast_json.dumps(fast_json.rows_as(TicketFull, rows))
+
+
+def _fast_raw(rows):
+    return fast_json.dumps(rows)
+
+
+def _cpu_ms(fn, rows, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t0 = time.process_time()
+        fn(rows)
+        samples.append((time.process_time() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tickets", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    rows = _rows(args.tickets)
+    paths = [
+        ("response_model", _response_model),
+        ("jsonable_encoder", _jsonable),
+        ("fast_json", _fast),
+        ("fast_json brut", _fast_raw),
+    ]
+    print(f"{args.tickets} tickets, orjson {'actif' if fast_json.HAS_ORJSON else 'absent (repli json)'}")
+    print(f"{'chemin':<18} {'CPU (ms)':>9} {'octets':>9} {'vs modele':>10}")
+    ref = None
+    for label, fn in paths:
+        ms = _cpu_ms(fn, rows, args.runs)
+        ref = ref or ms
+        print(f"{label:<18} {ms:>9.2f} {len(fn(rows)):>9} {ref / ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
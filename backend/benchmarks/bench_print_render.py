@@ -0,0 +1,73 @@
+"""
+Benchmark : temps de rendu d'un document imprime (ticket client 80mm + devis A4).
+
+Compare un rendu "a froid" (cache QR et data URI logo vides, comme avant la
+memoisation : encode QR + PNG + base64 et relecture du logo a chaque document)
+et un rendu "a chaud" (caches pre-chauffes). Aucune base requise : les params
+sont fournis via le snapshot utilise par l'impression par lot.
+
+Usage :
+    python -m benchmarks.bench_print_render
+    python -m benchmarks.bench_print_render --runs 500
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from app.api import print_tickets as pt
+
+PARAMS = {
+    "URL_SUIVI": "https://klikphone-sav-v2-production.up.railway.app",
+    "adresse": "79 Place Saint Léger, 73000 Chambéry",
+    "tel_boutique": "04 79 60 89 22",
+    "tva": "20",
+}
+
+
+def _ticket(i: int) -> dict:
+    return {
+        "id": i, "ticket_code": f"KP-{i:06d}", "client_id": 1,
+        "client_nom": "Dupont", "client_prenom": "Marie", "client_tel": "0600000000",
+        "marque": "Apple", "modele": "iPhone 13", "panne": "Ecran cassé",
+        "devis_estime": 149, "date_depot": datetime(2026, 10, 19, 10, 0),
+    }
+
+
+def _render(t: dict):
+    pt._ticket_client_html(t)
+    pt._a4_document(t, "devis")
+
+
+def _measure(runs: int, cold: bool) -> list:
+    out = []
+    t = _ticket(1)
+    for _ in range(runs):
+        if cold:
+            pt._qr_png_data_uri.cache_clear()
+            pt._asset_uris.clear()
+        t0 = time.perf_counter()
+        _render(t)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=200)
+    args = ap.parse_args()
+
+    token = pt._params_snapshot.set(PARAMS)
+    try:
+        _render(_ticket(0))  # imports / templates
+        for label, cold in (("froid (sans cache)", True), ("chaud (memoise)", False)):
+            samples = sorted(_measure(args.runs, cold))
+            p95 = samples[int(len(samples) * 0.95) - 1]
+            print(f"{label:20s} median {statistics.median(samples):7.3f} ms   p95 {p95:7.3f} ms")
+    finally:
+        pt._params_snapshot.reset(token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark : surcout du profileur de requetes (services/query_profiler).
+
+Mesure le cout de l'observateur par execute() sur des requetes typiques
+(liste de tickets en f-string, lookup par id, INSERT multi-lignes), texte
+deja vu (cas courant) et texte nouveau (empreinte calculee). Le surcout est
+rapporte a la duree d'une requete : --query-ms (defaut 0.5 ms, aller-retour
+local rapide ; compter 2 a 10 ms sur Supabase).
+
+Avec DATABASE_URL, mesure aussi de bout en bout `SELECT 1` sur une vraie
+connexion du pool, profileur actif puis coupe.
+
+Usage :
+    python -m benchmarks.bench_query_profiler
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_query_profiler --runs 5000
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from app.services import query_profiler
+
+QUERIES = {
+    "liste tickets": (
+        "SELECT t.*, c.nom AS client_nom FROM tickets t JOIN clients c ON c.id = t.client_id "
+        "WHERE t.statut IN ('En attente de diagnostic', 'En cours de réparation') "
+        "AND t.id > 1234 ORDER BY t.date_depot DESC LIMIT 50 OFFSET 100"
+    ),
+    "lookup id": "SELECT * FROM tickets WHERE id = %s",
+    "insert lignes": (
+        "INSERT INTO devis_lignes (devis_id, description, prix_unitaire) VALUES "
+        + ", ".join(f"({i}, 'Piece {i}', {i}.50)" for i in range(30))
+    ),
+}
+
+
+class _Cursor:
+    rowcount = 24
+
+
+def _per_call_us(sql: str, runs: int, fresh: bool) -> float:
+    cur = _Cursor()
+    samples = []
+    for i in range(runs):
+        q = f"{sql} /* {i} */" if fresh else sql
+        t0 = time.perf_counter()
+        query_profiler._observe(q, None, 0.0004, cur)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def _db(runs: int):
+    from app import database
+    query_profiler.install()
+
+    def loop():
+        samples = []
+        with database.get_cursor() as cur:
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                cur.execute("SELECT 1")
+                cur.fetchall()
+                samples.append((time.perf_counter() - t0) * 1000)
+        return statistics.median(samples)
+
+    query_profiler.ENABLED = False
+    off = loop()
+    query_profiler.ENABLED = True
+    on = loop()
+    print(f"\nSELECT 1 reel : {off:.3f} ms sans, {on:.3f} ms avec ({(on - off) / off * 100:+.1f} %)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=20000)
+    parser.add_argument("--query-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{'requete':<16}  {'deja vue (us)':>14}  {'surcout':>8}  {'nouvelle (us)':>14}")
+    for label, sql in QUERIES.items():
+        query_profiler.reset()
+        seen = _per_call_us(sql, args.runs, fresh=False)
+        fresh = _per_call_us(sql, min(args.runs, 2000), fresh=True)
+        pct = seen / (args.query_ms * 1000) * 100
+        print(f"{label:<16}  {seen:>14.2f}  {pct:>7.2f}%  {fresh:>14.2f}")
+
+    if os.getenv("DATABASE_URL"):
+        _db(args.runs)
+
+
+if __name__ == "__main__":
+    main()
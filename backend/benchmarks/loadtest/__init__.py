@@ -0,0 +1,22 @@
+"""
+Banc de charge reproductible : donnees synthetiques + endpoints chauds.
+
+Les tests unitaires mockent get_cursor : ils ne mesurent rien. Ce paquet
+remplit une base Postgres locale (jetable !) avec un volume realiste puis
+rejoue les endpoints les plus sollicites avec des clients HTTP concurrents.
+
+    # 1. Base jetable + schema de l'application + donnees (echelle 1 = 5000 clients)
+    DATABASE_URL=postgresql://... python -m benchmarks.loadtest seed --scale 1 --reset
+
+    # 2. Serveur sur la meme base, meme JWT_SECRET
+    DATABASE_URL=... JWT_SECRET=bench uvicorn app.main:app --workers 2
+
+    # 3. Charge : p50/p95/p99 + debit par scenario, resultat JSON
+    JWT_SECRET=bench python -m benchmarks.loadtest run --url http://127.0.0.1:8000 \\
+        --concurrency 16 --duration 30 --out avant.json
+
+    # 4. Comparaison de deux executions (code retour 1 si regression p95)
+    python -m benchmarks.loadtest compare avant.json apres.json --seuil 10
+
+Le generateur est deterministe (--seed) : meme echelle, memes donnees.
+"""
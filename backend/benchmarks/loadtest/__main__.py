@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import os
+import sys
+
+from benchmarks.loadtest import __doc__ as USAGE
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.loadtest", description=USAGE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest="commande", required=True)
+
+    p = sub.add_parser("seed", help="schema + donnees synthetiques")
+    p.add_argument("--dsn", default=os.getenv("DATABASE_URL"))
+    p.add_argument("--scale", type=float, default=1.0, help="1 = 5000 clients, 15000 tickets")
+    p.add_argument("--seed", type=float, default=0.42, help="graine setseed() dans [-1, 1]")
+    p.add_argument("--reset", action="store_true", help="vide les tables generees avant")
+
+    p = sub.add_parser("run", help="charge HTTP concurrente")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--duration", type=float, default=30)
+    p.add_argument("--warmup", type=float, default=3)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--lecture-seule", action="store_true", help="sans PATCH de statut")
+    p.add_argument("--scenario", action="append", help="limiter a ce(s) scenario(s)")
+    p.add_argument("--token", help="JWT (sinon signe avec JWT_SECRET)")
+    p.add_argument("--out", help="fichier JSON de resultat")
+
+    p = sub.add_parser("compare", help="ecarts entre deux resultats JSON")
+    p.add_argument("avant")
+    p.add_argument("apres")
+    p.add_argument("--seuil", type=float, default=10.0, help="regression p95 en %%")
+
+    args = parser.parse_args(argv)
+
+    if args.commande == "seed":
+        if not args.dsn:
+            parser.error("DATABASE_URL ou --dsn requis")
+        from benchmarks.loadtest.seed import seed
+        seed(args.dsn, scale=args.scale, seed_value=args.seed, reset=args.reset)
+        return 0
+
+    if args.commande == "run":
+        from benchmarks.loadtest import run
+        result = asyncio.run(run.run(
+            args.url, concurrency=args.concurrency, duration=args.duration, warmup=args.warmup,
+            seed=args.seed, read_only=args.lecture_seule, only=args.scenario, token=args.token,
+        ))
+        run.print_report(result)
+        if args.out:
+            run.save(result, args.out)
+        return 0
+
+    from benchmarks.loadtest import compare
+    result = compare.compare(compare.load(args.avant), compare.load(args.apres), args.seuil)
+    compare.print_comparison(result)
+    return 1 if result["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+Comparaison de deux executions (JSON produits par `run --out`).
+"""
+
+import json
+
+METRIQUES = ("p50_ms", "p95_ms", "p99_ms", "debit_rps")
+
+
+def _delta(avant, apres):
+    if avant in (None, 0) or apres is None:
+        return None
+    return round((apres - avant) / avant * 100, 1)
+
+
+def compare(avant: dict, apres: dict, seuil: float = 10.0) -> dict:
+    """Ecarts en % par scenario commun ; regression = p95 en hausse de plus de `seuil` %."""
+    lignes, regressions = {}, []
+    for name, a in avant["scenarios"].items():
+        b = apres["scenarios"].get(name)
+        if b is None:
+            continue
+        lignes[name] = {m: {"avant": a.get(m), "apres": b.get(m), "delta_pct": _delta(a.get(m), b.get(m))}
+                        for m in METRIQUES}
+        d = lignes[name]["p95_ms"]["delta_pct"]
+        if d is not None and d > seuil:
+            regressions.append(name)
+    return {"scenarios": lignes, "regressions": regressions, "seuil_pct": seuil}
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_comparison(result: dict):
+    print(f"{'scenario':<18} " + " ".join(f"{m:>22}" for m in METRIQUES))
+    for name, metrics in result["scenarios"].items():
+        cells = []
+        for m in METRIQUES:
+            v = metrics[m]
+            d = f"{v['delta_pct']:+.1f}%" if v["delta_pct"] is not None else "-"
+            cells.append(f"{v['avant']!s:>7} -> {v['apres']!s:>7} {d:>6}")
+        flag = "  REGRESSION" if name in result["regressions"] else ""
+        print(f"{name:<18} " + " ".join(f"{c:>22}" for c in cells) + flag)
+    if result["regressions"]:
+        print(f"\np95 en hausse de plus de {result['seuil_pct']} % : {', '.join(result['regressions'])}")
@@ -0,0 +1,179 @@
+"""
+Rejoue les endpoints chauds avec N clients HTTP concurrents.
+
+Chaque worker tire un scenario au hasard (ponderation SCENARIOS, graine
+fixe) pendant --duration secondes, apres --warmup secondes non mesurees.
+Par scenario : p50/p95/p99 (rang le plus proche), erreurs, debit, et nombre
+moyen de requetes SQL lu dans l'en-tete Server-Timing (`db;...;desc="N req"`)
+quand l'instrumentation est active.
+"""
+
+import asyncio
+import json
+import math
+import random
+import re
+import subprocess
+import time
+from datetime import datetime
+
+import httpx
+
+_DB_QUERIES = re.compile(r'\bdb;[^,]*desc="(\d+) req"')
+
+RECHERCHES = ["Mar", "iPhone", "06", "Dub", "Galaxy", "KP-00", "Ecran", "Nguyen"]
+PANNES = ["Ec", "Bat", "Con", "Dé", "Vi"]
+
+
+def _statut(rnd: random.Random) -> str:
+    from app.api.tickets import STATUTS
+    return rnd.choice(STATUTS)
+
+
+# nom -> (poids, ecriture, fabrique (rnd, ids) -> (methode, chemin, json))
+SCENARIOS = {
+    "dashboard": (4, False, lambda rnd, ids: ("GET", "/api/tickets/stats/dashboard", None)),
+    "tickets_recherche": (3, False, lambda rnd, ids: (
+        "GET", f"/api/tickets?search={rnd.choice(RECHERCHES)}&limit=50", None)),
+    "ticket_detail": (4, False, lambda rnd, ids: ("GET", f"/api/tickets/{rnd.choice(ids)}", None)),
+    "ticket_statut": (1, True, lambda rnd, ids: (
+        "PATCH", f"/api/tickets/{rnd.choice(ids)}/statut", {"statut": _statut(rnd)})),
+    "autocomplete": (3, False, lambda rnd, ids: (
+        "GET", f"/api/autocomplete/search?categorie=panne&q={rnd.choice(PANNES)}", None)),
+    "chat_non_lus": (4, False, lambda rnd, ids: ("GET", "/api/chat/team/unread/total?user=bench", None)),
+    "reporting": (1, False, lambda rnd, ids: ("GET", "/api/reporting", None)),
+    "tracking_stats": (1, False, lambda rnd, ids: ("GET", "/api/tracking/stats", None)),
+}
+
+
+def percentile(samples: list, q: float):
+    """Percentile au rang le plus proche (samples tries)."""
+    if not samples:
+        return None
+    return samples[max(0, math.ceil(q / 100 * len(samples)) - 1)]
+
+
+class _Scenario:
+    __slots__ = ("latencies", "errors", "queries")
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.queries = []
+
+    def summary(self, seconds: float) -> dict:
+        lat = sorted(self.latencies)
+        ms = lambda v: round(v * 1000, 2) if v is not None else None  # noqa: E731
+        return {
+            "requetes": len(lat),
+            "erreurs": self.errors,
+            "debit_rps": round(len(lat) / seconds, 1) if seconds else 0,
+            "p50_ms": ms(percentile(lat, 50)),
+            "p95_ms": ms(percentile(lat, 95)),
+            "p99_ms": ms(percentile(lat, 99)),
+            "max_ms": ms(lat[-1] if lat else None),
+            "sql_moyen": round(sum(self.queries) / len(self.queries), 1) if self.queries else None,
+        }
+
+
+def _token(explicit: str = None) -> str:
+    if explicit:
+        return explicit
+    # Meme JWT_SECRET que le serveur
+    from app.api.auth import create_token
+    return create_token("accueil", "bench")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def _ticket_ids(client: httpx.AsyncClient) -> list:
+    r = await client.get("/api/tickets", params={"limit": 500})
+    r.raise_for_status()
+    ids = [t["id"] for t in r.json()]
+    if not ids:
+        raise SystemExit("Aucun ticket : lancer `python -m benchmarks.loadtest seed` d'abord")
+    return ids
+
+
+async def _worker(n, client, ids, choices, weights, stats, deadline, measure_from, seed):
+    rnd = random.Random(seed * 1000 + n)
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            return
+        name = rnd.choices(choices, weights)[0]
+        method, path, body = SCENARIOS[name][2](rnd, ids)
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, path, json=body)
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            r, ok = None, False
+        elapsed = time.perf_counter() - t0
+        if t0 < measure_from:
+            continue
+        st = stats[name]
+        if not ok:
+            st.errors += 1
+            continue
+        st.latencies.append(elapsed)
+        m = _DB_QUERIES.search(r.headers.get("server-timing", ""))
+        if m:
+            st.queries.append(int(m.group(1)))
+
+
+async def run(url: str, concurrency: int = 16, duration: float = 30, warmup: float = 3,
+              seed: int = 42, read_only: bool = False, only: list = None, token: str = None) -> dict:
+    choices = [n for n, (_, write, _) in SCENARIOS.items()
+               if (not read_only or not write) and (not only or n in only)]
+    weights = [SCENARIOS[n][0] for n in choices]
+    stats = {n: _Scenario() for n in choices}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {_token(token)}"}
+
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=30) as client:
+        ids = await _ticket_ids(client)
+        start = time.perf_counter()
+        measure_from = start + warmup
+        deadline = measure_from + duration
+        await asyncio.gather(*(
+            _worker(i, client, ids, choices, weights, stats, deadline, measure_from, seed)
+            for i in range(concurrency)
+        ))
+        measured = time.perf_counter() - measure_from
+
+    total = sum(len(s.latencies) for s in stats.values())
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "url": url,
+            "concurrence": concurrency,
+            "duree_s": duration,
+            "seed": seed,
+            "lecture_seule": read_only,
+            "commit": _git_commit(),
+        },
+        "total": {"requetes": total, "debit_rps": round(total / measured, 1)},
+        "scenarios": {n: s.summary(measured) for n, s in stats.items()},
+    }
+
+
+def print_report(result: dict):
+    print(f"{'scenario':<18} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'sql':>5}")
+    for name, s in result["scenarios"].items():
+        cols = [s["p50_ms"], s["p95_ms"], s["p99_ms"]]
+        print(f"{name:<18} {s['requetes']:>7} {s['erreurs']:>5} {s['debit_rps']:>8} "
+              + " ".join(f"{v:>8}" if v is not None else f"{'-':>8}" for v in cols)
+              + f" {s['sql_moyen'] if s['sql_moyen'] is not None else '-':>5}")
+    print(f"\nTotal : {result['total']['requetes']} requetes, {result['total']['debit_rps']} req/s")
+
+
+def save(result: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,256 @@
+"""
+Generateur de donnees synthetiques (deterministe, cote serveur).
+
+Le schema "historique" (clients, tickets, params, membres_equipe,
+commandes_pieces, catalogue) vient de l'ancienne application et n'est pas
+cree par app.main : CORE_SCHEMA le cree si absent, puis le lifespan de
+l'application joue ses propres migrations (tables, colonnes, index,
+triggers), exactement comme au demarrage en production.
+
+Les lignes sont generees par des INSERT ... SELECT FROM generate_series
+apres setseed() : pas d'aller-retour par ligne, et memes donnees a seed et
+echelle identiques. Volumes pour --scale 1 dans VOLUMES.
+"""
+
+import asyncio
+import os
+import time
+
+import psycopg2
+
+CORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS params (cle TEXT PRIMARY KEY, valeur TEXT);
+CREATE TABLE IF NOT EXISTS membres_equipe (
+    id SERIAL PRIMARY KEY, nom TEXT NOT NULL, role TEXT DEFAULT '',
+    couleur TEXT DEFAULT '#8B5CF6', actif INTEGER DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS clients (
+    id SERIAL PRIMARY KEY, nom TEXT, prenom TEXT, telephone TEXT,
+    email TEXT, societe TEXT, date_creation TIMESTAMP DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    id SERIAL PRIMARY KEY, ticket_code TEXT, client_id INTEGER REFERENCES clients(id),
+    categorie TEXT, marque TEXT, modele TEXT, modele_autre TEXT, imei TEXT,
+    panne TEXT, panne_detail TEXT, pin TEXT, pattern TEXT,
+    notes_client TEXT, notes_internes TEXT, commentaire_client TEXT,
+    reparation_supp TEXT, prix_supp DECIMAL(10,2), devis_estime DECIMAL(10,2),
+    acompte DECIMAL(10,2), tarif_final DECIMAL(10,2), personne_charge TEXT,
+    technicien_assigne TEXT, commande_piece INTEGER DEFAULT 0, date_recuperation TEXT,
+    client_contacte INTEGER DEFAULT 0, client_accord INTEGER DEFAULT 0,
+    paye INTEGER DEFAULT 0, msg_whatsapp INTEGER DEFAULT 0, msg_sms INTEGER DEFAULT 0,
+    msg_email INTEGER DEFAULT 0, statut TEXT DEFAULT 'En attente de diagnostic',
+    date_depot TIMESTAMP DEFAULT NOW(), date_maj TIMESTAMP DEFAULT NOW(),
+    date_cloture TIMESTAMP, type_ecran TEXT, historique TEXT DEFAULT '',
+    reste_a_payer DECIMAL(10,2) DEFAULT 0, statut_paiement TEXT DEFAULT 'Non payé'
+);
+CREATE TABLE IF NOT EXISTS commandes_pieces (
+    id SERIAL PRIMARY KEY, ticket_id INTEGER REFERENCES tickets(id) ON DELETE CASCADE,
+    description TEXT, fournisseur TEXT, reference TEXT, prix DECIMAL(10,2) DEFAULT 0,
+    statut TEXT DEFAULT 'En attente', date_commande TIMESTAMP, date_reception TIMESTAMP,
+    notes TEXT, date_creation TIMESTAMP DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS catalog_marques (
+    categorie TEXT, marque TEXT, PRIMARY KEY (categorie, marque)
+);
+CREATE TABLE IF NOT EXISTS catalog_modeles (
+    categorie TEXT, marque TEXT, modele TEXT, PRIMARY KEY (categorie, marque, modele)
+);
+"""
+
+# Volumes a l'echelle 1 (multiplies par --scale)
+VOLUMES = {
+    "clients": 5000,
+    "tickets_par_client": 3,
+    "notes_par_ticket": 2,
+    "historique_par_ticket": 4,
+    "chat_messages": 2000,
+    "tarifs": 3000,
+    "tracking_events": 50000,
+    "devis_par_client": 0.4,
+}
+
+# Poids par statut (cles = app.api.tickets.STATUTS) : la majorite est close
+POIDS_STATUTS = {
+    "Pré-enregistré": 1, "En attente de diagnostic": 2, "En attente de pièce": 1,
+    "Pièce reçue": 1, "En attente d'accord client": 1, "En cours de réparation": 2,
+    "Réparation terminée": 2, "Rendu au client": 3, "Clôturé": 11,
+}
+STATUTS_PONDERES = [s for s, n in POIDS_STATUTS.items() for _ in range(n)]
+NOMS = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand",
+        "Leroy", "Moreau", "Simon", "Laurent", "Lefebvre", "Michel", "Garcia", "Roux",
+        "Benali", "Nguyen", "Haddad", "Rossi"]
+PRENOMS = ["Lucas", "Emma", "Hugo", "Lea", "Nathan", "Chloe", "Yanis", "Ines", "Adam",
+           "Sarah", "Karim", "Julie", "Mehdi", "Camille", "Louis", "Manon"]
+MODELES = [("Apple", "iPhone 11"), ("Apple", "iPhone 12"), ("Apple", "iPhone 13"),
+           ("Apple", "iPhone 14 Pro"), ("Apple", "iPhone 15"), ("Samsung", "Galaxy S21"),
+           ("Samsung", "Galaxy S23"), ("Samsung", "Galaxy A54"), ("Xiaomi", "Redmi Note 12"),
+           ("Google", "Pixel 7"), ("Huawei", "P30"), ("Oppo", "A78")]
+PANNES = ["Ecran cassé", "Batterie", "Connecteur de charge", "Désoxydation", "Vitre arrière",
+          "Caméra arrière", "Haut-parleur", "Micro", "Bouton power", "Diagnostic"]
+TECHS = ["Tarik", "Yassine", "Sofiane", "Nadia"]
+PIECES = ["Ecran", "Batterie", "Connecteur de charge", "Vitre arrière", "Caméra", "Haut-parleur"]
+QUALITES = ["Original", "Premium", "Compatible", "Reconditionné"]
+
+SEEDED_TABLES = [
+    "tracking_daily", "tracking_events", "chat_messages", "devis_lignes", "devis", "notes_tickets",
+    "historique", "commandes_pieces", "fidelite_historique", "tickets", "clients",
+    "tarifs", "autocompletion",
+]
+
+
+def _arr(values) -> str:
+    """Litteral ARRAY[...] (valeurs constantes du generateur, pas d'entree utilisateur)."""
+    return "ARRAY[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+def _pick(values, rnd="random()") -> str:
+    return f"({_arr(values)})[1 + floor({rnd} * {len(values)})::int]"
+
+
+def _statements(scale: float) -> list:
+    n_clients = max(10, int(VOLUMES["clients"] * scale))
+    marques = [m for m, _ in MODELES]
+    modeles = [m for _, m in MODELES]
+    return [
+        ("membres_equipe", """
+            INSERT INTO membres_equipe (nom, role, couleur, actif)
+            SELECT v.nom, v.role, '#8B5CF6', 1
+            FROM (VALUES ('bench', 'admin'), ('Tarik', 'Manager'), ('Yassine', 'Technicien'),
+                         ('Sofiane', 'Technicien'), ('Nadia', 'Accueil')) v(nom, role)
+            WHERE NOT EXISTS (SELECT 1 FROM membres_equipe m WHERE m.nom = v.nom)
+        """),
+        ("clients", f"""
+            INSERT INTO clients (nom, prenom, telephone, email, societe, date_creation)
+            SELECT {_pick(NOMS)}, {_pick(PRENOMS)},
+                   '06' || lpad(g::text, 8, '0'),
+                   CASE WHEN random() < 0.6 THEN 'client' || g || '@example.fr' ELSE '' END,
+                   CASE WHEN random() < 0.05 THEN 'Societe ' || g ELSE '' END,
+                   NOW() - random() * INTERVAL '730 days'
+            FROM generate_series(1, {n_clients}) g
+            ON CONFLICT DO NOTHING
+        """),
+        # Tirages dans la sous-requete (evalues par ligne), lus par index ensuite
+        ("tickets", f"""
+            INSERT INTO tickets (client_id, categorie, marque, modele, panne, panne_detail,
+                                 statut, technicien_assigne, devis_estime, tarif_final, paye,
+                                 date_depot, date_maj, historique)
+            SELECT s.client_id, 'Smartphone', ({_arr(marques)})[s.i], ({_arr(modeles)})[s.i],
+                   {_pick(PANNES)}, '', {_pick(STATUTS_PONDERES)}, {_pick(TECHS)},
+                   s.prix, s.prix, (random() < 0.7)::int,
+                   s.depot, s.depot + random() * INTERVAL '5 days', ''
+            FROM (
+                SELECT c.id AS client_id, 1 + floor(random() * {len(MODELES)})::int AS i,
+                       (30 + floor(random() * 250))::int AS prix,
+                       NOW() - random() * INTERVAL '365 days' AS depot
+                FROM (SELECT id FROM clients ORDER BY id DESC LIMIT {n_clients}) c
+                CROSS JOIN generate_series(1, {VOLUMES["tickets_par_client"]}) k
+            ) s
+        """),
+        ("tickets (codes, clotures)", """
+            UPDATE tickets SET
+                ticket_code = COALESCE(ticket_code, 'KP-' || lpad(id::text, 6, '0')),
+                date_cloture = CASE WHEN statut IN ('Clôturé', 'Rendu au client')
+                                    THEN date_maj ELSE NULL END
+            WHERE ticket_code IS NULL
+        """),
+        ("notes_tickets", f"""
+            INSERT INTO notes_tickets (ticket_id, auteur, contenu, important, type_note, is_read, date_creation)
+            SELECT t.id, {_pick(TECHS)}, 'Note ' || k || ' sur ' || t.ticket_code, random() < 0.1,
+                   {_pick(["note", "note", "note", "whatsapp", "sms", "email", "message_client"])},
+                   random() < 0.95, t.date_depot + k * INTERVAL '3 hours'
+            FROM tickets t CROSS JOIN generate_series(1, {VOLUMES["notes_par_ticket"]}) k
+            WHERE NOT EXISTS (SELECT 1 FROM notes_tickets n WHERE n.ticket_id = t.id)
+        """),
+        ("historique", f"""
+            INSERT INTO historique (ticket_id, type, contenu, date_creation)
+            SELECT t.id, 'statut', 'Statut -> ' || {_pick(STATUTS_PONDERES)},
+                   t.date_depot + k * INTERVAL '1 day'
+            FROM tickets t CROSS JOIN generate_series(1, {VOLUMES["historique_par_ticket"]}) k
+            WHERE NOT EXISTS (SELECT 1 FROM historique h WHERE h.ticket_id = t.id)
+        """),
+        ("chat_messages", f"""
+            INSERT INTO chat_messages (sender, recipient, message, is_private, read_by, created_at)
+            SELECT {_pick(TECHS)}, CASE WHEN random() < 0.8 THEN 'all' ELSE {_pick(TECHS)} END,
+                   'Message ' || g, random() < 0.2,
+                   CASE WHEN random() < 0.7 THEN 'Tarik,Yassine,Sofiane,Nadia' ELSE '' END,
+                   NOW() - random() * INTERVAL '60 days'
+            FROM generate_series(1, {int(VOLUMES["chat_messages"] * scale)}) g
+        """),
+        ("tarifs", f"""
+            INSERT INTO tarifs (marque, modele, type_piece, qualite, prix_client, en_stock)
+            SELECT ({_arr(marques)})[s.i], ({_arr(modeles)})[s.i] || ' ' || (s.g % 40),
+                   {_pick(PIECES)}, {_pick(QUALITES)},
+                   (20 + floor(random() * 300))::int, random() < 0.8
+            FROM (
+                SELECT g, 1 + floor(random() * {len(MODELES)})::int AS i
+                FROM generate_series(1, {int(VOLUMES["tarifs"] * scale)}) g
+            ) s
+        """),
+        ("autocompletion", f"""
+            INSERT INTO autocompletion (categorie, terme, compteur)
+            SELECT 'panne', p, (1 + floor(random() * 200))::int
+            FROM unnest({_arr(PANNES)}) p
+            ON CONFLICT (categorie, terme) DO NOTHING
+        """),
+        ("tracking_events", f"""
+            INSERT INTO tracking_events (event_type, source, target, ip_hash, created_at)
+            SELECT {_pick(["vitrine_click", "suivi_view", "avis_click", "devis_view"])},
+                   {_pick(["google", "instagram", "direct", "qr"])}, '/vitrine',
+                   md5((g % 5000)::text), NOW() - random() * INTERVAL '90 days'
+            FROM generate_series(1, {int(VOLUMES["tracking_events"] * scale)}) g
+        """),
+        ("devis", f"""
+            INSERT INTO devis (numero, client_id, client_nom, client_prenom, client_tel, appareil,
+                               description, statut, total_ht, total_ttc, date_creation)
+            SELECT 'BENCH-' || c.id, c.id, c.nom, c.prenom, c.telephone, 'iPhone 13',
+                   'Remplacement ecran', {_pick(["Brouillon", "Envoyé", "Accepté", "Refusé"])},
+                   100, 120, NOW() - random() * INTERVAL '180 days'
+            FROM clients c
+            WHERE random() < {VOLUMES["devis_par_client"]}
+            ON CONFLICT (numero) DO NOTHING
+        """),
+        ("devis_lignes", """
+            INSERT INTO devis_lignes (devis_id, description, quantite, prix_unitaire, total, ordre)
+            SELECT d.id, 'Ligne ' || k, 1, 40, 40, k
+            FROM devis d CROSS JOIN generate_series(1, 3) k
+            WHERE d.numero LIKE 'BENCH-%'
+              AND NOT EXISTS (SELECT 1 FROM devis_lignes l WHERE l.devis_id = d.id)
+        """),
+    ]
+
+
+async def _run_app_migrations():
+    from app.main import app, lifespan
+    from app.services.startup import boot
+    async with lifespan(app):
+        # Le lifespan rend la main tout de suite : attendre la fin du boot
+        if not boot.wait(timeout=600):
+            raise RuntimeError(f"migrations inachevees : {boot.pending()}")
+
+
+def seed(dsn: str, scale: float = 1.0, seed_value: float = 0.42, reset: bool = False):
+    """Schema historique, migrations de l'application puis donnees."""
+    # app.database lit DATABASE_URL a la creation du pool
+    os.environ["DATABASE_URL"] = dsn
+    from app.services import tracking_rollup
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(CORE_SCHEMA)
+            asyncio.run(_run_app_migrations())
+
+        with conn, conn.cursor() as cur:
+            if reset:
+                cur.execute("TRUNCATE " + ", ".join(SEEDED_TABLES) + " RESTART IDENTITY CASCADE")
+                cur.execute("DELETE FROM params WHERE cle = %s", (tracking_rollup.WATERMARK_KEY,))
+            cur.execute("SELECT setseed(%s)", (seed_value,))
+            for label, sql in _statements(scale):
+                t0 = time.perf_counter()
+                cur.execute(sql)
+                print(f"  {label:<28} {cur.rowcount:>9} lignes  {time.perf_counter() - t0:6.2f} s")
+            cur.execute("ANALYZE")
+    finally:
+        conn.close()
+    # Les stats de tracking lisent les rollups journaliers
+    print(f"  tracking_daily (rollup)      {tracking_rollup.compact()}")
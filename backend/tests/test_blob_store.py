@@ -0,0 +1,142 @@
+"""Tests pour le blob store (disque + S3 stand-in, eviction, Range)."""
+
+import io
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.blob_store import (
+    BlobStore, FilesystemBackend, S3Backend, content_key, derived_key,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+class FakeS3:
+    """Stand-in local de l'API boto3 utilisee par S3Backend."""
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def __init__(self, last_modified=None):
+        self.objects = {}
+        self.last_modified = last_modified or datetime.now(timezone.utc)
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise KeyError("NoSuchKey")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)]), "LastModified": self.last_modified}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(FilesystemBackend(tmp_path / "blobs", 10 * 1024 * 1024))
+
+
+def test_put_is_content_addressed(store):
+    key = store.put(PNG)
+    assert key == content_key(PNG)
+    assert store.put(PNG) == key
+    assert store.get(key) == PNG
+    assert store.get("0" * 64) is None
+    assert store.get("../etc/passwd") is None
+
+
+def test_derived_key_and_max_age(store):
+    key = derived_key("video_download", "https://cdn.example/a.png")
+    store.put(b"payload", key=key)
+    assert store.get(key, max_age=60) == b"payload"
+    old = time.time() - 3600
+    os.utime(store.local.path(key), (old, old))
+    assert store.get(key, max_age=60) is None
+
+
+def test_max_age_counts_from_write_not_last_read(store):
+    key = derived_key("video_download", "https://cdn.example/b.png")
+    store.put(b"payload", key=key)
+    written = time.time() - 2 * 3600  # ecrit il y a 2 h
+    os.utime(store.local.path(key), (written, written))
+    # Lectures repetees (LRU) : elles ne doivent pas repousser l'expiration
+    for _ in range(3):
+        assert store.get(key, max_age=3 * 3600) == b"payload"
+        assert store.get(key) == b"payload"
+        assert store.local_path(key) is not None
+    assert store.local.age(key) >= 2 * 3600 - 5
+    assert store.get(key, max_age=3600) is None
+
+
+def test_remote_rehydration_keeps_write_time(tmp_path):
+    s3 = FakeS3(last_modified=datetime.now(timezone.utc) - timedelta(days=8))
+    remote = S3Backend("bucket", client=s3)
+    key = derived_key("video_download", "https://cdn.example/c.png")
+    BlobStore(FilesystemBackend(tmp_path / "w1", 10**6), remote).put(b"old", key=key)
+
+    reader = BlobStore(FilesystemBackend(tmp_path / "w2", 10**6), remote)
+    assert reader.get(key, max_age=7 * 86400) is None
+    assert reader.get(key) == b"old"
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    store = BlobStore(FilesystemBackend(tmp_path / "blobs", 3000))
+    keys = []
+    for i in range(3):
+        keys.append(store.put(bytes([i]) * 1000))
+        old = time.time() - 100 + i
+        os.utime(store.local.path(keys[-1]), (old, old))
+    store.get(keys[0])  # relu -> le plus recent
+    store.put(b"x" * 1000)
+    assert store.local.exists(keys[0])
+    assert not store.local.exists(keys[1])
+    assert store.local.total_bytes() <= 3000
+    assert store.stats()["evicted"] >= 1
+
+
+def test_remote_rehydrates_local(tmp_path):
+    s3 = FakeS3()
+    remote = S3Backend("bucket", client=s3)
+    writer = BlobStore(FilesystemBackend(tmp_path / "w1", 10**6), remote)
+    key = writer.put(PNG)
+    assert ("bucket", f"blobs/{key}") in s3.objects
+
+    # Autre worker / redeploiement : disque vide, le blob revient de S3
+    reader = BlobStore(FilesystemBackend(tmp_path / "w2", 10**6), remote)
+    assert reader.get(key) == PNG
+    assert reader.local.exists(key)
+    assert reader.stats()["remote_hits"] == 1
+
+
+def test_serve_range_etag_and_immutable(store):
+    key = store.put(PNG)
+    app = FastAPI()
+
+    @app.get("/img/{key}")
+    def img(key: str, request: Request):
+        return store.serve(request, key)
+
+    client = TestClient(app)
+    r = client.get(f"/img/{key}")
+    assert r.status_code == 200
+    assert r.content == PNG
+    assert r.headers["content-type"] == "image/png"
+    assert "immutable" in r.headers["cache-control"]
+    assert r.headers["accept-ranges"] == "bytes"
+
+    r = client.get(f"/img/{key}", headers={"Range": "bytes=8-15"})
+    assert r.status_code == 206
+    assert r.content == PNG[8:16]
+    assert r.headers["content-range"] == f"bytes 8-15/{len(PNG)}"
+
+    r = client.get(f"/img/{key}", headers={"Range": "bytes=-4"})
+    assert r.content == PNG[-4:]
+
+    r = client.get(f"/img/{key}", headers={"Range": f"bytes={len(PNG)}-"})
+    assert r.status_code == 416
+
+    r = client.get(f"/img/{key}", headers={"If-None-Match": f'"{key}"'})
+    assert r.status_code == 304
+
+    assert client.get(f"/img/{'0' * 64}").status_code == 404
@@ -0,0 +1,74 @@
+"""Tests pour l'execution des outils de l'assistant IA (cache + parallelisme)."""
+
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from app.api import chat
+
+
+def setup_function():
+    chat._invalidate_tool_cache()
+    chat._tool_stats.clear()
+
+
+def test_tool_cache_key_normalises_input():
+    """Casse, espaces et champs vides ne changent pas la cle."""
+    a = chat._tool_cache_key("search_client", {"query": "  Dupont  Jean "})
+    b = chat._tool_cache_key("search_client", {"query": "dupont jean"})
+    c = chat._tool_cache_key("list_tickets", {"statut": "", "limit": 5})
+    d = chat._tool_cache_key("list_tickets", {"limit": 5})
+    assert a == b
+    assert c == d
+
+
+def test_execute_tool_cached_hits_cache():
+    """Un meme appel repete n'execute l'outil qu'une fois."""
+    with patch("app.api.chat._execute_tool", return_value='[{"id": 1}]') as m:
+        r1 = chat._execute_tool_cached("search_client", {"query": "Dupont"})
+        r2 = chat._execute_tool_cached("search_client", {"query": "DUPONT"})
+    assert r1 == r2 == '[{"id": 1}]'
+    assert m.call_count == 1
+    st = chat._tool_stats["search_client"]
+    assert st["calls"] == 2
+    assert st["cache_hits"] == 1
+
+
+def test_execute_tool_cached_skips_errors():
+    """Les resultats en erreur ne sont pas memorises."""
+    with patch("app.api.chat._execute_tool", return_value='{"error": "boom"}') as m:
+        chat._execute_tool_cached("get_stats", {"type": "today"})
+        chat._execute_tool_cached("get_stats", {"type": "today"})
+    assert m.call_count == 2
+
+
+def test_execute_tool_cached_expires():
+    """Passe le TTL, l'outil est re-execute."""
+    with patch("app.api.chat._execute_tool", return_value="[]") as m, \
+         patch("app.api.chat._TOOL_CACHE_TTL", 0.0):
+        chat._execute_tool_cached("get_stats", {"type": "overview"})
+        chat._execute_tool_cached("get_stats", {"type": "overview"})
+    assert m.call_count == 2
+
+
+def test_tools_run_concurrently_and_keep_order():
+    """Les tool_use d'un tour tournent en parallele, resultats dans l'ordre."""
+    barrier = threading.Barrier(3, timeout=2)
+
+    def slow_tool(name, tool_input):
+        barrier.wait()  # bloque tant que les 3 outils ne tournent pas ensemble
+        return f'"{tool_input["query"]}"'
+
+    blocks = [
+        {"type": "tool_use", "id": f"tu_{i}", "name": "search_client", "input": {"query": q}}
+        for i, q in enumerate(["a", "b", "c"])
+    ]
+    with patch("app.api.chat._execute_tool", side_effect=slow_tool):
+        t0 = time.perf_counter()
+        results = asyncio.run(chat._execute_tools_parallel(blocks))
+        elapsed = time.perf_counter() - t0
+
+    assert [r["tool_use_id"] for r in results] == ["tu_0", "tu_1", "tu_2"]
+    assert [r["content"] for r in results] == ['"a"', '"b"', '"c"']
+    assert elapsed < 2
@@ -0,0 +1,171 @@
+"""Tests pour l'upsert client sur telephone normalise et la fusion des doublons."""
+
+import asyncio
+import os
+import uuid
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.api import clients
+from app.models import ClientCreate
+from app.services import clients_upsert
+
+
+TEL_NORM_CASES = [
+    ("06 12 34 56 78", "0612345678"),
+    ("06.12.34.56.78", "0612345678"),
+    ("+33 6 12 34 56 78", "0612345678"),
+    ("0033612345678", "0612345678"),
+    ("33612345678", "0612345678"),
+    ("+32 470 12 34 56", "+32470123456"),
+    ("0032470123456", "+32470123456"),
+    ("0612", "0612"),
+    ("", None),
+    (None, None),
+    ("+", None),
+]
+
+
+@pytest.fixture
+def index_ready():
+    with patch.object(clients_upsert, "_index_ready", True):
+        yield
+
+
+@pytest.fixture
+def pg_schema():
+    """Schema jetable avec la table clients et la migration appliquee."""
+    import psycopg2
+    import psycopg2.extras
+
+    dsn = os.getenv("TEST_DATABASE_URL")
+    schema = f"clients_test_{uuid.uuid4().hex[:8]}"
+    conn = psycopg2.connect(dsn, options=f"-c search_path={schema}",
+                            cursor_factory=psycopg2.extras.RealDictCursor)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(f"CREATE SCHEMA {schema}")
+    cur.execute("""CREATE TABLE clients (
+        id SERIAL PRIMARY KEY, nom TEXT, prenom TEXT, telephone TEXT,
+        email TEXT, societe TEXT, carte_camby BOOLEAN DEFAULT FALSE,
+        points_fidelite INTEGER DEFAULT 0, total_depense DECIMAL(10,2) DEFAULT 0,
+        bon_grattage TEXT
+    )""")
+    try:
+        yield cur
+    finally:
+        cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.close()
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL non définie")
+def test_tel_norm_on_postgres(pg_schema):
+    """La fonction SQL qui porte l'index unique, pas une copie Python."""
+    cur = pg_schema
+    cur.execute(clients_upsert.TEL_NORM_FUNCTION)
+    for raw, expected in TEL_NORM_CASES:
+        cur.execute("SELECT tel_norm(%s) AS n", (raw,))
+        assert cur.fetchone()["n"] == expected, raw
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL non définie")
+def test_upsert_before_and_after_migration_on_postgres(pg_schema):
+    cur = pg_schema
+    with patch.object(clients_upsert, "_index_ready", False):
+        # Index absent : repli SELECT + INSERT, pas d'erreur ON CONFLICT
+        first = clients_upsert.upsert(cur, "06 12 34 56 78", nom="Martin")
+        assert clients_upsert.upsert(cur, "06 12 34 56 78", email="m@x.fr")["id"] == first["id"]
+
+        assert clients_upsert.migrate(cur) == {"groupes": 0, "doublons": 0, "tables": {}}
+        again = clients_upsert.upsert(cur, "+33 6 12 34 56 78", prenom="Lucas")
+        assert again["id"] == first["id"]
+        assert (again["nom"], again["prenom"], again["email"]) == ("Martin", "Lucas", "m@x.fr")
+        # Deja migre : aucune DDL rejouee
+        assert clients_upsert.migrate(cur) is None
+
+
+def test_create_client_is_one_upsert(index_ready):
+    cur = MagicMock()
+    cur.fetchone.return_value = {"id": 4, "nom": "Martin", "telephone": "06 12 34 56 78"}
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    data = ClientCreate(nom="Martin", telephone="+33 6 12 34 56 78", email="")
+    with patch("app.api.clients.get_cursor", ctx):
+        row = asyncio.run(clients.create_or_get_client(data))
+
+    assert row["id"] == 4
+    assert cur.execute.call_count == 1
+    sql, params = cur.execute.call_args[0]
+    assert "tel_norm(%(telephone)s)" in sql
+    assert "ON CONFLICT (telephone_norm) DO UPDATE SET" in sql
+    assert "email = COALESCE(NULLIF(EXCLUDED.email, ''), clients.email)" in sql
+    assert "carte_camby = EXCLUDED.carte_camby" in sql
+    assert "RETURNING *" in sql
+    assert params["telephone"] == "+33 6 12 34 56 78"
+
+
+def test_upsert_without_update_still_returns_row(index_ready):
+    cur = MagicMock()
+    clients_upsert.upsert(cur, "0612345678", update=False, nom="A", email=None)
+    sql, params = cur.execute.call_args[0]
+    assert "DO UPDATE SET telephone_norm = EXCLUDED.telephone_norm" in sql
+    assert "email" not in params
+
+
+def _merge_cursor(doublons: int):
+    cur = MagicMock()
+    cur.fetchone.return_value = {"groupes": 2, "doublons": doublons}
+    cur.fetchall.return_value = [{"table_name": "fidelite_historique"}, {"table_name": "tickets"}]
+    cur.rowcount = 3
+    return cur
+
+
+def test_merge_duplicates_dry_run_only_counts():
+    cur = _merge_cursor(5)
+    assert clients_upsert.merge_duplicates(cur, dry_run=True) == {"groupes": 2, "doublons": 5, "tables": {}}
+    assert cur.execute.call_count == 1
+
+
+def test_merge_duplicates_repoints_and_deletes():
+    cur = _merge_cursor(5)
+    stats = clients_upsert.merge_duplicates(cur)
+    assert stats["tables"] == {"fidelite_historique": 3, "tickets": 3}
+
+    sqls = [c[0][0] for c in cur.execute.call_args_list]
+    assert "CREATE TEMP TABLE _clients_fusion" in sqls[1]
+    assert "points_fidelite = COALESCE(s.points_fidelite, 0) + agg.points" in sqls[2]
+    assert any('UPDATE "tickets" t SET client_id = f.survivant' in s for s in sqls)
+    assert any('UPDATE "fidelite_historique" t SET client_id = f.survivant' in s for s in sqls)
+    # Les doublons ne sont supprimes qu'apres le rattachement
+    delete = next(i for i, s in enumerate(sqls) if s.startswith("DELETE FROM clients"))
+    assert delete > max(i for i, s in enumerate(sqls) if "SET client_id" in s)
+
+
+def test_migrate_merges_before_unique_index():
+    cur = _merge_cursor(0)
+    cur.fetchone.side_effect = [{"idx": None}, {"groupes": 0, "doublons": 0}]
+    clients_upsert.migrate(cur)
+    sqls = [c[0][0] for c in cur.execute.call_args_list]
+    assert sqls[-1].startswith("CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_telephone_norm")
+
+    # Index deja la : ni trigger recree ni UPDATE de toute la table
+    cur = _merge_cursor(0)
+    cur.fetchone.return_value = {"idx": "idx_clients_telephone_norm"}
+    assert clients_upsert.migrate(cur) is None
+    assert cur.execute.call_count == 1
+    assert "to_regclass" in cur.execute.call_args[0][0]
+
+
+def test_upsert_falls_back_without_unique_index():
+    cur = MagicMock()
+    cur.fetchone.side_effect = [{"idx": None}, None, {"id": 9}]
+    with patch.object(clients_upsert, "_index_ready", False):
+        assert clients_upsert.upsert(cur, "0612345678", nom="A")["id"] == 9
+    sqls = [c[0][0] for c in cur.execute.call_args_list]
+    assert "SELECT * FROM clients WHERE telephone = %s" in sqls[1]
+    assert "INSERT INTO clients" in sqls[2] and "ON CONFLICT" not in sqls[2]
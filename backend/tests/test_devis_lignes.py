@@ -0,0 +1,79 @@
+"""Tests pour la persistance differentielle des lignes de devis."""
+
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from app.api import devis
+from app.api.devis import DevisLigneIn, DevisUpdate
+
+
+def _existing(n: int) -> list:
+    return [
+        {"id": 100 + i, "description": f"Ligne {i}", "quantite": 1, "prix_unitaire": 10.0 + i, "ordre": i}
+        for i in range(n)
+    ]
+
+
+def _payload(n: int, changes: dict = None) -> list:
+    out = []
+    for i in range(n):
+        l = {"description": f"Ligne {i}", "quantite": 1, "prix_unitaire": 10.0 + i}
+        l.update((changes or {}).get(i, {}))
+        out.append(DevisLigneIn(**l))
+    return out
+
+
+def test_diff_by_position():
+    lignes = devis._prepare_lignes(_payload(4, {1: {"prix_unitaire": 99}}))
+    inserts, updates, deletes = devis._diff_lignes(_existing(5), lignes)
+    assert inserts == []
+    assert [u["id"] for u in updates] == [101]
+    assert updates[0]["total"] == 99
+    assert deletes == [104]
+
+
+def test_diff_by_id_handles_reorder_and_new_lines():
+    existing = _existing(3)
+    payload = [
+        DevisLigneIn(id=102, description="Ligne 2", prix_unitaire=12),
+        DevisLigneIn(id=100, description="Ligne 0", prix_unitaire=10),
+        DevisLigneIn(description="Nouvelle", prix_unitaire=5),
+    ]
+    inserts, updates, deletes = devis._diff_lignes(existing, devis._prepare_lignes(payload))
+    assert [l["description"] for l in inserts] == ["Nouvelle"]
+    assert {(u["id"], u["ordre"]) for u in updates} == {(102, 0), (100, 1)}
+    assert deletes == [101]
+
+
+def test_autosave_of_30_lines_is_three_statements():
+    cur = MagicMock()
+    cur.fetchone.return_value = {
+        "id": 7, "numero": "DEV-202610-0001", "statut": "Brouillon",
+        "tva": 20, "remise": 0, "_lignes": _existing(30),
+    }
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    data = DevisUpdate(lignes=_payload(30, {12: {"quantite": 2}}))
+    with patch("app.api.devis.get_cursor", ctx):
+        assert asyncio.run(devis.update_devis(7, data, user={})) == {"ok": True}
+
+    # Lecture devis+lignes, 1 UPDATE lignes, 1 UPDATE devis (avant : 33)
+    assert cur.execute.call_count == 3
+    update_lignes = cur.execute.call_args_list[1][0]
+    assert "unnest" in update_lignes[0]
+    assert update_lignes[1][0] == [112]
+
+    sql, values = cur.execute.call_args_list[2][0]
+    assert sql.startswith("UPDATE devis SET")
+    expected_ht = sum(10.0 + i for i in range(30)) + 22.0
+    assert values[0] == round(expected_ht, 2)
+
+
+def test_unchanged_lines_write_nothing():
+    cur = MagicMock()
+    assert devis._save_lignes(cur, 7, _existing(30), devis._prepare_lignes(_payload(30))) == 0
+    cur.execute.assert_not_called()
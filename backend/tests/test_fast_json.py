@@ -0,0 +1,92 @@
+"""Tests pour la serialisation JSON rapide des listes de lignes SQL."""
+
+import asyncio
+import json
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from psycopg2.extras import RealDictRow
+
+from app.api import tickets
+from app.models import TicketFull
+from app.services import fast_json
+
+
+def _row(**values):
+    row = RealDictRow()
+    row.update(values)
+    return row
+
+
+def _ticket(i):
+    return _row(
+        id=i, ticket_code=f"KP-{i:06d}", client_id=7, marque="Apple", modele="iPhone 13",
+        statut="En cours de réparation", devis_estime=Decimal("89.90"), tarif_final=Decimal("120"),
+        date_depot=datetime(2025, 3, 1, 9, 30, 15, 120), date_maj=datetime(2025, 3, 2, 10, 0),
+        date_cloture=None, est_retour_sav=False, paye=1, msg_whatsapp=1, msg_sms=0, msg_email=0,
+        client_nom="Martin", client_carte_camby=1, ticket_original_id=None, reparation_extra="x",
+    )
+
+
+def _db(rows):
+    cur = MagicMock()
+    cur.fetchall.return_value = rows
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    return ctx, cur
+
+
+def test_dumps_matches_default_encoder():
+    content = [_row(
+        d=datetime(2025, 1, 2, 3, 4, 5, 6), j=date(2025, 1, 2), h=time(8, 30),
+        prix=Decimal("12.50"), entier=Decimal("12"), nom="Écran", ok=True, vide=None,
+    ), {"liste": (1, 2), 3: "cle entiere"}]
+    assert json.loads(fast_json.dumps(content)) == json.loads(JSONResponse(jsonable_encoder(content)).body)
+
+
+def test_default_without_orjson():
+    content = {"d": datetime(2025, 1, 2, 3, 4), "prix": Decimal("9.99")}
+    assert json.dumps(content, default=fast_json._default) == '{"d": "2025-01-02T03:04:00", "prix": 9.99}'
+
+
+def test_rows_as_matches_response_model():
+    rows = [_ticket(1), _ticket(2)]
+    fast = json.loads(fast_json.dumps(fast_json.rows_as(TicketFull, rows)))
+    validated = [TicketFull(**r).model_dump(mode="json") for r in rows]
+    assert fast == validated
+    assert "reparation_extra" not in fast[0]
+    assert fast[0]["commande_piece"] == 0  # absent de la ligne : valeur par defaut
+
+
+def test_list_tickets_skips_validation_and_keeps_schema():
+    ctx, cur = _db([_ticket(i) for i in range(3)])
+    with patch("app.api.tickets.get_cursor", ctx):
+        r = asyncio.run(tickets.list_tickets(
+            statut=None, tel=None, code=None, nom=None, search=None, limit=100, offset=0, user={},
+        ))
+    assert isinstance(r, fast_json.FastJSONResponse)
+    body = json.loads(r.body)
+    assert [t["id"] for t in body] == [0, 1, 2]
+    assert body[0]["date_depot"] == "2025-03-01T09:30:15.000120"
+    sql = cur.execute.call_args[0][0]
+    assert "EXISTS(SELECT 1 FROM notes_tickets WHERE ticket_id = t.id AND type_note = 'sms')::int" in sql
+    assert sql.index("t.telephone_pret_rendu::int as telephone_pret_rendu") > sql.index("t.*")
+
+    route = next(rt for rt in tickets.router.routes if rt.path == "/api/tickets" and "GET" in rt.methods)
+    assert route.response_model == list[TicketFull]
+
+
+def test_repair_queue_serialises_datetimes():
+    ctx, _ = _db([_row(id=1, date_depot=datetime(2025, 3, 1, 9, 0), reparation_debut=None, date_recuperation="demain")])
+    with patch("app.api.tickets.get_cursor", ctx):
+        r = asyncio.run(tickets.get_repair_queue(tech=None, limit=20, user={}))
+    assert json.loads(r.body) == [
+        {"id": 1, "date_depot": "2025-03-01T09:00:00", "reparation_debut": None, "date_recuperation": "demain"},
+    ]
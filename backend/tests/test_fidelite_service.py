@@ -0,0 +1,110 @@
+"""Tests pour le service fidelite (reglages en cache, fiche en une requete)."""
+
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import fidelite
+
+
+PARAMS = [
+    {"cle": "fidelite_points_par_euro", "valeur": "5"},
+    {"cle": "fidelite_palier_film", "valeur": "500"},
+    {"cle": "grattage_frequence", "valeur": "abc"},
+    {"cle": "FIDELITE_SETTINGS_VERSION", "valeur": "v1"},
+]
+
+
+@pytest.fixture
+def cursor():
+    cur = MagicMock()
+    cur.fetchall.return_value = PARAMS
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    fidelite._settings = None
+    with patch("app.services.fidelite.get_cursor", ctx):
+        yield cur
+    fidelite._settings = None
+
+
+def test_settings_single_query_and_cached(cursor):
+    s = fidelite.settings()
+    assert s.version == "v1"
+    assert s.active is True
+    assert s.points_par_euro == 5
+    assert s.palier_film == 500
+    assert s.palier_reduction == 5000
+    assert s.grattage_frequence == 10  # valeur invalide -> defaut
+    assert fidelite.settings() is s
+    assert cursor.execute.call_count == 1
+
+
+def test_invalidate_bumps_version_and_reloads(cursor):
+    s = fidelite.settings()
+    fidelite.invalidate(cursor)
+    sql, args = cursor.execute.call_args[0]
+    assert "INSERT INTO params" in sql
+    assert args[0] == fidelite.VERSION_KEY
+    assert fidelite.settings() is not s
+
+
+def test_summary_one_round_trip(cursor):
+    fidelite.settings()
+    cursor.execute.reset_mock()
+    cursor.fetchone.return_value = {
+        "client_id": 3, "points_fidelite": 700, "total_depense": 140,
+        "bon_grattage": "film",
+        "historique": [{"type": "gain", "points": 700, "description": "x", "date_creation": "2026-01-02T10:00:00"}],
+    }
+    fiche = fidelite.summary(client_id=3)
+    assert cursor.execute.call_count == 1
+    assert "json_agg" in cursor.execute.call_args[0][0]
+    assert fiche["points"] == 700
+    assert fiche["recompenses_disponibles"] == {"film": True, "reduction": False}
+    assert fiche["prochaine_recompense"]["points_restants"] == 4300
+    assert fiche["bon_grattage_label"] == "Film verre trempé OFFERT"
+    assert len(fiche["historique"]) == 1
+
+    cursor.fetchone.return_value = None
+    assert fidelite.summary(ticket_code="KP-000404") is None
+    assert "ticket_code" in cursor.execute.call_args[0][0]
+
+
+def test_credit_is_a_single_statement(cursor):
+    s = fidelite.settings()
+    cur = MagicMock()
+    cur.fetchone.return_value = {"credite": True, "total_points": 1200, "client_existe": True}
+    assert fidelite.credit(cur, 3, 42, 100.0, s) == {"points_gagnes": 500, "total_points": 1200}
+    assert cur.execute.call_count == 1
+    sql, args = cur.execute.call_args[0]
+    assert "UPDATE clients" in sql and "INSERT INTO fidelite_historique" in sql
+    assert args["points"] == 500 and args["ticket_id"] == 42
+
+    # Ticket deja credite : solde inchange
+    cur.fetchone.return_value = {"credite": False, "total_points": 1200, "client_existe": True}
+    assert fidelite.credit(cur, 3, 42, 100.0, s)["points_gagnes"] == 0
+
+    cur.fetchone.return_value = {"credite": False, "total_points": None, "client_existe": False}
+    assert fidelite.credit(cur, 99, 42, 100.0, s) is None
+
+
+def test_debit_guards_balance(cursor):
+    s = fidelite.settings()
+    cur = MagicMock()
+    cur.fetchone.return_value = {"points_restants": 200, "client_existe": True}
+    assert fidelite.debit(cur, 3, "film", s) == 200
+    args = cur.execute.call_args[0][1]
+    assert args["points"] == 500 and args["type"] == "utilisation_film"
+
+    cur.fetchone.return_value = {"points_restants": None, "client_existe": True}
+    with pytest.raises(ValueError):
+        fidelite.debit(cur, 3, "reduction", s)
+    with pytest.raises(ValueError):
+        fidelite.debit(cur, 3, "inconnu", s)
+
+    cur.fetchone.return_value = {"points_restants": None, "client_existe": False}
+    assert fidelite.debit(cur, 99, "film", s) is None
@@ -0,0 +1,107 @@
+"""Tests pour le cache HTTP (ETag / 304) des endpoints publics."""
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.services import http_cache
+
+
+def _app(calls: list, payload: dict):
+    app = FastAPI()
+
+    @app.get("/items/{code}")
+    def items(code: str, request: Request):
+        def build():
+            calls.append(code)
+            if code == "absent":
+                raise HTTPException(404, "Ticket non trouvé")
+            return {"code": code, **payload}
+        return http_cache.cached_json(
+            request, "test_ns", code, build, cache_control=http_cache.PRIVATE_REVALIDATE,
+        )
+
+    return TestClient(app)
+
+
+def test_etag_and_304():
+    calls = []
+    client = _app(calls, {"statut": "En cours"})
+    r1 = client.get("/items/KP-000001")
+    assert r1.status_code == 200
+    assert r1.json() == {"code": "KP-000001", "statut": "En cours"}
+    etag = r1.headers["etag"]
+    assert r1.headers["cache-control"] == "private, no-cache"
+
+    r2 = client.get("/items/KP-000001", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.content == b""
+    assert r2.headers["etag"] == etag
+    assert calls == ["KP-000001"]  # 2e appel servi depuis le cache
+
+
+def test_invalidate_rebuilds():
+    calls = []
+    payload = {"statut": "En cours"}
+    client = _app(calls, payload)
+    etag = client.get("/items/KP-000002").headers["etag"]
+
+    payload["statut"] = "Réparation terminée"
+    http_cache.invalidate("test_ns", "KP-000002")
+    r = client.get("/items/KP-000002", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.json()["statut"] == "Réparation terminée"
+    assert r.headers["etag"] != etag
+    assert calls == ["KP-000002", "KP-000002"]
+
+    # Invalidation du namespace entier
+    http_cache.invalidate("test_ns")
+    client.get("/items/KP-000002")
+    assert len(calls) == 3
+
+
+def test_errors_are_not_cached():
+    calls = []
+    client = _app(calls, {})
+    assert client.get("/items/absent").status_code == 404
+    assert client.get("/items/absent").status_code == 404
+    assert calls == ["absent", "absent"]
+
+
+def test_same_content_same_etag():
+    c1 = _app([], {"prix": 1})
+    c2 = _app([], {"prix": 1})
+    http_cache.invalidate("test_ns")
+    e1 = c1.get("/items/X").headers["etag"]
+    http_cache.invalidate("test_ns")
+    e2 = c2.get("/items/X").headers["etag"]
+    assert e1 == e2
+
+
+def test_catalogue_revalidates_and_sees_admin_writes(client):
+    """Les listes publiques sont relues par l'admin apres ecriture : le
+    navigateur doit revalider a chaque fois (no-cache + ETag)."""
+    from contextlib import contextmanager
+    from unittest.mock import MagicMock, patch
+
+    from app.api import smartphones_tarifs
+
+    rows = [{"id": 1, "slug": "galaxy-s24", "prix_1": 500}]
+    cur = MagicMock()
+    cur.fetchall.side_effect = lambda: [dict(r) for r in rows]
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    http_cache.invalidate("catalogue")
+    with patch("app.api.smartphones_tarifs.get_cursor", ctx):
+        r1 = client.get("/api/smartphones-tarifs")
+        assert r1.headers["cache-control"] == "public, no-cache"
+        etag = r1.headers["etag"]
+        assert client.get("/api/smartphones-tarifs", headers={"If-None-Match": etag}).status_code == 304
+
+        rows.append({"id": 2, "slug": "pixel-8", "prix_1": 450})
+        smartphones_tarifs._invalidate_phones_cache()  # hook des CRUD admin
+        r2 = client.get("/api/smartphones-tarifs", headers={"If-None-Match": etag})
+    assert r2.status_code == 200
+    assert [p["slug"] for p in r2.json()] == ["galaxy-s24", "pixel-8"]
@@ -0,0 +1,67 @@
+"""Budget de temps d'import au demarrage (`python -X importtime -c "import app.main"`).
+
+Railway met l'instance en veille : chaque cold start rejoue ces imports
+avant la premiere reponse. Les dependances lourdes (PDF, images, QR, JWT,
+clients HTTP, SDK) sont importees a la premiere utilisation ; ce test
+echoue si l'une d'elles revient dans le chemin de demarrage, ou si le cout
+propre de l'application depasse le budget.
+
+Le budget est relatif a FastAPI (importe dans le meme processus) pour ne
+pas dependre de la vitesse de la machine : (app.main - fastapi) / fastapi.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Importes a la premiere utilisation, jamais au demarrage
+LAZY_MODULES = (
+    "fpdf", "PIL", "qrcode", "jose", "httpx", "openpyxl", "xhtml2pdf",
+    "anthropic", "boto3", "bs4", "app.video.story_template", "app.video.generator",
+)
+
+# Mesure au moment de l'ajout : ~1.1-1.45 (contre ~1.9-2.45 avant les imports paresseux)
+MAX_RATIO = 1.75
+RUNS = 2
+
+
+def _importtime() -> dict:
+    """{module: (self_us, cumulative_us)} pour un import de app.main."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        modules.setdefault(name.strip(), (int(self_us), int(cumulative)))
+    return modules
+
+
+def _top(modules: dict, n: int = 10) -> str:
+    own = sorted(((c, m) for m, (_, c) in modules.items() if m.startswith("app.")), reverse=True)
+    return "\n".join(f"  {c / 1000:8.1f} ms  {m}" for c, m in own[:n])
+
+
+def test_heavy_dependencies_are_not_imported_at_startup():
+    modules = _importtime()
+    loaded = [m for m in LAZY_MODULES if m in modules]
+    assert not loaded, f"importes au demarrage : {loaded}"
+
+
+def test_startup_import_budget():
+    ratios = []
+    for _ in range(RUNS):
+        modules = _importtime()
+        total, fastapi = modules["app.main"][1], modules["fastapi"][1]
+        ratios.append((total - fastapi) / fastapi)
+    best = min(ratios)
+    assert best <= MAX_RATIO, (
+        f"cout d'import propre a l'app = {best:.2f} x FastAPI (budget {MAX_RATIO}).\n"
+        f"Plus gros modules app.* (cumule) :\n{_top(modules)}"
+    )
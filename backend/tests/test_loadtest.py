@@ -0,0 +1,46 @@
+"""Tests pour le banc de charge (percentiles, comparaison, generateur)."""
+
+from app.api.tickets import STATUTS
+from benchmarks.loadtest import compare, run, seed
+from benchmarks.loadtest.__main__ import main
+
+
+def test_percentile_nearest_rank():
+    samples = list(range(1, 101))
+    assert run.percentile(samples, 50) == 50
+    assert run.percentile(samples, 95) == 95
+    assert run.percentile(samples, 99) == 99
+    assert run.percentile([7], 99) == 7
+    assert run.percentile([], 50) is None
+
+
+def test_server_timing_query_count():
+    header = 'app;dur=12.3, db;dur=4.2;desc="3 req", pool;dur=0.1'
+    assert run._DB_QUERIES.search(header).group(1) == "3"
+
+
+def _result(p95, rps=100):
+    return {"scenarios": {"dashboard": {"p50_ms": 10, "p95_ms": p95, "p99_ms": 40, "debit_rps": rps}}}
+
+
+def test_compare_flags_p95_regression():
+    result = compare.compare(_result(20), _result(25), seuil=10)
+    assert result["regressions"] == ["dashboard"]
+    assert result["scenarios"]["dashboard"]["p95_ms"]["delta_pct"] == 25.0
+    assert compare.compare(_result(20), _result(21), seuil=10)["regressions"] == []
+
+
+def test_compare_exit_code(tmp_path):
+    avant, apres = tmp_path / "avant.json", tmp_path / "apres.json"
+    run.save(_result(20), avant)
+    run.save(_result(30), apres)
+    assert main(["compare", str(avant), str(apres)]) == 1
+    assert main(["compare", str(avant), str(avant)]) == 0
+
+
+def test_seed_covers_every_statut():
+    assert set(seed.POIDS_STATUTS) == set(STATUTS)
+    labels = [label for label, _ in seed._statements(0.01)]
+    for table in ("clients", "tickets", "notes_tickets", "historique", "chat_messages",
+                  "tarifs", "tracking_events", "devis"):
+        assert table in labels
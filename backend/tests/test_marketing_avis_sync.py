@@ -0,0 +1,59 @@
+"""Tests pour la synchronisation des avis Google (upsert en un seul INSERT)."""
+
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from app.api import marketing
+
+REVIEWS = [
+    {"author_name": "Marie D", "rating": 5, "text": "Super accueil", "time": 1760000000},
+    {"author_name": "Marie D", "rating": 5, "text": "Super accueil", "time": 1760000000},  # doublon Google
+    {"author_name": "Paul", "rating": 4, "text": "Rapide", "time": 1760100000},
+    {"author_name": "Léa", "rating": 5, "text": "", "time": 0},
+]
+
+
+class _FakeResp:
+    def json(self):
+        return {"status": "OK", "result": {"reviews": REVIEWS, "rating": 4.8, "user_ratings_total": 120}}
+
+
+class _FakeClient:
+    def __init__(self, *a, **kw):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, *a, **kw):
+        return _FakeResp()
+
+
+def test_sync_is_one_statement(monkeypatch):
+    monkeypatch.setenv("GOOGLE_PLACES_API_KEY", "k")
+    monkeypatch.setenv("GOOGLE_PLACE_ID", "pid")
+    monkeypatch.setattr(marketing, "_tables_checked", True)
+    cur = MagicMock()
+    cur.fetchall.return_value = [{"id": 10}, {"id": 11}]
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    with patch("app.api.marketing.get_cursor", ctx), patch("httpx.AsyncClient", _FakeClient):
+        res = asyncio.run(marketing.sync_avis(user={"sub": "Admin"}))
+
+    assert cur.execute.call_count == 1
+    sql, params = cur.execute.call_args.args
+    assert "ON CONFLICT DO NOTHING" in sql
+    assert "md5(COALESCE(a.texte, ''))" in sql
+    # 4 avis Google, 1 doublon ecarte cote Python -> 3 lignes x 5 colonnes
+    assert len(params) == 15
+    assert params[0] == "google_marie_d_1760000000"
+    assert params[14] is None  # avis sans timestamp -> date_avis NULL
+    assert res["synced"] == 2
+    assert res["total_reviews_found"] == 4
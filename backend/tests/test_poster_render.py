@@ -0,0 +1,79 @@
+"""Tests pour le rendu des affiches de prix (cache par contenu, ZIP streame)."""
+
+import io
+import zipfile
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import poster_render
+from app.services.blob_store import BlobStore, FilesystemBackend
+
+
+def _fake_render(rows: list) -> bytes:
+    return ("%PDF-" + ",".join(f"{r['modele']}:{r['prix_1']}" for r in rows)).encode()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    s = BlobStore(FilesystemBackend(tmp_path / "blobs", 10**7))
+    monkeypatch.setattr(poster_render, "blob_store", s)
+    monkeypatch.setitem(poster_render._stats, "rendered", 0)
+    monkeypatch.setitem(poster_render._stats, "cache_hits", 0)
+    return s
+
+
+def _groups():
+    return {
+        "13": [{"modele": "iPhone 13", "prix_1": 399}],
+        "14": [{"modele": "iPhone 14", "prix_1": 499}],
+        "15": [{"modele": "iPhone 15", "prix_1": 599}],
+    }
+
+
+@pytest.mark.parametrize("processes", ["0", "2"])
+def test_only_changed_group_is_rerendered(store, monkeypatch, processes):
+    monkeypatch.setenv("POSTER_RENDER_PROCESSES", processes)
+    groups = _groups()
+    jobs = [(f"{g}.pdf", rows, ()) for g, rows in groups.items()]
+    out = dict(poster_render.render_many(jobs, _fake_render, "test"))
+    assert out["14.pdf"] == b"%PDF-iPhone 14:499"
+    assert poster_render._stats["rendered"] == 3
+
+    groups["14"][0]["prix_1"] = 479
+    jobs = [(f"{g}.pdf", rows, ()) for g, rows in groups.items()]
+    out = dict(poster_render.render_many(jobs, _fake_render, "test"))
+    assert out["14.pdf"] == b"%PDF-iPhone 14:479"
+    assert poster_render._stats["rendered"] == 4
+    assert poster_render._stats["cache_hits"] == 2
+
+
+def test_stream_zip_yields_valid_archive():
+    entries = [("a.pdf", b"%PDF-a" * 100), ("b.pdf", b"%PDF-b" * 100)]
+    chunks = list(poster_render.stream_zip(iter(entries)))
+    assert len(chunks) >= 2  # une entree envoyee avant la suivante
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert zf.namelist() == ["a.pdf", "b.pdf"]
+    assert zf.read("b.pdf") == b"%PDF-b" * 100
+
+
+def test_all_zip_endpoint_single_query(client, store, monkeypatch):
+    monkeypatch.setenv("POSTER_RENDER_PROCESSES", "0")
+    cur = MagicMock()
+    cur.fetchall.return_value = [
+        {"id": 1, "modele": "iPhone 13", "page_group": "13", "stockage_1": "128 Go", "prix_1": 399},
+        {"id": 2, "modele": "iPhone 14", "page_group": "14", "stockage_1": "128 Go", "prix_1": 499},
+    ]
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    with patch("app.api.iphone_tarifs.get_cursor", ctx), \
+            patch("app.api.iphone_tarifs._render_pdf", _fake_render):
+        r = client.get("/api/iphone-tarifs/pdf/all-zip")
+    assert r.status_code == 200
+    assert cur.execute.call_count == 1
+    zf = zipfile.ZipFile(io.BytesIO(r.content))
+    assert sorted(zf.namelist()) == ["klikphone_tarifs_13.pdf", "klikphone_tarifs_14.pdf"]
@@ -0,0 +1,58 @@
+"""Tests pour l'impression thermique par lot."""
+
+from contextlib import contextmanager
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+
+def _ticket(tid, **extra):
+    return {
+        "id": tid, "ticket_code": f"KP-{tid:06d}", "client_id": tid,
+        "client_nom": "Dupont", "client_prenom": "Marie", "client_tel": "0600000000",
+        "marque": "Apple", "modele": "iPhone 13", "panne": "Ecran", "devis_estime": 120,
+        "date_depot": datetime(2026, 10, 19, 10, 0), "statut": "En attente de diagnostic",
+        "ticket_original_code": None, **extra,
+    }
+
+
+def _batch_cursor():
+    cur = MagicMock()
+    cur.fetchall.side_effect = [
+        [{"cle": "adresse", "valeur": "1 rue du Test"}, {"cle": "URL_SUIVI", "valeur": "https://suivi.test"}],
+        [_ticket(1), _ticket(2, est_retour_sav=True, ticket_original_code="KP-000042"), _ticket(3)],
+        [{"ticket_id": 2, "contenu": "Client pressé", "auteur": "A", "important": True, "date_creation": None}],
+    ]
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    return cur, ctx
+
+
+def test_batch_fixed_query_count(client, auth_headers):
+    cur, ctx = _batch_cursor()
+    with patch("app.api.print_tickets.get_cursor", ctx):
+        r = client.get("/api/tickets/print/batch?statut=En attente de diagnostic&mode=combined",
+                       headers=auth_headers)
+    assert r.status_code == 200
+    assert r.headers["x-ticket-count"] == "3"
+    html = r.text
+    # 3 requetes pour tout le lot (params, tickets, notes)
+    assert cur.execute.call_count == 3
+    # 3 tickets x (client + staff) = 6 pages -> 5 sauts de page, un seul <html>
+    assert html.count("page-break-after:always") == 5
+    assert html.count("<html>") == 1
+    assert "1 rue du Test" in html
+    assert "KP-000042" in html
+    assert "Client pressé" in html
+
+
+def test_batch_requires_ids_or_filter(client, auth_headers):
+    r = client.get("/api/tickets/print/batch", headers=auth_headers)
+    assert r.status_code == 400
+
+
+def test_batch_requires_auth(client):
+    r = client.get("/api/tickets/print/batch?ids=1,2")
+    assert r.status_code == 401
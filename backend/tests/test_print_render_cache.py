@@ -0,0 +1,32 @@
+"""Tests pour la memoisation QR / logo des impressions."""
+
+import os
+
+from app.api import print_tickets as pt
+
+
+def test_qr_is_memoised_per_url():
+    pt._qr_png_data_uri.cache_clear()
+    token = pt._params_snapshot.set({"URL_SUIVI": "https://suivi.test"})
+    try:
+        first = pt._qr_data_uri("KP-000001")
+        assert pt._qr_data_uri("KP-000001") == first
+        pt._qr_data_uri("KP-000002")
+    finally:
+        pt._params_snapshot.reset(token)
+    info = pt._qr_png_data_uri.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+    assert first.startswith("data:image/png;base64,")
+
+
+def test_asset_uri_invalidated_by_mtime(tmp_path):
+    path = tmp_path / "logo.png"
+    path.write_bytes(b"\x89PNG-v1")
+    v1 = pt._asset_data_uri(str(path))
+    assert pt._asset_data_uri(str(path)) == v1
+
+    path.write_bytes(b"\x89PNG-v2")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert pt._asset_data_uri(str(path)) != v1
+    assert pt._asset_data_uri(str(tmp_path / "absent.png")) == ""
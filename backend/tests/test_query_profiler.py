@@ -0,0 +1,96 @@
+"""Tests pour le profileur de requetes SQL par empreinte."""
+
+from unittest.mock import MagicMock
+
+import psycopg2.extensions
+import pytest
+
+from app.services import query_profiler as qp
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    qp.reset()
+    yield
+    qp.reset()
+
+
+def test_fingerprint_normalises_literals_and_lists():
+    a = qp.fingerprint("SELECT * FROM tickets WHERE statut IN ('Clôturé', 'Rendu') AND id > 42 -- note")
+    b = qp.fingerprint("select * from tickets where statut in ('A')   and id > 7")
+    assert a == "SELECT * FROM tickets WHERE statut IN (?) AND id > ?"
+    assert a.lower() == b.lower()
+    assert qp.fingerprint("SELECT %s, %(nom)s, idx_1, $1") == "SELECT ?, ?, idx_1, $1"
+    assert qp.fingerprint("WHERE id = ANY(ARRAY[1, 2, 3])") == "WHERE id = ANY(ARRAY[?])"
+    assert (qp.fingerprint("INSERT INTO t (a, b) VALUES (1, 'x'), (2, 'y'), (3, 'z')")
+            == "INSERT INTO t (a, b) VALUES (?, ?), ...")
+    assert qp.fingerprint("SELECT E'a\\nb', 'l''apostrophe'") == "SELECT ?, ?"
+
+
+def _cur(rowcount=3):
+    cur = MagicMock()
+    cur.rowcount = rowcount
+    return cur
+
+
+def test_histograms_are_bounded_per_fingerprint(monkeypatch):
+    monkeypatch.setattr(qp, "SLOW_MS", 10_000)
+    for i, secs in enumerate((0.0003, 0.004, 0.004, 0.3)):
+        qp._observe(f"SELECT * FROM clients WHERE id = {i}", None, secs, _cur(rowcount=1))
+    qp._observe("UPDATE tickets SET statut = %s", ("x",), 0.001, _cur(rowcount=-1))
+
+    top = qp.top("total")
+    assert top[0]["fingerprint"] == "SELECT * FROM clients WHERE id = ?"
+    assert top[0]["appels"] == 4
+    assert top[0]["latence"] == {"<=0.5ms": 1, "<=5ms": 2, "<=500ms": 1}
+    assert top[0]["lignes"] == {"<=1": 4}
+    assert top[0]["p95"] == "<=500ms"
+    assert qp.top("appels", 1)[0]["appels"] == 4
+    assert len(qp.top(limit=10)) == 2
+
+
+def test_fingerprint_table_is_capped(monkeypatch):
+    monkeypatch.setattr(qp, "MAX_FINGERPRINTS", 2)
+    for t in ("a", "b", "c", "d"):
+        qp._observe(f"SELECT 1 FROM {t}", None, 0.001, _cur())
+    assert {r["fingerprint"] for r in qp.top()} == {"SELECT ? FROM a", "SELECT ? FROM b", qp.OVERFLOW}
+
+
+def test_slow_statement_gets_plan_under_savepoint():
+    conn = MagicMock()
+    conn.closed = False
+    conn.autocommit = False
+    conn.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    ec = conn.cursor.return_value.__enter__.return_value
+    ec.fetchall.return_value = [("Seq Scan on tickets",), ("  Filter: (statut = 'x')",)]
+    cur = _cur()
+    cur.connection = conn
+
+    qp._observe("SELECT * FROM tickets WHERE statut = %s", ("x",), 0.5, cur)
+    qp._observe("SELECT * FROM tickets WHERE statut = %s", ("y",), 0.5, cur)  # plan deja frais
+
+    sqls = [c[0][0] for c in ec.execute.call_args_list]
+    assert sqls == [
+        "SAVEPOINT query_profiler",
+        "EXPLAIN SELECT * FROM tickets WHERE statut = %s",
+        "ROLLBACK TO SAVEPOINT query_profiler",
+        "RELEASE SAVEPOINT query_profiler",
+    ]
+    assert qp.top()[0]["plan"].startswith("Seq Scan on tickets")
+
+
+def test_no_explain_for_ddl_or_failed_transaction():
+    conn = MagicMock()
+    conn.closed = False
+    conn.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+    cur = _cur()
+    cur.connection = conn
+    qp._observe("SELECT pg_sleep(1)", None, 1.0, cur)
+    qp._observe("CREATE INDEX x ON t(a)", None, 1.0, cur)
+    conn.cursor.assert_not_called()
+
+
+def test_disabled_profiler_records_nothing(monkeypatch):
+    monkeypatch.setattr(qp, "ENABLED", False)
+    qp._observe("SELECT 1", None, 0.001, _cur())
+    assert qp.top() == []
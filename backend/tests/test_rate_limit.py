@@ -0,0 +1,83 @@
+"""Tests pour le rate limiter partage (sliding window counter)."""
+
+from unittest.mock import MagicMock, patch
+from contextlib import contextmanager
+
+from app.services import rate_limit
+from app.services.rate_limit import MemoryBackend, PostgresBackend, RatePolicy
+
+
+def test_memory_backend_blocks_over_limit():
+    backend = MemoryBackend()
+    policy = RatePolicy(3, 60)
+    now = 600.0  # debut de fenetre
+    assert [backend.hit("ip", policy, now) for _ in range(4)] == [True, True, True, False]
+    # autre cle independante
+    assert backend.hit("other", policy, now)
+
+
+def test_memory_backend_sliding_window():
+    """La fenetre precedente compte au prorata du temps restant."""
+    backend = MemoryBackend()
+    policy = RatePolicy(10, 60)
+    for _ in range(10):
+        assert backend.hit("ip", policy, 600.0)
+    # 15 s dans la fenetre suivante : 10 * 0.75 = 7.5 -> 2 requetes passent
+    allowed = [backend.hit("ip", policy, 675.0) for _ in range(5)]
+    assert allowed == [True, True, True, False, False]
+    # 2 fenetres plus tard : tout est oublie
+    assert backend.hit("ip", policy, 800.0)
+
+
+def test_memory_backend_bounded():
+    backend = MemoryBackend(max_keys=100)
+    policy = RatePolicy(5, 60)
+    for i in range(1000):
+        backend.hit(f"ip{i}", policy, 600.0)
+    assert len(backend._counters) == 100
+
+
+def test_postgres_backend_single_statement():
+    """Une requete par verification ; pas de ligne retournee = rejet."""
+    cur = MagicMock()
+    cur.fetchone.side_effect = [{"hits": 1}, None]
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    backend = PostgresBackend()
+    backend._table_checked = True
+    with patch("app.services.rate_limit.get_cursor", ctx), \
+         patch("app.services.rate_limit.random.random", return_value=1.0):
+        assert backend.hit("public:ip", RatePolicy(30, 60), 630.0) is True
+        assert backend.hit("public:ip", RatePolicy(30, 60), 630.0) is False
+    assert cur.execute.call_count == 2
+    params = cur.execute.call_args.args[1]
+    assert params["win"] == 600 and params["prev"] == 540
+    assert params["weight"] == 0.5
+
+
+def test_postgres_failure_falls_back_to_memory(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_BACKEND", "postgres")
+    with patch.object(rate_limit._postgres, "hit", side_effect=RuntimeError("db down")):
+        assert rate_limit.check("admin_verify", "fallback-test-ip") is True
+    assert rate_limit.stats()["policies"]["admin_verify"]["backend_errors"] >= 1
+
+
+def test_policy_env_override(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_PUBLIC", "2/10")
+    p = rate_limit._policy("public")
+    assert (p.limit, p.window) == (2, 10)
+
+
+def test_enforce_returns_429_with_retry_after(client, auth_headers):
+    """Le 6e essai de code admin depuis la meme IP est rejete."""
+    rate_limit._memory.reset()
+    headers = {**auth_headers, "x-forwarded-for": "203.0.113.9"}
+    codes = [
+        client.delete("/api/iphone-tarifs/demandes-commandes/1", headers=headers).status_code
+        for _ in range(6)
+    ]
+    assert codes[:5] == [403] * 5
+    assert codes[5] == 429
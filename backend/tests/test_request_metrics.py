@@ -0,0 +1,93 @@
+"""Tests pour l'instrumentation par requete (Server-Timing, agregats)."""
+
+import pytest
+
+from app import database
+from app.services import request_metrics
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    request_metrics.reset()
+    yield
+    request_metrics.reset()
+
+
+class _FakeCursor:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, query, vars=None):
+        self.calls.append(query)
+        return "ok"
+
+
+def test_observed_cursor_counts_queries_in_request_context():
+    cls = database._observed(_FakeCursor)
+    assert database._observed(_FakeCursor) is cls
+    cur = cls()
+
+    token = request_metrics.begin()
+    m = token[0]
+    assert cur.execute("SELECT 1") == "ok"
+    cur.execute("SELECT 2")
+    request_metrics._on_checkout(0.002)
+    request_metrics.end(token, _Request(), None)
+
+    assert cur.calls == ["SELECT 1", "SELECT 2"]
+    assert m.queries == 2 and m.pool_wait == pytest.approx(0.002)
+    # Hors requete : rien n'est compte
+    cur.execute("SELECT 3")
+    assert m.queries == 2
+
+
+def test_server_timing_header_format():
+    m = request_metrics.Metrics()
+    m.queries, m.db_time, m.pool_wait = 3, 0.0042, 0.0001
+    request_metrics.record_http("https://discord.com/api/webhooks/x", 0.1)  # hors contexte
+    m.http["resend"] = [1, 0.25]
+    header = request_metrics.server_timing(m, 0.0123)
+    assert header.startswith("app;dur=12.3, ")
+    assert 'db;dur=4.2;desc="3 req"' in header
+    assert 'resend;dur=250.0;desc="1 appel(s)"' in header
+
+
+def test_http_label():
+    assert request_metrics.http_label("https://api.resend.com/emails") == "resend"
+    assert request_metrics.http_label("https://caisse.enregistreuse.fr/workers/webapp.php") == "caisse"
+    assert request_metrics.http_label("https://api.anthropic.com/v1/messages") == "anthropic"
+    assert request_metrics.http_label("https://example.org") == "http"
+
+
+def test_response_carries_server_timing(client):
+    r = client.get("/health")
+    assert r.status_code == 200
+    assert r.headers["Server-Timing"].startswith("app;dur=")
+    routes = {row["route"]: row for row in request_metrics.top("p95", 50)}
+    assert routes["GET /health"]["appels"] == 1
+
+
+def test_sampling_disabled(monkeypatch, client):
+    monkeypatch.setenv("PERF_SAMPLE_RATE", "0")
+    r = client.get("/health")
+    assert "Server-Timing" not in r.headers
+    assert request_metrics.top() == []
+
+
+def test_top_routes_by_p95_and_query_count():
+    for total, queries in ((0.010, 1), (0.020, 1), (0.500, 1)):
+        m = request_metrics.Metrics()
+        m.queries = queries
+        request_metrics._record("GET /lent", total, m)
+    m = request_metrics.Metrics()
+    m.queries = 40
+    request_metrics._record("GET /bavard", 0.05, m)
+
+    assert request_metrics.top("p95")[0]["route"] == "GET /lent"
+    assert request_metrics.top("p95")[0]["p95_ms"] == 500.0
+    assert request_metrics.top("requetes")[0]["route"] == "GET /bavard"
+
+
+class _Request:
+    method = "GET"
+    scope = {}
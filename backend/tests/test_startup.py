@@ -0,0 +1,161 @@
+"""Tests pour l'orchestrateur de demarrage (taches, timeouts, portes)."""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.services import startup
+from app.services.startup import Boot
+
+
+def _sleep(s):
+    return lambda: time.sleep(s)
+
+
+def test_independent_tasks_run_concurrently_after_deps():
+    boot = Boot(workers=4)
+    boot.add("a", _sleep(0.2))
+    boot.add("b", _sleep(0.2))
+    boot.add("c", _sleep(0), deps=("a", "b"))
+    t0 = time.perf_counter()
+    boot.start()
+    assert boot.wait(5)
+    assert time.perf_counter() - t0 < 0.35
+    a, b, c = (boot.tasks[n] for n in "abc")
+    assert [t.state for t in (a, b, c)] == [startup.OK] * 3
+    assert c.started >= max(a.ended, b.ended)
+
+
+def test_timeout_and_error_do_not_block_dependents():
+    ran = []
+    boot = Boot(workers=2)
+    boot.add("lente", _sleep(1), timeout=0.1, gates=("g",))
+    boot.add("casse", lambda: 1 / 0)
+    boot.add("suite", lambda: ran.append(True), deps=("lente", "casse"))
+    boot.start()
+    assert boot.wait(5)
+    assert boot.tasks["lente"].state == startup.TIMEOUT
+    assert boot.tasks["casse"].state == startup.ERROR
+    assert "ZeroDivisionError" in boot.tasks["casse"].error
+    assert ran == [True]
+    assert boot.ready and boot.pending() == []
+    assert {r["tache"]: r["etat"] for r in boot.status()["taches"]}["suite"] == startup.OK
+
+
+def test_invalid_graph_is_rejected():
+    boot = Boot()
+    boot.add("a", _sleep(0), deps=("inconnue",))
+    with pytest.raises(ValueError):
+        boot.start()
+    boot = Boot()
+    boot.add("a", _sleep(0), deps=("b",))
+    boot.add("b", _sleep(0), deps=("a",))
+    with pytest.raises(ValueError):
+        boot.start()
+
+
+def test_router_gated_until_its_tasks_finish():
+    release = threading.Event()
+    boot = Boot()
+    boot.add("schema", lambda: release.wait(5), gates=("schema",))
+    boot.add("autre", _sleep(0), gates=("autre",))
+
+    router = APIRouter()
+
+    @router.get("/x")
+    async def x():
+        return {"ok": True}
+
+    app = FastAPI()
+    app.include_router(router, dependencies=[startup.requires("schema")])
+    client = TestClient(app)
+
+    with patch("app.services.startup.boot", boot):
+        assert client.get("/x").status_code == 200  # boot jamais lance : pret
+        boot.start()
+        r = client.get("/x")
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == str(startup.RETRY_AFTER_S)
+        release.set()
+        assert boot.wait(5)
+        assert client.get("/x").status_code == 200
+
+
+def test_health_db_not_ready_while_booting():
+    from app import main
+    release = threading.Event()
+    boot = Boot()
+    boot.add("tables", lambda: release.wait(5), gates=("schema",))
+    with patch("app.main.boot", boot):
+        boot.start()
+        r = asyncio.run(main.health_db())
+        release.set()
+        boot.wait(5)
+    assert r.status_code == 503
+    assert json.loads(r.body)["en_attente"] == ["schema"]
+
+
+def test_app_boot_graph_covers_router_gates():
+    from app import main
+    main.boot._check_graph()
+    gates = {g for t in main.boot.tasks.values() for g in t.gates}
+    required = set()
+    for route in main.app.routes:
+        for dep in getattr(route, "dependencies", []):
+            required.update(getattr(dep.dependency, "gates", ()))
+    assert required and required <= gates
+
+
+def test_kill_idle_spares_this_instance_connections():
+    from app import main
+    from app.database import APPLICATION_NAME
+    cur = MagicMock()
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    with patch("app.main.get_cursor", ctx):
+        main._kill_idle_sessions()
+    sql, params = cur.execute.call_args[0]
+    assert "application_name IS DISTINCT FROM %s" in sql
+    assert params == (APPLICATION_NAME,)
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL non définie")
+def test_kill_idle_on_postgres():
+    """Une transaction en cours de cette instance survit, celle d'une autre non."""
+    import psycopg2
+    from app import main
+    from app.database import APPLICATION_NAME
+
+    dsn = os.getenv("TEST_DATABASE_URL")
+    mine = psycopg2.connect(dsn, application_name=APPLICATION_NAME)
+    other = psycopg2.connect(dsn, application_name="ancienne-instance")
+    runner = psycopg2.connect(dsn, application_name=APPLICATION_NAME)
+    try:
+        for conn in (mine, other):
+            conn.cursor().execute("SELECT 1")  # ouvre une transaction, laissee idle
+
+        @contextmanager
+        def ctx():
+            with runner, runner.cursor() as cur:
+                yield cur
+
+        with patch("app.main.get_cursor", ctx):
+            main._kill_idle_sessions()
+        time.sleep(0.2)
+        mine.cursor().execute("SELECT 1")
+        with pytest.raises(psycopg2.OperationalError):
+            other.cursor().execute("SELECT 1")
+    finally:
+        for conn in (mine, other, runner):
+            conn.close()
@@ -0,0 +1,48 @@
+"""Tests pour l'inbox des interactions client du dashboard."""
+
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+
+def test_interactions_single_query(client):
+    """Les 4 categories viennent d'une seule requete."""
+    cur = MagicMock()
+    cur.fetchall.return_value = [
+        {"cat": "validation_devis", "ticket_id": 1},
+        {"cat": "validation_devis", "ticket_id": 2},
+        {"cat": "message_client", "ticket_id": 2},
+        {"cat": "avis_client", "ticket_id": 3},
+        {"cat": "accord_client_valide", "ticket_id": 1},
+        {"cat": "accord_client_valide", "ticket_id": 7},
+    ]
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    with patch("app.api.suivi.get_cursor", ctx):
+        r = client.get("/api/suivi/dashboard/interactions")
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["accord_client"] == {"count": 2, "ticket_ids": [1, 2]}
+    assert body["accord_client_valide"] == {"count": 2, "ticket_ids": [1, 7]}
+    assert body["messages"] == {"count": 1, "ticket_ids": [2]}
+    assert body["avis"] == {"count": 1, "ticket_ids": [3]}
+    assert body["total_actions"] == 4
+    assert cur.execute.call_count == 1
+    # Le predicat doit rester celui de l'index partiel
+    assert "is_read IS NOT TRUE" in cur.execute.call_args.args[0]
+
+
+def test_accord_valide_driven_by_open_tickets_index():
+    """accord_client_valide part des tickets ouverts (idx_tickets_actifs),
+    pas de l'historique des validations : meme predicat que l'index."""
+    from app.api.suivi import _INTERACTIONS_SQL
+    from app.main import _CREATE_INDEXES
+
+    index = next(sql for sql in _CREATE_INDEXES if "idx_tickets_actifs" in sql)
+    predicate = index.split("WHERE ", 1)[1]
+    assert f"t.{predicate}" in _INTERACTIONS_SQL
+    assert "FROM tickets t" in _INTERACTIONS_SQL
+    assert "EXISTS" in _INTERACTIONS_SQL
@@ -0,0 +1,74 @@
+"""Tests pour le catalogue tarifs en memoire (Devis Flash + autocomplete)."""
+
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import tarifs_catalog
+
+
+ROWS = [
+    {"marque": "Apple", "modele": "iPhone 13", "type_piece": "Batterie", "qualite": "", "prix_client": 69, "en_stock": True},
+    {"marque": "Apple", "modele": "iPhone 13", "type_piece": "Ecran", "qualite": "Original", "prix_client": 189, "en_stock": False},
+    {"marque": "Apple", "modele": "iPhone 13 Pro", "type_piece": "Ecran", "qualite": "OLED", "prix_client": 229, "en_stock": True},
+    {"marque": "Samsung", "modele": "Galaxy S23", "type_piece": "Ecran", "qualite": None, "prix_client": 199, "en_stock": True},
+]
+
+
+@pytest.fixture
+def catalog_cursor():
+    cur = MagicMock()
+    cur.fetchone.return_value = {"valeur": "v1"}
+    cur.fetchall.return_value = ROWS
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    tarifs_catalog._snapshot = None
+    with patch("app.services.tarifs_catalog.get_cursor", ctx):
+        yield cur
+    tarifs_catalog._snapshot = None
+
+
+def test_search_groups_by_model(catalog_cursor):
+    res = tarifs_catalog.search_models("iphone 13", 20)
+    assert [m["modele"] for m in res] == ["iPhone 13", "iPhone 13 Pro"]
+    assert len(res[0]["reparations"]) == 2
+    assert res[0]["reparations"][1] == {
+        "composant": "Ecran", "qualite": "Original", "prix_vente": 189.0, "en_stock": False,
+    }
+
+
+def test_search_matches_brand_and_short_queries(catalog_cursor):
+    assert [m["modele"] for m in tarifs_catalog.search_models("SAMS", 20)] == ["Galaxy S23"]
+    assert len(tarifs_catalog.search_models("ph", 20)) == 2  # sous-chaine, < 3 caracteres
+    assert tarifs_catalog.search_models("pixel", 20) == []
+    assert len(tarifs_catalog.search_models("apple", 1)) == 1
+
+
+def test_snapshot_is_reused_until_invalidated(catalog_cursor):
+    tarifs_catalog.search_models("iphone", 20)
+    tarifs_catalog.search_models("galaxy", 20)
+    loads = [c for c in catalog_cursor.execute.call_args_list if "FROM tarifs" in c.args[0]]
+    assert len(loads) == 1
+
+    tarifs_catalog.invalidate(catalog_cursor)
+    tarifs_catalog.search_models("iphone", 20)
+    loads = [c for c in catalog_cursor.execute.call_args_list if "FROM tarifs" in c.args[0]]
+    assert len(loads) == 2
+
+
+def test_other_worker_version_bump_triggers_reload(catalog_cursor):
+    tarifs_catalog.search_models("iphone", 20)
+    catalog_cursor.fetchone.return_value = {"valeur": "v2"}
+    with patch("app.services.tarifs_catalog.VERSION_CHECK_S", 0.0):
+        tarifs_catalog.search_models("iphone", 20)
+    loads = [c for c in catalog_cursor.execute.call_args_list if "FROM tarifs" in c.args[0]]
+    assert len(loads) == 2
+
+
+def test_matching_modeles_excludes_brand_only_hits(catalog_cursor):
+    assert tarifs_catalog.matching_modeles("apple") == []
+    assert tarifs_catalog.matching_modeles("13") == [("iPhone 13", "Apple"), ("iPhone 13 Pro", "Apple")]
@@ -0,0 +1,126 @@
+"""Tests pour la recherche a facettes du catalogue telephones."""
+
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import telephones_catalog
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    telephones_catalog._entries.clear()
+    telephones_catalog._version = None
+    telephones_catalog._checked_at = 0.0
+    yield
+    telephones_catalog._entries.clear()
+    telephones_catalog._version = None
+
+
+def _db(version="v1"):
+    cur = MagicMock()
+    queries = []
+
+    def execute(sql, params=None):
+        queries.append((sql, params))
+        if "FROM params" in sql:
+            cur.fetchone.return_value = {"valeur": version}
+        elif sql.lstrip().startswith("WITH base"):
+            cur.fetchone.return_value = {
+                "total": 30,
+                "items": [{"id": 1, "marque": "Apple", "modele": "iPhone 13", "prix_vente": 399.0}],
+                "facettes": [
+                    {"facette": "marque", "valeur": "Samsung", "nb": 4},
+                    {"facette": "marque", "valeur": "Apple", "nb": 30},
+                    {"facette": "en_stock", "valeur": True, "nb": 30},
+                ],
+            }
+        else:
+            cur.fetchall.return_value = [{"id": 2, "marque": "Apple", "prix_vente": Decimal("449.00")}]
+
+    cur.execute.side_effect = execute
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    return ctx, queries
+
+
+def _searches(queries):
+    return [q for q in queries if "FROM params" not in q[0]]
+
+
+def test_page_total_and_facets_in_one_statement():
+    ctx, queries = _db()
+    with patch("app.services.telephones_catalog.get_cursor", ctx):
+        res = telephones_catalog.search(marque="Apple", en_stock=True, search="iphone", page=1, limit=24)
+
+    searches = _searches(queries)
+    assert len(searches) == 1
+    sql, params = searches[0]
+    assert "COUNT(*) FROM telephones_catalogue" not in sql
+    assert params["search"] == "%iphone%" and params["offset"] == 0
+    assert res["total"] == 30 and res["total_pages"] == 2
+    assert res["items"][0]["modele"] == "iPhone 13"
+    assert [f["valeur"] for f in res["facettes"]["marque"]] == ["Apple", "Samsung"]
+    assert res["facettes"]["grade"] == []
+
+
+def test_facet_ignores_its_own_filter():
+    sql = telephones_catalog._facets_sql({"marque": "marque = %(marque)s", "grade": "grade = %(grade)s"})
+    branches = sql.split("UNION ALL")
+    marque = next(b for b in branches if "'marque' AS facette" in b)
+    grade = next(b for b in branches if "'grade' AS facette" in b)
+    assert "marque = %(marque)s" not in marque and "grade = %(grade)s" in marque
+    assert "grade = %(grade)s" not in grade and "marque = %(marque)s" in grade
+
+
+def test_next_page_reuses_cached_counts():
+    ctx, queries = _db()
+    with patch("app.services.telephones_catalog.get_cursor", ctx):
+        telephones_catalog.search(marque="Apple", page=1)
+        res = telephones_catalog.search(marque="Apple", page=2)
+
+    searches = _searches(queries)
+    assert len(searches) == 2
+    sql, params = searches[1]
+    assert "WITH base" not in sql and params["offset"] == 24
+    assert res["total"] == 30 and res["facettes"]["marque"][0]["valeur"] == "Apple"
+
+
+@pytest.mark.parametrize("tri", [*telephones_catalog.ORDERS, "inconnu"])
+def test_every_order_is_total(tri):
+    """Page 1 (CTE) et page 2 (LIMIT seul) trient sur la meme cle unique."""
+    ctx, queries = _db()
+    with patch("app.services.telephones_catalog.get_cursor", ctx):
+        telephones_catalog.search(tri=tri, page=1)
+        telephones_catalog.search(tri=tri, page=2)
+
+    order = telephones_catalog.ORDERS.get(tri, telephones_catalog.DEFAULT_ORDER)
+    assert order.endswith(", id")
+    first, second = (q[0] for q in _searches(queries))
+    assert f"row_number() OVER (ORDER BY {order})" in first
+    assert f"ORDER BY {order} LIMIT" in second
+
+
+def test_new_catalogue_version_drops_cached_counts():
+    ctx, queries = _db("v1")
+    with patch("app.services.telephones_catalog.get_cursor", ctx):
+        telephones_catalog.search(page=1)
+    ctx2, queries2 = _db("v2")
+    telephones_catalog._checked_at = 0.0
+    with patch("app.services.telephones_catalog.get_cursor", ctx2):
+        telephones_catalog.search(page=2)
+    assert _searches(queries2)[0][0].lstrip().startswith("WITH base")
+
+
+def test_sync_invalidates_in_its_transaction():
+    cur = MagicMock()
+    telephones_catalog._entries[("v1", ("stats",))] = {"total": 1}
+    telephones_catalog.invalidate(cur)
+    sql, params = cur.execute.call_args[0]
+    assert "INSERT INTO params" in sql and params[0] == telephones_catalog.VERSION_KEY
+    assert telephones_catalog._entries == {}
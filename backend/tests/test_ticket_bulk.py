@@ -0,0 +1,128 @@
+"""Tests pour les operations groupees sur les tickets (statut, assignation, paiement)."""
+
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import tickets
+from app.models import BulkAssign, BulkPaye, BulkStatusChange
+from app.services import fidelite
+
+
+@pytest.fixture
+def cursor():
+    cur = MagicMock()
+    opened = []
+
+    @contextmanager
+    def ctx():
+        opened.append(1)
+        yield cur
+
+    cur.opened = opened
+    with patch("app.api.tickets.get_cursor", ctx), \
+         patch("app.api.tickets.notif_operation_groupee") as groupee, \
+         patch("app.api.tickets.notif_changement_statut") as unitaire, \
+         patch("app.api.tickets.push_notification") as push:
+        cur.groupee, cur.unitaire, cur.push = groupee, unitaire, push
+        yield cur
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_bulk_status_one_statement_one_summary(cursor):
+    cursor.fetchall.return_value = [
+        {"id": 1, "ancien_statut": "En attente d'accord client", "ticket_code": "KP-000001", "technicien_assigne": "Marina", "panne": ""},
+        {"id": 2, "ancien_statut": "Pièce reçue", "ticket_code": "KP-000002", "technicien_assigne": "Marina", "panne": ""},
+    ]
+    res = _run(tickets.bulk_change_status(
+        BulkStatusChange(ids=[2, 1, 2, 3], statut="En cours de réparation"), user={},
+    ))
+    assert res == {"ok": True, "nouveau_statut": "En cours de réparation", "modifies": 2, "introuvables": [3]}
+    assert cursor.execute.call_count == 1
+    assert len(cursor.opened) == 1
+
+    sql, params = cursor.execute.call_args[0]
+    assert "id = ANY(%(ids)s)" in sql and "FOR UPDATE" in sql
+    assert params["ids"] == [1, 2, 3]
+
+    cursor.groupee.assert_called_once()
+    assert len(cursor.groupee.call_args[0][1]) == 2
+    cursor.unitaire.assert_not_called()
+    # Un seul devis valide -> notification ciblee
+    assert cursor.push.call_count == 1
+    assert cursor.push.call_args.kwargs["target_user"] == "Marina"
+
+
+def test_bulk_limits(cursor):
+    with pytest.raises(HTTPException) as exc:
+        _run(tickets.bulk_change_status(BulkStatusChange(ids=[], statut="Clôturé"), user={}))
+    assert exc.value.status_code == 400
+    with pytest.raises(HTTPException):
+        _run(tickets.bulk_assign(BulkAssign(ids=list(range(tickets._BULK_MAX + 1))), user={}))
+    with pytest.raises(HTTPException):
+        _run(tickets.bulk_change_status(BulkStatusChange(ids=[1], statut="Inconnu"), user={}))
+    cursor.execute.assert_not_called()
+
+
+def test_bulk_assign(cursor):
+    cursor.fetchall.return_value = [
+        {"id": 4, "ticket_code": "KP-000004", "ancien_technicien": None},
+        {"id": 5, "ticket_code": "KP-000005", "ancien_technicien": "Karim"},
+    ]
+    res = _run(tickets.bulk_assign(BulkAssign(ids=[4, 5], technicien=" Karim "), user={}))
+    assert res["modifies"] == 1 and res["technicien"] == "Karim"
+    assert cursor.execute.call_count == 1
+    assert "INSERT INTO historique" in cursor.execute.call_args[0][0]
+    assert cursor.push.call_args.kwargs["target_user"] == "Karim"
+
+
+def test_bulk_paye_credits_in_one_statement(cursor):
+    cursor.fetchall.side_effect = [
+        [
+            {"id": 7, "ticket_code": "KP-000007", "client_id": 1, "montant": 80},
+            {"id": 8, "ticket_code": "KP-000008", "client_id": 1, "montant": 20},
+        ],
+        [{"ticket_id": 7, "points": 800}, {"ticket_id": 8, "points": 200}],
+    ]
+    fidelite._settings = fidelite.Settings({}, "v")
+    fidelite._checked_at = float("inf")
+    try:
+        res = _run(tickets.bulk_paye(BulkPaye(ids=[7, 8, 9]), user={}))
+    finally:
+        fidelite._settings = None
+        fidelite._checked_at = 0.0
+    assert res == {
+        "ok": True,
+        "payes": ["KP-000007", "KP-000008"],
+        "deja_payes_ou_introuvables": [9],
+        "points_credites": 1000,
+        "fidelite_ok": True,
+    }
+    # Paiement + credit fidelite (sous savepoint), chacun ensembliste
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert statements[1] == "SAVEPOINT fidelite_groupee"
+    assert statements[3] == "RELEASE SAVEPOINT fidelite_groupee"
+    assert len(statements) == 4
+    credit_params = cursor.execute.call_args_list[2][0][1]
+    assert credit_params["tickets"] == [7, 8]
+    assert credit_params["points"] == [800, 200]
+
+
+def test_bulk_paye_keeps_payments_when_loyalty_credit_fails(cursor):
+    cursor.fetchall.return_value = [
+        {"id": 7, "ticket_code": "KP-000007", "client_id": 1, "montant": 80},
+    ]
+    with patch("app.api.tickets.fidelite_service.credit_many", side_effect=RuntimeError("deadlock")):
+        res = _run(tickets.bulk_paye(BulkPaye(ids=[7]), user={}))
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    # La transaction reste utilisable : le paiement est commite, pas annule
+    assert statements[-2:] == ["SAVEPOINT fidelite_groupee", "ROLLBACK TO SAVEPOINT fidelite_groupee"]
+    assert res["payes"] == ["KP-000007"]
+    assert res["points_credites"] == 0
+    assert res["fidelite_ok"] is False
@@ -0,0 +1,94 @@
+"""Tests pour le changement de statut en une seule instruction SQL."""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import tickets
+from app.models import StatusChange
+
+RTT = 0.02  # aller-retour simule vers Postgres
+
+
+@pytest.fixture
+def cursor():
+    cur = MagicMock()
+    cur.execute.side_effect = lambda *a, **k: time.sleep(RTT)
+    cur.fetchone.return_value = {
+        "ancien_statut": "En attente d'accord client",
+        "ticket_code": "KP-000123",
+        "technicien_assigne": "Marina",
+        "panne": "Ecran cassé",
+    }
+    opened = []
+
+    @contextmanager
+    def ctx():
+        opened.append(1)
+        yield cur
+
+    cur.opened = opened
+    with patch("app.api.tickets.get_cursor", ctx), \
+         patch("app.api.tickets.notif_changement_statut") as notif, \
+         patch("app.api.tickets.notif_reparation_terminee"), \
+         patch("app.api.tickets.push_notification") as push:
+        cur.notif, cur.push = notif, push
+        yield cur
+
+
+def _change(ticket_id: int, statut: str):
+    return asyncio.run(tickets.change_status(ticket_id, StatusChange(statut=statut), user={}))
+
+
+def test_one_statement_one_connection(cursor):
+    t0 = time.perf_counter()
+    res = _change(123, "En cours de réparation")
+    elapsed = time.perf_counter() - t0
+
+    assert res == {
+        "ok": True,
+        "ancien_statut": "En attente d'accord client",
+        "nouveau_statut": "En cours de réparation",
+    }
+    # Avant : jusqu'a 7 instructions + une 2e connexion pour la note
+    assert cursor.execute.call_count == 1
+    assert len(cursor.opened) == 1
+    assert elapsed < 2 * RTT
+
+    sql, params = cursor.execute.call_args[0]
+    assert "FOR UPDATE" in sql
+    assert "reparation_duree" in sql and "EXTRACT(EPOCH" in sql
+    assert "INSERT INTO historique" in sql
+    assert "INSERT INTO notes_tickets" in sql
+    assert "statut = 'En réparation'" in sql
+    assert params["entree"] is True and params["id"] == 123
+
+    cursor.notif.assert_called_once_with("KP-000123", "En attente d'accord client", "En cours de réparation")
+    assert cursor.push.call_args.kwargs["target_user"] == "Marina"
+
+
+def test_pieces_sync_depends_on_status(cursor):
+    _change(1, "Réparation terminée")
+    sql, params = cursor.execute.call_args[0]
+    assert "statut = 'Reçu', date_reception" in sql
+    assert params["entree"] is False
+
+    _change(1, "En attente de diagnostic")
+    sql = cursor.execute.call_args[0][0]
+    assert "UPDATE commandes_pieces" not in sql
+    assert cursor.push.call_count == 0
+
+
+def test_unknown_ticket_and_invalid_status(cursor):
+    cursor.fetchone.return_value = None
+    with pytest.raises(HTTPException) as exc:
+        _change(999, "Clôturé")
+    assert exc.value.status_code == 404
+
+    with pytest.raises(HTTPException) as exc:
+        _change(1, "Inexistant")
+    assert exc.value.status_code == 400
@@ -0,0 +1,107 @@
+"""Tests pour le buffer d'ingestion des events de tracking."""
+
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+from app.services.tracking_buffer import TrackingBuffer
+
+
+def _patched_cursor(cur):
+    @contextmanager
+    def ctx():
+        yield cur
+    return patch("app.services.tracking_buffer.get_cursor", ctx)
+
+
+def test_flush_uses_one_multi_row_insert_per_batch():
+    """N events -> ceil(N / flush_events) INSERT multi-lignes."""
+    buf = TrackingBuffer(flush_events=3, flush_ms=60_000, max_pending=100)
+    cur = MagicMock()
+    with _patched_cursor(cur), patch.object(buf, "_ensure_thread"):
+        for i in range(5):
+            assert buf.add("tarifs_click", "home", None, f"ip{i}")
+        assert buf.stats()["buffered"] == 5
+        assert buf.flush() == 5
+
+    assert cur.execute.call_count == 2
+    sql, params = cur.execute.call_args_list[0].args
+    assert sql.count("(%s, %s, %s, %s, %s)") == 3
+    assert len(params) == 15
+    st = buf.stats()
+    assert st["buffered"] == 0
+    assert st["flushed"] == 5
+    assert st["batches"] == 2
+
+
+def test_flush_failure_keeps_events():
+    """Erreur DB : les events restent en attente pour le prochain flush."""
+    buf = TrackingBuffer(flush_events=10, flush_ms=60_000, max_pending=100)
+    cur = MagicMock()
+    cur.execute.side_effect = RuntimeError("db down")
+    with _patched_cursor(cur), patch.object(buf, "_ensure_thread"):
+        buf.add("tarifs_click", None, None, "ip")
+        buf.add("tarifs_click", None, None, "ip")
+        assert buf.flush() == 0
+    st = buf.stats()
+    assert st["buffered"] == 2
+    assert st["flush_errors"] == 1
+    assert st["dropped"] == 0
+
+
+def test_backpressure_then_drop_when_db_stuck():
+    """Buffer plein : flush synchrone, puis rejet si la DB ne suit pas."""
+    buf = TrackingBuffer(flush_events=10, flush_ms=60_000, max_pending=2)
+    cur = MagicMock()
+    cur.execute.side_effect = RuntimeError("db down")
+    with _patched_cursor(cur), patch.object(buf, "_ensure_thread"):
+        assert buf.add("e", None, None, "a")
+        assert buf.add("e", None, None, "b")
+        assert buf.add("e", None, None, "c") is False
+    st = buf.stats()
+    assert st["backpressure_flushes"] == 1
+    assert st["dropped"] == 1
+    assert st["buffered"] == 2
+
+
+def test_backpressure_flush_frees_room():
+    """Buffer plein mais DB OK : le flush synchrone libere de la place."""
+    buf = TrackingBuffer(flush_events=10, flush_ms=60_000, max_pending=2)
+    cur = MagicMock()
+    with _patched_cursor(cur), patch.object(buf, "_ensure_thread"):
+        buf.add("e", None, None, "a")
+        buf.add("e", None, None, "b")
+        assert buf.add("e", None, None, "c")
+    st = buf.stats()
+    assert st["flushed"] == 2
+    assert st["buffered"] == 1
+    assert st["dropped"] == 0
+
+
+def test_stop_flushes_pending():
+    """stop() (shutdown) ecrit ce qui reste en memoire."""
+    buf = TrackingBuffer(flush_events=10, flush_ms=60_000, max_pending=100)
+    cur = MagicMock()
+    with _patched_cursor(cur):
+        buf.add("e", None, None, "a")
+        buf.stop()
+    st = buf.stats()
+    assert st["buffered"] == 0
+    assert st["flushed"] == 1
+
+
+def test_track_event_endpoint_buffers(client):
+    """POST /api/tracking/event n'ecrit pas en DB, il alimente le buffer."""
+    with patch("app.api.tracking.tracking_buffer") as buf:
+        buf.add.return_value = True
+        r = client.post("/api/tracking/event", json={"event_type": "tarifs_click", "source": "home"})
+    assert r.status_code == 200
+    assert buf.add.call_args.args[:2] == ("tarifs_click", "home")
+
+
+def test_track_event_endpoint_full_buffer(client):
+    """Buffer sature -> 503 + Retry-After."""
+    with patch("app.api.tracking.tracking_buffer") as buf:
+        buf.add.return_value = False
+        r = client.post("/api/tracking/event", json={"event_type": "tarifs_click"})
+    assert r.status_code == 503
+    assert r.headers.get("retry-after") == "5"
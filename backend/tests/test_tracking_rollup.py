@@ -0,0 +1,66 @@
+"""Tests pour les rollups journaliers du tracking (sketch HLL + stats)."""
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+from app.services.tracking_rollup import HyperLogLog, rollup_stats
+
+
+def test_hll_estimate_within_error():
+    """10 000 valeurs distinctes -> estimation a 3 sigma pres (p=10)."""
+    hll = HyperLogLog()
+    for i in range(10_000):
+        hll.add(f"ip-{i}")
+    assert abs(hll.count() - 10_000) / 10_000 < 0.10
+
+
+def test_hll_small_cardinality_and_duplicates():
+    hll = HyperLogLog()
+    for _ in range(5):
+        for v in ("a", "b", "c"):
+            hll.add(v)
+    assert hll.count() == 3
+
+
+def test_hll_merge_and_roundtrip():
+    """Fusion de deux jours qui se recouvrent = union des visiteurs."""
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(3000):
+        a.add(f"ip-{i}")
+    for i in range(2000, 5000):
+        b.add(f"ip-{i}")
+    merged = HyperLogLog(a.to_bytes()).merge(HyperLogLog(b.to_bytes()))
+    assert abs(merged.count() - 5000) / 5000 < 0.10
+
+
+def test_rollup_stats_merges_rollups_and_raw_tail():
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    sketch = HyperLogLog()
+    for v in ("ip1", "ip2"):
+        sketch.add(v)
+
+    cur = MagicMock()
+    cur.fetchone.return_value = {"valeur": yesterday.isoformat()}
+    cur.fetchall.side_effect = [
+        [{"day": yesterday, "source": "home", "n": 5, "sketch": sketch.to_bytes()}],
+        [{"day": today, "source": "suivi", "n": 2, "hashes": ["ip2", "ip3"]}],
+    ]
+
+    @contextmanager
+    def ctx():
+        yield cur
+
+    with patch("app.services.tracking_rollup.get_cursor", ctx):
+        stats = rollup_stats("tarifs_click", 30)
+
+    assert stats["total"] == 7
+    assert stats["today"] == 2
+    assert stats["unique_visitors"] == 3
+    assert stats["by_source"] == [{"source": "home", "n": 5}, {"source": "suivi", "n": 2}]
+    assert [t["n"] for t in stats["timeline"]] == [5, 2]
+    # 1 lecture watermark + 2 requetes (rollups, queue brute), aucun COUNT DISTINCT
+    sqls = [c.args[0] for c in cur.execute.call_args_list]
+    assert len(sqls) == 3
+    assert not any("COUNT(DISTINCT" in s for s in sqls)
@@ -188,6 +188,9 @@ class ApiClient {
   addHistory(id, texte) { return this.post(`/api/tickets/${id}/historique?texte=${encodeURIComponent(texte)}`); }
   getHistorique(id) { return this.get(`/api/tickets/${id}/historique`); }
   togglePaye(id) { return this.patch(`/api/tickets/${id}/paye`, {}); }
+  bulkChangeStatus(ids, statut) { return this.post('/api/tickets/bulk/statut', { ids, statut }); }
+  bulkAssign(ids, technicien) { return this.post('/api/tickets/bulk/assignation', { ids, technicien }); }
+  bulkPaye(ids) { return this.post('/api/tickets/bulk/paye', { ids }); }
   getRepairQueue(tech) {
     const qs = tech ? `?tech=${encodeURIComponent(tech)}` : '';
     return this.get(`/api/tickets/queue/repair${qs}`);
@@ -193,7 +193,7 @@ export default function DevisPage() {
         setShowNewClientFields(false);
       }
       setLignes(d.lignes?.length > 0 ? d.lignes.map(l => ({
-        description: l.description, quantite: l.quantite, prix_unitaire: Number(l.prix_unitaire),
+        id: l.id, description: l.description, quantite: l.quantite, prix_unitaire: Number(l.prix_unitaire),
       })) : [{ description: '', quantite: 1, prix_unitaire: 0 }]);
       setShowModal(true);
     } catch { /* ignore */ }